@@ -403,8 +403,22 @@ def do_logout(n_clicks):
 # -------------------- Export WSGI --------------------
 server = app.server
 
+# -------------------- Health-check de pools de BD --------------------
+@server.route("/healthz")
+def healthz():
+    # SELECT 1 sobre cada engine ya inicializado (no crea engines nuevos)
+    from flask import jsonify
+    from utils.db_engines import check_all_engines_health
+    checks = check_all_engines_health()
+    ok = all(c["ok"] for c in checks.values())
+    return jsonify({"ok": ok, "engines": checks}), (200 if ok else 503)
+
 if __name__ == "__main__":
     import os
+    # Con el reloader solo precalienta el proceso hijo (el que sirve peticiones)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        from utils.precalentamiento import iniciar_precalentamiento
+        iniciar_precalentamiento()
     app.run(
         host="0.0.0.0",
         port=int(os.environ.get("PORT", 8050)),
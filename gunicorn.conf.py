@@ -0,0 +1,14 @@
+# gunicorn.conf.py
+
+"""
+Configuración de gunicorn (se carga automáticamente desde el directorio de trabajo).
+
+post_fork: cada worker lanza su precalentamiento en segundo plano (utils.precalentamiento)
+para que el primer usuario tras un despliegue o un reciclado no pague el arranque en frío.
+"""
+
+
+def post_fork(server, worker):
+    from utils.precalentamiento import iniciar_precalentamiento
+
+    iniciar_precalentamiento()
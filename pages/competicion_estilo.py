@@ -5,11 +5,11 @@ Estructura: ESTILO GLOBAL con 3 sub-rankings (Identidad General, Ofensiva, Defen
 
 from dash import html, dcc, callback, Input, Output, State, ALL, clientside_callback, ClientsideFunction
 from utils.db_manager import (get_indicadores_rendimiento_laliga, get_rankings_compuestos_laliga, 
-                               get_all_teams_rankings_laliga, get_metric_evolution_by_matchday, 
-                               get_match_opponents_by_matchday, get_match_results_by_matchday, 
-                               get_metric_info_from_name, get_laliga_db_connection)
+                               get_all_teams_rankings_laliga, get_evolucion_metrica_temporada, 
+                               get_metric_info_from_name)
+from utils.indicadores_laliga import consultar_indicadores, pivotar_metricas
+from utils.scatter_equipos import aplicar_jitter, capas_equipos, figura_cacheada
 import pandas as pd
-import numpy as np
 import plotly.graph_objects as go
 import dash
 
@@ -91,28 +91,12 @@ GROUP_TO_RANKING_ID_ESTILO = {
 def get_scatter_data_estilo(metric_x, metric_y):
     """Obtiene datos para scatter plot de Estilo desde la BD"""
     try:
-        engine = get_laliga_db_connection()
-        if not engine:
-            return None
-        
-        query = f"""
-        SELECT 
-            team_name,
-            metric_id,
-            metric_value
-        FROM indicadores_rendimiento
-        WHERE metric_id IN ('{metric_x}', '{metric_y}')
-        ORDER BY team_name, metric_id
-        """
-        
-        df = pd.read_sql(query, engine)
+        # Una fila por equipo con ambas métricas (cubo de indicadores en memoria)
+        df_pivot = pivotar_metricas([metric_x, metric_y])
         
-        if df.empty:
+        if df_pivot.empty:
             return None
         
-        # Pivotar para tener una fila por equipo con ambas métricas
-        df_pivot = df.pivot(index='team_name', columns='metric_id', values='metric_value').reset_index()
-        
         # Verificar que tenemos ambas columnas
         if metric_x not in df_pivot.columns or metric_y not in df_pivot.columns:
             return None
@@ -124,30 +108,17 @@ def get_scatter_data_estilo(metric_x, metric_y):
         return None
 
 
-def create_scatter_plot_estilo(metric_x, metric_y, label_x, label_y, invert_y=False, custom_title=None):
-    """Crea un scatter plot de Estilo con escudos de equipos y líneas medias"""
+def _construir_figura_scatter_estilo(metric_x, metric_y, label_x, label_y, invert_y=False, custom_title=None):
+    """Crea un scatter plot de Estilo con escudos de equipos y líneas medias (None si no hay datos)"""
     
     # Obtener datos
     df = get_scatter_data_estilo(metric_x, metric_y)
     
     if df is None or df.empty:
-        return html.Div([
-            html.Div([
-                html.I(className="fas fa-exclamation-triangle fa-2x mb-3", style={"color": "#dc3545"}),
-                html.P("No hay datos disponibles para este diagrama", style={"color": "#6c757d"})
-            ], style={"textAlign": "center", "padding": "100px 20px"})
-        ])
-    
-    # Añadir jitter para evitar solapamientos
-    np.random.seed(42)
-    
-    # Calcular rangos
-    x_range = df[metric_x].max() - df[metric_x].min()
-    y_range = df[metric_y].max() - df[metric_y].min()
+        return None
     
-    # Añadir jitter muy pequeño (0.3% del rango)
-    df['x_jitter'] = df[metric_x] + np.random.uniform(-x_range*0.003, x_range*0.003, len(df))
-    df['y_jitter'] = df[metric_y] + np.random.uniform(-y_range*0.003, y_range*0.003, len(df))
+    # Jitter muy pequeño (0.3% del rango) para separar escudos solapados
+    x_range, y_range = aplicar_jitter(df, metric_x, metric_y)
     
     # Calcular medias para las líneas
     mean_x = df[metric_x].mean()
@@ -172,72 +143,13 @@ def create_scatter_plot_estilo(metric_x, metric_y, label_x, label_y, invert_y=Fa
         opacity=0.5
     )
     
-    # Añadir puntos invisibles para el hover
-    for idx, row in df.iterrows():
-        team = row['team_name']
-        x_val = row['x_jitter']
-        y_val = row['y_jitter']
-        
-        fig.add_trace(go.Scatter(
-            x=[x_val],
-            y=[y_val],
-            mode='markers',
-            marker=dict(
-                size=35,
-                color='rgba(0,0,0,0)',
-                line=dict(width=0)
-            ),
-            hovertemplate=f'<b>{team}</b><br>' +
-                         f'{label_x}: %{{x:.2f}}<br>' +
-                         f'{label_y}: %{{y:.2f}}<extra></extra>',
-            showlegend=False,
-            name=team
-        ))
-    
-    # Añadir círculos azules para RC Deportivo
-    for idx, row in df.iterrows():
-        team = row['team_name']
-        if team == 'RC Deportivo':
-            x_val = row['x_jitter']
-            y_val = row['y_jitter']
-            
-            fig.add_trace(go.Scatter(
-                x=[x_val],
-                y=[y_val],
-                mode='markers',
-                marker=dict(
-                    size=65,
-                    color='rgba(0,0,0,0)',
-                    line=dict(width=4, color='#007bff')
-                ),
-                showlegend=False,
-                hoverinfo='skip'
-            ))
-    
     # Tamaño de las imágenes en unidades de datos (aumentado)
     img_size_x = x_range * 0.22
     img_size_y = y_range * 0.22
     
-    # Añadir escudos como imágenes
-    images = []
-    for idx, row in df.iterrows():
-        team = row['team_name']
-        x_val = row['x_jitter']
-        y_val = row['y_jitter']
-        
-        images.append(dict(
-            source=f'/assets/Escudos/{team}.png',
-            xref="x",
-            yref="y",
-            x=x_val,
-            y=y_val,
-            sizex=img_size_x,
-            sizey=img_size_y,
-            xanchor="center",
-            yanchor="middle",
-            sizing="contain",
-            layer="above"
-        ))
+    # Hover, círculo del RC Deportivo y escudos: una traza por capa para todos los equipos
+    images = capas_equipos(fig, df, label_x, label_y, hover_size=35, destacado_size=65, destacado_width=4,
+                           img_size_x=img_size_x, img_size_y=img_size_y)
     
     # Configurar rangos con margen
     x_min = df[metric_x].min() - x_range * 0.08
@@ -325,6 +237,26 @@ def create_scatter_plot_estilo(metric_x, metric_y, label_x, label_y, invert_y=Fa
         showlegend=False
     )
     
+    return fig
+
+
+def create_scatter_plot_estilo(metric_x, metric_y, label_x, label_y, invert_y=False, custom_title=None):
+    """Crea un scatter plot de Estilo con escudos de equipos y líneas medias"""
+    
+    # Figura construida una vez por cubo de indicadores (repetir una opción no la rehace)
+    fig = figura_cacheada(
+        ('estilo', metric_x, metric_y, label_x, label_y, invert_y, custom_title),
+        lambda: _construir_figura_scatter_estilo(metric_x, metric_y, label_x, label_y, invert_y, custom_title)
+    )
+    
+    if fig is None:
+        return html.Div([
+            html.Div([
+                html.I(className="fas fa-exclamation-triangle fa-2x mb-3", style={"color": "#dc3545"}),
+                html.P("No hay datos disponibles para este diagrama", style={"color": "#6c757d"})
+            ], style={"textAlign": "center", "padding": "100px 20px"})
+        ])
+    
     return dcc.Graph(
         figure=fig,
         config={'displayModeBar': False},
@@ -765,59 +697,46 @@ def build_estilo_heatmap_html(df, rankings_compuestos, collapsed_sections=None,
         # Obtener datos de rankings compuestos para tooltips
         if composite_ranking_ids:
             try:
-                from utils.db_manager import get_laliga_db_connection
-                engine = get_laliga_db_connection()
-                if engine:
-                    placeholders = ','.join(['%s'] * len(composite_ranking_ids))
-                    query = f"""
-                    SELECT 
-                        metric_id,
-                        team_name,
-                        ranking_position,
-                        metric_value
-                    FROM indicadores_rendimiento 
-                    WHERE metric_id IN ({placeholders})
-                    ORDER BY metric_id, ranking_position
-                    """
-                    
-                    import pandas as pd
-                    df_composite = pd.read_sql(query, engine, params=tuple(composite_ranking_ids))
+                # Rankings compuestos desde el cubo de indicadores en memoria
+                df_composite = consultar_indicadores(metric_ids=composite_ranking_ids).sort_values(
+                    ['metric_id', 'ranking_position'], kind='stable'
+                )
+                
+                if not df_composite.empty:
+                    # Crear diccionario temporal por metric_id
+                    temp_rankings = {}
+                    for idx, row in df_composite.iterrows():
+                        metric_id = row['metric_id']
+                        ranking = int(row['ranking_position'])
+                        team = row['team_name']
+                        value = row['metric_value']
+                        
+                        if metric_id not in temp_rankings:
+                            temp_rankings[metric_id] = {}
+                        
+                        if ranking not in temp_rankings[metric_id]:
+                            temp_rankings[metric_id][ranking] = []
+                        
+                        temp_rankings[metric_id][ranking].append({
+                            'team': team,
+                            'value': value
+                        })
                     
-                    if not df_composite.empty:
-                        # Crear diccionario temporal por metric_id
-                        temp_rankings = {}
-                        for idx, row in df_composite.iterrows():
-                            metric_id = row['metric_id']
-                            ranking = int(row['ranking_position'])
-                            team = row['team_name']
-                            value = row['metric_value']
-                            
-                            if metric_id not in temp_rankings:
-                                temp_rankings[metric_id] = {}
-                            
-                            if ranking not in temp_rankings[metric_id]:
-                                temp_rankings[metric_id][ranking] = []
-                            
-                            temp_rankings[metric_id][ranking].append({
-                                'team': team,
-                                'value': value
-                            })
+                    # Convertir a nombres de grupo y agrupar
+                    for metric_id, rankings in temp_rankings.items():
+                        # Encontrar el nombre del grupo correspondiente
+                        group_name = None
+                        for m in metrics_display:
+                            if m.get('ranking_id') == metric_id:
+                                group_name = m['name']
+                                break
                         
-                        # Convertir a nombres de grupo y agrupar
-                        for metric_id, rankings in temp_rankings.items():
-                            # Encontrar el nombre del grupo correspondiente
-                            group_name = None
-                            for m in metrics_display:
-                                if m.get('ranking_id') == metric_id:
-                                    group_name = m['name']
-                                    break
-                            
-                            if group_name:
-                                # Agrupar equipos con misma posición
-                                grouped = {}
-                                for pos, teams_data in rankings.items():
-                                    grouped[pos] = teams_data
-                                all_teams_rankings[group_name] = grouped
+                        if group_name:
+                            # Agrupar equipos con misma posición
+                            grouped = {}
+                            for pos, teams_data in rankings.items():
+                                grouped[pos] = teams_data
+                            all_teams_rankings[group_name] = grouped
             except Exception as e:
                 pass  # Si falla, continuar sin tooltips de rankings compuestos
     except Exception as e:
@@ -989,14 +908,8 @@ def update_metric_evolution_estilo(selected_metric, team_data):
     if not season_id:
         season_id = 1
     
-    # Obtener datos de evolución
-    df_evolution = get_metric_evolution_by_matchday(team_name, metric_id, metric_category, season_id)
-    
-    # Obtener rivales por jornada
-    opponents = get_match_opponents_by_matchday(team_name, season_id)
-    
-    # Obtener resultados por jornada
-    results = get_match_results_by_matchday(team_name, season_id)
+    # Evolución, rivales y resultados por jornada (línea temporal del equipo cacheada)
+    df_evolution, opponents, results = get_evolucion_metrica_temporada(team_name, metric_id, metric_category, season_id)
     
     if df_evolution.empty:
         return html.Div(
@@ -1018,8 +931,8 @@ def update_metric_evolution_estilo(selected_metric, team_data):
     bar_colors = []
     hover_texts = []
     
-    for _, row in df_full.iterrows():
-        matchday = int(row['match_day_number'])
+    for matchday, metric_value in zip(df_full['match_day_number'], df_full['metric_value']):
+        matchday = int(matchday)
         opponent = opponents.get(matchday, '')
         result_data = results.get(matchday, {})
         resultado = result_data.get('resultado', '')
@@ -1037,17 +950,17 @@ def update_metric_evolution_estilo(selected_metric, team_data):
             bar_colors.append('#6c757d')  # Gris (sin datos)
         
         # Crear hover text con información completa
-        if pd.notna(row['metric_value']) and opponent and resultado:
+        if pd.notna(metric_value) and opponent and resultado:
             hover_texts.append(
                 f"<b>Jornada {matchday}</b><br>"
                 f"vs {opponent}<br>"
                 f"Resultado: {goles_favor}-{goles_contra} ({resultado})<br>"
-                f"Valor: {row['metric_value']:.2f}"
+                f"Valor: {metric_value:.2f}"
             )
-        elif pd.notna(row['metric_value']) and opponent:
-            hover_texts.append(f"<b>Jornada {matchday}</b><br>vs {opponent}<br>Valor: {row['metric_value']:.2f}")
-        elif pd.notna(row['metric_value']):
-            hover_texts.append(f"<b>Jornada {matchday}</b><br>Valor: {row['metric_value']:.2f}")
+        elif pd.notna(metric_value) and opponent:
+            hover_texts.append(f"<b>Jornada {matchday}</b><br>vs {opponent}<br>Valor: {metric_value:.2f}")
+        elif pd.notna(metric_value):
+            hover_texts.append(f"<b>Jornada {matchday}</b><br>Valor: {metric_value:.2f}")
         else:
             hover_texts.append(f"<b>Jornada {matchday}</b><br>Sin datos")
     
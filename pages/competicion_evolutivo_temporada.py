@@ -9,12 +9,15 @@ Evolutivo Temporada (Competición): Visualización tipo ranking por métrica.
 from dash import html, dcc, callback, Input, Output, State
 import dash_bootstrap_components as dbc
 from utils.layouts import standard_page
-from utils.db_manager import get_db_connection, get_laliga_db_connection, get_indicadores_rendimiento_laliga, get_available_teams_laliga, get_all_teams_rankings_laliga, get_rankings_compuestos_laliga, get_metric_info_from_name, get_metric_evolution_by_matchday, get_match_opponents_by_matchday, get_match_results_by_matchday
+from utils.db_manager import get_db_connection, get_indicadores_rendimiento_laliga, get_indicadores_rendimiento_todos_laliga, RANKINGS_COMPUESTOS, get_available_teams_laliga, get_all_teams_rankings_laliga, get_rankings_compuestos_laliga, get_metric_info_from_name, get_evolucion_metrica_temporada
+import threading
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from sqlalchemy import inspect
+from utils.db_engines import table_exists
+from utils.indicadores_laliga import consultar_indicadores, pivotar_metricas, get_cubo_indicadores, get_version_cubo
+from utils.scatter_equipos import aplicar_jitter, capas_equipos, figura_cacheada
 
 def fetch_indicadores_rendimiento_laliga(team_name="RC Deportivo", for_perfil=True):
     """
@@ -84,28 +87,12 @@ def filter_metrics_by_groups(df, for_perfil=True):
 def get_scatter_data_rendimiento(metric_x, metric_y):
     """Obtiene datos para scatter plot de Rendimiento desde la BD"""
     try:
-        engine = get_laliga_db_connection()
-        if not engine:
-            return None
-        
-        query = f"""
-        SELECT 
-            team_name,
-            metric_id,
-            metric_value
-        FROM indicadores_rendimiento
-        WHERE metric_id IN ('{metric_x}', '{metric_y}')
-        ORDER BY team_name, metric_id
-        """
-        
-        df = pd.read_sql(query, engine)
+        # Una fila por equipo con ambas métricas (cubo de indicadores en memoria)
+        df_pivot = pivotar_metricas([metric_x, metric_y])
         
-        if df.empty:
+        if df_pivot.empty:
             return None
         
-        # Pivotar para tener una fila por equipo con ambas métricas
-        df_pivot = df.pivot(index='team_name', columns='metric_id', values='metric_value').reset_index()
-        
         # Verificar que tenemos ambas columnas
         if metric_x not in df_pivot.columns or metric_y not in df_pivot.columns:
             return None
@@ -117,30 +104,17 @@ def get_scatter_data_rendimiento(metric_x, metric_y):
         return None
 
 
-def create_scatter_plot_rendimiento(metric_x, metric_y, label_x, label_y, invert_y=False, custom_title=None):
-    """Crea un scatter plot de Rendimiento con escudos de equipos y líneas medias"""
+def _construir_figura_scatter_rendimiento(metric_x, metric_y, label_x, label_y, invert_y=False, custom_title=None):
+    """Crea un scatter plot de Rendimiento con escudos de equipos y líneas medias (None si no hay datos)"""
     
     # Obtener datos
     df = get_scatter_data_rendimiento(metric_x, metric_y)
     
     if df is None or df.empty:
-        return html.Div([
-            html.Div([
-                html.I(className="fas fa-exclamation-triangle fa-2x mb-3", style={"color": "#dc3545"}),
-                html.P("No hay datos disponibles para este diagrama", style={"color": "#6c757d"})
-            ], style={"textAlign": "center", "padding": "100px 20px"})
-        ])
-    
-    # Añadir jitter para evitar solapamientos
-    np.random.seed(42)
-    
-    # Calcular rangos
-    x_range = df[metric_x].max() - df[metric_x].min()
-    y_range = df[metric_y].max() - df[metric_y].min()
+        return None
     
-    # Añadir jitter muy pequeño (0.3% del rango)
-    df['x_jitter'] = df[metric_x] + np.random.uniform(-x_range*0.003, x_range*0.003, len(df))
-    df['y_jitter'] = df[metric_y] + np.random.uniform(-y_range*0.003, y_range*0.003, len(df))
+    # Jitter muy pequeño (0.3% del rango) para separar escudos solapados
+    x_range, y_range = aplicar_jitter(df, metric_x, metric_y)
     
     # Calcular medias para las líneas
     mean_x = df[metric_x].mean()
@@ -165,72 +139,13 @@ def create_scatter_plot_rendimiento(metric_x, metric_y, label_x, label_y, invert
         opacity=0.5
     )
     
-    # Añadir puntos invisibles para el hover
-    for idx, row in df.iterrows():
-        team = row['team_name']
-        x_val = row['x_jitter']
-        y_val = row['y_jitter']
-        
-        fig.add_trace(go.Scatter(
-            x=[x_val],
-            y=[y_val],
-            mode='markers',
-            marker=dict(
-                size=35,
-                color='rgba(0,0,0,0)',
-                line=dict(width=0)
-            ),
-            hovertemplate=f'<b>{team}</b><br>' +
-                         f'{label_x}: %{{x:.2f}}<br>' +
-                         f'{label_y}: %{{y:.2f}}<extra></extra>',
-            showlegend=False,
-            name=team
-        ))
-    
-    # Añadir círculos azules para RC Deportivo
-    for idx, row in df.iterrows():
-        team = row['team_name']
-        if team == 'RC Deportivo':
-            x_val = row['x_jitter']
-            y_val = row['y_jitter']
-            
-            fig.add_trace(go.Scatter(
-                x=[x_val],
-                y=[y_val],
-                mode='markers',
-                marker=dict(
-                    size=65,
-                    color='rgba(0,0,0,0)',
-                    line=dict(width=4, color='#007bff')
-                ),
-                showlegend=False,
-                hoverinfo='skip'
-            ))
-    
     # Tamaño de las imágenes en unidades de datos (igual que en Diagrama de Estilo)
     img_size_x = x_range * 0.10
     img_size_y = y_range * 0.10
     
-    # Añadir escudos como imágenes
-    images = []
-    for idx, row in df.iterrows():
-        team = row['team_name']
-        x_val = row['x_jitter']
-        y_val = row['y_jitter']
-        
-        images.append(dict(
-            source=f'/assets/Escudos/{team}.png',
-            xref="x",
-            yref="y",
-            x=x_val,
-            y=y_val,
-            sizex=img_size_x,
-            sizey=img_size_y,
-            xanchor="center",
-            yanchor="middle",
-            sizing="contain",
-            layer="above"
-        ))
+    # Hover, círculo del RC Deportivo y escudos: una traza por capa para todos los equipos
+    images = capas_equipos(fig, df, label_x, label_y, hover_size=35, destacado_size=65, destacado_width=4,
+                           img_size_x=img_size_x, img_size_y=img_size_y)
     
     # Configurar rangos con margen
     x_min = df[metric_x].min() - x_range * 0.08
@@ -279,6 +194,26 @@ def create_scatter_plot_rendimiento(metric_x, metric_y, label_x, label_y, invert
         showlegend=False
     )
     
+    return fig
+
+
+def create_scatter_plot_rendimiento(metric_x, metric_y, label_x, label_y, invert_y=False, custom_title=None):
+    """Crea un scatter plot de Rendimiento con escudos de equipos y líneas medias"""
+    
+    # Figura construida una vez por cubo de indicadores (repetir una opción no la rehace)
+    fig = figura_cacheada(
+        ('rendimiento', metric_x, metric_y, label_x, label_y, invert_y, custom_title),
+        lambda: _construir_figura_scatter_rendimiento(metric_x, metric_y, label_x, label_y, invert_y, custom_title)
+    )
+    
+    if fig is None:
+        return html.Div([
+            html.Div([
+                html.I(className="fas fa-exclamation-triangle fa-2x mb-3", style={"color": "#dc3545"}),
+                html.P("No hay datos disponibles para este diagrama", style={"color": "#6c757d"})
+            ], style={"textAlign": "center", "padding": "100px 20px"})
+        ])
+    
     return dcc.Graph(
         figure=fig,
         config={'displayModeBar': False},
@@ -307,8 +242,7 @@ def fetch_indicadores_rendimiento(team_name="RC Deportivo"):
     try:
         engine = get_db_connection()
         if engine is not None:
-            insp = inspect(engine)
-            if 'indicadores_rendimiento' in insp.get_table_names():
+            if table_exists(engine, 'indicadores_rendimiento'):
                 df = pd.read_sql("SELECT metrica, valor, ranking FROM indicadores_rendimiento", engine)
                 df['ranking'] = pd.to_numeric(df['ranking'], errors='coerce').astype('Int64')
                 df = df.dropna(subset=['metrica', 'ranking'])
@@ -1087,15 +1021,139 @@ def _group_tied_teams(rankings_dict):
     return result
 
 
-def build_custom_heatmap_html(df, rankings_compuestos, collapsed_sections=None, team_name='RC Deportivo'):
+# ============================================================================
+# MODELO PRECALCULADO DEL HEATMAP (todos los equipos en una pasada)
+# ============================================================================
+
+# Construido desde el cubo de indicadores y válido mientras no cambie su versión:
+# {'version': ..., 'equipos': {team: modelo}, 'rankings': {...}, 'compuestos': {...}}
+_MODELOS_HEATMAP = None
+_MODELOS_HEATMAP_LOCK = threading.Lock()
+
+
+def _modelo_equipo(df):
+    """Métricas ordenadas por grupos y filas por métrica de un equipo (formato metrica/valor/ranking)."""
+    ordered_metrics, group_pos = _order_metrics_by_groups(df)
+    return {
+        'df': df,
+        'ordered_metrics': ordered_metrics,
+        'group_pos': group_pos,
+        'df_by_metric': {row['metrica']: row for row in df.to_dict('records')},
+    }
+
+
+def _construir_modelos_heatmap(version):
+    """
+    Modelo del heatmap para los 22 equipos y rankings de todos los equipos por métrica
+    (para los tooltips), en una sola pasada sobre el cubo de indicadores.
+    """
+    equipos = {}
+    for team, df in get_indicadores_rendimiento_todos_laliga().items():
+        df_filtered = filter_metrics_by_groups(df)
+        if not df_filtered.empty:
+            equipos[team] = _modelo_equipo(df_filtered)
+
+    # Rankings compuestos por equipo: {team: {metric_id: ranking_position}}
+    df_compuestos = consultar_indicadores(metric_ids=RANKINGS_COMPUESTOS)
+    rankings_equipo = {
+        team: dict(zip(grupo['metric_id'], grupo['ranking_position']))
+        for team, grupo in df_compuestos.sort_values('metric_id', kind='stable').groupby('team_name', sort=False)
+    }
+    for team, modelo in equipos.items():
+        modelo['rankings_compuestos'] = rankings_equipo.get(team, {})
+
+    # Tooltips de métricas individuales (nombres cortos), con empates agrupados
+    rankings = {}
+    metric_names = get_cubo_indicadores()['metric_name'].dropna().unique().tolist()
+    for original_name, ranking in get_all_teams_rankings_laliga(metric_names).items():
+        rankings[METRIC_NAME_MAPPING.get(original_name, original_name)] = _group_tied_teams(ranking)
+
+    # Tooltips de rankings compuestos: los empates reales de BD comparten ranking_position
+    compuestos = {}
+    df_compuestos = df_compuestos.sort_values(['metric_id', 'ranking_position'], kind='stable')
+    for row in df_compuestos.itertuples(index=False):
+        posiciones = compuestos.setdefault(row.metric_id, {})
+        posiciones.setdefault(int(row.ranking_position), []).append({
+            'team': row.team_name,
+            'value': row.metric_value
+        })
+    for metric_id, posiciones in compuestos.items():
+        compuestos[metric_id] = {
+            pos: teams_list[0] if len(teams_list) == 1 else teams_list
+            for pos, teams_list in posiciones.items()
+        }
+
+    print(f"🗺️ Modelo heatmap competición: {len(equipos)} equipos, versión {version}")
+    return {'version': version, 'equipos': equipos, 'rankings': rankings, 'compuestos': compuestos}
+
+
+def get_modelos_heatmap():
+    """
+    Modelos del heatmap de todos los equipos (compartidos: NO modificar).
+    Se reconstruyen solo cuando cambia la versión del cubo de indicadores.
+    """
+    global _MODELOS_HEATMAP
+
+    get_cubo_indicadores()  # Refresca el cubo si toca comprobar su versión
+    version = get_version_cubo()
+    modelos = _MODELOS_HEATMAP
+    if modelos is not None and modelos['version'] == version:
+        return modelos
+
+    with _MODELOS_HEATMAP_LOCK:
+        modelos = _MODELOS_HEATMAP
+        if modelos is None or modelos['version'] != version:
+            try:
+                modelos = _construir_modelos_heatmap(version)
+            except Exception as e:
+                print(f"[ERROR] Error construyendo modelo del heatmap: {e}")
+                modelos = {'version': None, 'equipos': {}, 'rankings': {}, 'compuestos': {}}
+            # Sin versión (cubo no cargado) no se guarda: se reintenta en la siguiente llamada
+            if version is not None:
+                _MODELOS_HEATMAP = modelos
+    return modelos
+
+
+def get_datos_heatmap(team_name='RC Deportivo'):
+    """
+    Datos para pintar el heatmap de un equipo: (df, rankings_compuestos, modelo).
+    Con el modelo precalculado cambiar de equipo no lanza consultas; sin él
+    (equipo fuera del cubo o sin conexión a LaLiga) se usa la ruta de consulta original.
+    """
+    team_name = team_name or 'RC Deportivo'
+    modelo = get_modelos_heatmap()['equipos'].get(team_name)
+    if modelo is not None:
+        return modelo['df'], modelo['rankings_compuestos'], modelo
+
+    try:
+        df = fetch_indicadores_rendimiento(team_name)
+    except Exception:
+        df = fetch_indicadores_rendimiento()
+    try:
+        rankings_compuestos = get_rankings_compuestos_laliga(team_name)
+    except Exception:
+        rankings_compuestos = {
+            'RankingRendimiento': 4,
+            'RankingOfensivo': 2,
+            'RankingDefensivo': 4,
+            'RankingFísico-Combatividad': 13,
+            'RankingBalónParado': 3
+        }
+    return df, rankings_compuestos, None
+
+
+def build_custom_heatmap_html(df, rankings_compuestos, collapsed_sections=None, team_name='RC Deportivo', modelo=None):
     """Construye un heatmap completamente personalizado en HTML/CSS"""
     
     if collapsed_sections is None:
         collapsed_sections = set()
     
-    # Obtener datos organizados
-    ordered_metrics, group_pos = _order_metrics_by_groups(df)
-    df_by_metric = {row['metrica']: row for _, row in df.iterrows()}
+    # Obtener datos organizados (precalculados si viene el modelo del equipo)
+    if modelo is None:
+        modelo = _modelo_equipo(df)
+    ordered_metrics = modelo['ordered_metrics']
+    group_pos = modelo['group_pos']
+    df_by_metric = modelo['df_by_metric']
     
     # Verificar si TODO está colapsado (vista Global)
     all_section_names = [name for name in group_pos.keys()]
@@ -1192,108 +1250,16 @@ def build_custom_heatmap_html(df, rankings_compuestos, collapsed_sections=None,
                     'visual_width': num_metrics_in_group
                 })
     
-    # Obtener rankings de todos los equipos para tooltips
-    try:
-        # Crear mapeo inverso para obtener nombres originales (como en BD)
-        reverse_mapping = {v: k for k, v in METRIC_NAME_MAPPING.items()}
-        
-        # Separar métricas individuales de rankings compuestos
-        individual_metrics = []
-        composite_ranking_ids = []
-        
-        for m in metrics_display:
-            if m.get('is_composite') and m.get('ranking_id'):
-                # Es un ranking compuesto
-                composite_ranking_ids.append(m['ranking_id'])
-            else:
-                # Es métrica individual
-                individual_metrics.append(m['name'])
-        
-        # Convertir nombres cortos a originales para métricas individuales
-        original_metrics = [reverse_mapping.get(m, m) for m in individual_metrics]
-        
-        # Obtener datos de métricas individuales
-        all_teams_rankings = {}
-        if original_metrics:
-            all_teams_rankings_original = get_all_teams_rankings_laliga(original_metrics)
-            # Convertir claves a nombres cortos y agrupar empates
-            for original_name, rankings in all_teams_rankings_original.items():
-                short_name = METRIC_NAME_MAPPING.get(original_name, original_name)
-                grouped = _group_tied_teams(rankings)
-                all_teams_rankings[short_name] = grouped
-        
-        # Obtener datos de rankings compuestos usando query especial por metric_id
-        if composite_ranking_ids:
-            try:
-                engine = get_laliga_db_connection()
-                if engine:
-                    placeholders = ','.join(['%s'] * len(composite_ranking_ids))
-                    query = f"""
-                    SELECT 
-                        metric_id,
-                        team_name,
-                        ranking_position,
-                        metric_value
-                    FROM indicadores_rendimiento 
-                    WHERE metric_id IN ({placeholders})
-                    ORDER BY metric_id, ranking_position
-                    """
-                    
-                    import pandas as pd
-                    df_composite = pd.read_sql(query, engine, params=tuple(composite_ranking_ids))
-                    
-                    if not df_composite.empty:
-                        # Crear diccionario temporal por metric_id
-                        # IMPORTANTE: Acumulamos equipos con misma ranking_position
-                        # Estructura: {metric_id: {ranking: [{'team': 'nombre', 'value': valor}, ...]}}
-                        temp_rankings = {}
-                        for idx, row in df_composite.iterrows():
-                            metric_id = row['metric_id']
-                            ranking = int(row['ranking_position'])
-                            team = row['team_name']
-                            value = row['metric_value']
-                            
-                            if metric_id not in temp_rankings:
-                                temp_rankings[metric_id] = {}
-                            
-                            # CLAVE: Acumular equipos en la misma posición (empates reales de BD)
-                            if ranking not in temp_rankings[metric_id]:
-                                temp_rankings[metric_id][ranking] = []
-                            
-                            temp_rankings[metric_id][ranking].append({
-                                'team': team,
-                                'value': value
-                            })
-                        
-                        # Convertir a nombres de grupo y agrupar empates
-                        for metric_id, rankings in temp_rankings.items():
-                            # Encontrar el nombre del grupo correspondiente
-                            group_name = None
-                            for m in metrics_display:
-                                if m.get('ranking_id') == metric_id:
-                                    group_name = m['name']
-                                    break
-                            
-                            if group_name:
-                                # Convertir listas de 1 elemento a dict simple
-                                # rankings ya tiene estructura: {pos: [{'team': ..., 'value': ...}, ...]}
-                                final_rankings = {}
-                                for pos, teams_list in rankings.items():
-                                    if len(teams_list) == 1:
-                                        # Un solo equipo en esta posición
-                                        final_rankings[pos] = teams_list[0]
-                                    else:
-                                        # Múltiples equipos (empate real de BD)
-                                        final_rankings[pos] = teams_list
-                                
-                                all_teams_rankings[group_name] = final_rankings
-            except Exception as e:
-                # Error silencioso, continuar con rankings vacíos
-                pass
-        
-    except Exception as e:
-        # Error silencioso, continuar con rankings vacíos
-        all_teams_rankings = {}
+    # Rankings de todos los equipos para tooltips (precalculados en el modelo del heatmap)
+    modelos = get_modelos_heatmap()
+    all_teams_rankings = {}
+    for m in metrics_display:
+        if m.get('is_composite') and m.get('ranking_id'):
+            rankings = modelos['compuestos'].get(m['ranking_id'])
+        else:
+            rankings = modelos['rankings'].get(m['name'])
+        if rankings:
+            all_teams_rankings[m['name']] = rankings
     
     # Construir HTML
     global_ranking = rankings_compuestos.get('RankingRendimiento', 4)
@@ -1723,22 +1689,10 @@ def team_selector_premium():
 
 
 def build_layout():
-    df = fetch_indicadores_rendimiento()
-    
-    # Obtener rankings compuestos
-    try:
-        rankings_compuestos = get_rankings_compuestos_laliga("RC Deportivo")
-    except:
-        rankings_compuestos = {
-            'RankingRendimiento': 4,
-            'RankingOfensivo': 2,
-            'RankingDefensivo': 4,
-            'RankingFísico-Combatividad': 13,
-            'RankingBalónParado': 3
-        }
+    df, rankings_compuestos, modelo = get_datos_heatmap('RC Deportivo')
     
     # Construir heatmap HTML inicial (por defecto RC Deportivo)
-    heatmap_html = build_custom_heatmap_html(df, rankings_compuestos, set(), 'RC Deportivo')
+    heatmap_html = build_custom_heatmap_html(df, rankings_compuestos, set(), 'RC Deportivo', modelo)
     
     return standard_page([
         # Inyectar CSS para tooltips personalizados y html2canvas
@@ -1890,22 +1844,10 @@ import dash
 )
 def build_initial_heatmap(selected_team, current_state):
     """Construye el heatmap en la carga inicial y cuando cambie el equipo seleccionando."""
-    try:
-        df = fetch_indicadores_rendimiento(selected_team)
-    except Exception:
-        df = fetch_indicadores_rendimiento()
-    try:
-        rankings_compuestos = get_rankings_compuestos_laliga(selected_team or 'RC Deportivo')
-    except Exception:
-        rankings_compuestos = {
-            'RankingRendimiento': 4,
-            'RankingOfensivo': 2,
-            'RankingDefensivo': 4,
-            'RankingFísico-Combatividad': 13,
-            'RankingBalónParado': 3
-        }
+    # Modelo precalculado del equipo: cambiar de equipo no lanza consultas
+    df, rankings_compuestos, modelo = get_datos_heatmap(selected_team)
     collapsed_sections = set(current_state.get('collapsed_sections', [])) if current_state else set()
-    heatmap_html = build_custom_heatmap_html(df, rankings_compuestos, collapsed_sections, selected_team or 'RC Deportivo')
+    heatmap_html = build_custom_heatmap_html(df, rankings_compuestos, collapsed_sections, selected_team or 'RC Deportivo', modelo)
     return heatmap_html, {'collapsed_sections': list(collapsed_sections)}
 
 
@@ -1967,23 +1909,10 @@ def handle_block_clicks(clicks_list, current_state, selected_team):
         else:
             collapsed_sections.add(clicked_section)
     
-    # Obtener datos
-    try:
-        df = fetch_indicadores_rendimiento(selected_team)
-    except Exception:
-        df = fetch_indicadores_rendimiento()
-    try:
-        rankings_compuestos = get_rankings_compuestos_laliga(selected_team or 'RC Deportivo')
-    except Exception:
-        rankings_compuestos = {
-            'RankingRendimiento': 4,
-            'RankingOfensivo': 2,
-            'RankingDefensivo': 4,
-            'RankingFísico-Combatividad': 13,
-            'RankingBalónParado': 3
-        }
+    # Obtener datos (modelo precalculado del equipo)
+    df, rankings_compuestos, modelo = get_datos_heatmap(selected_team)
     
-    heatmap_html = build_custom_heatmap_html(df, rankings_compuestos, collapsed_sections, selected_team or 'RC Deportivo')
+    heatmap_html = build_custom_heatmap_html(df, rankings_compuestos, collapsed_sections, selected_team or 'RC Deportivo', modelo)
     return heatmap_html, {'collapsed_sections': list(collapsed_sections)}
 
 
@@ -2278,14 +2207,8 @@ def update_metric_evolution(selected_metric, team_data):
     if not season_id:
         season_id = 1
     
-    # Obtener datos de evolución
-    df_evolution = get_metric_evolution_by_matchday(team_name, metric_id, metric_category, season_id)
-    
-    # Obtener rivales por jornada
-    opponents = get_match_opponents_by_matchday(team_name, season_id)
-    
-    # Obtener resultados por jornada
-    results = get_match_results_by_matchday(team_name, season_id)
+    # Evolución, rivales y resultados por jornada (línea temporal del equipo cacheada)
+    df_evolution, opponents, results = get_evolucion_metrica_temporada(team_name, metric_id, metric_category, season_id)
     
     if df_evolution.empty:
         return html.Div(
@@ -2307,8 +2230,8 @@ def update_metric_evolution(selected_metric, team_data):
     bar_colors = []
     hover_texts = []
     
-    for _, row in df_full.iterrows():
-        matchday = int(row['match_day_number'])
+    for matchday, metric_value in zip(df_full['match_day_number'], df_full['metric_value']):
+        matchday = int(matchday)
         opponent = opponents.get(matchday, '')
         result_data = results.get(matchday, {})
         resultado = result_data.get('resultado', '')
@@ -2326,17 +2249,17 @@ def update_metric_evolution(selected_metric, team_data):
             bar_colors.append('#6c757d')  # Gris (sin datos)
         
         # Crear hover text con información completa
-        if pd.notna(row['metric_value']) and opponent and resultado:
+        if pd.notna(metric_value) and opponent and resultado:
             hover_texts.append(
                 f"<b>Jornada {matchday}</b><br>"
                 f"vs {opponent}<br>"
                 f"Resultado: {goles_favor}-{goles_contra} ({resultado})<br>"
-                f"Valor: {row['metric_value']:.2f}"
+                f"Valor: {metric_value:.2f}"
             )
-        elif pd.notna(row['metric_value']) and opponent:
-            hover_texts.append(f"<b>Jornada {matchday}</b><br>vs {opponent}<br>Valor: {row['metric_value']:.2f}")
-        elif pd.notna(row['metric_value']):
-            hover_texts.append(f"<b>Jornada {matchday}</b><br>Valor: {row['metric_value']:.2f}")
+        elif pd.notna(metric_value) and opponent:
+            hover_texts.append(f"<b>Jornada {matchday}</b><br>vs {opponent}<br>Valor: {metric_value:.2f}")
+        elif pd.notna(metric_value):
+            hover_texts.append(f"<b>Jornada {matchday}</b><br>Valor: {metric_value:.2f}")
         else:
             hover_texts.append(f"<b>Jornada {matchday}</b><br>Sin datos")
     
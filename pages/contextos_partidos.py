@@ -627,10 +627,7 @@ def update_contextos_matrix(dummy):
             ], style={
                 'display': 'flex',
                 'width': '100%'
-            }),
-            
-            # Store para guardar todos los datos de partidos (para el modal)
-            dcc.Store(id='all-matches-store', data=matrix)
+            })
         ])
         
     except Exception as e:
@@ -654,15 +651,16 @@ def update_contextos_matrix(dummy):
      Output('modal-match-body', 'children')],
     [Input({'type': 'match-card-wrapper', 'index': dash.dependencies.ALL}, 'n_clicks'),
      Input('close-match-modal', 'n_clicks')],
-    [State('match-detail-modal', 'is_open'),
-     State('all-matches-store', 'data')],
+    [State('match-detail-modal', 'is_open')],
     prevent_initial_call=True
 )
-def toggle_match_modal(match_clicks, close_clicks, is_open, all_matches_data):
+def toggle_match_modal(match_clicks, close_clicks, is_open):
     """
     Abre/cierra el modal y muestra detalles del partido seleccionado.
+    El detalle se busca por match_id en el dataset compartido de contextos.
     """
     from dash import ctx
+    from utils.contextos_laliga import get_partido_contexto
     
     if not ctx.triggered:
         return dash.no_update, dash.no_update, dash.no_update
@@ -684,21 +682,7 @@ def toggle_match_modal(match_clicks, close_clicks, is_open, all_matches_data):
         trigger_dict = json.loads(triggered_id.split('.')[0])
         match_id = trigger_dict['index']
         
-        # Buscar el partido en all_matches_data
-        if not all_matches_data:
-            return False, "", ""
-        
-        match_info = None
-        for resultado in ['Positivo', 'Negativo']:
-            for contexto in ['Favorable', 'Desfavorable']:
-                for match in all_matches_data[resultado][contexto]:
-                    if match['match_id'] == match_id:
-                        match_info = match
-                        break
-                if match_info:
-                    break
-            if match_info:
-                break
+        match_info = get_partido_contexto(match_id)
         
         if not match_info:
             return False, "", ""
@@ -10,6 +10,7 @@ import dash
 import plotly.graph_objects as go
 import pandas as pd
 import json
+import os
 import re
 from datetime import datetime
 
@@ -21,7 +22,8 @@ from utils.entrenamiento_metricas import (
     get_cached_athletes
 )
 from utils.entrenamiento_tablas import generar_tabla_evolutiva
-from utils.entrenamiento_graficos import generar_grafico_optimizado_precargado
+from utils.entrenamiento_graficos import resumir_datos_por_metrica, generar_grafico_desde_resumen, valores_por_dia
+from utils.result_cache import get_or_compute, make_key
 
 # Importaciones originales de db_manager
 from utils.db_manager import (
@@ -29,8 +31,7 @@ from utils.db_manager import (
     get_all_athletes,
     get_athletes_from_microciclo,
     get_microciclos_from_processed_table,
-    get_microciclos,
-    get_available_parameters
+    get_microciclos
 )
 
 # Importar función ultra-optimizada (MANTENER IGUAL)
@@ -371,6 +372,34 @@ def get_microciclo_equipo_content(microciclos=None):
 
 
 # Callback para cargar microciclos una sola vez al inicio
+# Caché en servidor (compartida entre workers) de la lista de microciclos y de la tabla evolutiva
+MICROCICLOS_LISTA_NAMESPACE = 'microciclos_lista'
+TABLA_EVOLUTIVA_NAMESPACE = 'tabla_evolutiva_equipo'
+# TTL de los datos que incluyen la semana actual (segundos)
+MICROCICLO_ACTUAL_TTL = int(os.getenv('MICROCICLO_ACTUAL_TTL', 300))
+
+
+def obtener_lista_microciclos():
+    """
+    Lista de microciclos desde la tabla intermedia (caché de servidor, TTL corto).
+    Si la tabla intermedia no devuelve nada se usa el método antiguo (sin cachear).
+    """
+    try:
+        microciclos = get_or_compute(
+            MICROCICLOS_LISTA_NAMESPACE,
+            'todos',
+            get_microciclos_from_processed_table,
+            ttl=MICROCICLO_ACTUAL_TTL
+        )
+        if microciclos:
+            return microciclos
+    except Exception as e:
+        pass
+    
+    # Fallback al método antiguo si falla
+    return get_microciclos()
+
+
 @callback(
     Output("microciclos-store", "data"),
     Input("microciclos-store", "data"),
@@ -380,16 +409,7 @@ def load_microciclos_once(current_data):
     """Carga los microciclos solo la primera vez (cuando data está vacío)"""
     if not current_data:
         # OPTIMIZACIÓN: Usar tabla intermedia en lugar de procesar en tiempo real
-        try:
-            microciclos = get_microciclos_from_processed_table()
-            if microciclos:
-                return microciclos
-        except Exception as e:
-            pass
-        
-        # Fallback al método antiguo si falla
-        microciclos = get_microciclos()
-        return microciclos
+        return obtener_lista_microciclos()
     return current_data
 
 
@@ -460,6 +480,52 @@ def toggle_modo_referencia(n_max, n_media, modo_actual):
         )
 
     
+def construir_datos_evolutivos_equipo(modo_referencia):
+    """
+    Datos de la tabla evolutiva del equipo: todos los microciclos con los jugadores
+    que realmente participaron (sin porteros, solo Full).
+    
+    Returns:
+        dict de cargar_tabla_evolutiva_microciclos o None si no hay jugadores
+    """
+    # IMPORTANTE: Usar los mismos jugadores que usa el gráfico (df_raw['athlete_id'].unique())
+    engine = get_db_connection()
+    
+    query_jugadores_activos = '''
+        SELECT DISTINCT athlete_id
+        FROM microciclos_metricas_procesadas
+        WHERE athlete_position != 'Goal Keeper'
+          AND activity_date >= '2024-08-01'
+    '''
+    
+    df_jugadores = pd.read_sql(query_jugadores_activos, engine)
+    
+    if df_jugadores.empty:
+        return None
+    
+    jugadores_ids = df_jugadores['athlete_id'].tolist()
+    print(f"🎯 Jugadores ACTIVOS sin porteros: {len(jugadores_ids)}")
+    
+    # Cargar datos de todos los microciclos con los mismos jugadores Y modo de referencia
+    return cargar_tabla_evolutiva_microciclos(
+        jugadores_ids=jugadores_ids, 
+        modo_referencia=modo_referencia
+    )
+
+
+def obtener_datos_evolutivos_equipo(modo_referencia):
+    """
+    Datos de la tabla evolutiva desde la caché de servidor o calculados.
+    Incluye la semana actual, así que caduca con MICROCICLO_ACTUAL_TTL (y el ETL la invalida).
+    """
+    return get_or_compute(
+        TABLA_EVOLUTIVA_NAMESPACE,
+        modo_referencia,
+        lambda: construir_datos_evolutivos_equipo(modo_referencia),
+        ttl=MICROCICLO_ACTUAL_TTL
+    )
+
+
 # Callback para cargar tabla evolutiva al inicio
 @callback(
     Output("sc-tabla-evolutiva-container", "children"),
@@ -486,44 +552,10 @@ def cargar_tabla_evolutiva_inicial(microciclos, modo_referencia, date_data):
                        className="text-muted text-center p-4"), {}
     
     try:
-        from pages.seguimiento_carga_ultra_optimizado import cargar_tabla_evolutiva_microciclos
-        from utils.db_manager import get_db_connection
-        import pandas as pd
-        
         print("🔄 Cargando tabla evolutiva de microciclos...")
-        
-        # Obtener jugadores REALES que participaron en microciclos (sin porteros)
-        # IMPORTANTE: Usar los mismos jugadores que usa el gráfico (df_raw['athlete_id'].unique())
-        engine = get_db_connection()
-        
-        query_jugadores_activos = '''
-            SELECT DISTINCT athlete_id
-            FROM microciclos_metricas_procesadas
-            WHERE athlete_position != 'Goal Keeper'
-              AND activity_date >= '2024-08-01'
-        '''
-        
-        df_jugadores = pd.read_sql(query_jugadores_activos, engine)
-        engine.dispose()
-        
-        if df_jugadores.empty:
-            return (
-                html.Div("No hay jugadores disponibles", 
-                        className="text-muted text-center p-4"),
-                {}
-            )
-        
-        jugadores_ids = df_jugadores['athlete_id'].tolist()
-        
-        print(f"🎯 Jugadores ACTIVOS sin porteros: {len(jugadores_ids)}")
-        print(f"🎯 (Solo jugadores que realmente participaron en entrenamientos)")
         print(f"📊 Modo de referencia: {'MÁXIMO' if modo_referencia == 'max' else 'MEDIA'} de últimos 4 partidos")
         
-        # Cargar datos de todos los microciclos con los mismos jugadores Y modo de referencia
-        datos_evolutivos = cargar_tabla_evolutiva_microciclos(
-            jugadores_ids=jugadores_ids, 
-            modo_referencia=modo_referencia
-        )
+        datos_evolutivos = obtener_datos_evolutivos_equipo(modo_referencia)
         
         if not datos_evolutivos:
             return (
@@ -590,6 +622,107 @@ def cambiar_microciclo_desde_tabla(clicks_celdas, clicks_headers, ids_celdas, id
     raise PreventUpdate
 
 
+# Caché en servidor (compartida entre workers) de los payloads de microciclo
+# (semana actual con MICROCICLO_ACTUAL_TTL; los microciclos cerrados no caducan)
+MICROCICLO_CACHE_NAMESPACE = 'microciclo_equipo_resumen'
+
+
+def _es_microciclo_actual(microciclo_id, microciclos):
+    """True si el microciclo es la semana actual según la lista de microciclos cargada"""
+    for mc in microciclos or []:
+        if mc.get('id') == microciclo_id:
+            return bool(mc.get('is_current'))
+    # Sin información: tratarlo como vivo para no cachearlo indefinidamente
+    return True
+
+
+def construir_payload_microciclo(microciclo_id, modo_referencia):
+    """
+    Calcula el payload de un microciclo: resumen numérico por día de todas las
+    métricas y valores de referencia (sin figuras).
+    Sin filtros de jugadores - usa lógica fija (sin porteros, sin Part/Rehab).
+    
+    Returns:
+        dict con el contenido de sc-microciclo-cache o None si no hay datos
+    """
+    # Obtener atletas del microciclo desde tabla procesada
+    atletas_df = get_athletes_from_microciclo(microciclo_id)
+    
+    if atletas_df.empty:
+        print(f"⚠️ No hay datos en tabla intermedia para {microciclo_id}")
+        return None
+    
+    # Filtrar porteros - lógica fija (sin filtros de usuario)
+    atletas_sin_porteros = atletas_df[atletas_df['athlete_position'] != 'Goal Keeper']
+    
+    # Selección fija: jugadores de campo (sin porteros, sin Part/Rehab)
+    jugadores_ids = atletas_sin_porteros['athlete_id'].tolist()
+    
+    print(f"⚡⚡⚡ ULTRA-OPTIMIZACIÓN: Cargando con solo 2 queries masivas...")
+    
+    # Cargar todo con 2 queries masivas
+    resultado_raw = cargar_microciclo_ultrarapido_v2(microciclo_id, jugadores_ids)
+    
+    if not resultado_raw:
+        print("❌ Error cargando microciclo")
+        return None
+    
+    datos_por_metrica = resultado_raw['datos_por_metrica']
+    ultimos_4_mds_por_metrica = resultado_raw['maximos_historicos']
+    nombre_partido = resultado_raw.get('nombre_partido')
+    
+    # Detectar tipo de microciclo (1 sola vez)
+    dias_presentes = []
+    for metrica, df_resumen in datos_por_metrica.items():
+        if not df_resumen.empty:
+            dias_presentes = df_resumen['activity_tag'].unique().tolist()
+            break
+    
+    tipo_microciclo = detectar_tipo_microciclo(dias_presentes)
+    print(f"   Días presentes: {dias_presentes}")
+    print(f"   Modo referencia: {'MÁXIMO' if modo_referencia == 'max' else 'MEDIA'}")
+    
+    # Añadir tipo y modo de referencia al diccionario de máximos históricos para pasarlo a los gráficos
+    ultimos_4_mds_con_tipo = {}
+    for metrica, datos in ultimos_4_mds_por_metrica.items():
+        if datos:
+            ultimos_4_mds_con_tipo[metrica] = {
+                **datos, 
+                'tipo_microciclo': tipo_microciclo,
+                'modo_referencia': modo_referencia  # NUEVO: pasar modo
+            }
+        else:
+            ultimos_4_mds_con_tipo[metrica] = {
+                'tipo_microciclo': tipo_microciclo,
+                'modo_referencia': modo_referencia  # NUEVO: pasar modo
+            }
+    
+    # Payload compacto: solo números por día; las figuras se generan bajo demanda
+    return {
+        'microciclo_id': microciclo_id,
+        'cargado': True,
+        'resumen': resumir_datos_por_metrica(datos_por_metrica),  # ← Medias/jugadores por día
+        'nombre_partido': nombre_partido,
+        'maximos_historicos': ultimos_4_mds_con_tipo,  # ← Máximos CON tipo y modo_referencia
+        'tipo_microciclo': tipo_microciclo,  # ← Tipo detectado
+        'dias_presentes': dias_presentes  # ← Días disponibles
+    }
+
+
+def obtener_payload_microciclo(microciclo_id, modo_referencia, es_actual):
+    """
+    Devuelve el payload del microciclo desde la caché de servidor o lo calcula.
+    Clave: (microciclo_id, modo_referencia). Microciclos cerrados sin caducidad,
+    semana actual con TTL corto (MICROCICLO_ACTUAL_TTL).
+    """
+    return get_or_compute(
+        MICROCICLO_CACHE_NAMESPACE,
+        make_key(microciclo_id, modo_referencia),
+        lambda: construir_payload_microciclo(microciclo_id, modo_referencia),
+        ttl=MICROCICLO_ACTUAL_TTL if es_actual else None
+    )
+
+
 # Callback principal: Cargar y cachear TODAS las métricas del microciclo
 @callback(
     Output("sc-microciclo-cache", "data"),
@@ -599,12 +732,13 @@ def cambiar_microciclo_desde_tabla(clicks_celdas, clicks_headers, ids_celdas, id
     Input("sc-modo-referencia", "data"),  # NUEVO: Recargar cuando cambia el modo
     State("sc-microciclo-dropdown", "value"),
     State("sc-date-store", "data"),
+    State("microciclos-store", "data"),
     prevent_initial_call=True
 )
-def cargar_microciclo_completo(n_clicks, modo_referencia, microciclo_id, date_data):
+def cargar_microciclo_completo(n_clicks, modo_referencia, microciclo_id, date_data, microciclos):
     """
-    OPTIMIZADO: Carga datos desde tabla intermedia.
-    Fallback a método antiguo si la tabla no está disponible.
+    OPTIMIZADO: Carga datos desde tabla intermedia, con caché de servidor
+    compartida por todos los usuarios y workers.
     Sin filtros de jugadores - usa lógica fija (sin porteros, sin Part/Rehab)
     
     Se ejecuta cuando:
@@ -628,96 +762,13 @@ def cargar_microciclo_completo(n_clicks, modo_referencia, microciclo_id, date_da
     print(f"🔄 Cargando microciclo: {microciclo_id}")
     print(f"   Modo: {'MÁXIMO' if modo_referencia == 'max' else 'MEDIA'}")
     
-    # MÉTODO OPTIMIZADO: Usar tabla intermedia
     try:
-        # Obtener atletas del microciclo desde tabla procesada
-        atletas_df = get_athletes_from_microciclo(microciclo_id)
-        
-        if atletas_df.empty:
-            print(f"⚠️ No hay datos en tabla intermedia para {microciclo_id}, usando método antiguo")
-            raise Exception("Tabla intermedia vacía")
-        
-        # Filtrar porteros - lógica fija (sin filtros de usuario)
-        atletas_sin_porteros = atletas_df[atletas_df['athlete_position'] != 'Goal Keeper']
-        
-        # Selección fija: jugadores de campo (sin porteros, sin Part/Rehab)
-        jugadores_ids = atletas_sin_porteros['athlete_id'].tolist()
+        es_actual = _es_microciclo_actual(microciclo_id, microciclos)
+        cache_optimizado = obtener_payload_microciclo(microciclo_id, modo_referencia, es_actual)
         
-        print(f"⚡⚡⚡ ULTRA-OPTIMIZACIÓN: Cargando con solo 2 queries masivas...")
-        
-        # Importar función ULTRA-optimizada (2 queries totales)
-        from pages.seguimiento_carga_ultra_optimizado import cargar_microciclo_ultrarapido_v2
-        
-        # Cargar todo con 2 queries masivas
-        resultado_raw = cargar_microciclo_ultrarapido_v2(microciclo_id, jugadores_ids)
-        
-        if not resultado_raw:
-            print("❌ Error cargando microciclo")
+        if not cache_optimizado:
             raise Exception("No se pudieron cargar los datos")
         
-        datos_por_metrica = resultado_raw['datos_por_metrica']
-        ultimos_4_mds_por_metrica = resultado_raw['maximos_historicos']
-        nombre_partido = resultado_raw.get('nombre_partido')
-        
-        # Generar gráficos de forma ultra-optimizada
-        
-        # Detectar tipo de microciclo ANTES de generar gráficos (1 sola vez)
-        dias_presentes = []
-        for metrica, df_resumen in datos_por_metrica.items():
-            if not df_resumen.empty:
-                dias_presentes = df_resumen['activity_tag'].unique().tolist()
-                break
-        
-        tipo_microciclo = detectar_tipo_microciclo(dias_presentes)
-        print(f"   Días presentes: {dias_presentes}")
-        print(f"   Modo referencia: {'MÁXIMO' if modo_referencia == 'max' else 'MEDIA'}")
-        
-        # Añadir tipo y modo de referencia al diccionario de máximos históricos para pasarlo a los gráficos
-        ultimos_4_mds_con_tipo = {}
-        for metrica, datos in ultimos_4_mds_por_metrica.items():
-            if datos:
-                ultimos_4_mds_con_tipo[metrica] = {
-                    **datos, 
-                    'tipo_microciclo': tipo_microciclo,
-                    'modo_referencia': modo_referencia  # NUEVO: pasar modo
-                }
-            else:
-                ultimos_4_mds_con_tipo[metrica] = {
-                    'tipo_microciclo': tipo_microciclo,
-                    'modo_referencia': modo_referencia  # NUEVO: pasar modo
-                }
-        
-        # Obtener parámetros una sola vez (no 6 veces)
-        parametros = get_available_parameters()
-        parametros_dict = {p['value']: p['label'] for p in parametros}
-        
-        graficos_metricas = {}
-        for metrica, df_resumen in datos_por_metrica.items():
-            try:
-                # Generar gráfico con función optimizada (tipo ya incluido en máximos)
-                fig = generar_grafico_optimizado_precargado(
-                    df_resumen,
-                    metrica,
-                    parametros_dict.get(metrica, metrica),
-                    ultimos_4_mds_con_tipo.get(metrica),
-                    None,  # umbrales_df no necesario (hardcodeados)
-                    nombre_partido
-                )
-                graficos_metricas[metrica] = fig
-            except Exception as e:
-                pass
-        
-        # Cache optimizado CON TODAS LAS MÉTRICAS PRE-CARGADAS
-        cache_optimizado = {
-            'microciclo_id': microciclo_id,
-            'jugadores_ids': jugadores_ids,
-            'cargado': True,
-            'graficos': graficos_metricas,  # ← TODAS las figuras listas
-            'maximos_historicos': ultimos_4_mds_con_tipo,  # ← Máximos CON tipo y modo_referencia
-            'tipo_microciclo': tipo_microciclo,  # ← Tipo detectado
-            'dias_presentes': dias_presentes  # ← Días disponibles
-        }
-        
         # Generar timestamp único para trigger
         import time
         timestamp = time.time()
@@ -746,14 +797,12 @@ def cargar_microciclo_completo(n_clicks, modo_referencia, microciclo_id, date_da
 def cargar_metrica_inicial(loaded_timestamp, cache_data):
     """Muestra el gráfico de la primera métrica (Distancia Total) desde el cache
     
-    Los datos YA están cargados en cache_data['graficos']
+    La figura se genera en servidor a partir de cache_data['resumen']
     """
     if not loaded_timestamp or not cache_data or not cache_data.get('cargado'):
         return {}, "total_distance", {'display': 'none'}
     
-    # Obtener figura desde el cache (ya está cargada)
-    graficos = cache_data.get('graficos', {})
-    fig = graficos.get('total_distance', {})
+    fig = generar_grafico_desde_resumen(cache_data, 'total_distance')
     
     if fig:
         return fig, "total_distance", {'display': 'block'}
@@ -770,8 +819,8 @@ def cargar_metrica_inicial(loaded_timestamp, cache_data):
 def cambiar_metrica(n_clicks_list, cache_data):
     """Cambia la métrica mostrada leyendo desde el cache
     
-    Los datos YA están cargados en cache_data['graficos']
-    NO hace queries adicionales = INSTANTÁNEO
+    Los datos YA están cargados en cache_data['resumen']
+    NO hace queries adicionales: solo genera la figura de la métrica pedida
     Sin filtros de usuario - usa datos pre-cargados
     """
     ctx = dash.callback_context
@@ -789,9 +838,7 @@ def cambiar_metrica(n_clicks_list, cache_data):
     button_dict = json.loads(button_id)
     metrica_seleccionada = button_dict['index']
     
-    # Obtener figura desde el cache (ya está cargada)
-    graficos = cache_data.get('graficos', {})
-    fig = graficos.get(metrica_seleccionada)
+    fig = generar_grafico_desde_resumen(cache_data, metrica_seleccionada)
     
     if fig:
         print(f"⚡ Mostrando {metrica_seleccionada} (desde cache)")
@@ -880,19 +927,15 @@ def cargar_tabla_detallada(metrica_seleccionada, cache_data):
     if not cache_data or not cache_data.get('cargado') or not metrica_seleccionada:
         return html.Div("No hay datos disponibles", className="text-muted text-center p-4")
     
-    # Obtener figura desde el cache
-    graficos = cache_data.get('graficos', {})
-    fig = graficos.get(metrica_seleccionada)
+    # Obtener valores por día desde el resumen del cache
+    valores = valores_por_dia(cache_data, metrica_seleccionada)
     
-    if not fig:
+    if not valores:
         return html.Div("No hay datos disponibles para esta métrica", className="text-muted text-center p-4")
     
-    # Extraer datos de la figura para crear tabla
     try:
         datos_tabla = []
-        for trace in fig.get('data', []):
-            dia = trace.get('name', '').split(' ')[0]
-            valor = trace.get('y', [0])[0] if trace.get('y') else 0
+        for dia, valor in valores:
             if dia and dia.startswith('MD-'):
                 datos_tabla.append({'Día': dia, 'Valor': f"{valor:.1f}"})
         
@@ -960,10 +1003,10 @@ def generar_barras_todas_metricas(loaded_timestamp, cache_data):
     }
     
     # Obtener datos del cache (ya cargados)
-    graficos = cache_data.get('graficos', {})
+    resumen = cache_data.get('resumen', {})
     maximos_historicos = cache_data.get('maximos_historicos', {})
     
-    if not graficos:
+    if not resumen:
         return html.Div("No hay datos disponibles", className="text-center text-muted p-4")
     
     barras_html = []
@@ -972,13 +1015,12 @@ def generar_barras_todas_metricas(loaded_timestamp, cache_data):
     for config in metricas_config:
         metric_id = config['id']
         
-        # Obtener figura del cache
-        fig = graficos.get(metric_id)
-        if not fig:
+        # Obtener valores por día del resumen
+        valores = valores_por_dia(cache_data, metric_id)
+        if not valores:
             continue
         
         try:
-            # Extraer datos de la figura (ya están procesados)
             entrenamientos_con_porcentaje = []
             acumulado_total = 0
             
@@ -994,13 +1036,11 @@ def generar_barras_todas_metricas(loaded_timestamp, cache_data):
             # Determinar si es métrica de suma o media
             es_media = config.get('tipo') == 'media'
             
-            # Extraer valores de las barras del gráfico
+            # Valores por día de entrenamiento
             valores_entrenamientos = []
             valores_absolutos = []  # Para logging
-            for trace in fig.get('data', []):
-                dia = trace.get('name', '').split(' ')[0]  # Quitar porcentaje si existe
+            for dia, valor in valores:
                 if dia and dia.startswith('MD-'):
-                    valor = trace.get('y', [0])[0] if trace.get('y') else 0
                     # Solo procesar si tenemos valor y máximo histórico válidos
                     if valor and valor > 0 and max_historico and max_historico > 0:
                         porcentaje = (valor / max_historico) * 100
@@ -21,7 +21,7 @@ from utils.entrenamiento_metricas import (
     get_cached_athletes
 )
 from utils.entrenamiento_tablas import generar_tabla_evolutiva
-from utils.entrenamiento_graficos import generar_grafico_optimizado_precargado
+from utils.entrenamiento_graficos import resumir_datos_por_metrica, generar_grafico_desde_resumen, valores_por_dia
 
 # Importaciones originales de db_manager
 from utils.db_manager import (
@@ -29,8 +29,7 @@ from utils.db_manager import (
     get_all_athletes,
     get_athletes_from_microciclo,
     get_microciclos_from_processed_table,
-    get_microciclos,
-    get_available_parameters
+    get_microciclos
 )
 
 # Importar funciones ultra-optimizadas
@@ -38,6 +37,7 @@ from pages.seguimiento_carga_ultra_optimizado import (
     cargar_microciclo_ultrarapido_v2, 
     cargar_tabla_evolutiva_microciclos
 )
+from utils.referencias_temporada import precargar_referencias_jugadores
 
 
 
@@ -448,6 +448,10 @@ def cargar_tabla_evolutiva_jugador(jugador_id, modo_referencia, cache_evolutivo)
             cache_evolutivo or {}
         )
     
+    # Precargar en segundo plano las referencias de temporada de TODA la plantilla
+    # (una consulta): cambiar después de jugador no espera a la BD
+    precargar_referencias_jugadores([j['id'] for j in JUGADORES_ESTATICOS])
+    
     # Verificar caché primero
     cache_evolutivo = cache_evolutivo or {}
     cache_key = f"{jugador_id}_{modo_referencia}"
@@ -731,9 +735,7 @@ def cargar_microciclo_jugador(n_clicks, modo_referencia, microciclo_id, jugador_
             # Guardar en caché
             cache_maximos[cache_key] = ultimos_4_mds_por_metrica
         
-        # Generar gráficos de forma ultra-optimizada
-        
-        # Detectar tipo de microciclo ANTES de generar gráficos (1 sola vez)
+        # Detectar tipo de microciclo (1 sola vez)
         dias_presentes = []
         for metrica, df_resumen in datos_por_metrica.items():
             if not df_resumen.empty:
@@ -742,40 +744,13 @@ def cargar_microciclo_jugador(n_clicks, modo_referencia, microciclo_id, jugador_
         
         tipo_microciclo = detectar_tipo_microciclo(dias_presentes)
         
-        # Añadir tipo al diccionario de máximos históricos para pasarlo a los gráficos
-        ultimos_4_mds_con_tipo = {}
-        for metrica, datos in ultimos_4_mds_por_metrica.items():
-            if datos:
-                ultimos_4_mds_con_tipo[metrica] = {**datos, 'tipo_microciclo': tipo_microciclo}
-            else:
-                ultimos_4_mds_con_tipo[metrica] = {'tipo_microciclo': tipo_microciclo}
-        
-        # Obtener parámetros una sola vez (no 6 veces)
-        parametros = get_available_parameters()
-        parametros_dict = {p['value']: p['label'] for p in parametros}
-        
-        graficos_metricas = {}
-        for metrica, df_resumen in datos_por_metrica.items():
-            try:
-                # Generar gráfico con función optimizada (tipo ya incluido en máximos)
-                fig = generar_grafico_optimizado_precargado(
-                    df_resumen,
-                    metrica,
-                    parametros_dict.get(metrica, metrica),
-                    ultimos_4_mds_con_tipo.get(metrica),
-                    None,  # umbrales_df no necesario (hardcodeados)
-                    nombre_partido
-                )
-                graficos_metricas[metrica] = fig
-            except Exception as e:
-                pass
-        
-        # Cache optimizado CON TODAS LAS MÉTRICAS PRE-CARGADAS DEL JUGADOR
+        # Cache compacto del jugador: solo números por día; las figuras se generan bajo demanda
         cache_optimizado = {
             'microciclo_id': microciclo_id,
             'jugador_id': jugador_id,  # ← Jugador individual
             'cargado': True,
-            'graficos': graficos_metricas,  # ← TODAS las figuras listas
+            'resumen': resumir_datos_por_metrica(datos_por_metrica),  # ← Valores por día
+            'nombre_partido': nombre_partido,
             'maximos_historicos': ultimos_4_mds_por_metrica,  # ← Máximos precalculados
             'tipo_microciclo': tipo_microciclo,  # ← Tipo detectado
             'dias_presentes': dias_presentes  # ← Días disponibles
@@ -808,14 +783,12 @@ def cargar_microciclo_jugador(n_clicks, modo_referencia, microciclo_id, jugador_
 def cargar_metrica_inicial(loaded_timestamp, cache_data):
     """Muestra el gráfico de la primera métrica (Distancia Total) desde el cache
     
-    Los datos YA están cargados en cache_data['graficos']
+    La figura se genera en servidor a partir de cache_data['resumen']
     """
     if not loaded_timestamp or not cache_data or not cache_data.get('cargado'):
         return {}, "total_distance", {'display': 'none'}, None
     
-    # Obtener figura desde el cache (ya está cargada)
-    graficos = cache_data.get('graficos', {})
-    fig = graficos.get('total_distance', {})
+    fig = generar_grafico_desde_resumen(cache_data, 'total_distance')
     
     # Obtener info del máximo
     max_info = generar_info_maximo('total_distance', cache_data)
@@ -836,8 +809,8 @@ def cargar_metrica_inicial(loaded_timestamp, cache_data):
 def cambiar_metrica(n_clicks_list, cache_data):
     """Cambia la métrica mostrada leyendo desde el cache
     
-    Los datos YA están cargados en cache_data['graficos']
-    NO hace queries adicionales = INSTANTÁNEO
+    Los datos YA están cargados en cache_data['resumen']
+    NO hace queries adicionales: solo genera la figura de la métrica pedida
     Sin filtros de usuario - usa datos pre-cargados
     """
     ctx = dash.callback_context
@@ -855,9 +828,7 @@ def cambiar_metrica(n_clicks_list, cache_data):
     button_dict = json.loads(button_id)
     metrica_seleccionada = button_dict['index']
     
-    # Obtener figura desde el cache (ya está cargada)
-    graficos = cache_data.get('graficos', {})
-    fig = graficos.get(metrica_seleccionada)
+    fig = generar_grafico_desde_resumen(cache_data, metrica_seleccionada)
     
     # Obtener info del máximo
     max_info = generar_info_maximo(metrica_seleccionada, cache_data)
@@ -947,19 +918,15 @@ def cargar_tabla_detallada(metrica_seleccionada, cache_data):
     if not cache_data or not cache_data.get('cargado') or not metrica_seleccionada:
         return html.Div("No hay datos disponibles", className="text-muted text-center p-4")
     
-    # Obtener figura desde el cache
-    graficos = cache_data.get('graficos', {})
-    fig = graficos.get(metrica_seleccionada)
+    # Obtener valores por día desde el resumen del cache
+    valores = valores_por_dia(cache_data, metrica_seleccionada)
     
-    if not fig:
+    if not valores:
         return html.Div("No hay datos disponibles para esta métrica", className="text-muted text-center p-4")
     
-    # Extraer datos de la figura para crear tabla
     try:
         datos_tabla = []
-        for trace in fig.get('data', []):
-            dia = trace.get('name', '').split(' ')[0]
-            valor = trace.get('y', [0])[0] if trace.get('y') else 0
+        for dia, valor in valores:
             if dia and dia.startswith('MD-'):
                 datos_tabla.append({'Día': dia, 'Valor': f"{valor:.1f}"})
         
@@ -1027,10 +994,10 @@ def generar_barras_todas_metricas(loaded_timestamp, cache_data):
     }
     
     # Obtener datos del cache (ya cargados)
-    graficos = cache_data.get('graficos', {})
+    resumen = cache_data.get('resumen', {})
     maximos_historicos = cache_data.get('maximos_historicos', {})
     
-    if not graficos:
+    if not resumen:
         return html.Div("No hay datos disponibles", className="text-center text-muted p-4")
     
     barras_html = []
@@ -1039,13 +1006,12 @@ def generar_barras_todas_metricas(loaded_timestamp, cache_data):
     for config in metricas_config:
         metric_id = config['id']
         
-        # Obtener figura del cache
-        fig = graficos.get(metric_id)
-        if not fig:
+        # Obtener valores por día del resumen
+        valores = valores_por_dia(cache_data, metric_id)
+        if not valores:
             continue
         
         try:
-            # Extraer datos de la figura (ya están procesados)
             entrenamientos_con_porcentaje = []
             acumulado_total = 0
             
@@ -1057,13 +1023,11 @@ def generar_barras_todas_metricas(loaded_timestamp, cache_data):
             # Determinar si es métrica de suma o media
             es_media = config.get('tipo') == 'media'
             
-            # Extraer valores de las barras del gráfico
+            # Valores por día de entrenamiento
             valores_entrenamientos = []
             valores_absolutos = []  # Para logging
-            for trace in fig.get('data', []):
-                dia = trace.get('name', '').split(' ')[0]  # Quitar porcentaje si existe
+            for dia, valor in valores:
                 if dia and dia.startswith('MD-'):
-                    valor = trace.get('y', [0])[0] if trace.get('y') else 0
                     # Solo procesar si tenemos valor y máximo histórico válidos
                     if valor and valor > 0 and max_historico and max_historico > 0:
                         porcentaje = (valor / max_historico) * 100
@@ -1255,7 +1219,6 @@ def cargar_datos_iniciales():
             ORDER BY athlete_name
         '''
         df_jugadores = pd.read_sql(query, engine)
-        engine.dispose()
         
         jugadores = []
         if not df_jugadores.empty:
@@ -6,9 +6,8 @@ import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import timedelta
 import numpy as np
-from functools import lru_cache
 from utils.layouts import standard_page
 from utils.soccersystem_data import (
     get_team_anthropometry_timeseries,
@@ -353,11 +352,6 @@ def cambiar_tab_antropo(estado_clicks, evolutivo_clicks, current_tab):
     return get_estado_antropometrico_content(), style_active, style_inactive, "estado-actual"
 
 # Callbacks para la pestaña Estado Antropométrico
-@lru_cache(maxsize=32)
-def get_cached_anthropometry_data(category, cache_key):
-    """Cache para datos antropométricos - se actualiza cada minuto"""
-    return get_team_anthropometry_timeseries(category=category)
-
 @callback(
     [Output("antropo-estado-cards", "children"),
      Output("antropo-actual-composicion", "figure"),
@@ -371,9 +365,8 @@ def update_antropo_dashboard(current_tab):
         return html.Div(), _empty_fig("Ranking % Grasa"), html.Div()
     
     try:
-        # Obtener datos antropométricos con caché (se renueva cada minuto)
-        cache_key = datetime.now().strftime('%Y%m%d%H%M')
-        df_current = get_cached_anthropometry_data("Primer Equipo", cache_key)
+        # Obtener datos antropométricos (almacén en memoria con carga incremental)
+        df_current = get_team_anthropometry_timeseries(category="Primer Equipo")
         
         if df_current is None or df_current.empty:
             return (
@@ -642,7 +635,7 @@ def load_evolutivo_players(current_tab):
         return []
         
     # Obtener datos de jugadores de primer equipo
-    ts = get_cached_anthropometry_data("Primer Equipo", datetime.now().strftime('%Y%m%d%H%M'))
+    ts = get_team_anthropometry_timeseries(category="Primer Equipo")
     
     if ts is None or ts.empty:
         return []
@@ -728,7 +721,7 @@ def update_antropo_evolution_chart(n_grasa, n_peso, n_pliegues, selected_players
     
     try:
         # Obtener datos evolutivos
-        df = get_cached_anthropometry_data("Primer Equipo", datetime.now().strftime('%Y%m%d%H%M'))
+        df = get_team_anthropometry_timeseries(category="Primer Equipo")
         
         if df is None or df.empty:
             empty_msg = html.Div("Sin datos disponibles", 
@@ -4,9 +4,9 @@ from dash import html, dcc, callback, Input, Output, State
 import dash_bootstrap_components as dbc
 import dash
 import plotly.graph_objects as go
-import pandas as pd
 from utils.layouts import standard_page
-from utils.db_manager import get_laliga_db_connection
+from utils.indicadores_laliga import pivotar_metricas
+from utils.scatter_equipos import aplicar_jitter, capas_equipos, figura_cacheada
 
 # Contenido de las pestañas
 def get_evolucion_resultados_content():
@@ -38,28 +38,12 @@ def get_contextos_partidos_content():
 def get_scatter_data(metric_x, metric_y):
     """Obtiene datos para scatter plot desde la BD"""
     try:
-        engine = get_laliga_db_connection()
-        if not engine:
-            return None
-        
-        query = f"""
-        SELECT 
-            team_name,
-            metric_id,
-            metric_value
-        FROM indicadores_rendimiento
-        WHERE metric_id IN ('{metric_x}', '{metric_y}')
-        ORDER BY team_name, metric_id
-        """
-        
-        df = pd.read_sql(query, engine)
+        # Una fila por equipo con ambas métricas (cubo de indicadores en memoria)
+        df_pivot = pivotar_metricas([metric_x, metric_y])
         
-        if df.empty:
+        if df_pivot.empty:
             return None
         
-        # Pivotar para tener una fila por equipo con ambas métricas
-        df_pivot = df.pivot(index='team_name', columns='metric_id', values='metric_value').reset_index()
-        
         # Verificar que tenemos ambas columnas
         if metric_x not in df_pivot.columns or metric_y not in df_pivot.columns:
             return None
@@ -70,8 +54,8 @@ def get_scatter_data(metric_x, metric_y):
         print(f"Error obteniendo datos scatter: {e}")
         return None
 
-def create_scatter_plot(metric_x, metric_y, label_x, label_y, invert_y=False, custom_title=None):
-    """Crea un scatter plot con escudos de equipos y líneas medias"""
+def _construir_figura_scatter(metric_x, metric_y, label_x, label_y, invert_y=False, custom_title=None):
+    """Crea un scatter plot con escudos de equipos y líneas medias (None si no hay datos)"""
     
     # Título: personalizado o automático
     title = custom_title if custom_title else f"{label_x} vs {label_y}"
@@ -80,24 +64,10 @@ def create_scatter_plot(metric_x, metric_y, label_x, label_y, invert_y=False, cu
     df = get_scatter_data(metric_x, metric_y)
     
     if df is None or df.empty:
-        return html.Div([
-            html.Div([
-                html.I(className="fas fa-exclamation-triangle fa-2x mb-3", style={"color": "#dc3545"}),
-                html.P("No hay datos disponibles para este diagrama", style={"color": "#6c757d"})
-            ], style={"textAlign": "center", "padding": "100px 20px"})
-        ])
-    
-    # Añadir jitter para evitar solapamientos (pequeña variación aleatoria)
-    import numpy as np
-    np.random.seed(42)  # Para reproducibilidad
-    
-    # Calcular rangos
-    x_range = df[metric_x].max() - df[metric_x].min()
-    y_range = df[metric_y].max() - df[metric_y].min()
+        return None
     
-    # Añadir jitter muy pequeño (0.3% del rango) para separar puntos solapados
-    df['x_jitter'] = df[metric_x] + np.random.uniform(-x_range*0.003, x_range*0.003, len(df))
-    df['y_jitter'] = df[metric_y] + np.random.uniform(-y_range*0.003, y_range*0.003, len(df))
+    # Jitter muy pequeño (0.3% del rango) para separar escudos solapados
+    x_range, y_range = aplicar_jitter(df, metric_x, metric_y)
     
     # Calcular medias para las líneas (usar valores originales)
     mean_x = df[metric_x].mean()
@@ -122,77 +92,13 @@ def create_scatter_plot(metric_x, metric_y, label_x, label_y, invert_y=False, cu
         opacity=0.5
     )
     
-    # Añadir puntos invisibles para el hover (mantener interactividad)
-    for idx, row in df.iterrows():
-        team = row['team_name']
-        x_val = row['x_jitter']  # Usar valores con jitter
-        y_val = row['y_jitter']
-        
-        fig.add_trace(go.Scatter(
-            x=[x_val],
-            y=[y_val],
-            mode='markers',
-            marker=dict(
-                size=25,
-                color='rgba(0,0,0,0)',  # Transparente
-                line=dict(width=0)
-            ),
-            hovertemplate=f'<b>{team}</b><br>' +
-                         f'{label_x}: %{{x:.2f}}<br>' +
-                         f'{label_y}: %{{y:.2f}}<extra></extra>',
-            showlegend=False,
-            name=team
-        ))
-    
-    # Añadir círculos azules para RC Deportivo
-    for idx, row in df.iterrows():
-        team = row['team_name']
-        if team == 'RC Deportivo':
-            x_val = row['x_jitter']  # Usar valores con jitter
-            y_val = row['y_jitter']
-            
-            fig.add_trace(go.Scatter(
-                x=[x_val],
-                y=[y_val],
-                mode='markers',
-                marker=dict(
-                    size=48,  # Más grande para rodear bien el escudo
-                    color='rgba(0,0,0,0)',
-                    line=dict(width=3, color='#007bff')
-                ),
-                showlegend=False,
-                hoverinfo='skip'
-            ))
-    
-    # Tamaño de las imágenes (ya calculamos x_range e y_range arriba)
-    
     # Tamaño de las imágenes en unidades de datos (proporcional al rango)
-    img_size_x = x_range * 0.12  # 4% del rango X
-    img_size_y = y_range * 0.12  # 4% del rango Y
-    
-    # Añadir escudos como imágenes
-    images = []
-    for idx, row in df.iterrows():
-        team = row['team_name']
-        x_val = row['x_jitter']  # Usar valores con jitter
-        y_val = row['y_jitter']
-        
-        # Mismo tamaño para todos (el destacado es con el círculo azul)
-        size_multiplier = 1.0
-        
-        images.append(dict(
-            source=f'/assets/Escudos/{team}.png',
-            xref="x",
-            yref="y",
-            x=x_val,
-            y=y_val,
-            sizex=img_size_x * size_multiplier,
-            sizey=img_size_y * size_multiplier,
-            xanchor="center",
-            yanchor="middle",
-            sizing="contain",
-            layer="above"
-        ))
+    img_size_x = x_range * 0.12
+    img_size_y = y_range * 0.12
+    
+    # Hover, círculo del RC Deportivo y escudos: una traza por capa para todos los equipos
+    images = capas_equipos(fig, df, label_x, label_y, hover_size=25, destacado_size=48, destacado_width=3,
+                           img_size_x=img_size_x, img_size_y=img_size_y)
     
     # Configurar layout con fondo transparente y más espacio
     fig.update_layout(
@@ -229,6 +135,25 @@ def create_scatter_plot(metric_x, metric_y, label_x, label_y, invert_y=False, cu
         font=dict(family='Montserrat')
     )
     
+    return fig
+
+def create_scatter_plot(metric_x, metric_y, label_x, label_y, invert_y=False, custom_title=None):
+    """Crea un scatter plot con escudos de equipos y líneas medias"""
+    
+    # Figura construida una vez por cubo de indicadores (repetir una opción no la rehace)
+    fig = figura_cacheada(
+        ('mapas', metric_x, metric_y, label_x, label_y, invert_y, custom_title),
+        lambda: _construir_figura_scatter(metric_x, metric_y, label_x, label_y, invert_y, custom_title)
+    )
+    
+    if fig is None:
+        return html.Div([
+            html.Div([
+                html.I(className="fas fa-exclamation-triangle fa-2x mb-3", style={"color": "#dc3545"}),
+                html.P("No hay datos disponibles para este diagrama", style={"color": "#6c757d"})
+            ], style={"textAlign": "center", "padding": "100px 20px"})
+        ])
+    
     return dcc.Graph(
         figure=fig,
         config={'displayModeBar': False},
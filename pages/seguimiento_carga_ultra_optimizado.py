@@ -7,9 +7,15 @@ ESTRATEGIA:
 3. Procesamiento en memoria con pandas (super rápido)
 """
 
+import numpy as np
 import pandas as pd
 import re
 from utils.db_manager import get_db_connection
+from utils.consultas import ejecutar_consulta
+from utils.referencias_temporada import (
+    get_referencias_jugador, columna_de_metrica,
+    get_referencias_equipo, referencias_equipo_para_fechas, METRICAS_EQUIPO
+)
 
 
 def cargar_microciclo_ultrarapido_v2(microciclo_id, jugadores_ids):
@@ -25,15 +31,12 @@ def cargar_microciclo_ultrarapido_v2(microciclo_id, jugadores_ids):
     if not engine:
         return None
     
-    # Formatear IDs con comillas
-    jugadores_ids_quoted = ','.join([f"'{j}'" for j in jugadores_ids])
-    
     # ========================================
     # QUERY 1: TODO EL MICROCICLO (todas las métricas en UNA query)
     # ========================================
     # Query 1: Cargando TODO el microciclo
     
-    query_microciclo = f'''
+    query_microciclo = '''
         SELECT 
             activity_tag,
             athlete_id,
@@ -50,11 +53,12 @@ def cargar_microciclo_ultrarapido_v2(microciclo_id, jugadores_ids):
             distance_per_minute,
             activity_name
         FROM microciclos_metricas_procesadas
-        WHERE microciclo_id = '{microciclo_id}'
+        WHERE microciclo_id = :microciclo_id
           AND athlete_position != 'Goal Keeper'
     '''
     
-    df_microciclo = pd.read_sql(query_microciclo, engine)
+    df_microciclo = ejecutar_consulta(query_microciclo, {'microciclo_id': microciclo_id},
+                                      engine=engine, nombre='microciclo_v2.microciclo')
     # Datos cargados correctamente
     
     if df_microciclo.empty:
@@ -92,181 +96,30 @@ def cargar_microciclo_ultrarapido_v2(microciclo_id, jugadores_ids):
         # Usando temporada actual
     
     # ========================================
-    # QUERY 2: ÚLTIMOS 4 MDs (todas las métricas en UNA query)
+    # REFERENCIA: ÚLTIMOS 4 MDs (tabla de referencia del equipo, sin query por carga)
     # ========================================
-    # Query 2: Cargando últimos 4 MDs
     
     # Buscar máximos históricos: MD actual + hasta 3 anteriores (máximo 4 total)
     # IMPORTANTE: Considerar fecha de inicio de temporada y límite real de partidos
+    # CASO ESPECIAL: Primera jornada sin partidos anteriores -> MD del microciclo actual
+    maximos_historicos = {}
     if temporada_actual and fecha_md is not None:
-        # Fecha de inicio de temporada (ajustar según sea necesario)
         fecha_inicio_temporada = f"{temporada_actual}-08-10"
+        df_referencias = get_referencias_equipo(fecha_inicio_temporada)
+        referencia = referencias_equipo_para_fechas(df_referencias, pd.Series([fecha_md])).iloc[0]
         
-        # INCLUIR el MD actual (<=) + anteriores desde inicio de temporada
-        condicion_fecha = f"AND activity_date <= '{fecha_md}' AND activity_date >= '{fecha_inicio_temporada}'"
-        msg_fecha = f"hasta {fecha_md} (desde inicio temporada {fecha_inicio_temporada})"
-        
-        query_historicos = f'''
-            SELECT 
-                activity_date,
-                MAX(activity_name) as activity_name,
-                MAX(microciclo_id) as microciclo_id,
-                AVG(CASE 
-                    WHEN field_time >= 4200 
-                    THEN total_distance * (5640.0 / field_time) 
-                    ELSE NULL 
-                END) as avg_total_distance,
-                AVG(CASE 
-                    WHEN field_time >= 4200 
-                    THEN distancia_21_kmh * (5640.0 / field_time) 
-                    ELSE NULL 
-                END) as avg_distancia_21,
-                AVG(CASE 
-                    WHEN field_time >= 4200 
-                    THEN distancia_24_kmh * (5640.0 / field_time) 
-                    ELSE NULL 
-                END) as avg_distancia_24,
-                AVG(CASE 
-                    WHEN field_time >= 4200 
-                    THEN acc_dec_total * (5640.0 / field_time) 
-                    ELSE NULL 
-                END) as avg_acc_dec,
-                AVG(CASE 
-                    WHEN field_time >= 4200 
-                    THEN distance_per_minute
-                    ELSE NULL 
-                END) as avg_ritmo_medio
-            FROM microciclos_metricas_procesadas
-            WHERE activity_tag = 'MD'
-              {condicion_fecha}
-              AND YEAR(activity_date) = {temporada_actual if temporada_actual else 'YEAR(CURDATE())'}
-              AND athlete_position != 'Goal Keeper'
-              AND field_time >= 4200
-              AND (participation_type IS NULL OR participation_type NOT IN ('Part', 'Rehab'))
-            GROUP BY activity_date
-            ORDER BY activity_date DESC
-            LIMIT 4
-        '''
-        
-        df_historicos = pd.read_sql(query_historicos, engine)
-        # Máximos históricos cargados
-        
-        # VALIDACIÓN: Verificar cuántos partidos realmente tenemos
-        num_partidos_disponibles = len(df_historicos)
-        
-        # CASO ESPECIAL: Primera jornada sin partidos anteriores
-        # Si no hay partidos históricos, intentar obtener el MD del microciclo actual
-        if num_partidos_disponibles == 0 and fecha_md is not None:
-            print("⚠️ Primera jornada: No hay partidos anteriores, buscando MD del microciclo actual...")
-            
-            # Query para obtener el MD del microciclo actual (sin filtro de fecha anterior)
-            query_md_actual = f'''
-                SELECT 
-                    activity_date,
-                    MAX(activity_name) as activity_name,
-                    MAX(microciclo_id) as microciclo_id,
-                    AVG(CASE 
-                        WHEN field_time >= 4200 
-                        THEN total_distance * (5640.0 / field_time) 
-                        ELSE NULL 
-                    END) as avg_total_distance,
-                    AVG(CASE 
-                        WHEN field_time >= 4200 
-                        THEN distancia_21_kmh * (5640.0 / field_time) 
-                        ELSE NULL 
-                    END) as avg_distancia_21,
-                    AVG(CASE 
-                        WHEN field_time >= 4200 
-                        THEN distancia_24_kmh * (5640.0 / field_time) 
-                        ELSE NULL 
-                    END) as avg_distancia_24,
-                    AVG(CASE 
-                        WHEN field_time >= 4200 
-                        THEN acc_dec_total * (5640.0 / field_time) 
-                        ELSE NULL 
-                    END) as avg_acc_dec,
-                    AVG(CASE 
-                        WHEN field_time >= 4200 
-                        THEN distance_per_minute
-                        ELSE NULL 
-                    END) as avg_ritmo_medio
-                FROM microciclos_metricas_procesadas
-                WHERE activity_tag = 'MD'
-                  AND activity_date = '{fecha_md}'
-                  AND YEAR(activity_date) = {temporada_actual if temporada_actual else 'YEAR(CURDATE())'}
-                  AND athlete_position != 'Goal Keeper'
-                  AND field_time >= 4200
-                  AND (participation_type IS NULL OR participation_type NOT IN ('Part', 'Rehab'))
-                GROUP BY activity_date
-            '''
-            
-            df_md_actual = pd.read_sql(query_md_actual, engine)
-            if not df_md_actual.empty:
-                df_historicos = df_md_actual
-                num_partidos_disponibles = 1
-                print(f"✅ MD actual encontrado: {df_md_actual['activity_name'].iloc[0]}")
-                msg_partidos = "1 partido (Primera jornada - usando MD actual como referencia)"
-            else:
-                msg_partidos = "No hay datos de partidos disponibles"
-        elif num_partidos_disponibles < 4:
-            # Ajustar mensaje para reflejar la realidad
-            if num_partidos_disponibles == 1:
-                msg_partidos = f"Solo {num_partidos_disponibles} partido disponible desde inicio de temporada"
-            else:
-                msg_partidos = f"Solo {num_partidos_disponibles} partidos disponibles desde inicio de temporada"
-        else:
-            msg_partidos = f"{num_partidos_disponibles} partidos (ventana completa)"
-        
-        # Calcular max/min/media por métrica y obtener el partido del máximo
-        maximos_historicos = {}
-        if not df_historicos.empty:
-            for col in ['avg_total_distance', 'avg_distancia_21', 'avg_distancia_24', 'avg_acc_dec', 'avg_ritmo_medio']:
-                col_data = df_historicos[[col, 'activity_date', 'activity_name', 'microciclo_id']].dropna(subset=[col])
-                if len(col_data) > 0:
-                    # Mapear nombres de columna a nombres de métrica
-                    metric_map = {
-                        'avg_total_distance': 'total_distance',
-                        'avg_distancia_21': 'distancia_21_kmh',
-                        'avg_distancia_24': 'distancia_24_kmh',
-                        'avg_acc_dec': 'acc_dec_total',
-                        'avg_ritmo_medio': 'ritmo_medio'
-                    }
-                    metric_name = metric_map[col]
-                    
-                    # Obtener valor MÁXIMO y su fecha
-                    idx_max = col_data[col].idxmax()
-                    max_val = col_data.loc[idx_max, col]
-                    fecha_max = col_data.loc[idx_max, 'activity_date']
-                    
-                    # Calcular MEDIA de los últimos 4 partidos
-                    media_val = col_data[col].mean()
-                    
-                    # Procesando métrica
-                    
-                    # Obtener nombre del partido directamente del DataFrame
-                    partido_max = None
-                    if pd.notna(col_data.loc[idx_max, 'activity_name']):
-                        partido_max = col_data.loc[idx_max, 'activity_name']
-                    elif pd.notna(col_data.loc[idx_max, 'microciclo_id']):
-                        # Extraer del microciclo_id si no hay activity_name
-                        mc_id = col_data.loc[idx_max, 'microciclo_id']
-                        match = re.search(r'_([^_]+_Vs_[^_]+)$', mc_id)
-                        if match:
-                            partido_max = match.group(1).replace('_', ' ')
-                    
-                    maximos_historicos[metric_name] = {
-                        'max': max_val,
-                        'media': media_val,  # NUEVO: media de los últimos 4
-                        'min': col_data[col].min(),
-                        'partido_max': partido_max,
-                        'fecha_max': fecha_max
-                    }
-                    # Máximo y media calculados
-        
-        # Máximos calculados
-    else:
-        maximos_historicos = {}
-        # Sin máximos históricos
+        if pd.notna(referencia.get('fecha_md')):
+            for metric_name in METRICAS_EQUIPO:
+                if pd.isna(referencia[f'{metric_name}_max']):
+                    continue
+                fecha_max = referencia[f'{metric_name}_fecha_max']
+                maximos_historicos[metric_name] = {
+                    'max': referencia[f'{metric_name}_max'],
+                    'media': referencia[f'{metric_name}_media'],  # Media de los últimos 4
+                    'min': referencia[f'{metric_name}_min'],
+                    'partido_max': referencia[f'{metric_name}_partido_max'],
+                    'fecha_max': fecha_max.date() if pd.notna(fecha_max) else None
+                }
     
     # ========================================
     # PROCESAMIENTO EN MEMORIA (pandas super rápido)
@@ -472,185 +325,168 @@ def calcular_maximo_individual_jugador(athlete_id, metric_name, fecha_referencia
         - 'modo_referencia': Modo utilizado ('max' o 'media')
         - 'num_partidos': Número de partidos considerados
     """
-    # Cálculo silencioso de máximo individual
+    # Las referencias de temporada de TODAS las métricas se calculan en una consulta y
+    # quedan cacheadas por jugador: aquí solo se consulta el índice
+    sin_datos = {
+        'max': None,
+        'media': None,
+        'valor_referencia': None,
+        'partido_max': None,
+        'fecha_max': None,
+        'tiene_datos': False,
+        'ultimo_md_fecha': None,
+        'warning': None,
+        'num_partidos': 0,
+        'modo_referencia': modo_referencia
+    }
     
-    engine = get_db_connection()
-    if not engine:
+    col_name = columna_de_metrica(metric_name)
+    if col_name is None:
+        return {**sin_datos, 'warning': f'ERROR: Métrica no soportada: {metric_name}'}
+    
+    try:
+        referencia = get_referencias_jugador(athlete_id).get(col_name)
+    except Exception as e:
+        # Error en cálculo de máximo
+        return {**sin_datos, 'warning': f'ERROR: {str(e)}'}
+    
+    if not referencia or (referencia['num_partidos'] == 0 and referencia['fallback'] is None):
+        # No tiene ningún MD registrado desde inicio de temporada
+        return {**sin_datos, 'warning': '🔴🔴 ALERTA: Ningún partido registrado en temporada'}
+    
+    if referencia['num_partidos'] == 0:
+        # FALLBACK: partido donde jugó más minutos (ya estandarizado si la métrica lo requiere)
+        fallback = referencia['fallback']
         return {
-            'max': None,
-            'media': None,
-            'valor_referencia': None,
-            'partido_max': None,
-            'fecha_max': None,
-            'tiene_datos': False,
-            'ultimo_md_fecha': None,
-            'warning': 'ERROR: No se pudo conectar a la base de datos',
-            'num_partidos': 0,
+            'max': fallback['valor'],
+            'media': fallback['valor'],  # Solo 1 partido, max = media
+            'valor_referencia': fallback['valor'],
+            'partido_max': fallback['partido'],
+            'fecha_max': fallback['fecha'],
+            'tiene_datos': True,
+            'ultimo_md_fecha': fallback['fecha'],
+            'warning': f'🔴 ALERTA: Sin partidos +70\'. Referencia: {fallback["field_time"]/60:.0f}\' en {fallback["partido"]}',
+            'num_partidos': 1,
             'modo_referencia': modo_referencia
         }
     
-    # Mapeo de nombres de métricas a columnas de BD
-    # Para ritmo_medio: usamos distance_per_minute en partidos (MD)
-    columnas_metricas = {
-        'total_distance': 'total_distance',
-        'distancia_+21_km/h_(m)': 'distancia_21_kmh',
-        'distancia_+24_km/h_(m)': 'distancia_24_kmh',
-        'distancia+28_(km/h)': 'distancia_28_kmh',
-        'gen2_acceleration_band7plus_total_effort_count': 'acc_dec_total',
-        'average_player_load': 'distance_per_minute'  # Cambiado para usar distance_per_minute en MDs
+    if referencia['max'] is None:
+        return {**sin_datos, 'warning': 'ERROR: Sin valores de la métrica en partidos +70\''}
+    
+    # Seleccionar valor de referencia según modo
+    if modo_referencia == 'media':
+        valor_referencia = referencia['media']
+    else:
+        valor_referencia = referencia['max']
+    
+    # Info sobre cantidad de partidos considerados
+    num_partidos = referencia['num_partidos']
+    warning = None
+    if num_partidos == 1:
+        warning = f'⚠️ Solo 1 partido +70\' disponible'
+    elif num_partidos < 4:
+        warning = f'⚠️ {num_partidos} partidos +70\' disponibles'
+    
+    return {
+        'max': referencia['max'],
+        'media': referencia['media'],
+        'valor_referencia': valor_referencia,
+        'partido_max': referencia['partido_max'],
+        'fecha_max': referencia['fecha_max'],
+        'tiene_datos': True,
+        'ultimo_md_fecha': referencia['ultimo_md_fecha'],
+        'warning': warning,
+        'num_partidos': num_partidos,
+        'modo_referencia': modo_referencia
     }
+
+
+def calcular_compensatorios(engine, microciclo_ids, jugadores_ids=None, df_referencias=None):
+    """
+    Compensatorio (MD+1, o MD+2 si no hay MD+1) en distancia total para TODOS los microciclos
+    con UNA consulta agrupada por microciclo y un cálculo vectorizado.
     
-    col_name = columnas_metricas.get(metric_name, metric_name)
+    Referencia: MAX de la media del equipo en los últimos 4 MDs hasta el MD del microciclo
+    (igual que el gráfico). Colores sobre el % redondeado: rango óptimo 55-70%,
+    tolerancia ±5% absoluto (naranja 50-54% y 71-75%).
     
-    # Determinar si esta métrica debe estandarizarse (NO para ritmo_medio/distance_per_minute)
-    debe_estandarizar = metric_name not in ['average_player_load', 'ritmo_medio']
+    Args:
+        engine: engine de la BD principal
+        microciclo_ids: IDs de microciclo a calcular
+        jugadores_ids: Lista de IDs de jugadores a incluir (None = todos excepto porteros)
+        df_referencias: tabla de referencia del equipo (get_referencias_equipo); None = temporada actual
     
-    # Query para obtener TODOS los partidos con +70' DESDE INICIO DE TEMPORADA
-    # EXCLUYE pretemporada: solo desde 10/08/{año}
-    # Usa TODA la temporada oficial para calcular máximo/media absolutos del jugador
-    from datetime import datetime
-    temporada_actual = datetime.now().year
-    fecha_inicio_temporada = f"{temporada_actual}-08-10"
+    Retorna dict: {microciclo_id: {'valor': float, 'porcentaje': int, 'color': str}}
+    """
+    compensatorios = {mc_id: {'valor': None, 'porcentaje': None, 'color': 'gris'} for mc_id in microciclo_ids}
+    if not microciclo_ids:
+        return compensatorios
     
-    query = f'''
+    if df_referencias is None:
+        df_referencias = get_referencias_equipo()
+    
+    # Entrenamientos Full (sin Part/Rehab) de los jugadores seleccionados; el MD con todos
+    filtro_jugadores = "AND athlete_id IN :jugadores_ids" if jugadores_ids else ""
+    query_compensatorios = f'''
         SELECT 
-            activity_date,
-            activity_name,
-            field_time,
-            {col_name} as metric_value
+            microciclo_id,
+            MIN(CASE WHEN activity_tag = 'MD' THEN activity_date END) as fecha_md,
+            AVG(CASE WHEN activity_tag = 'MD+1' {filtro_jugadores}
+                      AND (participation_type IS NULL OR participation_type NOT IN ('Part', 'Rehab'))
+                     THEN total_distance END) as valor_md1,
+            AVG(CASE WHEN activity_tag = 'MD+2' {filtro_jugadores}
+                      AND (participation_type IS NULL OR participation_type NOT IN ('Part', 'Rehab'))
+                     THEN total_distance END) as valor_md2
         FROM microciclos_metricas_procesadas
-        WHERE athlete_id = '{athlete_id}'
-          AND activity_tag = 'MD'
-          AND field_time >= 4200
-          AND activity_date >= '{fecha_inicio_temporada}'
-        ORDER BY activity_date DESC
+        WHERE microciclo_id IN :microciclo_ids
+          AND activity_tag IN ('MD', 'MD+1', 'MD+2')
+          AND athlete_position != 'Goal Keeper'
+        GROUP BY microciclo_id
     '''
+    params = {'microciclo_ids': list(microciclo_ids)}
+    if jugadores_ids:
+        params['jugadores_ids'] = list(jugadores_ids)
+    
+    df = ejecutar_consulta(query_compensatorios, params, engine=engine, nombre='compensatorios')
+    df = df.dropna(subset=['fecha_md'])
+    if df.empty or df_referencias.empty:
+        return compensatorios
+    
+    # MD+1 si tiene datos; si no, MD+2
+    df['valor'] = df['valor_md1'].astype('float64').fillna(df['valor_md2'].astype('float64'))
+    df = df.dropna(subset=['valor'])
+    if df.empty:
+        return compensatorios
+    
+    # Referencia: MAX de los últimos 4 MDs del equipo hasta la fecha del MD (incluido)
+    referencia = referencias_equipo_para_fechas(df_referencias, df['fecha_md'], con_primera_jornada=False)
+    df['max_historico'] = referencia['total_distance_max'].astype('float64')
+    df = df.dropna(subset=['max_historico'])
+    
+    max_historico = df['max_historico']
+    porcentaje = (df['valor'] / max_historico.where(max_historico > 0) * 100).fillna(0)
+    df['porcentaje'] = np.round(porcentaje).astype(int)
+    
+    p = df['porcentaje']
+    df['color'] = np.select(
+        [(p >= 55) & (p <= 70), (p >= 50) & (p < 55), (p > 70) & (p <= 75), p < 50],
+        ['verde', 'naranja', 'naranja', 'rojo_claro'],
+        default='rojo_oscuro'
+    )
+    
+    for mc_id, valor, porcentaje_mc, color in df[['microciclo_id', 'valor', 'porcentaje', 'color']].itertuples(index=False):
+        compensatorios[mc_id] = {'valor': float(valor), 'porcentaje': int(porcentaje_mc), 'color': color}
     
-    try:
-        df = pd.read_sql(query, engine)
-        
-        if df.empty:
-            # No tiene ningún MD con +70 minutos DESDE INICIO DE TEMPORADA
-            # FALLBACK: Buscar partido donde jugó más minutos desde inicio de temporada
-            # EXCLUYE pretemporada
-            query_max_minutos = f'''
-                SELECT 
-                    activity_date,
-                    activity_name,
-                    field_time,
-                    {col_name} as metric_value
-                FROM microciclos_metricas_procesadas
-                WHERE athlete_id = '{athlete_id}'
-                  AND activity_tag = 'MD'
-                  AND field_time > 0
-                  AND activity_date >= '{fecha_inicio_temporada}'
-                ORDER BY field_time DESC
-                LIMIT 1
-            '''
-            
-            df_max_min = pd.read_sql(query_max_minutos, engine)
-            
-            if df_max_min.empty:
-                # No tiene ningún MD registrado
-                return {
-                    'max': None,
-                    'media': None,
-                    'valor_referencia': None,
-                    'partido_max': None,
-                    'fecha_max': None,
-                    'tiene_datos': False,
-                    'ultimo_md_fecha': None,
-                    'warning': '🔴🔴 ALERTA: Ningún partido registrado en temporada',
-                    'num_partidos': 0,
-                    'modo_referencia': modo_referencia
-                }
-            else:
-                # Usar el partido donde jugó más minutos y estandarizar (solo si la métrica lo requiere)
-                field_time = df_max_min['field_time'].iloc[0]
-                metric_value = df_max_min['metric_value'].iloc[0]
-                if debe_estandarizar:
-                    valor_std = metric_value * (5640 / field_time)
-                else:
-                    valor_std = metric_value
-                partido = df_max_min['activity_name'].iloc[0]
-                fecha = df_max_min['activity_date'].iloc[0]
-                
-                # Usando partido con más minutos
-                
-                return {
-                    'max': valor_std,
-                    'media': valor_std,  # Solo 1 partido, max = media
-                    'valor_referencia': valor_std,
-                    'partido_max': partido,
-                    'fecha_max': fecha,
-                    'tiene_datos': True,
-                    'ultimo_md_fecha': fecha,
-                    'warning': f'🔴 ALERTA: Sin partidos +70\'. Referencia: {field_time/60:.0f}\' en {partido}',
-                    'num_partidos': 1,
-                    'modo_referencia': modo_referencia
-                }
-        
-        # Tiene al menos 1 MD con +70 minutos
-        
-        # Estandarizar a 94 minutos (5640 segundos) solo si la métrica lo requiere
-        if debe_estandarizar:
-            df['metric_value_std'] = df['metric_value'] * (5640 / df['field_time'])
-        else:
-            df['metric_value_std'] = df['metric_value']
-        
-        # Calcular MÁXIMO y MEDIA de todos los partidos
-        idx_max = df['metric_value_std'].idxmax()
-        max_value = df.loc[idx_max, 'metric_value_std']
-        media_value = df['metric_value_std'].mean()
-        partido_max = df.loc[idx_max, 'activity_name']
-        fecha_max = df.loc[idx_max, 'activity_date']
-        
-        # Seleccionar valor de referencia según modo
-        if modo_referencia == 'media':
-            valor_referencia = media_value
-        else:
-            valor_referencia = max_value
-        
-        # Info sobre cantidad de partidos considerados
-        warning = None
-        if len(df) == 1:
-            warning = f'⚠️ Solo 1 partido +70\' disponible'
-        elif len(df) < 4:
-            warning = f'⚠️ {len(df)} partidos +70\' disponibles'
-        
-        return {
-            'max': max_value,
-            'media': media_value,
-            'valor_referencia': valor_referencia,
-            'partido_max': partido_max,
-            'fecha_max': fecha_max,
-            'tiene_datos': True,
-            'ultimo_md_fecha': df['activity_date'].iloc[0],  # El más reciente
-            'warning': warning,
-            'num_partidos': len(df),
-            'modo_referencia': modo_referencia
-        }
-        
-    except Exception as e:
-        # Error en cálculo de máximo
-        return {
-            'max': None,
-            'media': None,
-            'valor_referencia': None,
-            'partido_max': None,
-            'fecha_max': None,
-            'tiene_datos': False,
-            'ultimo_md_fecha': None,
-            'warning': f'ERROR: {str(e)}',
-            'num_partidos': 0,
-            'modo_referencia': modo_referencia
-        }
+    return compensatorios
 
 
 def obtener_compensatorios_tabla(microciclos, jugadores_ids=None):
     """
     Obtiene los valores de compensatorio (MD+1 o MD+2) en distancia total para cada microciclo.
-    USA EL MISMO CÁLCULO que el gráfico de visualización de carga (pandas groupby).
+    USA EL MISMO CÁLCULO que el gráfico de visualización de carga.
+    
+    La tabla evolutiva ya los incluye ('compensatorios' en cargar_tabla_evolutiva_microciclos);
+    esta función queda para datos evolutivos cacheados antes de ese cambio.
     
     Args:
         microciclos: Lista de diccionarios con microciclos
@@ -658,179 +494,168 @@ def obtener_compensatorios_tabla(microciclos, jugadores_ids=None):
     
     Retorna dict: {microciclo_id: {'valor': float, 'porcentaje': float, 'color': str}}
     """
+    microciclo_ids = [mc['id'] for mc in microciclos]
     engine = get_db_connection()
-    compensatorios = {}
+    if not engine:
+        return {mc_id: {'valor': None, 'porcentaje': None, 'color': 'gris'} for mc_id in microciclo_ids}
     
-    # Cálculo de compensatorios
+    try:
+        return calcular_compensatorios(engine, microciclo_ids, jugadores_ids)
+    except Exception as e:
+        print(f"❌ Error calculando compensatorios: {e}")
+        return {mc_id: {'valor': None, 'porcentaje': None, 'color': 'gris'} for mc_id in microciclo_ids}
+
+
+# ============================================
+# MOTOR VECTORIZADO DE LA TABLA EVOLUTIVA
+# ============================================
+
+METRICAS_EVOLUTIVAS = ['total_distance', 'distancia_21_kmh', 'distancia_24_kmh', 'acc_dec_total', 'ritmo_medio']
+
+# Métrica de la tabla -> columna de referencia en partidos (ritmo: distance_per_minute)
+_COLUMNA_REFERENCIA_MD = {
+    'total_distance': 'total_distance',
+    'distancia_21_kmh': 'distancia_21_kmh',
+    'distancia_24_kmh': 'distancia_24_kmh',
+    'acc_dec_total': 'acc_dec_total',
+    'ritmo_medio': 'distance_per_minute'
+}
+
+
+def _referencias_individuales(athlete_id, modo_referencia, fecha_inicio_temporada):
+    """
+    Valor de referencia del jugador por métrica: MAX o MEDIA de TODOS sus partidos +70'
+    desde inicio de temporada; sin partidos +70', el partido donde jugó MÁS MINUTOS.
+    """
+    referencias = get_referencias_jugador(athlete_id, fecha_inicio_temporada)
+    valores = {}
+    for metrica in METRICAS_EVOLUTIVAS:
+        referencia = referencias.get(_COLUMNA_REFERENCIA_MD[metrica])
+        if not referencia:
+            valores[metrica] = None
+        elif referencia['num_partidos'] > 0:
+            valores[metrica] = referencia['media'] if modo_referencia == 'media' else referencia['max']
+        else:
+            valores[metrica] = (referencia['fallback'] or {}).get('valor')
+    return valores
+
+
+def _referencias_equipo_por_microciclo(df_microciclos, df_referencias, modo_referencia):
+    """
+    Referencia del equipo para cada microciclo: MAX o MEDIA de los últimos 4 MDs hasta su
+    fecha_md (incluida), leída de la tabla de referencia del equipo.
     
-    # Query para obtener máximos históricos (IGUAL que tabla evolutiva para Distancia Total)
-    # Normalizado a 94 mins para jugadores con +70 mins
-    # IMPORTANTE: Filtrar desde inicio de temporada
-    from datetime import datetime
-    temporada_actual = datetime.now().year
-    fecha_inicio_temporada = f"{temporada_actual}-08-10"
+    CASO ESPECIAL (primera jornada sin partidos anteriores): se usa el propio MD del microciclo.
+    Microciclo sin partido (ej: pretemporada): sin referencia.
     
-    query_maximos = f'''
-        SELECT 
-            activity_date as fecha_md,
-            AVG(CASE WHEN field_time >= 4200 THEN total_distance * (5640/field_time) END) as max_total_distance
-        FROM microciclos_metricas_procesadas
-        WHERE activity_tag = 'MD'
-          AND athlete_position != 'Goal Keeper'
-          AND field_time >= 4200
-          AND activity_date >= '{fecha_inicio_temporada}'
-          AND (participation_type IS NULL OR participation_type NOT IN ('Part', 'Rehab'))
-        GROUP BY activity_date
-        ORDER BY activity_date DESC
-    '''
+    Returns:
+        DataFrame indexado por microciclo_id con una columna por métrica
+    """
+    sufijo = 'media' if modo_referencia == 'media' else 'max'
+    referencias = referencias_equipo_para_fechas(df_referencias, df_microciclos['fecha_md'].reset_index(drop=True))
+    
+    df_resultado = pd.DataFrame(index=df_microciclos['microciclo_id'], columns=METRICAS_EVOLUTIVAS, dtype='float64')
+    for metrica in METRICAS_EVOLUTIVAS:
+        columna = f'{metrica}_{sufijo}'
+        if columna in referencias.columns:
+            df_resultado[metrica] = referencias[columna].astype('float64').to_numpy()
+    return df_resultado
+
+
+def _umbrales_por_tipo():
+    """
+    Umbrales (min/max) de todos los tipos de microciclo en formato largo: tipo, metrica, min, max.
+    """
+    filas = []
+    for tipo in ['estandar', 'extendido', 'reducido', 'superrecortado']:
+        for config in get_metricas_config_por_tipo(tipo):
+            filas.append({'tipo': tipo, 'metrica': config['id'], 'min_umbral': config['min'], 'max_umbral': config['max']})
+    return pd.DataFrame(filas)
+
+
+def calcular_acumulados_evolutivos(df_microciclos, df_entrenamientos, df_referencias):
+    """
+    Acumulados de la tabla evolutiva para todos los microciclos y métricas a la vez.
     
-    df_maximos = pd.read_sql(query_maximos, engine)
+    - % de cada entrenamiento (MD-X) sobre la referencia del microciclo
+    - Acumulado: suma de % (ritmo_medio: media), redondeado ANTES de asignar color
+    - Tipo de microciclo según los días presentes (sin entrenamientos: 'especial')
+    - Color con zona de tolerancia ±5% absoluto sobre los umbrales del tipo
     
-    for mc in microciclos:
-        mc_id = mc['id']
-        
-        try:
-            # Cargar datos del microciclo completo (igual que el gráfico)
-            query_microciclo = f'''
-                SELECT 
-                    activity_tag,
-                    athlete_id,
-                    activity_date,
-                    total_distance,
-                    athlete_position,
-                    participation_type
-                FROM microciclos_metricas_procesadas
-                WHERE microciclo_id = '{mc_id}'
-                  AND athlete_position != 'Goal Keeper'
-            '''
-            
-            df_mc = pd.read_sql(query_microciclo, engine)
-            
-            if df_mc.empty:
-                compensatorios[mc_id] = {'valor': None, 'porcentaje': None, 'color': 'gris'}
-                continue
-            
-            # Obtener fecha del MD (para buscar máximo histórico)
-            df_md = df_mc[df_mc['activity_tag'] == 'MD']
-            if df_md.empty:
-                compensatorios[mc_id] = {'valor': None, 'porcentaje': None, 'color': 'gris'}
-                continue
-            
-            fecha_md = df_md['activity_date'].min()
-            
-            # Filtrar por jugadores seleccionados (IGUAL que el gráfico)
-            # Procesando compensatorio
-            
-            if jugadores_ids:
-                df_entrenamientos = df_mc[
-                    (df_mc['activity_tag'] != 'MD') &
-                    (df_mc['athlete_id'].isin(jugadores_ids))
-                ]
-            else:
-                df_entrenamientos = df_mc[df_mc['activity_tag'] != 'MD']
-            
-            # Buscar MD+1 primero
-            df_md_plus_1 = df_entrenamientos[
-                (df_entrenamientos['activity_tag'] == 'MD+1') &
-                ((df_entrenamientos['participation_type'].isna()) | 
-                 (~df_entrenamientos['participation_type'].isin(['Part', 'Rehab'])))
-            ]
-            
-            # MD+1 disponible
-            
-            # Usar MD+1 si tiene datos
-            if not df_md_plus_1.empty and not df_md_plus_1['total_distance'].isna().all():
-                df_compensatorio = df_md_plus_1
-                compensatorio_tag = 'MD+1'
-            else:
-                # Buscar MD+2
-                df_md_plus_2_sin_filtro = df_entrenamientos[df_entrenamientos['activity_tag'] == 'MD+2']
-                df_md_plus_2 = df_entrenamientos[
-                    (df_entrenamientos['activity_tag'] == 'MD+2') &
-                    ((df_entrenamientos['participation_type'].isna()) | 
-                     (~df_entrenamientos['participation_type'].isin(['Part', 'Rehab'])))
-                ]
-                
-                # MD+2 procesado
-                
-                df_compensatorio = df_md_plus_2
-                compensatorio_tag = 'MD+2'
-            
-            # Si no hay ni MD+1 ni MD+2, sin datos
-            if df_compensatorio.empty or df_compensatorio['total_distance'].isna().all():
-                compensatorios[mc_id] = {'valor': None, 'porcentaje': None, 'color': 'gris'}
-                continue
-            
-            # Calcular promedio con pandas (IGUAL que el gráfico)
-            valor = df_compensatorio['total_distance'].mean()
-            num_jugadores = len(df_compensatorio['athlete_id'].unique())
-            
-            # Compensatorio calculado
-            
-            if pd.isna(valor):
-                compensatorios[mc_id] = {'valor': None, 'porcentaje': None, 'color': 'gris'}
-                continue
-            
-            # Obtener máximos históricos hasta esta fecha (últimos 4 MDs desde inicio de temporada)
-            df_maximos_hasta_fecha = df_maximos[df_maximos['fecha_md'] <= fecha_md].head(4)
-            
-            # VALIDACIÓN: Verificar cuántos partidos realmente tenemos
-            num_partidos_disponibles = len(df_maximos_hasta_fecha)
-            
-            if not df_maximos_hasta_fecha.empty:
-                # IMPORTANTE: Usar MAX de los máximos (igual que el gráfico)
-                max_historico = df_maximos_hasta_fecha['max_total_distance'].max()
-                
-                # Máximo histórico obtenido (basado en {num_partidos_disponibles} partidos)
-                
-                # Calcular porcentaje relativo al máximo histórico (igual que otras métricas)
-                porcentaje = (valor / max_historico) * 100 if max_historico > 0 else 0
-                
-                # Redondear ANTES de asignar color (igual que resto de métricas)
-                porcentaje_redondeado = round(porcentaje)
-                
-                # Porcentaje calculado
-                
-                # Color con zona de tolerancia ±5% absoluto
-                # Rango óptimo: 55-70%
-                # Tolerancia: ±5% absoluto → naranja 50-54% y 71-75%
-                
-                if 55 <= porcentaje_redondeado <= 70:
-                    color = 'verde'  # Dentro del rango óptimo (55-70%)
-                elif 50 <= porcentaje_redondeado < 55:
-                    color = 'naranja'  # Zona de tolerancia inferior (50-54%)
-                elif 70 < porcentaje_redondeado <= 75:
-                    color = 'naranja'  # Zona de tolerancia superior (71-75%)
-                elif porcentaje_redondeado < 50:
-                    color = 'rojo_claro'  # Muy por debajo del mínimo (<50%)
-                else:  # > 75
-                    color = 'rojo_oscuro'  # Muy por encima del máximo (>75%)
-                
-                # Color asignado
-                
-                compensatorios[mc_id] = {
-                    'valor': valor,
-                    'porcentaje': porcentaje_redondeado,
-                    'color': color
-                }
-            else:
-                compensatorios[mc_id] = {
-                    'valor': None,
-                    'porcentaje': None,
-                    'color': 'gris'
-                }
-        except Exception as e:
-            # Error en microciclo
-            compensatorios[mc_id] = {
-                'valor': None,
-                'porcentaje': None,
-                'color': 'gris'
+    Args:
+        df_microciclos (DataFrame): microciclo_id de la temporada
+        df_entrenamientos (DataFrame): microciclo_id, activity_tag, avg_<métrica> (ya agrupado)
+        df_referencias (DataFrame): referencia por microciclo_id (índice) y métrica (columnas)
+    
+    Returns:
+        (tipos, acumulados): {microciclo_id: tipo} y {métrica: {microciclo_id: celda}}
+    """
+    mc_ids = df_microciclos['microciclo_id'].tolist()
+    df_ent = df_entrenamientos[df_entrenamientos['microciclo_id'].isin(mc_ids)]
+    
+    # Tipo de microciclo según los días presentes
+    presentes = pd.crosstab(df_ent['microciclo_id'], df_ent['activity_tag']) > 0
+    presentes = presentes.reindex(columns=['MD-3', 'MD-4', 'MD-5', 'MD-6'], fill_value=False)
+    tipo_con_entrenos = pd.Series(np.select(
+        [presentes['MD-5'] | presentes['MD-6'], ~presentes['MD-3'] & ~presentes['MD-4'], ~presentes['MD-4']],
+        ['extendido', 'superrecortado', 'reducido'],
+        default='estandar'
+    ), index=presentes.index)
+    tipos = tipo_con_entrenos.reindex(mc_ids).fillna('especial')
+    
+    # Formato largo: una fila por (microciclo, día, métrica) con valor
+    largo = df_ent.melt(
+        id_vars=['microciclo_id'], value_vars=[f'avg_{m}' for m in METRICAS_EVOLUTIVAS],
+        var_name='metrica', value_name='valor'
+    ).dropna(subset=['valor'])
+    largo['metrica'] = largo['metrica'].str[len('avg_'):]
+    
+    referencias = df_referencias.rename_axis(index='microciclo_id').reset_index().melt(
+        id_vars=['microciclo_id'], var_name='metrica', value_name='referencia'
+    )
+    largo = largo.merge(referencias, on=['microciclo_id', 'metrica'], how='left')
+    largo = largo[largo['referencia'].notna() & (largo['referencia'] != 0)]
+    largo['porcentaje'] = largo['valor'] / largo['referencia'] * 100
+    
+    celdas = largo.groupby(['microciclo_id', 'metrica'])['porcentaje'].agg(['sum', 'mean', 'count']).reset_index()
+    celdas['acumulado'] = np.round(np.where(celdas['metrica'] == 'ritmo_medio', celdas['mean'], celdas['sum']))
+    celdas['tipo'] = celdas['microciclo_id'].map(tipos)
+    df_umbrales = _umbrales_por_tipo()
+    celdas = celdas.merge(df_umbrales, on=['tipo', 'metrica'], how='left')
+    
+    acumulado = celdas['acumulado']
+    celdas['color'] = np.select(
+        [celdas['tipo'] == 'especial',
+         acumulado < celdas['min_umbral'] - 5,
+         acumulado < celdas['min_umbral'],
+         acumulado <= celdas['max_umbral'],
+         acumulado <= celdas['max_umbral'] + 5],
+        ['gris', 'rojo_claro', 'naranja', 'verde', 'naranja'],
+        default='rojo_oscuro'
+    )
+    
+    # Celdas base: gris sin valor; umbrales del tipo salvo en microciclos 'especial'
+    umbrales = {(fila.tipo, fila.metrica): (fila.min_umbral, fila.max_umbral) for fila in df_umbrales.itertuples()}
+    acumulados = {metrica: {} for metrica in METRICAS_EVOLUTIVAS}
+    for metrica in METRICAS_EVOLUTIVAS:
+        for mc_id in mc_ids:
+            min_umbral, max_umbral = umbrales.get((tipos[mc_id], metrica), (None, None))
+            acumulados[metrica][mc_id] = {
+                'acumulado': None,
+                'color': 'gris',
+                'min_umbral': min_umbral,
+                'max_umbral': max_umbral
             }
     
-    # Compensatorios calculados
+    for fila in celdas.itertuples(index=False):
+        acumulados[fila.metrica][fila.microciclo_id].update({
+            'acumulado': int(fila.acumulado),
+            'color': fila.color,
+            'num_entrenamientos': int(fila.count)
+        })
     
-    engine.dispose()
-    return compensatorios
+    return tipos.to_dict(), acumulados
+
 
 def cargar_tabla_evolutiva_microciclos(jugadores_ids=None, modo_referencia='max'):
     """
@@ -900,7 +725,7 @@ def cargar_tabla_evolutiva_microciclos(jugadores_ids=None, modo_referencia='max'
         # IMPORTANTE: NO filtrar por fecha_md para permitir primera jornada sin partidos anteriores
         # Query 1: Obtener lista de microciclos con sus MDs
         # IMPORTANTE: No filtrar por fecha al buscar MD, solo filtrar entrenamientos
-        query_microciclos = f'''
+        query_microciclos = '''
             SELECT 
                 m1.microciclo_id,
                 m1.microciclo_nombre,
@@ -915,7 +740,7 @@ def cargar_tabla_evolutiva_microciclos(jugadores_ids=None, modo_referencia='max'
                     MIN(activity_date) as fecha_inicio,
                     MAX(activity_date) as fecha_fin
                 FROM microciclos_metricas_procesadas
-                WHERE activity_date >= '{fecha_inicio_temporada}'
+                WHERE activity_date >= :fecha_inicio_temporada
                 GROUP BY microciclo_id, microciclo_nombre
             ) m1
             LEFT JOIN (
@@ -930,7 +755,9 @@ def cargar_tabla_evolutiva_microciclos(jugadores_ids=None, modo_referencia='max'
             ORDER BY m1.fecha_inicio ASC
         '''
                 
-        df_microciclos = pd.read_sql(query_microciclos, engine)
+        params_temporada = {'fecha_inicio_temporada': fecha_inicio_temporada}
+        df_microciclos = ejecutar_consulta(query_microciclos, params_temporada,
+                                           engine=engine, nombre='tabla_evolutiva.microciclos')
                 
         # Procesar microciclos
             
@@ -963,9 +790,10 @@ def cargar_tabla_evolutiva_microciclos(jugadores_ids=None, modo_referencia='max'
         # Solo necesitamos los entrenamientos, no MD ni compensatorios
         # TAMBIÉN obtener los activity_tags para detectar el tipo de microciclo
         filtro_jugadores = ""
+        params_entrenamientos = {}
         if jugadores_ids:
-            jugadores_ids_quoted = ','.join([f"'{j}'" for j in jugadores_ids])
-            filtro_jugadores = f"AND athlete_id IN ({jugadores_ids_quoted})"
+            filtro_jugadores = "AND athlete_id IN :jugadores_ids"
+            params_entrenamientos['jugadores_ids'] = list(jugadores_ids)
         
         query_entrenamientos = f'''
             SELECT 
@@ -986,359 +814,42 @@ def cargar_tabla_evolutiva_microciclos(jugadores_ids=None, modo_referencia='max'
             ORDER BY microciclo_id, activity_tag
         '''
         
-        df_entrenamientos = pd.read_sql(query_entrenamientos, engine)
+        df_entrenamientos = ejecutar_consulta(query_entrenamientos, params_entrenamientos,
+                                              engine=engine, nombre='tabla_evolutiva.entrenamientos')
         
-        # Query 3: Obtener máximos históricos para cada microciclo (últimos 4 MDs)
-        # 🎯 DIFERENCIA CLAVE: Si es UN SOLO jugador, usar máximos INDIVIDUALES
-        # Si son múltiples jugadores, usar máximos del EQUIPO
+        # Query 3: Valores de referencia por microciclo
+        # 🎯 DIFERENCIA CLAVE: Si es UN SOLO jugador, usar máximos INDIVIDUALES (temporada completa)
+        # Si son múltiples jugadores, usar máximos del EQUIPO (últimos 4 MDs hasta cada fecha)
         es_jugador_individual = jugadores_ids and len(jugadores_ids) == 1
-        df_partidos_jugador = pd.DataFrame()  # Inicializar para evitar problemas de scope
+        
+        # Tabla de referencia del equipo (últimos 4 MDs): modo equipo y compensatorios (ambos modos)
+        df_referencias_equipo = get_referencias_equipo(fecha_inicio_temporada)
         
         if es_jugador_individual:
-            jugador_id = jugadores_ids[0]
-            # Modo jugador individual
-            
-            # 🚀 JUGADOR: Usa TODA LA TEMPORADA (a diferencia del equipo que usa últimos 4)
-            # Calcula MAX o MEDIA de TODOS los partidos +70' de la temporada según modo_referencia
-            funcion_agregado = "AVG" if modo_referencia == 'media' else "MAX"
-            
-            # Query para obtener el valor de referencia (máximo o media) de TODA LA TEMPORADA
-            # CON partidos +70': Usa todos los partidos con field_time >= 4200 DESDE INICIO TEMPORADA
-            # EXCLUYE pretemporada: filtra por fecha_inicio_temporada
-            query_max_jugador = f'''
-                SELECT 
-                    {funcion_agregado}(total_distance * (5640/field_time)) as max_total_distance,
-                    {funcion_agregado}(distancia_21_kmh * (5640/field_time)) as max_distancia_21_kmh,
-                    {funcion_agregado}(distancia_24_kmh * (5640/field_time)) as max_distancia_24_kmh,
-                    {funcion_agregado}(acc_dec_total * (5640/field_time)) as max_acc_dec_total,
-                    {funcion_agregado}(distance_per_minute) as max_ritmo_medio
-                FROM microciclos_metricas_procesadas
-                WHERE athlete_id = '{jugador_id}'
-                  AND activity_tag = 'MD'
-                  AND field_time >= 4200
-                  AND activity_date >= '{fecha_inicio_temporada}'
-            '''
-            
-            df_max_jugador = pd.read_sql(query_max_jugador, engine)
-            
-            # Verificar si encontramos valores válidos
-            tiene_datos_70 = not df_max_jugador.empty and df_max_jugador['max_total_distance'].notna().any()
-            
-            if not tiene_datos_70:
-                # FALLBACK: Buscar el partido donde jugó MÁS MINUTOS desde inicio de temporada
-                # Usar ese partido específico tanto para máximo como para media
-                # EXCLUYE pretemporada: filtra por fecha_inicio_temporada
-                query_max_jugador_fallback = f'''
-                    SELECT 
-                        total_distance * (5640/field_time) as max_total_distance,
-                        distancia_21_kmh * (5640/field_time) as max_distancia_21_kmh,
-                        distancia_24_kmh * (5640/field_time) as max_distancia_24_kmh,
-                        acc_dec_total * (5640/field_time) as max_acc_dec_total,
-                        distance_per_minute as max_ritmo_medio,
-                        field_time
-                    FROM microciclos_metricas_procesadas
-                    WHERE athlete_id = '{jugador_id}'
-                      AND activity_tag = 'MD'
-                      AND activity_date >= '{fecha_inicio_temporada}'
-                    ORDER BY field_time DESC
-                    LIMIT 1
-                '''
-                df_max_jugador = pd.read_sql(query_max_jugador_fallback, engine)
-            
-            # Convertir a diccionario simple para uso posterior
-            # NOTA: maximos_absolutos_jugador contiene el valor según modo_referencia:
-            #       - Si modo='max': contiene el máximo de todos los partidos
-            #       - Si modo='media': contiene la media de todos los partidos
-            maximos_absolutos_jugador = {}
-            if not df_max_jugador.empty:
-                maximos_absolutos_jugador = {
-                    'total_distance': df_max_jugador['max_total_distance'].iloc[0],
-                    'distancia_21_kmh': df_max_jugador['max_distancia_21_kmh'].iloc[0],
-                    'distancia_24_kmh': df_max_jugador['max_distancia_24_kmh'].iloc[0],
-                    'acc_dec_total': df_max_jugador['max_acc_dec_total'].iloc[0],
-                    'ritmo_medio': df_max_jugador['max_ritmo_medio'].iloc[0]
-                }
-                # Valores de referencia calculados según modo_referencia
-            else:
-                # No se encontraron partidos para el jugador
-                for metrica in metricas:
-                    maximos_absolutos_jugador[metrica] = None
-            
-            # DataFrame vacío para mantener compatibilidad (no se usa en modo individual)
-            df_maximos = pd.DataFrame()
-            df_partidos_jugador = pd.DataFrame()  # No necesitamos el DF completo
-            
+            # Mismo valor para todos los microciclos (índice de referencias de temporada)
+            referencias_jugador = _referencias_individuales(jugadores_ids[0], modo_referencia, fecha_inicio_temporada)
+            df_referencias = pd.DataFrame(
+                [referencias_jugador] * len(df_microciclos),
+                index=df_microciclos['microciclo_id'], columns=METRICAS_EVOLUTIVAS
+            ).astype('float64')
         else:
-            # Modo EQUIPO: Usar promedios de todos los jugadores (lógica original)
-            # IMPORTANTE: Filtrar desde inicio de temporada
-            query_maximos = f'''
-                SELECT 
-                    activity_date as fecha_md,
-                    AVG(CASE WHEN field_time >= 4200 THEN total_distance * (5640/field_time) END) as max_total_distance,
-                    AVG(CASE WHEN field_time >= 4200 THEN distancia_21_kmh * (5640/field_time) END) as max_distancia_21_kmh,
-                    AVG(CASE WHEN field_time >= 4200 THEN distancia_24_kmh * (5640/field_time) END) as max_distancia_24_kmh,
-                    AVG(CASE WHEN field_time >= 4200 THEN acc_dec_total * (5640/field_time) END) as max_acc_dec_total,
-                    AVG(CASE WHEN field_time >= 4200 THEN distance_per_minute END) as max_ritmo_medio
-                FROM microciclos_metricas_procesadas
-                WHERE activity_tag = 'MD'
-                  AND athlete_position != 'Goal Keeper'
-                  AND field_time >= 4200
-                  AND activity_date >= '{fecha_inicio_temporada}'
-                  AND (participation_type IS NULL OR participation_type NOT IN ('Part', 'Rehab'))
-                GROUP BY activity_date
-                ORDER BY activity_date DESC
-            '''
-            
-            df_maximos = pd.read_sql(query_maximos, engine)
-        
-        # Datos de entrenamientos cargados
-        
-        # Calcular acumulados para cada métrica y microciclo
-        metricas = ['total_distance', 'distancia_21_kmh', 'distancia_24_kmh', 'acc_dec_total', 'ritmo_medio']
-        acumulados = {metrica: {} for metrica in metricas}
+            df_referencias = _referencias_equipo_por_microciclo(df_microciclos, df_referencias_equipo, modo_referencia)
         
+        # Acumulados, tipo de microciclo y colores (vectorizado)
+        tipos, acumulados = calcular_acumulados_evolutivos(df_microciclos, df_entrenamientos, df_referencias)
         for mc_info in microciclos_info:
-            mc_id = mc_info['id']
-            fecha_md = mc_info['fecha_md']
-            
-            # Filtrar entrenamientos de este microciclo
-            df_mc = df_entrenamientos[df_entrenamientos['microciclo_id'] == mc_id]
-            
-            if df_mc.empty:
-                # No hay entrenamientos, marcar como sin datos
-                for metrica in metricas:
-                    acumulados[metrica][mc_id] = {
-                        'acumulado': None,
-                        'color': 'gris',
-                        'min_umbral': None,
-                        'max_umbral': None
-                    }
-                mc_info['tipo_microciclo'] = 'especial'
-                continue
-            
-            # 🎯 CALCULAR MÁXIMOS según modo (individual vs equipo)
-            if es_jugador_individual:
-                # ✅ Usar valor de referencia del jugador según modo_referencia
-                # (máximo o media, ya calculado según modo seleccionado)
-                # Este valor se usa para TODOS los microciclos
-                maximos_individuales = maximos_absolutos_jugador
-            else:
-                # Modo EQUIPO: Usar DataFrame de máximos del equipo (últimos 4 desde inicio de temporada)
-                # Validar que fecha_md no sea NULL/NaT
-                if pd.isna(fecha_md):
-                    # Microciclo sin partido (ej: pretemporada), no tiene máximos
-                    df_maximos_hasta_fecha = pd.DataFrame()
-                else:
-                    df_maximos_hasta_fecha = df_maximos[df_maximos['fecha_md'] <= fecha_md].head(4)
-                
-                # CASO ESPECIAL: Primera jornada sin partidos anteriores
-                # Si no hay partidos anteriores, buscar el MD más reciente (puede ser de pretemporada)
-                # IMPORTANTE: Solo si fecha_md existe (no es NULL)
-                if df_maximos_hasta_fecha.empty and not pd.isna(fecha_md):
-                    # CASO ESPECIAL: Primera jornada sin partidos anteriores
-                    # EXACTAMENTE LA MISMA LÓGICA que cargar_microciclo_ultrarapido_v2
-                    
-                    # Query idéntica a la visualización del microciclo
-                    query_md_actual = f'''
-                        SELECT 
-                            activity_date as fecha_md,
-                            AVG(CASE 
-                                WHEN field_time >= 4200 
-                                THEN total_distance * (5640.0 / field_time) 
-                                ELSE NULL 
-                            END) as max_total_distance,
-                            AVG(CASE 
-                                WHEN field_time >= 4200 
-                                THEN distancia_21_kmh * (5640.0 / field_time) 
-                                ELSE NULL 
-                            END) as max_distancia_21_kmh,
-                            AVG(CASE 
-                                WHEN field_time >= 4200 
-                                THEN distancia_24_kmh * (5640.0 / field_time) 
-                                ELSE NULL 
-                            END) as max_distancia_24_kmh,
-                            AVG(CASE 
-                                WHEN field_time >= 4200 
-                                THEN acc_dec_total * (5640.0 / field_time) 
-                                ELSE NULL 
-                            END) as max_acc_dec_total,
-                            AVG(CASE 
-                                WHEN field_time >= 4200 
-                                THEN distance_per_minute
-                                ELSE NULL 
-                            END) as max_ritmo_medio
-                        FROM microciclos_metricas_procesadas
-                        WHERE activity_tag = 'MD'
-                          AND activity_date = '{fecha_md}'
-                          AND YEAR(activity_date) = {temporada_actual if temporada_actual else 'YEAR(CURDATE())'}
-                          AND athlete_position != 'Goal Keeper'
-                          AND field_time >= 4200
-                          AND (participation_type IS NULL OR participation_type NOT IN ('Part', 'Rehab'))
-                        GROUP BY activity_date
-                    '''
-                    
-                    df_md_actual = pd.read_sql(query_md_actual, engine)
-                    if not df_md_actual.empty:
-                        df_maximos_hasta_fecha = df_md_actual
-                
-                # VALIDACIÓN: Verificar cuántos partidos realmente tenemos
-                num_partidos_disponibles = len(df_maximos_hasta_fecha)
-                if num_partidos_disponibles < 4:
-                    # Ajustar cálculo basado en partidos reales disponibles
-                    pass  # El cálculo sigue siendo válido con menos de 4 partidos
-            
-            # Calcular acumulado para cada métrica
-            for metrica in metricas:
-                col_avg = f'avg_{metrica}'
-                col_max = f'max_{metrica}'
-                
-                # Ya NO es necesario agrupar porque SQL ya agrupa por activity_tag
-                # SQL: GROUP BY microciclo_id, activity_tag
-                # Resultado: 1 registro por (microciclo, activity_tag)
-                
-                # Obtener valores de entrenamientos (MD-X) - ya vienen agrupados de SQL
-                valores_entrenamientos = df_mc[col_avg].dropna().tolist()
-                
-                if not valores_entrenamientos:
-                    acumulados[metrica][mc_id] = {
-                        'acumulado': None,
-                        'color': 'gris',
-                        'min_umbral': None,
-                        'max_umbral': None
-                    }
-                    continue
-                
-                # Obtener valor de referencia (máximo o media) según modo
-                if es_jugador_individual:
-                    # Para jugador: ya calculado con MAX() o AVG() según modo_referencia
-                    max_historico = maximos_individuales.get(metrica)
-                else:
-                    # Para equipo: calcular desde df_maximos según modo_referencia
-                    if df_maximos_hasta_fecha.empty:
-                        max_historico = None
-                    else:
-                        # Usar máximo o media según modo_referencia
-                        if modo_referencia == 'media':
-                            max_historico = df_maximos_hasta_fecha[col_max].mean()
-                        else:  # 'max' por defecto
-                            max_historico = df_maximos_hasta_fecha[col_max].max()
-                
-                # Validar que el valor de referencia existe y es válido
-                if max_historico is None or pd.isna(max_historico) or max_historico == 0:
-                    acumulados[metrica][mc_id] = {
-                        'acumulado': None,
-                        'color': 'gris',
-                        'min_umbral': None,
-                        'max_umbral': None
-                    }
-                    continue
-                
-                # Calcular % de cada entrenamiento sobre el valor de referencia (max o media)
-                porcentajes = [(valor / max_historico) * 100 for valor in valores_entrenamientos]
-                
-                # Acumulado depende del tipo de métrica
-                if metrica == 'ritmo_medio':
-                    acumulado_pct = sum(porcentajes) / len(porcentajes)  # Media
-                else:
-                    acumulado_pct = sum(porcentajes)  # Suma
-                
-                # IMPORTANTE: Redondear ANTES de guardar para que el color se base en el valor mostrado
-                acumulado_pct_redondeado = round(acumulado_pct)
-                
-                # Guardar acumulado REDONDEADO (sin determinar color aún, se hará después con tipo_microciclo)
-                acumulados[metrica][mc_id] = {
-                    'acumulado': acumulado_pct_redondeado,  # Guardar redondeado
-                    'color': None,  # Se asignará después
-                    'min_umbral': None,  # Se asignará después
-                    'max_umbral': None,  # Se asignará después
-                    'num_entrenamientos': len(valores_entrenamientos)
-                }
-        
-        # Determinar tipo de microciclo basado en los DÍAS PRESENTES
-        # Usar función local (movida desde seguimiento_carga.py)
-        
-        for mc_info in microciclos_info:
-            mc_id = mc_info['id']
-            
-            # Obtener días presentes en este microciclo desde df_entrenamientos
-            df_mc = df_entrenamientos[df_entrenamientos['microciclo_id'] == mc_id]
-            
-            if df_mc.empty:
-                mc_info['tipo_microciclo'] = 'especial'
-                # Sin entrenamientos → Tipo: especial
-                continue
-            
-            # Obtener lista de activity_tags únicos
-            dias_presentes = df_mc['activity_tag'].unique().tolist()
-            
-            # Detectar tipo usando la misma función que el seguimiento de carga
-            tipo = detectar_tipo_microciclo(dias_presentes)
-            
-            # Tipo detectado
-            mc_info['tipo_microciclo'] = tipo
-        
-        # Ahora asignar umbrales y colores basados en el tipo de microciclo
-        # Usar función local (movida desde seguimiento_carga.py)
-        
-        for mc_info in microciclos_info:
-            mc_id = mc_info['id']
-            tipo = mc_info['tipo_microciclo']
-            
-            # Asignando colores
-            
-            if tipo == 'especial':
-                # Sin umbrales, color gris
-                for metrica in metricas:
-                    if acumulados[metrica][mc_id].get('acumulado') is not None:
-                        acumulados[metrica][mc_id]['color'] = 'gris'
-                    else:
-                        # Asegurarse de que tenga color aunque sea None
-                        acumulados[metrica][mc_id]['color'] = 'gris'
-                continue
-            
-            # Obtener configuración de umbrales para este tipo
-            config = get_metricas_config_por_tipo(tipo)
-            
-            for config_metrica in config:
-                metrica_id = config_metrica['id']
-                if metrica_id not in metricas:
-                    continue
-                
-                min_umbral = config_metrica['min']
-                max_umbral = config_metrica['max']
-                acumulado_val = acumulados[metrica_id][mc_id].get('acumulado')
-                
-                if acumulado_val is None:
-                    color = 'gris'
-                else:
-                    # Zona de tolerancia ±5% absoluto (no relativo)
-                    # Ejemplo: rango 60-80% → naranja 55-59% y 81-85%
-                    
-                    if acumulado_val < (min_umbral - 5):
-                        color = 'rojo_claro'  # Muy por debajo del mínimo (< min-5)
-                    elif acumulado_val < min_umbral:
-                        color = 'naranja'  # Zona de tolerancia inferior (min-5 a min-1)
-                    elif acumulado_val <= max_umbral:
-                        color = 'verde'  # Dentro del rango óptimo
-                    elif acumulado_val <= (max_umbral + 5):
-                        color = 'naranja'  # Zona de tolerancia superior (max+1 a max+5)
-                    else:
-                        color = 'rojo_oscuro'  # Muy por encima del máximo (> max+5)
-                
-                # Valor procesado
-                
-                acumulados[metrica_id][mc_id].update({
-                    'color': color,
-                    'min_umbral': min_umbral,
-                    'max_umbral': max_umbral
-                })
+            mc_info['tipo_microciclo'] = tipos[mc_info['id']]
         
-        # Acumulados calculados
+        # Compensatorios (MD+1/MD+2) en la misma carga: se cachean junto con la tabla
+        compensatorios = calcular_compensatorios(
+            engine, [mc['id'] for mc in microciclos_info], jugadores_ids, df_referencias_equipo
+        )
         
         return {
             'microciclos': microciclos_info,
             'acumulados': acumulados,
-            'jugadores_ids': jugadores_ids  # Para cálculo de compensatorios
+            'compensatorios': compensatorios,
+            'jugadores_ids': jugadores_ids
         }
         
     except Exception as e:
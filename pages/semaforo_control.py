@@ -1,12 +1,13 @@
 # pages/semaforo_control.py
 
-from dash import html, dcc, callback, Input, Output
+from dash import html, dcc, callback, Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime
 from utils.layouts import standard_page
-from utils.semaforo_utils import get_all_semaforo_status, get_estado_general
+from utils.semaforo_utils import get_snapshot_semaforo
 
 
 def create_circular_semaforo(estados_data):
@@ -254,21 +255,28 @@ def update_loading_indicator(data):
 @callback(
     Output('semaforo-data-store', 'data'),
     [Input('semaforo-interval', 'n_intervals'),
-     Input('semaforo-interval-periodic', 'n_intervals')]
+     Input('semaforo-interval-periodic', 'n_intervals')],
+    State('semaforo-data-store', 'data')
 )
-def load_semaforo_data(n_intervals_initial, n_intervals_periodic):
-    """Carga los datos del semáforo"""
+def load_semaforo_data(n_intervals_initial, n_intervals_periodic, current_data):
+    """Lee el snapshot compartido del semáforo (no consulta las BDs)"""
     try:
-        estados = get_all_semaforo_status()
+        snapshot = get_snapshot_semaforo()
         
-        estado_general = get_estado_general()
+        # Misma versión que la ya mostrada: no redibujar
+        if current_data and current_data.get('version') == snapshot.get('version'):
+            raise PreventUpdate
         
         return {
-            'estados': estados,
-            'estado_general': estado_general,
-            'timestamp': datetime.now().isoformat()
+            'estados': snapshot['estados'],
+            'estado_general': snapshot['estado_general'],
+            'timestamp': snapshot['timestamp'],
+            'version': snapshot.get('version')
         }
         
+    except PreventUpdate:
+        raise
+        
     except Exception as e:
         print(f"ERROR cargando datos del semáforo: {e}")
         return {
@@ -920,31 +920,17 @@ def toggle_standings_modal(open_clicks, close_clicks, is_open):
 )
 def filter_standings_table(filter_value, is_open):
     """Filtra la tabla según clasificación general, últimos 5 partidos, local o visitante"""
-    from utils.db_manager import get_league_standings
+    from utils.tendencia_resultados import get_clasificacion_ordenada
     
     if not is_open:
         return dash.no_update
     
-    standings_data = get_league_standings(team_name="RC Deportivo")
+    # Ordenaciones precalculadas en el snapshot compartido de tendencia
+    df = get_clasificacion_ordenada(filter_value, team_name="RC Deportivo")
     
-    if not standings_data or 'full_standings' not in standings_data:
+    if df.empty:
         return html.Div("No hay datos disponibles")
     
-    df = standings_data['full_standings'].copy()
-    
-    if filter_value == 'last5':
-        # Ordenar por puntos de últimos 5 partidos
-        df = df.sort_values('last_5_points', ascending=False).reset_index(drop=True)
-        df['position'] = range(1, len(df) + 1)
-    elif filter_value == 'home':
-        # Ordenar por puntos como local
-        df = df.sort_values(['points_home', 'goal_difference_home', 'goals_for_home'], ascending=[False, False, False]).reset_index(drop=True)
-        df['position'] = range(1, len(df) + 1)
-    elif filter_value == 'away':
-        # Ordenar por puntos como visitante
-        df = df.sort_values(['points_away', 'goal_difference_away', 'goals_for_away'], ascending=[False, False, False]).reset_index(drop=True)
-        df['position'] = range(1, len(df) + 1)
-    
     return create_full_standings_rows(df, filter_value)
 
 
@@ -1078,12 +1064,13 @@ def get_tendencia_resultados_content():
 )
 def update_tendencia_content(trigger):
     """Construye todo el contenido de tendencia de resultados"""
-    from utils.db_manager import get_results_trend_statistics, get_league_standings
+    from utils.tendencia_resultados import get_snapshot_tendencia, get_clasificacion_tendencia
     
     try:
-        # Obtener estadísticas y clasificación
-        stats = get_results_trend_statistics(team_name="RC Deportivo")
-        standings_data = get_league_standings(team_name="RC Deportivo")
+        # Estadísticas y clasificación del snapshot compartido (se recalcula solo tras un partido)
+        snapshot = get_snapshot_tendencia(team_name="RC Deportivo")
+        stats = snapshot.get('stats', {})
+        standings_data = get_clasificacion_tendencia(snapshot)
         
         if not stats or stats.get('total_partidos', 0) == 0:
             return html.Div([
@@ -0,0 +1,41 @@
+# scripts/actualizar_microciclos.py
+
+import os
+import sys
+import time
+import argparse
+
+# Asegura que el directorio raíz del proyecto esté en sys.path cuando se ejecuta el script directamente
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.microciclos_etl import actualizar_microciclos
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Actualiza de forma incremental la tabla microciclos_metricas_procesadas"
+    )
+    parser.add_argument("--desde", type=str, default=None,
+                        help="Reconstruir desde una fecha (YYYY-MM-DD) en lugar de la marca de agua")
+    parser.add_argument("--completo", action="store_true",
+                        help="Reconstruir la temporada completa (desde el 1 de julio)")
+    parser.add_argument("--intervalo", type=int, default=0,
+                        help="Minutos entre ejecuciones; 0 = ejecutar una sola vez")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    actualizar_microciclos(desde=args.desde, completo=args.completo)
+
+    # Modo servicio: mantener fresca la semana actual
+    while args.intervalo > 0:
+        time.sleep(args.intervalo * 60)
+        try:
+            actualizar_microciclos()
+        except Exception as e:
+            print(f"❌ Error en ETL de microciclos: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+ejecutar_consulta() contra SQLite en memoria: expansión de IN y parámetros escalares.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from utils.consultas import ejecutar_consulta, get_estadisticas_consultas, preparar_parametros
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE actividades (id INTEGER, athlete_id TEXT, distancia REAL)"))
+        conn.execute(
+            text("INSERT INTO actividades VALUES (:id, :athlete_id, :distancia)"),
+            [
+                {'id': 1, 'athlete_id': 'a1', 'distancia': 5000.0},
+                {'id': 2, 'athlete_id': 'a2', 'distancia': 6200.0},
+                {'id': 3, 'athlete_id': 'a1', 'distancia': 7100.0},
+                {'id': 4, 'athlete_id': 'a3', 'distancia': 4300.0},
+            ]
+        )
+    yield engine
+    engine.dispose()
+
+
+def _ids(df):
+    return sorted(df['id'].tolist())
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT id FROM actividades WHERE athlete_id IN (:ids)",
+    "SELECT id FROM actividades WHERE athlete_id IN ( :ids )",
+    "SELECT id FROM actividades WHERE athlete_id IN :ids",
+])
+def test_in_con_y_sin_parentesis(engine, sql):
+    df = ejecutar_consulta(sql, {'ids': ['a1', 'a2']}, engine=engine)
+    assert _ids(df) == [1, 2, 3]
+
+
+@pytest.mark.parametrize('valor', [('a2',), ['a2'], {'a2'}, np.array(['a2']), pd.Series(['a2'])])
+def test_un_solo_elemento(engine, valor):
+    df = ejecutar_consulta("SELECT id FROM actividades WHERE athlete_id IN (:ids)", {'ids': valor}, engine=engine)
+    assert _ids(df) == [2]
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT id FROM actividades WHERE athlete_id IN (:ids)",
+    "SELECT id FROM actividades WHERE athlete_id IN :ids",
+])
+def test_lista_vacia_no_devuelve_filas(engine, sql):
+    df = ejecutar_consulta(sql, {'ids': []}, engine=engine)
+    assert df.empty
+    assert list(df.columns) == ['id']
+
+
+def test_parametros_escalares(engine):
+    df = ejecutar_consulta(
+        "SELECT id, distancia FROM actividades WHERE athlete_id = :athlete_id AND distancia >= :minimo",
+        {'athlete_id': 'a1', 'minimo': 6000}, engine=engine
+    )
+    assert df.to_dict('records') == [{'id': 3, 'distancia': 7100.0}]
+
+
+def test_escalares_y_lista_en_la_misma_consulta(engine):
+    sql = "SELECT id FROM actividades WHERE athlete_id IN (:ids) AND distancia > :minimo"
+    assert _ids(ejecutar_consulta(sql, {'ids': ('a1', 'a3'), 'minimo': 4500}, engine=engine)) == [1, 3]
+    # Misma sentencia compilada con otro número de elementos
+    assert _ids(ejecutar_consulta(sql, {'ids': ('a1', 'a2', 'a3'), 'minimo': 6000}, engine=engine)) == [2, 3]
+
+
+def test_sin_parametros_y_estadisticas(engine):
+    get_estadisticas_consultas(reset=True)
+    df = ejecutar_consulta("SELECT COUNT(*) AS n FROM actividades", engine=engine, nombre='conteo')
+    assert df['n'].iloc[0] == 4
+    stats = get_estadisticas_consultas()
+    assert stats.loc['conteo', 'llamadas'] == 1
+    assert stats.loc['conteo', 'filas'] == 1
+
+
+def test_preparar_parametros_marca_solo_las_colecciones():
+    valores, expandibles = preparar_parametros({'b': np.array([1, 2]), 'a': ['x'], 'fecha': '2025-10-01', 'n': 3})
+    assert expandibles == ('a', 'b')
+    assert valores == {'b': (1, 2), 'a': ('x',), 'fecha': '2025-10-01', 'n': 3}
+    assert type(valores['b'][0]) is int
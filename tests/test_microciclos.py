@@ -0,0 +1,175 @@
+"""
+Paridad de la segmentación en una pasada (utils/microciclos.py) con el bucle por MD
+que usaba get_microciclos() antes (sobre un DataFrame sintético, sin BD).
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import db_manager
+from utils.microciclos import indices_md_cierre, segmentar_microciclos
+
+DIA = 86400
+AHORA = datetime(2025, 11, 20, 12, 0, 0)
+
+
+class _DatetimeFijo(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return AHORA
+
+
+def _actividades(filas):
+    """
+    filas: [(día relativo, tag, nombre)] -> DataFrame como el de get_microciclos()
+    """
+    base = int(datetime(2025, 10, 1, 10, 0, 0).timestamp())
+    return pd.DataFrame({
+        'id': [f'a{i}' for i in range(len(filas))],
+        'start_time': [base + int(dia * DIA) for dia, _, _ in filas],
+        'name': [nombre for _, _, nombre in filas],
+        'tag_list_json': [tag for _, tag, _ in filas],
+    })
+
+
+def _microciclos_legado(df):
+    """
+    Bucle original de get_microciclos(): una pasada sobre df por cada MD.
+    """
+    df_md = df[df['grupo_dia'] == 'MD'].copy()
+    if df_md.empty:
+        return []
+
+    microciclos = []
+    for idx, row in df_md.iterrows():
+        md_timestamp = row['start_time']
+        md_date = datetime.fromtimestamp(md_timestamp)
+        partido_nombre = row['name'] if pd.notna(row['name']) else f"Partido {md_date.strftime('%d/%m/%Y')}"
+
+        md_previos = df_md.index[df_md.index < idx]
+        if idx > 0 and len(md_previos) > 0:
+            start_timestamp = df_md.loc[md_previos.max(), 'start_time']
+        else:
+            df_antes_md = df[df['start_time'] < md_timestamp]
+            if not df_antes_md.empty:
+                start_timestamp = df_antes_md['start_time'].min()
+            else:
+                start_timestamp = md_timestamp - 604800
+
+        df_antes_este_md = df[df['start_time'] < md_timestamp]
+        if not df_antes_este_md.empty:
+            end_date = datetime.fromtimestamp(df_antes_este_md['start_time'].max())
+        else:
+            end_date = datetime.fromtimestamp(md_timestamp - 86400)
+        end_date_for_query = datetime.fromtimestamp(md_timestamp - 1)
+        start_date = datetime.fromtimestamp(start_timestamp)
+
+        microciclos.append({
+            'id': f'mc_{idx}',
+            'label': f"Semana {partido_nombre} ({start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')})",
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date_for_query.strftime('%Y-%m-%d %H:%M:%S'),
+            'partido_nombre': partido_nombre,
+            'is_current': False
+        })
+
+    start_date = datetime.fromtimestamp(df_md['start_time'].max())
+    microciclos.append({
+        'id': 'mc_actual',
+        'label': f"Semana Actual ({start_date.strftime('%d/%m/%Y')} - {AHORA.strftime('%d/%m/%Y')})",
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': AHORA.strftime('%Y-%m-%d %H:%M:%S'),
+        'partido_nombre': 'Semana Actual',
+        'is_current': True
+    })
+    microciclos.reverse()
+    return microciclos
+
+
+@pytest.fixture
+def microciclos_de(monkeypatch):
+    """
+    Ejecuta get_microciclos() sobre un DataFrame sintético (grupo_dia = tag_list_json).
+    """
+    def _con_grupo_dia(df):
+        df['grupo_dia'] = df['tag_list_json']
+        return df
+
+    def ejecutar(df):
+        monkeypatch.setattr(db_manager, 'get_db_connection', lambda: object())
+        monkeypatch.setattr(db_manager, 'add_grupo_dia_column', _con_grupo_dia)
+        monkeypatch.setattr(db_manager, 'datetime', _DatetimeFijo)
+        monkeypatch.setattr(db_manager.pd, 'read_sql', lambda *args, **kwargs: df.copy())
+        return db_manager.get_microciclos()
+
+    return ejecutar
+
+
+ESCENARIOS = {
+    # Entrenos antes del primer MD: ese microciclo no tiene MD que lo abra
+    'entrenos_antes_del_primer_md': [
+        (0, 'MD-4', 'E1'), (1, 'MD-3', 'E2'), (3, 'MD-1', 'E3'), (4, 'MD', 'J1 RCD Vs A'),
+        (6, 'MD+2', 'E4'), (8, 'MD-3', 'E5'), (10, 'MD-1', 'E6'), (11, 'MD', 'J2 B Vs RCD'),
+    ],
+    # Primer registro ya es MD: inicio por defecto MD - 7 días y fin MD - 1 día
+    'primer_registro_md': [
+        (0, 'MD', 'J1 RCD Vs A'), (2, 'MD+2', 'E1'), (5, 'MD-1', 'E2'), (6, 'MD', None),
+    ],
+    # Dos MDs en la misma semana, sin entrenos entre ellos, y semana actual abierta
+    'dos_mds_en_una_semana': [
+        (0, 'MD-2', 'E1'), (1, 'MD-1', 'E2'), (2, 'MD', 'J1 RCD Vs A'), (5, 'MD', 'Copa C Vs RCD'),
+        (6, 'MD+1', 'E3'), (8, 'MD-1', 'E4'), (9, 'MD', 'J2 RCD Vs D'),
+        (10, 'MD+1', 'E5'), (12, 'MD-3', 'E6'),
+    ],
+}
+
+
+@pytest.mark.parametrize('escenario', sorted(ESCENARIOS))
+def test_get_microciclos_igual_que_bucle_legado(microciclos_de, escenario):
+    df = _actividades(ESCENARIOS[escenario])
+    esperado = _microciclos_legado(df.assign(grupo_dia=df['tag_list_json']))
+    assert microciclos_de(df) == esperado
+
+
+def test_semana_actual_abierta_empieza_en_el_ultimo_md(microciclos_de):
+    df = _actividades(ESCENARIOS['dos_mds_en_una_semana'])
+    actual, ultimo = microciclos_de(df)[:2]
+    assert actual['is_current'] and actual['id'] == 'mc_actual'
+    assert actual['start_date'] == datetime.fromtimestamp(df['start_time'].iloc[6]).strftime('%Y-%m-%d')
+    assert actual['end_date'] == AHORA.strftime('%Y-%m-%d %H:%M:%S')
+    assert ultimo['partido_nombre'] == 'J2 RCD Vs D'
+
+
+def test_dos_mds_en_una_semana_encadena_los_microciclos():
+    df = _actividades(ESCENARIOS['dos_mds_en_una_semana']).assign(grupo_dia=lambda d: d['tag_list_json'])
+    ventanas = segmentar_microciclos(df)
+    tiempos = df['start_time'].to_numpy()
+    copa = ventanas.iloc[1]
+    # El microciclo de la copa empieza y termina en el MD de liga (no hay entrenos entre ambos)
+    assert copa['inicio_ts'] == tiempos[2] and copa['fin_ts'] == tiempos[2]
+    assert copa['fin_consulta_ts'] == tiempos[3] - 1
+    assert list(ventanas['temporada'].unique()) == ['2025/2026']
+
+
+def test_sin_md_no_hay_microciclos(microciclos_de):
+    df = _actividades([(0, 'MD-2', 'E1'), (1, 'MD-1', 'E2')])
+    assert microciclos_de(df) == []
+    assert segmentar_microciclos(df.assign(grupo_dia=df['tag_list_json'])).empty
+
+
+@pytest.mark.parametrize('md_dias', [[2, 5, 9], [3], []])
+def test_indices_md_cierre_igual_que_busqueda_por_actividad(md_dias):
+    start_times = np.array([0, 1, 2, 3, 4, 5, 6, 9, 10, 12]) * DIA
+    md_times = np.array(md_dias, dtype='int64') * DIA
+
+    idx_md, es_actual = indices_md_cierre(start_times, md_times)
+
+    for i, ts in enumerate(start_times):
+        # Primer MD con start_time >= al de la actividad; si no hay, semana actual
+        cierre = next((j for j, md in enumerate(md_times) if md >= ts), None)
+        assert es_actual[i] == (cierre is None)
+        if cierre is not None:
+            assert idx_md[i] == cierre
@@ -0,0 +1,157 @@
+"""
+Referencia del equipo (últimos 4 MDs): tabla por fecha de MD y búsqueda por fecha,
+frente al cálculo directo MD a MD. La estandarización a 94' se prueba con SQLite.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from utils import db_manager, referencias_temporada as rt
+
+INICIO = '2025-08-10'
+
+# Media del equipo por MD: dos de pretemporada y seis de temporada
+MDS = pd.DataFrame({
+    'fecha_md': ['2025-07-26', '2025-08-02', '2025-08-16', '2025-08-23', '2025-08-30',
+                 '2025-09-13', '2025-09-20', '2025-09-27'],
+    'activity_name': ['Amistoso A', 'Amistoso B', 'J1 RCD Vs A', None, 'J3 RCD Vs C',
+                      'J4 D Vs RCD', 'J5 RCD Vs E', 'J6 F Vs RCD'],
+    'microciclo_id': ['mc_a', 'mc_b', 'mc_j1', 'mc_2025-08-23_J2_B_Vs_RCD', 'mc_j3', 'mc_j4', 'mc_j5', 'mc_j6'],
+    'total_distance': [9000.0, 9500.0, 10500.0, 11200.0, 10800.0, 10100.0, 11500.0, 10300.0],
+    'distancia_21_kmh': [600.0, 650.0, 700.0, np.nan, 720.0, 680.0, 760.0, 640.0],
+    'distancia_24_kmh': [250.0, 260.0, 280.0, 300.0, 290.0, 270.0, 310.0, 265.0],
+    'acc_dec_total': [40.0, 42.0, 45.0, 50.0, 47.0, 44.0, 52.0, 46.0],
+    'ritmo_medio': [100.0, 102.0, 105.0, 110.0, 108.0, 101.0, 112.0, 104.0],
+})
+
+
+def _ventana_directa(fecha):
+    """
+    Cálculo original: MDs de temporada <= fecha, los 4 más recientes.
+    """
+    df = MDS.assign(fecha_md=pd.to_datetime(MDS['fecha_md']))
+    df = df[(df['fecha_md'] >= pd.Timestamp(INICIO)) & (df['fecha_md'] <= pd.Timestamp(fecha))]
+    return df.sort_values('fecha_md', ascending=False).head(4)
+
+
+@pytest.fixture
+def tabla():
+    return rt.construir_referencias_equipo(MDS, INICIO)
+
+
+def test_pretemporada_solo_es_su_propia_referencia(tabla):
+    pretemporada = tabla[~tabla['en_temporada']]
+    assert len(pretemporada) == 2
+    assert (pretemporada['num_partidos'] == 1).all()
+    assert (pretemporada['total_distance_max'] == pretemporada['total_distance']).all()
+
+
+@pytest.mark.parametrize('metrica', list(rt.METRICAS_EQUIPO))
+def test_ventanas_igual_que_calculo_directo(tabla, metrica):
+    temporada = tabla[tabla['en_temporada']]
+    for fila in temporada.itertuples(index=False):
+        ventana = _ventana_directa(fila.fecha_md)
+        valores = ventana[metrica].dropna()
+        assert fila.num_partidos == min(len(ventana), 4)
+        assert getattr(fila, f'{metrica}_max') == pytest.approx(valores.max())
+        assert getattr(fila, f'{metrica}_min') == pytest.approx(valores.min())
+        assert getattr(fila, f'{metrica}_media') == pytest.approx(valores.mean())
+        fila_max = ventana.loc[valores.idxmax()]
+        assert getattr(fila, f'{metrica}_fecha_max') == fila_max['fecha_md']
+
+
+def test_menos_de_cuatro_y_cuatro_o_mas(tabla):
+    por_fecha = tabla.set_index('fecha_md')
+    assert por_fecha.loc['2025-08-16', 'num_partidos'] == 1
+    assert por_fecha.loc['2025-08-30', 'num_partidos'] == 3
+    assert por_fecha.loc['2025-09-13', 'num_partidos'] == 4
+    # Con 6 MDs la ventana ya no incluye J1 ni J2 (máximo 11500 en J5)
+    fila = por_fecha.loc['2025-09-27']
+    assert fila['num_partidos'] == 4
+    assert fila['total_distance_max'] == 11500.0 and fila['total_distance_partido_max'] == 'J5 RCD Vs E'
+    assert fila['total_distance_media'] == pytest.approx((10800 + 10100 + 11500 + 10300) / 4)
+
+
+def test_nombre_del_partido_desde_microciclo(tabla):
+    fila = tabla.set_index('fecha_md').loc['2025-08-23']
+    assert fila['partido'] == 'B Vs RCD'
+    assert fila['total_distance_partido_max'] == 'B Vs RCD'
+
+
+def test_busqueda_por_fecha(tabla):
+    fechas = pd.Series([pd.Timestamp('2025-09-27'), pd.Timestamp('2025-09-16'), pd.NaT, pd.Timestamp('2025-08-16')],
+                       index=[10, 11, 12, 13])
+    referencias = rt.referencias_equipo_para_fechas(tabla, fechas)
+    assert list(referencias.index) == [10, 11, 12, 13]
+    # Entre MDs: el último MD de temporada anterior a la fecha (J4)
+    assert referencias.loc[11, 'fecha_md'] == pd.Timestamp('2025-09-13')
+    assert referencias.loc[10, 'num_partidos'] == 4
+    assert referencias.loc[13, 'num_partidos'] == 1
+    assert referencias.loc[12].isna().all()
+
+
+@pytest.mark.parametrize('con_primera_jornada', [True, False])
+def test_fecha_anterior_al_primer_md_de_temporada(tabla, con_primera_jornada):
+    # MD de pretemporada: solo con_primera_jornada usa su propia fila
+    fechas = pd.Series([pd.Timestamp('2025-08-02'), pd.Timestamp('2025-08-05')])
+    referencias = rt.referencias_equipo_para_fechas(tabla, fechas, con_primera_jornada=con_primera_jornada)
+    if con_primera_jornada:
+        assert referencias.loc[0, 'partido'] == 'Amistoso B'
+        assert referencias.loc[0, 'total_distance_max'] == 9500.0
+    else:
+        assert referencias.loc[0].isna().all()
+    # Sin MD ese día y sin MDs de temporada antes: sin referencia en ambos casos
+    assert referencias.loc[1].isna().all()
+
+
+def test_tabla_vacia():
+    vacia = rt.construir_referencias_equipo(MDS.iloc[:0], INICIO)
+    assert vacia.empty
+    referencias = rt.referencias_equipo_para_fechas(vacia, pd.Series([pd.Timestamp('2025-09-01')]))
+    assert len(referencias) == 1 and referencias.iloc[0].isna().all()
+
+
+@pytest.fixture
+def engine_metricas(monkeypatch, tmp_path):
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE microciclos_metricas_procesadas (athlete_id TEXT, activity_date TEXT, activity_name TEXT, "
+            "microciclo_id TEXT, activity_tag TEXT, athlete_position TEXT, participation_type TEXT, field_time REAL, "
+            "total_distance REAL, distancia_21_kmh REAL, distancia_24_kmh REAL, acc_dec_total REAL, "
+            "distance_per_minute REAL)"
+        ))
+        filas = [
+            # 94' exactos y 78' (4700 s): 10000 m -> 12000 m estandarizados
+            ('a1', '2025-08-16', 'MD', 'Midfielder', None, 5640, 11000, 700, 300, 50, 110),
+            ('a2', '2025-08-16', 'MD', 'Defender', 'Full', 4700, 10000, 500, 250, 40, 100),
+            # Fuera: menos de 70', portero, participación parcial y entrenamiento
+            ('a3', '2025-08-16', 'MD', 'Forward', None, 3000, 9000, 900, 400, 60, 130),
+            ('a4', '2025-08-16', 'MD', 'Goal Keeper', None, 5640, 5000, 10, 0, 5, 50),
+            ('a5', '2025-08-16', 'MD', 'Forward', 'Part', 5640, 1000, 10, 0, 5, 10),
+            ('a1', '2025-08-14', 'MD-2', 'Midfielder', None, 5640, 7000, 300, 100, 30, 90),
+            ('a1', '2025-08-23', 'MD', 'Midfielder', None, 5640, 10600, 720, 320, 48, 108),
+        ]
+        conn.execute(
+            text("INSERT INTO microciclos_metricas_procesadas VALUES (:a, :f, 'Partido', 'mc', :t, :p, :pt, :ft, "
+                 ":td, :d21, :d24, :acc, :dpm)"),
+            [dict(zip(['a', 'f', 't', 'p', 'pt', 'ft', 'td', 'd21', 'd24', 'acc', 'dpm'], fila)) for fila in filas]
+        )
+    monkeypatch.setattr(db_manager, 'get_db_connection', lambda: engine)
+    monkeypatch.setenv('RESULT_CACHE_PATH', str(tmp_path / 'cache.sqlite'))
+    yield engine
+    engine.dispose()
+
+
+def test_estandarizacion_a_94_minutos(engine_metricas):
+    tabla = rt.get_referencias_equipo(INICIO)
+    fila = tabla.set_index('fecha_md').loc['2025-08-16']
+    assert fila['total_distance'] == pytest.approx((11000 + 10000 * 5640 / 4700) / 2)
+    assert fila['distancia_21_kmh'] == pytest.approx((700 + 500 * 5640 / 4700) / 2)
+    # El ritmo ya es por minuto: no se estandariza
+    assert fila['ritmo_medio'] == pytest.approx(105)
+    assert list(tabla['fecha_md']) == [pd.Timestamp('2025-08-16'), pd.Timestamp('2025-08-23')]
+    assert tabla.set_index('fecha_md').loc['2025-08-23', 'total_distance_max'] == pytest.approx(11500)
@@ -0,0 +1,184 @@
+"""
+calcular_acumulados_evolutivos() frente a las reglas por microciclo del bucle original
+de cargar_tabla_evolutiva_microciclos() (fixture sintético, sin BD).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pages.seguimiento_carga_ultra_optimizado import (
+    METRICAS_EVOLUTIVAS, calcular_acumulados_evolutivos, detectar_tipo_microciclo,
+    get_metricas_config_por_tipo
+)
+
+# Referencia 1000 en todas las métricas: el % de cada entrenamiento es valor / 10
+REFERENCIA = 1000.0
+
+# {microciclo_id: {activity_tag: {métrica: % sobre la referencia}}}
+ENTRENAMIENTOS = {
+    'mc_estandar': {
+        'MD-4': {'total_distance': 50, 'distancia_21_kmh': 30, 'distancia_24_kmh': 20, 'acc_dec_total': 60, 'ritmo_medio': 60},
+        'MD-3': {'total_distance': 50, 'distancia_21_kmh': 30, 'distancia_24_kmh': 20, 'acc_dec_total': 60, 'ritmo_medio': 62},
+        'MD-2': {'total_distance': 45, 'distancia_21_kmh': 17, 'distancia_24_kmh': 20, 'acc_dec_total': 60, 'ritmo_medio': 58},
+        'MD-1': {'total_distance': 40, 'distancia_21_kmh': 10, 'distancia_24_kmh': 20, 'acc_dec_total': 60, 'ritmo_medio': 64},
+    },
+    'mc_reducido': {
+        # total_distance 170.4 -> 170: verde solo si se redondea antes de colorear (máx 170)
+        'MD-3': {'total_distance': 60.2, 'distancia_21_kmh': 40, 'distancia_24_kmh': 30, 'acc_dec_total': 40, 'ritmo_medio': 49.4},
+        'MD-2': {'total_distance': 60.1, 'distancia_21_kmh': 40, 'distancia_24_kmh': 30, 'acc_dec_total': 40, 'ritmo_medio': 49.4},
+        'MD-1': {'total_distance': 50.1, 'distancia_21_kmh': np.nan, 'distancia_24_kmh': 30, 'acc_dec_total': 40, 'ritmo_medio': 49.4},
+    },
+    'mc_extendido': {
+        'MD-5': {'total_distance': 40, 'distancia_21_kmh': 39, 'distancia_24_kmh': 35, 'acc_dec_total': 77},
+        'MD-4': {'total_distance': 40, 'distancia_21_kmh': 39, 'distancia_24_kmh': 35, 'acc_dec_total': 77},
+        'MD-3': {'total_distance': 40, 'distancia_21_kmh': 39, 'distancia_24_kmh': 35, 'acc_dec_total': 77},
+        'MD-2': {'total_distance': 40, 'distancia_21_kmh': 39, 'distancia_24_kmh': 35, 'acc_dec_total': 77},
+        'MD-1': {'total_distance': 34, 'distancia_21_kmh': 39, 'distancia_24_kmh': 35.5, 'acc_dec_total': 77},
+    },
+    'mc_superrecortado': {
+        'MD-2': {'total_distance': 30, 'distancia_21_kmh': 30, 'distancia_24_kmh': 23, 'acc_dec_total': 40, 'ritmo_medio': 40},
+        'MD-1': {'total_distance': 27, 'distancia_21_kmh': 30, 'distancia_24_kmh': 23, 'acc_dec_total': 40, 'ritmo_medio': 39},
+    },
+    # Fuera de los microciclos de la temporada: se ignora
+    'mc_otra_temporada': {
+        'MD-1': {'total_distance': 100, 'distancia_21_kmh': 100, 'distancia_24_kmh': 100, 'acc_dec_total': 100, 'ritmo_medio': 100},
+    },
+}
+
+MICROCICLOS = ['mc_estandar', 'mc_reducido', 'mc_especial', 'mc_extendido', 'mc_superrecortado', 'mc_sin_referencia']
+
+
+@pytest.fixture
+def datos():
+    filas = []
+    for mc_id, dias in {**ENTRENAMIENTOS, 'mc_sin_referencia': ENTRENAMIENTOS['mc_estandar']}.items():
+        for tag, pcts in dias.items():
+            fila = {'microciclo_id': mc_id, 'activity_tag': tag}
+            fila.update({f'avg_{m}': pcts.get(m, np.nan) * REFERENCIA / 100 for m in METRICAS_EVOLUTIVAS})
+            filas.append(fila)
+    df_entrenamientos = pd.DataFrame(filas)
+
+    df_microciclos = pd.DataFrame({'microciclo_id': MICROCICLOS})
+    df_referencias = pd.DataFrame(REFERENCIA, index=pd.Index(MICROCICLOS, name='microciclo_id'),
+                                  columns=METRICAS_EVOLUTIVAS)
+    # Referencia 0 y NaN: celdas grises aunque haya entrenamientos
+    df_referencias.loc['mc_estandar', 'distancia_24_kmh'] = 0
+    df_referencias.loc['mc_estandar', 'acc_dec_total'] = np.nan
+    df_referencias.loc['mc_sin_referencia', :] = np.nan
+    return df_microciclos, df_entrenamientos, df_referencias
+
+
+def _acumulados_legado(df_microciclos, df_entrenamientos, df_referencias):
+    """
+    Reglas del bucle original: un microciclo y una métrica cada vez.
+    """
+    tipos = {}
+    acumulados = {metrica: {} for metrica in METRICAS_EVOLUTIVAS}
+    celda_gris = {'acumulado': None, 'color': 'gris', 'min_umbral': None, 'max_umbral': None}
+
+    for mc_id in df_microciclos['microciclo_id']:
+        df_mc = df_entrenamientos[df_entrenamientos['microciclo_id'] == mc_id]
+        if df_mc.empty:
+            for metrica in METRICAS_EVOLUTIVAS:
+                acumulados[metrica][mc_id] = dict(celda_gris)
+            tipos[mc_id] = 'especial'
+            continue
+
+        for metrica in METRICAS_EVOLUTIVAS:
+            valores = df_mc[f'avg_{metrica}'].dropna().tolist()
+            referencia = df_referencias.loc[mc_id, metrica]
+            if not valores or referencia is None or pd.isna(referencia) or referencia == 0:
+                acumulados[metrica][mc_id] = dict(celda_gris)
+                continue
+            porcentajes = [valor / referencia * 100 for valor in valores]
+            if metrica == 'ritmo_medio':
+                acumulado = sum(porcentajes) / len(porcentajes)
+            else:
+                acumulado = sum(porcentajes)
+            acumulados[metrica][mc_id] = {
+                'acumulado': round(acumulado), 'color': None, 'min_umbral': None, 'max_umbral': None,
+                'num_entrenamientos': len(valores)
+            }
+        tipos[mc_id] = detectar_tipo_microciclo(df_mc['activity_tag'].unique().tolist())
+
+    for mc_id, tipo in tipos.items():
+        if tipo == 'especial':
+            continue
+        for config in get_metricas_config_por_tipo(tipo):
+            min_umbral, max_umbral = config['min'], config['max']
+            valor = acumulados[config['id']][mc_id]['acumulado']
+            if valor is None:
+                color = 'gris'
+            elif valor < min_umbral - 5:
+                color = 'rojo_claro'
+            elif valor < min_umbral:
+                color = 'naranja'
+            elif valor <= max_umbral:
+                color = 'verde'
+            elif valor <= max_umbral + 5:
+                color = 'naranja'
+            else:
+                color = 'rojo_oscuro'
+            acumulados[config['id']][mc_id].update({'color': color, 'min_umbral': min_umbral, 'max_umbral': max_umbral})
+    return tipos, acumulados
+
+
+def test_igual_que_bucle_por_microciclo(datos):
+    assert calcular_acumulados_evolutivos(*datos) == _acumulados_legado(*datos)
+
+
+def test_tipos_de_microciclo(datos):
+    tipos, _ = calcular_acumulados_evolutivos(*datos)
+    assert tipos == {
+        'mc_estandar': 'estandar', 'mc_reducido': 'reducido', 'mc_especial': 'especial',
+        'mc_extendido': 'extendido', 'mc_superrecortado': 'superrecortado', 'mc_sin_referencia': 'estandar'
+    }
+
+
+def test_microciclo_especial_sin_entrenamientos_es_gris(datos):
+    _, acumulados = calcular_acumulados_evolutivos(*datos)
+    for metrica in METRICAS_EVOLUTIVAS:
+        assert acumulados[metrica]['mc_especial'] == {
+            'acumulado': None, 'color': 'gris', 'min_umbral': None, 'max_umbral': None
+        }
+
+
+def test_suma_salvo_ritmo_medio_que_es_media(datos):
+    _, acumulados = calcular_acumulados_evolutivos(*datos)
+    assert acumulados['total_distance']['mc_estandar']['acumulado'] == 185
+    assert acumulados['total_distance']['mc_estandar']['num_entrenamientos'] == 4
+    assert acumulados['ritmo_medio']['mc_estandar']['acumulado'] == 61
+    # NaN de un día no cuenta como entrenamiento
+    assert acumulados['distancia_21_kmh']['mc_reducido']['num_entrenamientos'] == 2
+
+
+def test_redondeo_antes_de_colorear(datos):
+    _, acumulados = calcular_acumulados_evolutivos(*datos)
+    celda = acumulados['total_distance']['mc_reducido']
+    assert (celda['acumulado'], celda['max_umbral'], celda['color']) == (170, 170, 'verde')
+    celda = acumulados['ritmo_medio']['mc_reducido']
+    assert (celda['acumulado'], celda['min_umbral'], celda['color']) == (49, 50, 'naranja')
+
+
+@pytest.mark.parametrize('metrica, mc_id, acumulado, color', [
+    ('total_distance', 'mc_estandar', 185, 'verde'),
+    ('distancia_21_kmh', 'mc_estandar', 87, 'naranja'),          # min 90: banda inferior
+    ('total_distance', 'mc_extendido', 194, 'rojo_claro'),       # min 200: por debajo de min - 5
+    ('distancia_21_kmh', 'mc_extendido', 195, 'naranja'),        # max 190: banda superior
+    ('distancia_24_kmh', 'mc_extendido', 176, 'rojo_oscuro'),    # max 170: por encima de max + 5
+    ('total_distance', 'mc_superrecortado', 57, 'naranja'),      # min 60
+    ('distancia_24_kmh', 'mc_superrecortado', 46, 'rojo_oscuro'),  # max 40
+])
+def test_bandas_de_tolerancia(datos, metrica, mc_id, acumulado, color):
+    _, acumulados = calcular_acumulados_evolutivos(*datos)
+    assert (acumulados[metrica][mc_id]['acumulado'], acumulados[metrica][mc_id]['color']) == (acumulado, color)
+
+
+def test_referencia_cero_o_nan_deja_la_celda_gris_con_umbrales(datos):
+    _, acumulados = calcular_acumulados_evolutivos(*datos)
+    for metrica, mc_id in [('distancia_24_kmh', 'mc_estandar'), ('acc_dec_total', 'mc_estandar'),
+                           ('total_distance', 'mc_sin_referencia'), ('ritmo_medio', 'mc_extendido')]:
+        celda = acumulados[metrica][mc_id]
+        assert celda['acumulado'] is None and celda['color'] == 'gris'
+        assert celda['min_umbral'] is not None and 'num_entrenamientos' not in celda
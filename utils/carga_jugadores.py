@@ -4,9 +4,37 @@ Funciones para análisis de cargas máximas en partidos (MD) por jugador
 """
 
 import pandas as pd
-import json
 from datetime import datetime
-from utils.db_manager import get_db_connection, get_all_athletes
+from utils.db_manager import get_db_connection, get_all_athletes, get_metrics_wide
+from utils.tags_actividades import FILTRO_SQL_MD, extraer_es_md
+
+def _cargar_actividades_md(engine, inicio_ts):
+    """
+    Actividades MD (partidos) desde inicio_ts: id, start_time, name.
+    Filtra en MySQL con JSON_CONTAINS; si la BD no lo soporta (o hay JSON inválido)
+    filtra en Python con el parseo memoizado de tags.
+    """
+    try:
+        query = f'''
+            SELECT id, start_time, name
+            FROM activities
+            WHERE start_time >= %s
+              AND {FILTRO_SQL_MD}
+            ORDER BY start_time ASC
+        '''
+        return pd.read_sql(query, engine, params=(inicio_ts,))
+    except Exception as e:
+        print(f"WARNING: Filtro JSON_CONTAINS no disponible, filtrando en Python: {e}")
+    
+    query = '''
+        SELECT id, start_time, name, tag_list_json
+        FROM activities
+        WHERE start_time >= %s
+        ORDER BY start_time ASC
+    '''
+    df = pd.read_sql(query, engine, params=(inicio_ts,))
+    df = df[extraer_es_md(df['tag_list_json'])]
+    return df[['id', 'start_time', 'name']].copy()
 
 def calcular_estadisticas_md_jugadores(inicio_temporada='2025-08-15'):
     """
@@ -51,32 +79,7 @@ def calcular_estadisticas_md_jugadores(inicio_temporada='2025-08-15'):
         inicio_ts = int(datetime.strptime(inicio_temporada, '%Y-%m-%d').timestamp())
         
         # Obtener actividades MD desde inicio de temporada
-        # Usar una búsqueda más simple para evitar problemas con comillas en LIKE
-        query_actividades = '''
-            SELECT id, start_time, name, tag_list_json
-            FROM activities
-            WHERE start_time >= %s
-            ORDER BY start_time ASC
-        '''
-        df_actividades = pd.read_sql(query_actividades, engine, params=(inicio_ts,))
-        
-        # Filtrar actividades MD usando Python en lugar de SQL
-        def es_md(tag_json_str):
-            try:
-                if pd.isna(tag_json_str):
-                    return False
-                tags = json.loads(tag_json_str)
-                for tag in tags:
-                    if tag.get('name') == 'MD':
-                        return True
-                return False
-            except:
-                return False
-        
-        df_actividades['es_md'] = df_actividades['tag_list_json'].apply(es_md)
-        df_actividades = df_actividades[df_actividades['es_md']].copy()
-        df_actividades = df_actividades[['id', 'start_time', 'name']]  # Solo columnas necesarias
-        
+        df_actividades = _cargar_actividades_md(engine, inicio_ts)
         
         if df_actividades.empty:
             print("WARNING: No se encontraron actividades MD")
@@ -84,56 +87,23 @@ def calcular_estadisticas_md_jugadores(inicio_temporada='2025-08-15'):
         
         activity_ids = df_actividades['id'].tolist()
         
-        # Obtener todas las métricas en una sola consulta
+        # Obtener field_time y todas las métricas en UNA sola consulta (formato ancho)
         resultados = []
-        
-        # Primero obtener field_time para todos los partidos y jugadores
-        ids_str = ','.join([f"'{id}'" for id in activity_ids])
-        query_field_time = f'''
-            SELECT 
-                activity_id,
-                athlete_id,
-                CAST(parameter_value AS DECIMAL(10,2)) as field_time
-            FROM activity_athlete_metrics
-            WHERE parameter_name = 'field_time'
-            AND activity_id IN ({ids_str})
-            AND parameter_value IS NOT NULL
-            AND parameter_value != ''
-        '''
-        df_field_time = pd.read_sql(query_field_time, engine)
+        df_ancho = get_metrics_wide(activity_ids, ['field_time'] + todas_metricas)
         
         # Filtrar solo partidos con más de 70 minutos
-        df_field_time_filtered = df_field_time[df_field_time['field_time'] >= MIN_FIELD_TIME].copy()
+        df_ancho = df_ancho[df_ancho['field_time'] >= MIN_FIELD_TIME]
         
         for metrica in todas_metricas:
-            # Construir consulta con IDs entrecomillados (son UUIDs/strings)
-            query_metricas = f'''
-                SELECT 
-                    aam.activity_id,
-                    aam.athlete_id,
-                    CAST(aam.parameter_value AS DECIMAL(10,2)) as valor
-                FROM activity_athlete_metrics aam
-                WHERE aam.parameter_name = '{metrica}'
-                AND aam.activity_id IN ({ids_str})
-                AND aam.parameter_value IS NOT NULL
-                AND aam.parameter_value != ''
-            '''
-            
-            df_metrica = pd.read_sql(query_metricas, engine)
+            df_metrica = df_ancho.loc[
+                df_ancho[metrica].notna(),
+                ['activity_id', 'athlete_id', metrica, 'field_time']
+            ].rename(columns={metrica: 'valor'})
             
             if df_metrica.empty:
                 continue
             
-            # Merge con field_time
-            df_metrica = df_metrica.merge(
-                df_field_time_filtered[['activity_id', 'athlete_id', 'field_time']],
-                on=['activity_id', 'athlete_id'],
-                how='inner'  # Solo mantener registros con field_time >= 70 mins
-            )
-            
-            
-            if df_metrica.empty:
-                continue
+            df_metrica[['valor', 'field_time']] = df_metrica[['valor', 'field_time']].astype('float64')
             
             # Estandarizar valores a 94 minutos (solo para métricas acumulativas)
             if metrica in metricas_estandarizables:
@@ -0,0 +1,136 @@
+# utils/consultas.py
+
+"""
+Capa mínima de consultas parametrizadas para los caminos calientes.
+
+- Parámetros con nombre (:athlete_id, :fecha_inicio...) enlazados por el driver,
+  nunca interpolados en el texto SQL (los IDs llegan de dropdowns)
+- Listas y tuplas se expanden automáticamente en IN :ids con bindparam(expanding=True)
+  (también se acepta IN (:ids): se reescribe a IN :ids)
+- Cada texto SQL se compila a un TextClause UNA vez por proceso y se reutiliza: el texto
+  es estable entre llamadas y SQLAlchemy reaprovecha su caché de sentencias compiladas
+- Un único punto donde medir el tiempo de cada consulta: se acumulan estadísticas por
+  nombre y se registran las consultas lentas
+
+Configuración desde .env:
+- SQL_LOG_LENTAS_MS (por defecto 500; 0 = registrar todas)
+"""
+
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+# {nombre: {'llamadas': int, 'total_ms': float, 'max_ms': float, 'filas': int}}
+_ESTADISTICAS = {}
+_ESTADISTICAS_LOCK = threading.Lock()
+
+
+def _umbral_lentas_ms():
+    try:
+        return float(os.getenv('SQL_LOG_LENTAS_MS', 500))
+    except (TypeError, ValueError):
+        return 500.0
+
+
+@lru_cache(maxsize=256)
+def _sentencia(sql, claves_expandibles):
+    """
+    TextClause reutilizable para un texto SQL y un conjunto de parámetros lista.
+    Los parámetros expandibles escritos como IN (:ids) se reescriben a IN :ids: SQLAlchemy
+    ya añade los paréntesis al expandir y IN ((...)) falla en MySQL y SQLite.
+    """
+    for clave in claves_expandibles:
+        sql = re.sub(rf'\(\s*:{clave}\s*\)', f':{clave}', sql)
+    stmt = text(sql)
+    if claves_expandibles:
+        stmt = stmt.bindparams(*[bindparam(clave, expanding=True) for clave in claves_expandibles])
+    return stmt
+
+
+def preparar_parametros(params):
+    """
+    Normaliza los parámetros: listas / sets / arrays pasan a tupla y se marcan como expandibles.
+
+    Returns:
+        (params, claves_expandibles) con claves_expandibles ordenadas (clave de caché estable)
+    """
+    if not params:
+        return {}, ()
+
+    normalizados = {}
+    expandibles = []
+    for clave, valor in params.items():
+        if isinstance(valor, (list, tuple, set, frozenset)) or getattr(valor, 'ndim', 0) == 1:
+            # numpy / pandas -> tipos Python nativos para el driver
+            valor = tuple(valor.tolist() if hasattr(valor, 'tolist') else valor)
+            expandibles.append(clave)
+        normalizados[clave] = valor
+    return normalizados, tuple(sorted(expandibles))
+
+
+def _registrar(nombre, ms, filas):
+    with _ESTADISTICAS_LOCK:
+        stats = _ESTADISTICAS.setdefault(nombre, {'llamadas': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'filas': 0})
+        stats['llamadas'] += 1
+        stats['total_ms'] += ms
+        stats['max_ms'] = max(stats['max_ms'], ms)
+        stats['filas'] += filas
+
+    umbral = _umbral_lentas_ms()
+    if ms >= umbral:
+        print(f"🐢 SQL lenta [{nombre}]: {ms:.0f} ms, {filas} filas")
+
+
+def ejecutar_consulta(sql, params=None, engine=None, nombre=None):
+    """
+    Ejecuta una consulta parametrizada y devuelve un DataFrame.
+
+    Args:
+        sql (str): SQL con parámetros con nombre (:param). Para listas: IN :ids o IN (:ids)
+        params (dict): valores de los parámetros; listas/tuplas se expanden en IN
+        engine: engine SQLAlchemy (None = BD principal)
+        nombre (str): etiqueta para el registro de tiempos (por defecto, inicio del SQL)
+
+    Returns:
+        DataFrame con el resultado. Las excepciones se propagan igual que con pd.read_sql.
+    """
+    if engine is None:
+        from utils.db_manager import get_db_connection
+        engine = get_db_connection()
+        if engine is None:
+            raise RuntimeError("No se pudo conectar a la base de datos")
+
+    valores, expandibles = preparar_parametros(params)
+    stmt = _sentencia(sql, expandibles)
+    nombre = nombre or ' '.join(sql.split())[:60]
+
+    inicio = time.perf_counter()
+    with engine.connect() as conn:
+        df = pd.read_sql(stmt, conn, params=valores)
+    _registrar(nombre, (time.perf_counter() - inicio) * 1000, len(df))
+    return df
+
+
+def get_estadisticas_consultas(reset=False):
+    """
+    Estadísticas acumuladas por consulta en este proceso.
+
+    Returns:
+        DataFrame con llamadas, total_ms, media_ms, max_ms y filas, ordenado por total_ms
+    """
+    with _ESTADISTICAS_LOCK:
+        datos = {nombre: dict(stats) for nombre, stats in _ESTADISTICAS.items()}
+        if reset:
+            _ESTADISTICAS.clear()
+
+    if not datos:
+        return pd.DataFrame(columns=['llamadas', 'total_ms', 'media_ms', 'max_ms', 'filas'])
+
+    df = pd.DataFrame.from_dict(datos, orient='index')
+    df['media_ms'] = df['total_ms'] / df['llamadas']
+    return df[['llamadas', 'total_ms', 'media_ms', 'max_ms', 'filas']].sort_values('total_ms', ascending=False)
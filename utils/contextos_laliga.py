@@ -0,0 +1,174 @@
+# utils/contextos_laliga.py
+
+"""
+Dataset en memoria de match_context_analysis (BD LaLiga) indexado por match_id.
+
+La matriz 2x2 de contextos, sus estadísticas, las de Tendencia de Resultados y los
+modales de detalle releían la tabla completa (con su inspección de existencia) en cada
+llamada, y la matriz viajaba entera al navegador en un dcc.Store solo para que el modal
+pudiera buscar un partido. Aquí se carga UNA vez por proceso, junto con los links de
+informes de laliga_matches (postpartido/evolutivo) en la misma consulta, y todas esas
+vistas se derivan en memoria.
+
+Versión: MAX(last_updated), COUNT(*) y número de links de informes. Como mucho cada
+CONTEXTOS_COMPROBACION_SEGUNDOS se comprueba y, si ha cambiado, se recarga todo.
+
+Configuración desde .env:
+- CONTEXTOS_COMPROBACION_SEGUNDOS (por defecto 60)
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+from utils.consultas import ejecutar_consulta
+from utils.db_engines import get_table_columns, table_exists
+
+TABLA_CONTEXTOS = 'match_context_analysis'
+COLUMNAS_CONTEXTO = [
+    'match_id', 'season_id', 'season_name', 'competition_id', 'competition_name',
+    'match_date', 'match_day_number', 'depor_team_name_matches', 'depor_team_name_teams',
+    'opponent_name', 'condicion', 'goles_favor', 'goles_contra', 'resultado', 'resultado_tipo',
+    'pct_ganando', 'pct_empatando', 'pct_perdiendo', 'contexto_preferente', 'contexto_tipo',
+    'etiqueta_contexto', 'interpretacion', 'process_date', 'last_updated'
+]
+COLUMNAS_LINKS = ['postpartido_link', 'evolutivo_link']
+
+# {'datos': DataFrame, 'por_partido': {match_id: dict}, 'version': tuple, 'comprobado': float}
+_DATASET = None
+_DATASET_LOCK = threading.Lock()
+
+
+def _intervalo_comprobacion():
+    try:
+        return int(os.getenv('CONTEXTOS_COMPROBACION_SEGUNDOS', 60))
+    except (TypeError, ValueError):
+        return 60
+
+
+def _con_links(engine):
+    return table_exists(engine, 'laliga_matches') and all(
+        c in get_table_columns(engine, 'laliga_matches') for c in COLUMNAS_LINKS
+    )
+
+
+def _version(engine, con_links):
+    links = ', '.join(f"COUNT(lm.{c}) AS {c}" for c in COLUMNAS_LINKS) if con_links else 'NULL AS links'
+    union = "LEFT JOIN laliga_matches lm ON lm.match_id = mca.match_id" if con_links else ''
+    df = ejecutar_consulta(
+        f"SELECT MAX(mca.last_updated) AS ultima, COUNT(*) AS filas, {links} "
+        f"FROM {TABLA_CONTEXTOS} mca {union}",
+        engine=engine, nombre='match_context_analysis_version'
+    )
+    return tuple(df.to_dict('records')[0].values())
+
+
+def _cargar(engine, con_links):
+    columnas = ', '.join(f"mca.{c}" for c in COLUMNAS_CONTEXTO)
+    if con_links:
+        columnas += ', ' + ', '.join(f"lm.{c}" for c in COLUMNAS_LINKS)
+        union = "LEFT JOIN laliga_matches lm ON lm.match_id = mca.match_id"
+    else:
+        union = ''
+    df = ejecutar_consulta(
+        f"SELECT {columnas} FROM {TABLA_CONTEXTOS} mca {union} "
+        f"ORDER BY mca.match_date ASC, mca.match_day_number ASC",
+        engine=engine, nombre='match_context_analysis_dataset'
+    )
+    for columna in COLUMNAS_LINKS:
+        if columna not in df.columns:
+            df[columna] = None
+        df[columna] = df[columna].astype(object).where(df[columna].notna(), None)
+    return df.reset_index(drop=True)
+
+
+def _construir_dataset(df, version):
+    return {
+        'datos': df,
+        'por_partido': {
+            registro['match_id']: registro
+            for registro in df.dropna(subset=['match_id']).to_dict('records')
+        },
+        'version': version,
+        'comprobado': time.time(),
+    }
+
+
+def get_dataset_contextos():
+    """
+    Dataset completo de contextos (compartido: NO modificar lo devuelto).
+    Si la comprobación falla se sigue sirviendo el último dataset cargado.
+
+    Returns:
+        dict con 'datos' (DataFrame ordenado por fecha y jornada) y 'por_partido'
+        ({match_id: registro con links}); None si nunca se pudo cargar
+    """
+    global _DATASET
+
+    dataset = _DATASET
+    if dataset is not None and time.time() - dataset['comprobado'] < _intervalo_comprobacion():
+        return dataset
+
+    with _DATASET_LOCK:
+        dataset = _DATASET
+        if dataset is not None and time.time() - dataset['comprobado'] < _intervalo_comprobacion():
+            return dataset
+
+        try:
+            from utils.db_manager import get_laliga_db_connection
+
+            engine = get_laliga_db_connection()
+            if engine is None or not table_exists(engine, TABLA_CONTEXTOS):
+                raise RuntimeError(f"No hay acceso a {TABLA_CONTEXTOS}")
+
+            con_links = _con_links(engine)
+            version = _version(engine, con_links)
+            if dataset is None or dataset['version'] != version:
+                df = _cargar(engine, con_links)
+                _DATASET = _construir_dataset(df, version)
+                print(f"📦 Contextos de partidos: {len(df)} filas, versión {version}")
+            else:
+                _DATASET = {**dataset, 'comprobado': time.time()}
+        except Exception as e:
+            print(f"Error cargando contextos de partidos: {e}")
+            if dataset is None:
+                return None
+            _DATASET = {**dataset, 'comprobado': time.time()}
+
+    return _DATASET
+
+
+def consultar_contextos(team_name=None, competition_id=None, season_id=None):
+    """
+    Partidos del dataset filtrados por equipo, competición y/o temporada.
+
+    Returns:
+        DataFrame (copia) con COLUMNAS_CONTEXTO ordenado por fecha y jornada (vacío si no hay datos)
+    """
+    dataset = get_dataset_contextos()
+    if dataset is None:
+        return pd.DataFrame()
+    df = dataset['datos']
+    mascara = pd.Series(True, index=df.index)
+    if team_name is not None:
+        mascara &= df['depor_team_name_teams'] == team_name
+    if competition_id:
+        mascara &= df['competition_id'].astype(str) == str(competition_id)
+    if season_id:
+        mascara &= df['season_id'].astype(str) == str(season_id)
+    return df.loc[mascara, COLUMNAS_CONTEXTO].reset_index(drop=True)
+
+
+def get_partido_contexto(match_id):
+    """
+    Registro de un partido por match_id (incluye postpartido_link y evolutivo_link).
+
+    Returns:
+        dict (compartido: NO modificar) o None si no está en el dataset
+    """
+    dataset = get_dataset_contextos()
+    if dataset is None:
+        return None
+    return dataset['por_partido'].get(match_id)
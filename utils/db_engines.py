@@ -0,0 +1,289 @@
+# utils/db_engines.py
+
+"""
+Registro de engines SQLAlchemy compartidos por todo el proceso.
+
+Cada base de datos (principal, LaLiga, soccersystem) tiene UN engine con pool de
+conexiones que se crea la primera vez que se pide y se reutiliza en las llamadas
+siguientes. Así evitamos crear un pool nuevo, abrir una conexión de prueba e
+inspeccionar el esquema en cada consulta.
+
+Parámetros del pool configurables desde .env:
+- DB_POOL_SIZE (por defecto 5)
+- DB_MAX_OVERFLOW (por defecto 10)
+- DB_POOL_RECYCLE (segundos, por defecto 1800)
+- DB_POOL_TIMEOUT (segundos, por defecto 30)
+- DB_POOL_PRE_PING (1/0, por defecto 1)
+- DB_CONNECT_TIMEOUT (segundos, por defecto 10)
+- DB_READ_TIMEOUT (segundos, por defecto 300): sin él pymysql espera indefinidamente y
+  una consulta colgada bloquea su hilo para siempre
+- DB_WRITE_TIMEOUT (segundos, por defecto 60): envío de la consulta al servidor
+- DB_ENGINE_FALLO_SEGUNDOS (por defecto 10): tras un fallo al crear un engine, durante
+  este tiempo se devuelve el error sin reintentar la conexión
+
+También mantiene una caché de metadatos de esquema (tablas y columnas) por engine,
+con caducidad DB_SCHEMA_CACHE_TTL (segundos, por defecto 3600) e invalidación explícita.
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, inspect, text
+
+# {nombre: {'engine': Engine, 'url': str, 'pid': int}}
+_ENGINES = {}
+# Protege solo los diccionarios; la creación y la conexión de prueba van con el lock del nombre
+_ENGINES_LOCK = threading.Lock()
+# {nombre: Lock} para que una BD caída no bloquee la creación de los demás engines
+_NOMBRE_LOCKS = {}
+# {nombre: {'url': str, 'pid': int, 'hasta': float, 'error': Exception}}
+_FALLOS = {}
+
+
+def _env_int(key, default):
+    try:
+        return int(os.getenv(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_pool_config():
+    """
+    Devuelve los parámetros del pool leídos del entorno.
+    """
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') not in ('0', 'false', 'False'),
+        # Timeouts del driver (pymysql)
+        'connect_args': {
+            'connect_timeout': _env_int('DB_CONNECT_TIMEOUT', 10),
+            'read_timeout': _env_int('DB_READ_TIMEOUT', 300),
+            'write_timeout': _env_int('DB_WRITE_TIMEOUT', 60),
+        },
+    }
+
+
+def get_engine(name, db_url):
+    """
+    Devuelve el engine registrado con 'name', creándolo si no existe.
+
+    La primera vez se abre una conexión de prueba; si falla no se registra nada
+    y se propaga la excepción para que el llamador decida (normalmente devolver None).
+    El fallo se recuerda DB_ENGINE_FALLO_SEGUNDOS: mientras tanto se propaga sin esperar
+    otro timeout de conexión. Cada nombre se crea con su propio lock.
+    Si el proceso ha hecho fork (workers de gunicorn) se descarta el pool heredado
+    y se crea uno propio para el worker.
+
+    Args:
+        name (str): Nombre lógico del engine ('main', 'laliga', 'soccer', ...)
+        db_url (str): URL SQLAlchemy de la base de datos
+
+    Returns:
+        Engine de SQLAlchemy compartido
+    """
+    pid = os.getpid()
+    entry = _ENGINES.get(name)
+    if entry is not None and entry['url'] == db_url and entry['pid'] == pid:
+        return entry['engine']
+
+    _comprobar_fallo_reciente(name, db_url, pid)
+
+    with _ENGINES_LOCK:
+        lock = _NOMBRE_LOCKS.setdefault(name, threading.Lock())
+
+    with lock:
+        entry = _ENGINES.get(name)
+        if entry is not None and entry['url'] == db_url and entry['pid'] == pid:
+            return entry['engine']
+        _comprobar_fallo_reciente(name, db_url, pid)
+
+        if entry is not None:
+            # Pool heredado de otro proceso o URL cambiada: no cerrar sockets del padre
+            entry['engine'].dispose(close=entry['pid'] == pid)
+
+        try:
+            engine = create_engine(db_url, **get_pool_config())
+            # Probar la conexión una sola vez al crear el engine
+            with engine.connect():
+                pass
+        except Exception as e:
+            with _ENGINES_LOCK:
+                _FALLOS[name] = {'url': db_url, 'pid': pid, 'hasta': time.time() + _segundos_fallo(), 'error': e}
+            raise
+
+        with _ENGINES_LOCK:
+            _ENGINES[name] = {'engine': engine, 'url': db_url, 'pid': pid}
+            _FALLOS.pop(name, None)
+        return engine
+
+
+def _segundos_fallo():
+    return _env_int('DB_ENGINE_FALLO_SEGUNDOS', 10)
+
+
+def _comprobar_fallo_reciente(name, db_url, pid):
+    """
+    Propaga de nuevo el último fallo de creación de 'name' si sigue vigente.
+    """
+    fallo = _FALLOS.get(name)
+    if fallo is not None and fallo['url'] == db_url and fallo['pid'] == pid and time.time() < fallo['hasta']:
+        raise RuntimeError(f"Engine '{name}' no disponible (fallo reciente): {fallo['error']}")
+
+
+def dispose_engine(name):
+    """
+    Cierra el pool del engine 'name' y lo elimina del registro.
+    """
+    with _ENGINES_LOCK:
+        entry = _ENGINES.pop(name, None)
+        _FALLOS.pop(name, None)
+    if entry is not None:
+        entry['engine'].dispose(close=entry['pid'] == os.getpid())
+
+
+def dispose_all_engines():
+    """
+    Cierra todos los pools registrados (p.ej. en el hook post_fork de gunicorn).
+    """
+    for name in list(_ENGINES.keys()):
+        dispose_engine(name)
+
+
+def check_engine_health(name):
+    """
+    Health-check barato: ejecuta SELECT 1 sobre una conexión del pool.
+
+    Returns:
+        dict con 'name', 'ok', 'latency_ms' y 'error' (si lo hay)
+    """
+    entry = _ENGINES.get(name)
+    if entry is None:
+        return {'name': name, 'ok': False, 'latency_ms': None, 'error': 'engine no inicializado'}
+
+    inicio = time.perf_counter()
+    try:
+        with entry['engine'].connect() as conn:
+            conn.execute(text('SELECT 1'))
+        latency_ms = round((time.perf_counter() - inicio) * 1000, 1)
+        return {'name': name, 'ok': True, 'latency_ms': latency_ms, 'error': None}
+    except Exception as e:
+        return {'name': name, 'ok': False, 'latency_ms': None, 'error': str(e)}
+
+
+def check_all_engines_health():
+    """
+    Ejecuta check_engine_health sobre todos los engines registrados.
+
+    Returns:
+        dict {nombre: resultado del health-check}
+    """
+    return {name: check_engine_health(name) for name in list(_ENGINES.keys())}
+
+
+def get_pool_status():
+    """
+    Devuelve el estado textual de cada pool (conexiones en uso, overflow...).
+    """
+    return {name: entry['engine'].pool.status() for name, entry in list(_ENGINES.items())}
+
+
+# --------------------------------------
+# CACHÉ DE METADATOS DE ESQUEMA
+# --------------------------------------
+
+# Tiempo de vida de la caché de esquema (segundos). 0 = sin caducidad.
+SCHEMA_CACHE_TTL = _env_int('DB_SCHEMA_CACHE_TTL', 3600)
+
+# {clave_engine: {'loaded_at': float, 'tables': set, 'columns': {tabla: [cols]},
+#                 'aliases': {(tabla, candidatos): columna}}}
+_SCHEMA_CACHE = {}
+_SCHEMA_LOCK = threading.Lock()
+
+
+def _schema_key(engine):
+    return engine.url.render_as_string(hide_password=True)
+
+
+def _schema_entry(engine):
+    """
+    Devuelve la entrada de caché de esquema del engine, cargando la lista de
+    tablas si no existe o si ha caducado por TTL.
+    """
+    key = _schema_key(engine)
+    entry = _SCHEMA_CACHE.get(key)
+    if entry is not None and (SCHEMA_CACHE_TTL <= 0 or time.time() - entry['loaded_at'] < SCHEMA_CACHE_TTL):
+        return entry
+
+    with _SCHEMA_LOCK:
+        entry = _SCHEMA_CACHE.get(key)
+        if entry is not None and (SCHEMA_CACHE_TTL <= 0 or time.time() - entry['loaded_at'] < SCHEMA_CACHE_TTL):
+            return entry
+        tables = set(inspect(engine).get_table_names())
+        entry = {'loaded_at': time.time(), 'tables': tables, 'columns': {}, 'aliases': {}}
+        _SCHEMA_CACHE[key] = entry
+        return entry
+
+
+def get_table_names(engine):
+    """
+    Lista de tablas del engine, servida desde la caché de esquema.
+    """
+    return set(_schema_entry(engine)['tables'])
+
+
+def table_exists(engine, table_name):
+    """
+    True si la tabla existe (consulta la caché, no la BD, salvo en la primera carga).
+    """
+    return table_name in _schema_entry(engine)['tables']
+
+
+def get_table_columns(engine, table_name):
+    """
+    Lista de columnas de una tabla, cacheada por tabla.
+
+    Returns:
+        list con los nombres de columna ([] si la tabla no existe)
+    """
+    entry = _schema_entry(engine)
+    if table_name not in entry['tables']:
+        return []
+    cols = entry['columns'].get(table_name)
+    if cols is None:
+        cols = [c['name'] for c in inspect(engine).get_columns(table_name)]
+        entry['columns'][table_name] = cols
+    return list(cols)
+
+
+def find_table_column(engine, table_name, candidates):
+    """
+    Primer candidato que exista como columna de la tabla. Se resuelve una vez por
+    (tabla, candidatos) y se guarda en la caché de esquema (caduca e invalida con ella).
+
+    Returns:
+        nombre de columna o None
+    """
+    entry = _schema_entry(engine)
+    clave = (table_name, tuple(candidates))
+    if clave in entry['aliases']:
+        return entry['aliases'][clave]
+
+    cols = set(get_table_columns(engine, table_name))
+    columna = next((c for c in candidates if c in cols), None)
+    entry['aliases'][clave] = columna
+    return columna
+
+
+def invalidate_schema_cache(engine=None):
+    """
+    Invalida la caché de esquema de un engine (o de todos si engine es None).
+    """
+    with _SCHEMA_LOCK:
+        if engine is None:
+            _SCHEMA_CACHE.clear()
+        else:
+            _SCHEMA_CACHE.pop(_schema_key(engine), None)
@@ -2,20 +2,31 @@
 
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import text
 import os
+import time
 from dotenv import load_dotenv
 import sys
 import traceback
 from datetime import datetime, timedelta
 
+from utils.db_engines import get_engine, table_exists, get_table_columns
+from utils.tags_actividades import DAYCODE_TAG_TYPE_ID, extraer_grupo_dia, extraer_participacion
+from utils.microciclos import segmentar_microciclos
+from utils.historico_medico import get_almacen_medico
+from utils.indicadores_laliga import get_cubo_indicadores, consultar_indicadores
+from utils.contextos_laliga import consultar_contextos, get_partido_contexto
+from utils.consultas import ejecutar_consulta
+from utils.result_cache import get_or_compute, make_key
+
 # Cargar variables de entorno para las credenciales de la base de datos
 load_dotenv()
 
 # Función para obtener la conexión a la base de datos
 def get_db_connection():
     """
-    Crea y retorna una conexión a la base de datos usando SQLAlchemy.
+    Retorna el engine compartido (con pool) de la base de datos principal.
+    El engine se crea una sola vez por proceso; ver utils/db_engines.py.
     """
     # Configuración de credenciales desde el archivo .env
     DB_CONFIG = {
@@ -29,21 +40,7 @@ def get_db_connection():
     db_url = f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}/{DB_CONFIG['database']}"
     
     try:
-        # Crear y devolver el motor de SQLAlchemy
-        
-        engine = create_engine(db_url)
-        
-        # Probar la conexión
-        connection = engine.connect()
-        
-        
-        # Mostrar las tablas disponibles
-        inspector = inspect(engine)
-        tables = inspector.get_table_names()
-        
-        
-        connection.close()
-        return engine
+        return get_engine('main', db_url)
     except Exception as e:
         
         return None
@@ -63,19 +60,14 @@ def get_all_athletes():
             
             return pd.DataFrame(columns=['id', 'first_name', 'last_name'])
         
-        # Verificar las tablas disponibles antes de la consulta
-        inspector = inspect(engine)
-        tables = inspector.get_table_names()
-        
-        
-        # Verificar si la tabla 'athletes' existe
-        if 'athletes' not in tables:
+        # Verificar si la tabla 'athletes' existe (caché de esquema)
+        if not table_exists(engine, 'athletes'):
             
             # Posibles tablas que contienen jugadores (athlete/player/jugador)
             return pd.DataFrame(columns=['id', 'first_name', 'last_name'])
         
         # Verificar las columnas de la tabla 'athletes'
-        columns = [c['name'] for c in inspector.get_columns('athletes')]
+        columns = get_table_columns(engine, 'athletes')
         
         
         query = """
@@ -126,13 +118,12 @@ def get_athlete_activities(athlete_id):
             return pd.DataFrame(columns=['id', 'activity_id'])
             
         # Verificar si la tabla existe
-        inspector = inspect(engine)
-        if 'simple_activity_participation' not in inspector.get_table_names():
+        if not table_exists(engine, 'simple_activity_participation'):
             
             return pd.DataFrame(columns=['id', 'activity_id'])
             
         # Verificar las columnas de la tabla
-        columns = [c['name'] for c in inspector.get_columns('simple_activity_participation')]
+        columns = get_table_columns(engine, 'simple_activity_participation')
         
         
         # Verificar si athlete_id está en las columnas
@@ -274,7 +265,7 @@ def get_participants_for_activities(activity_ids, include_participation_tags=Fal
         
         # Si se solicitan tags de participación, parsear tags_json
         if include_participation_tags and not df.empty and 'tags_json' in df.columns:
-            df['participation_type'] = df['tags_json'].apply(_extract_participation_tag)
+            df['participation_type'] = extraer_participacion(df['tags_json'])
             df = df.drop(columns=['tags_json'])
         
         return df
@@ -285,26 +276,6 @@ def get_participants_for_activities(activity_ids, include_participation_tags=Fal
             cols.append("participation_type")
         return pd.DataFrame(columns=cols)
 
-def _extract_participation_tag(tags_json_str):
-    """
-    Extrae el tag de participación del JSON de tags.
-    Busca tags con tag_type_name == 'Participation'
-    Retorna: 'Full', 'Part', 'Rehab', o None
-    """
-    import json
-    
-    if pd.isna(tags_json_str) or tags_json_str == '' or tags_json_str is None:
-        return None  # Sin tag = consideramos Full por defecto
-    
-    try:
-        tags = json.loads(tags_json_str)
-        for tag in tags:
-            if tag.get('tag_type_name') == 'Participation' or tag.get('tag_type_id') == '09fd58ee-3477-11ef-8148-06e64249fcaf':
-                return tag.get('name')  # 'Full', 'Part', 'Rehab'
-        return None  # Sin tag de participación = Full por defecto
-    except:
-        return None
-
 # Cache para días de referencia (evitar consultas repetidas)
 _DIAS_REF_CACHE = None
 
@@ -314,10 +285,7 @@ def add_grupo_dia_column(actividades_df):
     Ignora los demás tag_type_id (GPS, Injected, etc).
     Normaliza las etiquetas 'Game -X' a 'MD-X' para unificar nomenclatura.
     """
-    import json
-    import re
     global _DIAS_REF_CACHE
-    DAYCODE_TAG_TYPE_ID = '09bdd0ac-3477-11ef-8148-06e64249fcaf'
     try:
         engine = get_db_connection()
         if engine is None or actividades_df.empty or 'tag_list_json' not in actividades_df.columns:
@@ -326,53 +294,14 @@ def add_grupo_dia_column(actividades_df):
         
         # Optimización: Cachear días de referencia para no consultar cada vez
         if _DIAS_REF_CACHE is None:
-            tags_df = pd.read_sql(f"SELECT DISTINCT name FROM activity_tags WHERE tag_type_id = '{DAYCODE_TAG_TYPE_ID}'", engine)
+            tags_df = pd.read_sql(
+                "SELECT DISTINCT name FROM activity_tags WHERE tag_type_id = %s",
+                engine, params=(DAYCODE_TAG_TYPE_ID,)
+            )
             _DIAS_REF_CACHE = set(tags_df['name'].dropna().tolist())
         
-        dias_ref = _DIAS_REF_CACHE
-        # Función para extraer el grupo_dia de tag_list_json SOLO si tag_type_id es el de DayCode
-        def extraer_grupo_dia(tag_json_str):
-            try:
-                tags = json.loads(tag_json_str)
-                for tag in tags:
-                    if tag.get('tag_type_id') == DAYCODE_TAG_TYPE_ID and tag.get('name') in dias_ref:
-                        return tag['name']
-                return 'Sin clasificar'
-            except Exception:
-                return 'Sin clasificar'
-                
-        # Aplicar la extracción
-        actividades_df['grupo_dia'] = actividades_df['tag_list_json'].apply(extraer_grupo_dia)
-        
-        # Función para normalizar los valores de grupo_dia (Game -X -> MD-X)
-        def normalizar_grupo_dia(valor):
-            # Caso base: ya es Sin clasificar
-            if valor == 'Sin clasificar':
-                return valor
-                
-            # Normalizar 'Game -X' a 'MD-X'
-            game_pattern = r'Game\s+-\s*(\d+)'
-            match = re.search(game_pattern, valor)
-            if match:
-                numero = match.group(1)
-                return f'MD-{numero}'  # Formato unificado sin espacios
-                
-            # Normalizar 'MD -X' a 'MD-X' (eliminar espacio)
-            md_pattern = r'MD\s+-\s*(\d+)'
-            match = re.search(md_pattern, valor)
-            if match:
-                numero = match.group(1)
-                return f'MD-{numero}'  # Formato unificado sin espacios
-                
-            # Para otros valores como MD o Game (sin número)
-            if valor == 'Game':
-                return 'MD'
-                
-            # Para otros formatos no reconocidos, mantener el valor original
-            return valor
-        
-        # Aplicar la normalización
-        actividades_df['grupo_dia'] = actividades_df['grupo_dia'].apply(normalizar_grupo_dia)
+        # Parseo memoizado por cadena JSON distinta + normalización (Game -X -> MD-X)
+        actividades_df['grupo_dia'] = extraer_grupo_dia(actividades_df['tag_list_json'], _DIAS_REF_CACHE)
         
         return actividades_df
     except Exception as e:
@@ -380,35 +309,85 @@ def add_grupo_dia_column(actividades_df):
         actividades_df['grupo_dia'] = 'Sin clasificar'
         return actividades_df
 
-def get_metrics_for_activities_and_athletes(activity_ids, athlete_ids, parameter_name):
+def get_metrics_wide(activity_ids, parameter_names, athlete_ids=None, dtype='float32', chunksize=50000):
     """
-    Devuelve las métricas para cada combinación de actividad y atleta.
+    Carga varias métricas de activity_athlete_metrics en UNA sola query parametrizada
+    y las pivota a formato ancho: una fila por (activity_id, athlete_id) y una columna
+    por métrica. La lectura se hace en streaming por bloques para no materializar
+    todo el formato largo en memoria.
     Args:
         activity_ids (list): lista de activity_id
-        athlete_ids (list): lista de athlete_id
-        parameter_name (str): métrica a consultar
+        parameter_names (list): métricas a consultar (p.ej. ['field_time', 'total_distance'])
+        athlete_ids (list|None): lista de athlete_id (None = todos los atletas)
+        dtype (str): tipo de las columnas de métricas ('float32' por defecto)
+        chunksize (int): filas por bloque de lectura
     Returns:
-        DataFrame con columnas: activity_id, athlete_id, parameter_value
+        DataFrame con columnas: activity_id, athlete_id, <una columna por métrica>
     """
+    parameter_names = list(parameter_names)
+    columnas = ["activity_id", "athlete_id"] + parameter_names
     try:
         engine = get_db_connection()
-        if engine is None or not activity_ids or not athlete_ids:
-            return pd.DataFrame(columns=["activity_id", "athlete_id", "parameter_value"])
+        if engine is None or not activity_ids or not parameter_names:
+            return pd.DataFrame(columns=columnas)
+        if athlete_ids is not None and len(athlete_ids) == 0:
+            return pd.DataFrame(columns=columnas)
         
-        # Optimización: Usar índices y filtrar primero por parameter_name (más selectivo)
-        # Convertir a CAST para asegurar tipo numérico en parameter_value
         query = '''
-            SELECT activity_id, athlete_id, CAST(parameter_value AS DECIMAL(10,2)) as parameter_value
+            SELECT activity_id, athlete_id, parameter_name, parameter_value
             FROM activity_athlete_metrics
-            WHERE parameter_name = %s 
-            AND activity_id IN %s 
-            AND athlete_id IN %s
+            WHERE parameter_name IN %s
+            AND activity_id IN %s
         '''
-        df = pd.read_sql(query, engine, params=(parameter_name, tuple(activity_ids), tuple(athlete_ids)))
-        return df
+        params = [tuple(parameter_names), tuple(activity_ids)]
+        if athlete_ids is not None:
+            query += " AND athlete_id IN %s"
+            params.append(tuple(athlete_ids))
+        query += " AND parameter_value IS NOT NULL AND parameter_value != ''"
+        
+        # Pivotar cada bloque según llega (cursor de servidor con stream_results)
+        bloques = []
+        with engine.connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql(query, conn, params=tuple(params), chunksize=chunksize):
+                chunk['parameter_value'] = pd.to_numeric(chunk['parameter_value'], errors='coerce')
+                bloques.append(chunk.pivot_table(
+                    index=['activity_id', 'athlete_id'],
+                    columns='parameter_name',
+                    values='parameter_value',
+                    aggfunc='first'
+                ))
+        
+        if not bloques:
+            return pd.DataFrame(columns=columnas)
+        
+        ancho = pd.concat(bloques)
+        if len(bloques) > 1:
+            # Un mismo (actividad, atleta) puede quedar repartido entre bloques
+            ancho = ancho.groupby(level=[0, 1]).first()
+        
+        ancho = ancho.reindex(columns=parameter_names).astype(dtype).reset_index()
+        ancho.columns.name = None
+        return ancho
     except Exception as e:
-        
+        print(f"Error getting metrics: {e}")
+        return pd.DataFrame(columns=columnas)
+
+def get_metrics_for_activities_and_athletes(activity_ids, athlete_ids, parameter_name):
+    """
+    Devuelve las métricas para cada combinación de actividad y atleta.
+    Args:
+        activity_ids (list): lista de activity_id
+        athlete_ids (list): lista de athlete_id
+        parameter_name (str): métrica a consultar
+    Returns:
+        DataFrame con columnas: activity_id, athlete_id, parameter_value
+    """
+    if not activity_ids or not athlete_ids:
         return pd.DataFrame(columns=["activity_id", "athlete_id", "parameter_value"])
+    
+    df = get_metrics_wide(activity_ids, [parameter_name], athlete_ids)
+    df = df.rename(columns={parameter_name: 'parameter_value'})
+    return df.dropna(subset=['parameter_value']).reset_index(drop=True)
 
 def get_field_time_for_activities(activity_ids, athlete_ids):
     """
@@ -419,28 +398,11 @@ def get_field_time_for_activities(activity_ids, athlete_ids):
     Returns:
         DataFrame con columnas: activity_id, athlete_id, field_time (en segundos)
     """
-    try:
-        engine = get_db_connection()
-        if engine is None or not activity_ids or not athlete_ids:
-            return pd.DataFrame(columns=["activity_id", "athlete_id", "field_time"])
-        
-        query = '''
-            SELECT 
-                activity_id, 
-                athlete_id, 
-                CAST(parameter_value AS DECIMAL(10,2)) as field_time
-            FROM activity_athlete_metrics
-            WHERE parameter_name = 'field_time'
-            AND activity_id IN %s 
-            AND athlete_id IN %s
-            AND parameter_value IS NOT NULL
-            AND parameter_value != ''
-        '''
-        df = pd.read_sql(query, engine, params=(tuple(activity_ids), tuple(athlete_ids)))
-        return df
-    except Exception as e:
-        print(f"Error getting field_time: {e}")
+    if not activity_ids or not athlete_ids:
         return pd.DataFrame(columns=["activity_id", "athlete_id", "field_time"])
+    
+    df = get_metrics_wide(activity_ids, ['field_time'], athlete_ids)
+    return df.dropna(subset=['field_time']).reset_index(drop=True)
 
 # Función para obtener los parámetros disponibles
 def get_available_parameters():
@@ -487,12 +449,12 @@ def get_variable_thresholds(variable_name):
         db_variable_name = variable_mappings.get(variable_name, variable_name)
         
         # Consultar umbrales para esta variable
-        query = f"""SELECT dia, max_value, min_value 
+        query = """SELECT dia, max_value, min_value 
                    FROM umbrales 
-                   WHERE variable = '{db_variable_name}'
+                   WHERE variable = %s
                    ORDER BY FIELD(dia, 'MD-4', 'MD-3', 'MD-2', 'MD-1', 'MD')"""
         
-        df = pd.read_sql(query, engine)
+        df = pd.read_sql(query, engine, params=(db_variable_name,))
         return df
         
     except Exception as e:
@@ -507,7 +469,7 @@ def get_variable_thresholds(variable_name):
 
 def get_laliga_db_connection():
     """
-    Crea y retorna una conexión a la base de datos LaLiga.
+    Retorna el engine compartido (con pool) de la base de datos LaLiga.
     """
     # Asegurar que las variables de entorno están cargadas
     load_dotenv()
@@ -529,16 +491,42 @@ def get_laliga_db_connection():
     db_url = f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}/{DB_CONFIG['database']}"
     
     try:
-        engine = create_engine(db_url)
-        # Probar la conexión
-        with engine.connect() as conn:
-            pass
-        return engine
+        return get_engine('laliga', db_url)
     except Exception as e:
         print(f"Error conectando a LaLiga: {e}")
         print(f"URL de conexión (sin credenciales): mysql+pymysql://*:*@{DB_CONFIG['host']}/{DB_CONFIG['database']}")
         return None
 
+def _valor_sql_texto(valor):
+    """
+    Texto de un valor numérico como lo devuelve CONCAT() en MySQL (3.0 -> '3', Decimal tal cual).
+    """
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+def _formato_indicadores(df):
+    """
+    Filas del cubo -> formato estándar (team_name, metrica, valor, ranking), ordenadas
+    por categoría y métrica como en la consulta original.
+    """
+    df = df.sort_values(['metric_category', 'metric_name'], kind='stable')
+    unidad = df['metric_unit'].where(df['metric_unit'].notna() & (df['metric_unit'] != 'Unknown'))
+    # Mismo texto que CONCAT(metric_value, ' ', metric_unit) en SQL
+    df = pd.DataFrame({
+        'team_name': df['team_name'].to_numpy(),
+        'metrica': df['metric_name'].to_numpy(),
+        'valor': [
+            None if pd.isna(v) else _valor_sql_texto(v) + ('' if pd.isna(u) else f' {u}')
+            for v, u in zip(df['metric_value'], unidad)
+        ],
+        'ranking': df['ranking_position'].to_numpy()
+    })
+    
+    # Limpieza de datos
+    df['ranking'] = pd.to_numeric(df['ranking'], errors='coerce').astype('Int64')
+    return df.dropna(subset=['metrica', 'ranking'])
+
 def get_indicadores_rendimiento_laliga(team_name="RC Deportivo"):
     """
     Obtiene los indicadores de rendimiento desde la base de datos LaLiga para un equipo específico.
@@ -551,44 +539,39 @@ def get_indicadores_rendimiento_laliga(team_name="RC Deportivo"):
         DataFrame con columnas: metrica, valor, ranking
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return pd.DataFrame(columns=['metrica', 'valor', 'ranking'])
-        
-        # Verificar si la tabla existe
-        inspector = inspect(engine)
-        if 'indicadores_rendimiento' not in inspector.get_table_names():
+        # Datos del equipo desde el cubo de indicadores en memoria
+        df = consultar_indicadores(team_name=team_name)
+        if df.empty:
             return pd.DataFrame(columns=['metrica', 'valor', 'ranking'])
         
-        # Consulta para obtener datos del equipo en formato estándar
-        query = """
-        SELECT 
-            metric_name as metrica,
-            CONCAT(metric_value, 
-                   CASE 
-                       WHEN metric_unit IS NOT NULL AND metric_unit != 'Unknown' 
-                       THEN CONCAT(' ', metric_unit)
-                       ELSE ''
-                   END) as valor,
-            ranking_position as ranking
-        FROM indicadores_rendimiento 
-        WHERE team_name = %s
-        ORDER BY metric_category, metric_name
-        """
-        
-        df = pd.read_sql(query, engine, params=(team_name,))
-        
-        if not df.empty:
-            # Limpieza de datos
-            df['ranking'] = pd.to_numeric(df['ranking'], errors='coerce').astype('Int64')
-            df = df.dropna(subset=['metrica', 'ranking'])
-        
-        return df
+        return _formato_indicadores(df).drop(columns='team_name')
         
     except Exception as e:
         pass
         return pd.DataFrame(columns=['metrica', 'valor', 'ranking'])
 
+def get_indicadores_rendimiento_todos_laliga():
+    """
+    Indicadores de rendimiento de TODOS los equipos en una sola pasada sobre el cubo.
+    
+    Returns:
+        dict: {team_name: DataFrame(metrica, valor, ranking)} (vacío si no hay datos)
+    """
+    try:
+        df = get_cubo_indicadores()
+        if df.empty:
+            return {}
+        
+        df = _formato_indicadores(df)
+        return {
+            team: grupo.drop(columns='team_name').reset_index(drop=True)
+            for team, grupo in df.groupby('team_name', sort=False)
+        }
+        
+    except Exception as e:
+        print(f"Error obteniendo indicadores de todos los equipos: {e}")
+        return {}
+
 def get_available_teams_laliga():
     """
     Obtiene la lista de equipos disponibles en la tabla indicadores_rendimiento de LaLiga.
@@ -597,18 +580,8 @@ def get_available_teams_laliga():
         list: Lista de nombres de equipos únicos
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return []
-        
-        # Verificar si la tabla existe
-        inspector = inspect(engine)
-        if 'indicadores_rendimiento' not in inspector.get_table_names():
-            return []
-        
-        query = "SELECT DISTINCT team_name FROM indicadores_rendimiento ORDER BY team_name"
-        df = pd.read_sql(query, engine)
-        teams = df['team_name'].tolist()
+        df = get_cubo_indicadores()
+        teams = sorted(df['team_name'].dropna().unique().tolist())
         print(f"Equipos disponibles: {teams}")
         return teams
         
@@ -627,24 +600,9 @@ def get_available_metrics_laliga(team_name="RC Deportivo"):
         list: Lista de métricas disponibles para el equipo
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return []
-        
-        # Verificar si la tabla existe
-        inspector = inspect(engine)
-        if 'indicadores_rendimiento' not in inspector.get_table_names():
-            return []
-        
         # Obtener los nombres de métricas únicos para el equipo
-        query = """
-        SELECT DISTINCT metric_name 
-        FROM indicadores_rendimiento 
-        WHERE team_name = %s 
-        ORDER BY metric_name
-        """
-        df = pd.read_sql(query, engine, params=(team_name,))
-        metrics = df['metric_name'].tolist()
+        df = consultar_indicadores(team_name=team_name)
+        metrics = sorted(df['metric_name'].dropna().unique().tolist())
         
         print(f"Métricas disponibles para {team_name}: {len(metrics)} métricas")
         return metrics
@@ -664,24 +622,13 @@ def get_metrics_by_category_laliga(team_name="RC Deportivo"):
         dict: Diccionario con categorías como claves y listas de métricas como valores
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return {}
-        
-        query = """
-        SELECT 
-            metric_category,
-            metric_name,
-            ranking_position
-        FROM indicadores_rendimiento 
-        WHERE team_name = %s 
-        ORDER BY metric_category, metric_name
-        """
-        df = pd.read_sql(query, engine, params=(team_name,))
+        df = consultar_indicadores(team_name=team_name)
         
         if df.empty:
             return {}
         
+        df = df.sort_values(['metric_category', 'metric_name'], kind='stable')
+        
         # Agrupar por categoría
         categories = {}
         for category in df['metric_category'].unique():
@@ -705,30 +652,19 @@ def get_all_teams_ranking_by_metric_laliga(metric_name):
         dict: Diccionario con ranking_position como clave y team_name como valor
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return {}
-        
-        query = """
-        SELECT 
-            team_name,
-            ranking_position,
-            metric_value
-        FROM indicadores_rendimiento 
-        WHERE metric_name = %s 
-        ORDER BY ranking_position
-        """
-        df = pd.read_sql(query, engine, params=(metric_name,))
+        df = consultar_indicadores(metric_names=[metric_name])
         
         if df.empty:
             return {}
         
+        df = df.sort_values('ranking_position', kind='stable')
+        
         # Crear diccionario ranking -> equipo
         ranking_dict = {}
-        for _, row in df.iterrows():
-            ranking_dict[int(row['ranking_position'])] = {
-                'team': row['team_name'],
-                'value': row['metric_value']
+        for row in df.itertuples(index=False):
+            ranking_dict[int(row.ranking_position)] = {
+                'team': row.team_name,
+                'value': row.metric_value
             }
         
         return ranking_dict
@@ -748,40 +684,19 @@ def get_all_teams_rankings_laliga(metric_names):
         dict: Diccionario anidado {metric_name: {ranking: {team, value}}}
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return {}
-        
-        # Crear placeholders para la consulta IN
-        placeholders = ','.join(['%s'] * len(metric_names))
-        query = f"""
-        SELECT 
-            metric_name,
-            team_name,
-            ranking_position,
-            metric_value
-        FROM indicadores_rendimiento 
-        WHERE metric_name IN ({placeholders})
-        ORDER BY metric_name, ranking_position
-        """
-        
-        df = pd.read_sql(query, engine, params=tuple(metric_names))
+        df = consultar_indicadores(metric_names=metric_names)
         
         if df.empty:
             return {}
         
+        df = df.sort_values(['metric_name', 'ranking_position'], kind='stable')
+        
         # Crear diccionario anidado
         rankings_dict = {}
-        for _, row in df.iterrows():
-            metric = row['metric_name']
-            ranking = int(row['ranking_position'])
-            
-            if metric not in rankings_dict:
-                rankings_dict[metric] = {}
-            
-            rankings_dict[metric][ranking] = {
-                'team': row['team_name'],
-                'value': row['metric_value']
+        for row in df.itertuples(index=False):
+            rankings_dict.setdefault(row.metric_name, {})[int(row.ranking_position)] = {
+                'team': row.team_name,
+                'value': row.metric_value
             }
         
         return rankings_dict
@@ -802,18 +717,7 @@ def get_metric_info_from_name(metric_name, team_name="RC Deportivo"):
         tuple: (metric_id, metric_category, season_id) o (None, None, None) si no se encuentra
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return None, None, None
-        
-        query = """
-        SELECT metric_id, metric_category, season_id
-        FROM indicadores_rendimiento
-        WHERE team_name = %s AND metric_name = %s
-        LIMIT 1
-        """
-        
-        df = pd.read_sql(query, engine, params=(team_name, metric_name))
+        df = consultar_indicadores(team_name=team_name, metric_names=[metric_name])
         
         if not df.empty:
             return df.iloc[0]['metric_id'], df.iloc[0]['metric_category'], df.iloc[0]['season_id']
@@ -824,77 +728,204 @@ def get_metric_info_from_name(metric_name, team_name="RC Deportivo"):
         print(f"Error obteniendo info de métrica: {e}")
         return None, None, None
 
+# Línea temporal de la temporada por equipo: se recalcula cuando cambian las filas del
+# equipo en laliga_teams para la temporada (jornada nueva) y, como mucho, cada hora.
+# La versión se comprueba como mucho cada INDICADORES_COMPROBACION_SEGUNDOS (por defecto
+# 60) por equipo y temporada: cambiar de métrica dentro de ese margen no consulta la BD.
+# Los resultados no se cachean aquí: salen del dataset de contextos en memoria
+# (utils.contextos_laliga), que tiene su propia versión.
+EVOLUCION_TEMPORADA_NAMESPACE = 'evolucion_temporada_laliga'
+EVOLUCION_TEMPORADA_TTL = 3600
+
+# {(team_name, season_id): {'version': (ultima_jornada, filas), 'comprobado': float}}
+_VERSIONES_EVOLUCION = {}
+
+# Mapeo de nombres entre laliga_teams y laliga_matches
+TEAM_NAME_MAPPING_MATCHES = {
+    'RC Deportivo': 'Deportivo de La Coruña',
+    # Agregar más mapeos si es necesario
+}
+
+_SQL_EVOLUCION_TEMPORADA = """
+    SELECT
+        m.match_day_number,
+        m.home_team_name,
+        m.away_team_name,
+        t.metric_id,
+        t.metric_category,
+        t.metric_value
+    FROM laliga_teams t
+    INNER JOIN laliga_matches m ON t.match_id = m.match_id
+    WHERE t.team_name = :team_name
+    AND m.season_id = :season_id
+"""
+
+# Versión barata de las filas que lee _SQL_EVOLUCION_TEMPORADA
+_SQL_EVOLUCION_TEMPORADA_VERSION = """
+    SELECT MAX(m.match_day_number) AS ultima_jornada, COUNT(*) AS filas
+    FROM laliga_teams t
+    INNER JOIN laliga_matches m ON t.match_id = m.match_id
+    WHERE t.team_name = :team_name
+    AND m.season_id = :season_id
+"""
+
+def _version_evolucion_temporada(team_name, season_id):
+    """
+    (ultima_jornada, filas) del equipo en la temporada, comprobada como mucho cada intervalo.
+    None si nunca se pudo comprobar.
+    """
+    try:
+        intervalo = int(os.getenv('INDICADORES_COMPROBACION_SEGUNDOS', 60))
+    except (TypeError, ValueError):
+        intervalo = 60
+    
+    clave = (team_name, season_id)
+    actual = _VERSIONES_EVOLUCION.get(clave)
+    if actual is not None and time.time() - actual['comprobado'] < intervalo:
+        return actual['version']
+    
+    try:
+        engine = get_laliga_db_connection()
+        if engine is None:
+            raise RuntimeError("No se pudo conectar a la BD LaLiga")
+        fila = ejecutar_consulta(
+            _SQL_EVOLUCION_TEMPORADA_VERSION, {'team_name': team_name, 'season_id': season_id},
+            engine=engine, nombre='evolucion_temporada_laliga_version'
+        ).iloc[0]
+        version = (str(fila['ultima_jornada']), int(fila['filas']))
+    except Exception as e:
+        # Si la comprobación falla se sigue usando la última versión conocida
+        print(f"Error comprobando versión de la evolución de la temporada: {e}")
+        if actual is None:
+            return None
+        version = actual['version']
+    _VERSIONES_EVOLUCION[clave] = {'version': version, 'comprobado': time.time()}
+    return version
 
-def get_match_opponents_by_matchday(team_name, season_id=1):
+def _construir_evolucion_temporada(team_name, season_id):
     """
-    Obtiene los equipos rivales para cada jornada.
+    Una sola consulta: jornada -> rival y valores de TODAS las métricas del equipo.
+    """
+    engine = get_laliga_db_connection()
+    if engine is None:
+        return {}
+    
+    df = ejecutar_consulta(
+        _SQL_EVOLUCION_TEMPORADA, {'team_name': team_name, 'season_id': season_id},
+        engine=engine, nombre='evolucion_temporada_laliga'
+    )
+    df['match_day_number'] = pd.to_numeric(df['match_day_number'], errors='coerce')
+    df = df.dropna(subset=['match_day_number'])
+    df['match_day_number'] = df['match_day_number'].astype(int)
+    
+    # Rival en cada jornada
+    team_name_in_matches = TEAM_NAME_MAPPING_MATCHES.get(team_name, team_name)
+    partidos = df[['match_day_number', 'home_team_name', 'away_team_name']].drop_duplicates()
+    partidos = partidos.sort_values('match_day_number', kind='stable')
+    rivales = {
+        int(jornada): away if home == team_name_in_matches else home
+        for jornada, home, away in zip(partidos['match_day_number'], partidos['home_team_name'], partidos['away_team_name'])
+    }
+    
+    # Valores por jornada: una columna por (metric_id, metric_category)
+    df['metric_value'] = pd.to_numeric(df['metric_value'], errors='coerce')
+    metricas = df.dropna(subset=['metric_value']).pivot_table(
+        index='match_day_number', columns=['metric_id', 'metric_category'],
+        values='metric_value', aggfunc='last'
+    ).sort_index()
+    
+    return {'rivales': rivales, 'metricas': metricas}
+
+def _resultados_por_jornada(team_name, season_id):
+    """
+    Jornada -> goles y resultado, desde el dataset de contextos en memoria (sin consulta).
+    """
+    df = consultar_contextos(team_name, season_id=season_id)
+    if df.empty:
+        return {}
+    df = df.dropna(subset=['match_day_number']).sort_values('match_day_number', kind='stable')
+    return {
+        int(jornada): {
+            'goles_favor': int(gf) if pd.notna(gf) else 0,
+            'goles_contra': int(gc) if pd.notna(gc) else 0,
+            'resultado': res if pd.notna(res) else 'Sin datos'
+        }
+        for jornada, gf, gc, res in zip(
+            df['match_day_number'], df['goles_favor'], df['goles_contra'], df['resultado']
+        )
+    }
+
+def get_evolucion_temporada_equipo(team_name, season_id=1):
+    """
+    Línea temporal de la temporada de un equipo (caché compartida entre workers).
     
     Args:
         team_name (str): Nombre del equipo en laliga_teams (ej: "RC Deportivo")
         season_id (int): ID de la temporada
     
     Returns:
-        dict: {match_day_number: opponent_name}
+        dict: {'rivales': {jornada: rival},
+               'resultados': {jornada: {'goles_favor', 'goles_contra', 'resultado'}},
+               'metricas': DataFrame jornada x (metric_id, metric_category)}
+              o {} si no se pudo obtener
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
+        # Versión de las filas del equipo en la temporada: cambia al cargar una jornada nueva
+        version = _version_evolucion_temporada(team_name, season_id)
+        if version is None:
             return {}
-        
-        # Primero obtener los match_ids del equipo desde laliga_teams
-        query_match_ids = """
-        SELECT DISTINCT match_id 
-        FROM laliga_teams 
-        WHERE team_name = %s
-        """
-        df_match_ids = pd.read_sql(query_match_ids, engine, params=(team_name,))
-        
-        if df_match_ids.empty:
+        clave = make_key(team_name, season_id, *version)
+        evolucion = get_or_compute(
+            EVOLUCION_TEMPORADA_NAMESPACE, clave,
+            lambda: _construir_evolucion_temporada(team_name, season_id),
+            ttl=EVOLUCION_TEMPORADA_TTL
+        ) or {}
+        if not evolucion:
             return {}
-        
-        match_ids = df_match_ids['match_id'].tolist()
-        
-        # Obtener información de partidos desde laliga_matches
-        placeholders = ','.join(['%s'] * len(match_ids))
-        query_matches = f"""
-        SELECT 
-            match_day_number,
-            home_team_name,
-            away_team_name
-        FROM laliga_matches
-        WHERE match_id IN ({placeholders})
-        AND season_id = %s
-        ORDER BY match_day_number
-        """
-        
-        df_matches = pd.read_sql(query_matches, engine, params=tuple(match_ids) + (season_id,))
-        
-        if df_matches.empty:
-            return {}
-        
-        # Mapeo de nombres entre laliga_teams y laliga_matches
-        team_name_mapping = {
-            'RC Deportivo': 'Deportivo de La Coruña',
-            # Agregar más mapeos si es necesario
-        }
-        
-        team_name_in_matches = team_name_mapping.get(team_name, team_name)
-        
-        # Determinar el rival en cada jornada
-        opponents = {}
-        for _, row in df_matches.iterrows():
-            matchday = int(row['match_day_number'])
-            if row['home_team_name'] == team_name_in_matches:
-                opponents[matchday] = row['away_team_name']
-            else:
-                opponents[matchday] = row['home_team_name']
-        
-        return opponents
-        
+        return {**evolucion, 'resultados': _resultados_por_jornada(team_name, season_id)}
     except Exception as e:
-        print(f"Error obteniendo rivales por jornada: {e}")
+        print(f"Error obteniendo evolución de la temporada: {e}")
         return {}
 
+def _seleccionar_metrica(evolucion, metric_id, metric_category):
+    """
+    Columna de una métrica de la línea temporal -> DataFrame(match_day_number, metric_value).
+    """
+    metricas = evolucion.get('metricas')
+    if metricas is None or (metric_id, metric_category) not in metricas.columns:
+        return pd.DataFrame(columns=['match_day_number', 'metric_value'])
+    
+    serie = metricas[(metric_id, metric_category)].dropna()
+    return pd.DataFrame({'match_day_number': serie.index.to_numpy(), 'metric_value': serie.to_numpy()})
+
+def get_evolucion_metrica_temporada(team_name, metric_id, metric_category, season_id=1):
+    """
+    Todo lo que necesita el gráfico de evolución por jornada de una métrica, leído de la
+    línea temporal cacheada (cambiar de métrica no lanza consultas).
+    
+    Returns:
+        tuple: (DataFrame match_day_number/metric_value, {jornada: rival}, {jornada: resultado})
+    """
+    evolucion = get_evolucion_temporada_equipo(team_name, season_id)
+    return (
+        _seleccionar_metrica(evolucion, metric_id, metric_category),
+        evolucion.get('rivales', {}),
+        evolucion.get('resultados', {})
+    )
+
+def get_match_opponents_by_matchday(team_name, season_id=1):
+    """
+    Obtiene los equipos rivales para cada jornada.
+    
+    Args:
+        team_name (str): Nombre del equipo en laliga_teams (ej: "RC Deportivo")
+        season_id (int): ID de la temporada
+    
+    Returns:
+        dict: {match_day_number: opponent_name}
+    """
+    return get_evolucion_temporada_equipo(team_name, season_id).get('rivales', {})
+
 
 def get_match_results_by_matchday(team_name, season_id=1):
     """
@@ -908,43 +939,7 @@ def get_match_results_by_matchday(team_name, season_id=1):
         dict: {match_day_number: {'goles_favor': int, 'goles_contra': int, 'resultado': str}}
               donde resultado puede ser 'Victoria', 'Empate', o 'Derrota'
     """
-    try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return {}
-        
-        query = """
-        SELECT 
-            match_day_number,
-            goles_favor,
-            goles_contra,
-            resultado
-        FROM match_context_analysis
-        WHERE depor_team_name_teams = %s
-        AND season_id = %s
-        ORDER BY match_day_number
-        """
-        
-        df_results = pd.read_sql(query, engine, params=(team_name, season_id))
-        
-        if df_results.empty:
-            return {}
-        
-        # Crear diccionario con resultados por jornada
-        results = {}
-        for _, row in df_results.iterrows():
-            matchday = int(row['match_day_number'])
-            results[matchday] = {
-                'goles_favor': int(row['goles_favor']) if pd.notna(row['goles_favor']) else 0,
-                'goles_contra': int(row['goles_contra']) if pd.notna(row['goles_contra']) else 0,
-                'resultado': row['resultado'] if pd.notna(row['resultado']) else 'Sin datos'
-            }
-        
-        return results
-        
-    except Exception as e:
-        print(f"Error obteniendo resultados por jornada: {e}")
-        return {}
+    return get_evolucion_temporada_equipo(team_name, season_id).get('resultados', {})
 
 
 def get_metric_evolution_by_matchday(team_name, metric_id, metric_category, season_id=1):
@@ -960,45 +955,20 @@ def get_metric_evolution_by_matchday(team_name, metric_id, metric_category, seas
     Returns:
         DataFrame con columnas: match_day_number, metric_value
     """
-    try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return pd.DataFrame(columns=['match_day_number', 'metric_value'])
-        
-        # Query optimizada: primero filtrar por laliga_teams (que tiene el nombre correcto)
-        # y luego hacer JOIN con laliga_matches para obtener match_day_number
-        query = """
-        SELECT 
-            m.match_day_number,
-            t.metric_value
-        FROM laliga_teams t
-        INNER JOIN laliga_matches m ON t.match_id = m.match_id
-        WHERE 
-            t.team_name = %s
-            AND t.metric_id = %s
-            AND t.metric_category = %s
-            AND m.season_id = %s
-        ORDER BY m.match_day_number
-        """
-        
-        df = pd.read_sql(
-            query, 
-            engine, 
-            params=(team_name, metric_id, metric_category, season_id)
-        )
-        
-        # Convertir a numéricos y limpiar
-        if not df.empty:
-            df['match_day_number'] = pd.to_numeric(df['match_day_number'], errors='coerce')
-            df['metric_value'] = pd.to_numeric(df['metric_value'], errors='coerce')
-            df = df[['match_day_number', 'metric_value']].dropna()
-        
-        return df
-        
-    except Exception as e:
-        print(f"Error obteniendo evolución de métrica: {e}")
-        return pd.DataFrame(columns=['match_day_number', 'metric_value'])
-
+    evolucion = get_evolucion_temporada_equipo(team_name, season_id)
+    return _seleccionar_metrica(evolucion, metric_id, metric_category)
+
+RANKINGS_COMPUESTOS = [
+    'RankingRendimiento',
+    'RankingOfensivo',
+    'RankingDefensivo',
+    'RankingFísico-Combatividad',
+    'RankingBalónParado',
+    'RankingEstilo',
+    'RankingEstilo-IdentidadGeneral',
+    'RankingEstilo-IdentidadOfensiva',
+    'RankingEstilo-IdentidadDefensiva'
+]
 
 def get_rankings_compuestos_laliga(team_name="RC Deportivo"):
     """
@@ -1012,44 +982,16 @@ def get_rankings_compuestos_laliga(team_name="RC Deportivo"):
         dict: Diccionario con {metric_id: ranking_position} para los rankings compuestos
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return {}
-        
-        # Verificar si la tabla existe
-        inspector = inspect(engine)
-        if 'indicadores_rendimiento' not in inspector.get_table_names():
-            return {}
-        
-        # Consulta para obtener exactamente los rankings que necesitamos
+        # Exactamente los rankings que necesitamos (desde el cubo de indicadores en memoria)
         # Para Rendimiento: RankingRendimiento, RankingOfensivo, RankingDefensivo, 
         #                   RankingFísico-Combatividad, RankingBalónParado
         # Para Estilo: RankingEstilo, RankingEstilo-IdentidadGeneral, 
         #              RankingEstilo-IdentidadOfensiva, RankingEstilo-IdentidadDefensiva
-        query = """
-        SELECT 
-            metric_id,
-            ranking_position
-        FROM indicadores_rendimiento 
-        WHERE team_name = %s 
-        AND metric_id IN (
-            'RankingRendimiento',
-            'RankingOfensivo',
-            'RankingDefensivo',
-            'RankingFísico-Combatividad',
-            'RankingBalónParado',
-            'RankingEstilo',
-            'RankingEstilo-IdentidadGeneral',
-            'RankingEstilo-IdentidadOfensiva',
-            'RankingEstilo-IdentidadDefensiva'
-        )
-        ORDER BY metric_id
-        """
-        
-        df = pd.read_sql(query, engine, params=(team_name,))
+        df = consultar_indicadores(team_name=team_name, metric_ids=RANKINGS_COMPUESTOS)
         
         if not df.empty:
             # Convertir a diccionario
+            df = df.sort_values('metric_id', kind='stable')
             rankings_dict = dict(zip(df['metric_id'], df['ranking_position']))
             return rankings_dict
         else:
@@ -1065,7 +1007,7 @@ def get_rankings_compuestos_laliga(team_name="RC Deportivo"):
 
 def get_soccer_db_connection():
     """
-    Crea y retorna una conexión a la base de datos soccersystem.
+    Retorna el engine compartido (con pool) de la base de datos soccersystem.
     """
     # Asegurar que las variables de entorno están cargadas
     load_dotenv()
@@ -1087,11 +1029,7 @@ def get_soccer_db_connection():
     db_url = f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}/{DB_CONFIG['database']}"
     
     try:
-        engine = create_engine(db_url)
-        # Probar la conexión
-        with engine.connect() as conn:
-            pass
-        return engine
+        return get_engine('soccer', db_url)
     except Exception as e:
         print(f"Error conectando a soccersystem: {e}")
         print(f"URL de conexión (sin credenciales): mysql+pymysql://*:*@{DB_CONFIG['host']}/{DB_CONFIG['database']}")
@@ -1100,28 +1038,18 @@ def get_soccer_db_connection():
 def get_fechas_entrenamiento_disponibles():
     """
     Obtiene todas las fechas de entrenamiento disponibles ordenadas de más reciente a más antigua.
+    Se sirven desde el histórico médico en memoria (utils.historico_medico).
     
     Returns:
         list: Lista de fechas ordenadas descendentemente
     """
     try:
-        print("Intentando obtener fechas de entrenamiento...")
-        engine = get_soccer_db_connection()
-        if engine is None:
-            print("Error: No se pudo obtener conexión a la BD soccersystem")
+        almacen = get_almacen_medico()
+        if almacen is None:
+            print("Error: No se pudo cargar el histórico médico de soccersystem")
             return []
         
-        query = """
-        SELECT DISTINCT fecha_entrenamiento 
-        FROM medico_mejuto 
-        ORDER BY fecha_entrenamiento DESC
-        """
-        
-        print(f"Ejecutando query: {query}")
-        df = pd.read_sql(query, engine)
-        fechas = df['fecha_entrenamiento'].tolist()
-        print(f"Fechas obtenidas: {len(fechas)} - Primeras 3: {fechas[:3] if fechas else 'Ninguna'}")
-        return fechas
+        return list(almacen['fechas'])
         
     except Exception as e:
         print(f"Error obteniendo fechas: {e}")
@@ -1131,36 +1059,19 @@ def get_fechas_entrenamiento_disponibles():
 
 def get_evaluaciones_medicas(fecha_entrenamiento):
     """
-    Obtiene todas las evaluaciones médicas para una fecha específica.
+    Obtiene todas las evaluaciones médicas para una fecha específica
+    (desde el histórico médico en memoria, indexado por fecha).
     """
     try:
-        print(f"Obteniendo evaluaciones médicas para fecha: {fecha_entrenamiento}")
-        # Obtener conexión
-        engine = get_soccer_db_connection()
-        if engine is None:
-            print("Error: No se pudo obtener conexión a la BD soccersystem")
+        almacen = get_almacen_medico()
+        if almacen is None:
             return pd.DataFrame()
         
-        query = """
-        SELECT 
-            COALESCE(m.nombre_pedrosa, mm.nombre_jugador) as nombre_jugador,
-            mm.evaluacion,
-            mm.comentarios_evaluacion,
-            mm.observaciones
-        FROM medico_mejuto mm
-        LEFT JOIN mapeo_nombre_dni m ON mm.nombre_jugador COLLATE utf8mb4_unicode_ci = m.nombre_mejuto COLLATE utf8mb4_unicode_ci
-        WHERE mm.fecha_entrenamiento = %s
-        ORDER BY COALESCE(m.nombre_pedrosa, mm.nombre_jugador)
-        """
-        
-        print(f"Ejecutando query con fecha: {fecha_entrenamiento}")
-        df = pd.read_sql(query, engine, params=(fecha_entrenamiento,))
-        print(f"Evaluaciones obtenidas: {len(df)} registros")
+        df = almacen['por_fecha'].get(str(fecha_entrenamiento))
+        if df is None:
+            return pd.DataFrame(columns=['nombre_jugador', 'evaluacion', 'comentarios_evaluacion', 'observaciones'])
         
-        # Rellenar valores nulos con cadena vacía
-        df = df.fillna('')
-        
-        return df
+        return df.copy()
     except Exception as e:
         print(f"Error obteniendo evaluaciones médicas: {e}")
         import traceback
@@ -1170,30 +1081,14 @@ def get_evaluaciones_medicas(fecha_entrenamiento):
 def get_historico_evaluaciones_completo():
     """
     Obtiene todas las evaluaciones médicas históricas para análisis evolutivo con nombres unificados
+    (desde el histórico médico en memoria: sin releer la tabla en cada vista)
     """
     try:
-        # Obtener conexión
-        engine = get_soccer_db_connection()
-        if engine is None:
+        almacen = get_almacen_medico()
+        if almacen is None:
             return pd.DataFrame()
         
-        query = """
-        SELECT 
-            mm.fecha_entrenamiento,
-            COALESCE(m.nombre_pedrosa, mm.nombre_jugador) as nombre_jugador,
-            mm.evaluacion,
-            mm.comentarios_evaluacion,
-            mm.observaciones
-        FROM medico_mejuto mm
-        LEFT JOIN mapeo_nombre_dni m ON mm.nombre_jugador COLLATE utf8mb4_unicode_ci = m.nombre_mejuto COLLATE utf8mb4_unicode_ci
-        WHERE mm.evaluacion IS NOT NULL
-        ORDER BY mm.fecha_entrenamiento DESC, COALESCE(m.nombre_pedrosa, mm.nombre_jugador) ASC
-        """
-        
-        df = pd.read_sql_query(query, engine)
-        engine.dispose()
-        
-        return df
+        return almacen['historico'].copy()
     except Exception as e:
         print(f"Error obteniendo histórico de evaluaciones: {e}")
         return pd.DataFrame()
@@ -1203,22 +1098,14 @@ def get_estadisticas_por_jugador():
     Calcula estadísticas de días por estado para cada jugador
     """
     try:
-        df_historico = get_historico_evaluaciones_completo()
-        if df_historico.empty:
+        almacen = get_almacen_medico()
+        if almacen is None or almacen['historico'].empty:
             return pd.DataFrame()
         
-        # Contar días por jugador y evaluación
-        stats = df_historico.groupby(['nombre_jugador', 'evaluacion']).size().reset_index(name='dias')
-        
-        # Calcular total de días por jugador
-        total_dias = df_historico.groupby('nombre_jugador').size().reset_index(name='total_dias')
-        
-        # Merge y calcular porcentajes
-        stats = stats.merge(total_dias, on='nombre_jugador')
-        stats['porcentaje'] = (stats['dias'] / stats['total_dias'] * 100).round(1)
-        
-        # Pivot para tener columnas por estado
-        stats_pivot = stats.pivot(index='nombre_jugador', columns='evaluacion', values='porcentaje').fillna(0)
+        # % de días por estado para cada jugador (crosstab normalizado por fila)
+        stats_pivot = (pd.crosstab(almacen['historico']['nombre_jugador'],
+                                   almacen['historico']['evaluacion'],
+                                   normalize='index') * 100).round(1)
         
         # Asegurar que todas las columnas estén presentes
         for estado in ['Normal', 'Precaución', 'Fisio/RTP']:
@@ -1227,6 +1114,8 @@ def get_estadisticas_por_jugador():
         
         # Reordenar columnas
         stats_pivot = stats_pivot[['Normal', 'Precaución', 'Fisio/RTP']]
+        stats_pivot.columns.name = None
+        stats_pivot.index.name = 'nombre_jugador'
         stats_pivot = stats_pivot.reset_index()
         
         return stats_pivot
@@ -1239,14 +1128,12 @@ def get_evolucion_jugador(nombre_jugador):
     Obtiene la evolución temporal de un jugador específico
     """
     try:
-        df_historico = get_historico_evaluaciones_completo()
-        if df_historico.empty:
+        almacen = get_almacen_medico()
+        if almacen is None:
             return pd.DataFrame()
         
-        # Filtrar por jugador
-        df_jugador = df_historico[df_historico['nombre_jugador'] == nombre_jugador].copy()
-        
-        if df_jugador.empty:
+        df_jugador = almacen['por_jugador'].get(nombre_jugador)
+        if df_jugador is None or df_jugador.empty:
             return pd.DataFrame()
         
         # Mapear evaluaciones a valores numéricos para el gráfico
@@ -1256,11 +1143,10 @@ def get_evolucion_jugador(nombre_jugador):
             'Normal': 3
         }
         
+        # Ya ordenado por fecha en el índice por jugador
+        df_jugador = df_jugador.copy()
         df_jugador['valor_numerico'] = df_jugador['evaluacion'].map(evaluacion_map)
         
-        # Ordenar por fecha
-        df_jugador = df_jugador.sort_values('fecha_entrenamiento')
-        
         return df_jugador
     except Exception as e:
         print(f"Error obteniendo evolución del jugador: {e}")
@@ -1271,12 +1157,11 @@ def get_lista_jugadores():
     Obtiene la lista de jugadores únicos con evaluaciones
     """
     try:
-        df_historico = get_historico_evaluaciones_completo()
-        if df_historico.empty:
+        almacen = get_almacen_medico()
+        if almacen is None:
             return []
         
-        jugadores = sorted(df_historico['nombre_jugador'].unique().tolist())
-        return jugadores
+        return sorted(almacen['por_jugador'].keys())
     except Exception as e:
         print(f"Error obteniendo lista de jugadores: {e}")
         return []
@@ -1730,24 +1615,8 @@ def get_full_section_ranking(ranking_id: str):
         Lista de diccionarios con team_name, ranking_position, section_name
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            return get_full_section_ranking_fallback(ranking_id)
-        
-        # Verificar si la tabla existe
-        inspector = inspect(engine)
-        if 'indicadores_rendimiento' not in inspector.get_table_names():
-            return get_full_section_ranking_fallback(ranking_id)
-        
-        # Consultar el ranking completo para la sección específica
-        query = """
-        SELECT team_name, ranking_position, metric_id
-        FROM indicadores_rendimiento 
-        WHERE metric_id = %s 
-        ORDER BY ranking_position ASC
-        """
-        
-        df = pd.read_sql(query, engine, params=(ranking_id,))
+        # Ranking completo para la sección específica (cubo de indicadores en memoria)
+        df = consultar_indicadores(metric_ids=[ranking_id]).sort_values('ranking_position', kind='stable')
         
         if df.empty:
             print(f"No se encontraron datos para {ranking_id}")
@@ -1824,6 +1693,7 @@ def get_full_section_ranking_fallback(ranking_id: str):
 def get_match_context_analysis(team_name="RC Deportivo", competition_id=None, season_id=None):
     """
     Obtiene el análisis de contextos de partidos desde la tabla match_context_analysis.
+    Se filtra en memoria el dataset compartido (utils.contextos_laliga): no consulta la BD.
     
     Args:
         team_name (str): Nombre del equipo en laliga_teams (por defecto "RC Deportivo")
@@ -1834,64 +1704,7 @@ def get_match_context_analysis(team_name="RC Deportivo", competition_id=None, se
         DataFrame con todos los campos de match_context_analysis
     """
     try:
-        engine = get_laliga_db_connection()
-        if engine is None:
-            print("Error: No se pudo conectar a la BD LaLiga")
-            return pd.DataFrame()
-        
-        # Verificar si la tabla existe
-        inspector = inspect(engine)
-        if 'match_context_analysis' not in inspector.get_table_names():
-            print("Error: Tabla match_context_analysis no existe")
-            return pd.DataFrame()
-        
-        # Construir query con filtros opcionales
-        query = """
-        SELECT 
-            match_id,
-            season_id,
-            season_name,
-            competition_id,
-            competition_name,
-            match_date,
-            match_day_number,
-            depor_team_name_matches,
-            depor_team_name_teams,
-            opponent_name,
-            condicion,
-            goles_favor,
-            goles_contra,
-            resultado,
-            resultado_tipo,
-            pct_ganando,
-            pct_empatando,
-            pct_perdiendo,
-            contexto_preferente,
-            contexto_tipo,
-            etiqueta_contexto,
-            interpretacion,
-            process_date,
-            last_updated
-        FROM match_context_analysis
-        WHERE depor_team_name_teams = %s
-        """
-        
-        params = [team_name]
-        
-        if competition_id:
-            query += " AND competition_id = %s"
-            params.append(competition_id)
-        
-        if season_id:
-            query += " AND season_id = %s"
-            params.append(season_id)
-        
-        query += " ORDER BY match_date ASC, match_day_number ASC"
-        
-        df = pd.read_sql(query, engine, params=tuple(params))
-        
-        print(f"✅ Obtenidos {len(df)} partidos con análisis de contexto")
-        return df
+        return consultar_contextos(team_name, competition_id, season_id)
         
     except Exception as e:
         print(f"Error obteniendo análisis de contextos: {e}")
@@ -1930,30 +1743,14 @@ def get_matches_by_context_matrix(team_name="RC Deportivo", competition_id=None,
             'Negativo': {'Favorable': [], 'Desfavorable': []}
         }
         
-        for _, row in df.iterrows():
-            resultado_tipo = row['resultado_tipo']
-            contexto_tipo = row['contexto_tipo']
-            
-            match_info = {
-                'match_id': row['match_id'],
-                'match_date': row['match_date'],
-                'match_day_number': row['match_day_number'],
-                'opponent_name': row['opponent_name'],
-                'condicion': row['condicion'],
-                'goles_favor': row['goles_favor'],
-                'goles_contra': row['goles_contra'],
-                'resultado': row['resultado'],
-                'resultado_tipo': row['resultado_tipo'],
-                'contexto_tipo': row['contexto_tipo'],
-                'contexto_preferente': row['contexto_preferente'],
-                'etiqueta_contexto': row['etiqueta_contexto'],
-                'interpretacion': row['interpretacion'],
-                'pct_ganando': row['pct_ganando'],
-                'pct_empatando': row['pct_empatando'],
-                'pct_perdiendo': row['pct_perdiendo']
-            }
-            
-            matrix[resultado_tipo][contexto_tipo].append(match_info)
+        columnas = [
+            'match_id', 'match_date', 'match_day_number', 'opponent_name', 'condicion',
+            'goles_favor', 'goles_contra', 'resultado', 'resultado_tipo', 'contexto_tipo',
+            'contexto_preferente', 'etiqueta_contexto', 'interpretacion',
+            'pct_ganando', 'pct_empatando', 'pct_perdiendo'
+        ]
+        for match_info in df[columnas].to_dict('records'):
+            matrix[match_info['resultado_tipo']][match_info['contexto_tipo']].append(match_info)
         
         return matrix
         
@@ -2001,7 +1798,7 @@ def get_context_statistics(team_name="RC Deportivo", competition_id=None, season
         return {}
 
 
-def get_league_standings(competition_id=None, season_id=None, team_name="RC Deportivo"):
+def get_league_standings(competition_id=None, season_id=None, team_name="RC Deportivo", columnas=None):
     """
     Obtiene la clasificación de la liga con opción de vista resumida centrada en un equipo.
     
@@ -2009,6 +1806,7 @@ def get_league_standings(competition_id=None, season_id=None, team_name="RC Depo
         competition_id (str): ID de la competición (opcional)
         season_id (str): ID de la temporada (opcional)
         team_name (str): Nombre del equipo para centrar la vista
+        columnas (list): Columnas a proyectar (None = todas); team_name y position siempre se incluyen
     
     Returns:
         dict: {
@@ -2024,7 +1822,15 @@ def get_league_standings(competition_id=None, season_id=None, team_name="RC Depo
             return {}
         
         # Query base
-        query = """
+        if columnas:
+            proyeccion = ', '.join(dict.fromkeys(['team_name', 'position', *columnas]))
+            query = f"""
+        SELECT {proyeccion}
+        FROM league_standings
+        WHERE 1=1
+        """
+        else:
+            query = """
         SELECT 
             competition_id, competition_name, season_id, season_name,
             team_id, team_name,
@@ -2099,6 +1905,8 @@ def get_league_standings(competition_id=None, season_id=None, team_name="RC Depo
 def get_match_reports_links(match_id):
     """
     Obtiene los links de informes (postpartido y evolutivo) de un partido.
+    Los partidos con análisis de contexto los traen ya cargados en el dataset compartido
+    (utils.contextos_laliga); solo el resto consulta laliga_matches.
     
     Args:
         match_id (int): ID del partido
@@ -2107,6 +1915,13 @@ def get_match_reports_links(match_id):
         dict: {'postpartido_link': str, 'evolutivo_link': str}
     """
     try:
+        partido = get_partido_contexto(match_id)
+        if partido is not None:
+            return {
+                'postpartido_link': partido['postpartido_link'],
+                'evolutivo_link': partido['evolutivo_link']
+            }
+        
         engine = get_laliga_db_connection()
         if engine is None:
             return {}
@@ -2179,32 +1994,14 @@ def get_results_trend_statistics(team_name="RC Deportivo", competition_id=None,
                     'goles_contra': df_cond['goles_contra'].sum()
                 }
         
-        # Racha actual
-        racha_actual = []
-        for _, row in df.tail(5).iterrows():
-            if row['resultado'] == 'Victoria':
-                racha_actual.append('V')
-            elif row['resultado'] == 'Empate':
-                racha_actual.append('E')
-            else:
-                racha_actual.append('D')
+        # Racha actual (últimos 5 como V/E/D)
+        racha_actual = df.tail(5)['resultado'].map({'Victoria': 'V', 'Empate': 'E'}).fillna('D').tolist()
         
         # Últimos partidos para timeline
-        ultimos_partidos = []
-        for _, row in df.tail(10).iterrows():
-            ultimos_partidos.append({
-                'match_id': row['match_id'],
-                'match_date': row['match_date'],
-                'match_day_number': row['match_day_number'],
-                'opponent_name': row['opponent_name'],
-                'condicion': row['condicion'],
-                'goles_favor': row['goles_favor'],
-                'goles_contra': row['goles_contra'],
-                'resultado': row['resultado'],
-                'resultado_tipo': row['resultado_tipo'],
-                'contexto_tipo': row['contexto_tipo'],
-                'puntos': row['puntos']
-            })
+        ultimos_partidos = df.tail(10)[[
+            'match_id', 'match_date', 'match_day_number', 'opponent_name', 'condicion',
+            'goles_favor', 'goles_contra', 'resultado', 'resultado_tipo', 'contexto_tipo', 'puntos'
+        ]].to_dict('records')
         
         stats = {
             'total_partidos': len(df),
@@ -2234,11 +2031,15 @@ def get_results_trend_statistics(team_name="RC Deportivo", competition_id=None,
 # --------------------------------------
 # FUNCIONES PARA MICROCICLOS
 # --------------------------------------
-def get_microciclos():
+def get_microciclos(dias_atras=180):
     """
     Obtiene todos los microciclos estructurados por partidos MD.
     Un microciclo es el periodo entre un MD y el siguiente MD (o hasta hoy si es la semana actual).
     
+    Args:
+        dias_atras (int): días de actividades a segmentar (por defecto ~6 meses;
+                          admite rangos de varias temporadas)
+    
     Returns:
         Lista de diccionarios con:
         - id: identificador único del microciclo
@@ -2248,25 +2049,21 @@ def get_microciclos():
         - partido_nombre: nombre del partido que cierra el microciclo
         - is_current: True si es la semana actual (sin MD de cierre)
     """
-    from datetime import datetime, timedelta
-    import json
-    
     try:
         engine = get_db_connection()
         if engine is None:
             return []
         
-        # Calcular timestamp de hace 6 meses para limitar la búsqueda
-        hace_6_meses = int((datetime.now() - timedelta(days=180)).timestamp())
+        # Limitar la búsqueda a los últimos 'dias_atras' días
+        desde = int((datetime.now() - timedelta(days=dias_atras)).timestamp())
         
-        # Obtener solo actividades de los últimos 6 meses (OPTIMIZACIÓN)
-        query = f'''
+        query = '''
             SELECT id, start_time, name, tag_list_json
             FROM activities
-            WHERE start_time >= {hace_6_meses}
+            WHERE start_time >= %s
             ORDER BY start_time ASC
         '''
-        df = pd.read_sql(query, engine)
+        df = pd.read_sql(query, engine, params=(desde,))
         
         if df.empty:
             return []
@@ -2274,74 +2071,36 @@ def get_microciclos():
         # Añadir columna grupo_dia para identificar MDs
         df = add_grupo_dia_column(df)
         
-        # Filtrar solo actividades MD (partidos)
-        df_md = df[df['grupo_dia'] == 'MD'].copy()
+        # Ventanas de todos los microciclos en una sola pasada (ordenada + searchsorted)
+        ventanas = segmentar_microciclos(df)
         
-        if df_md.empty:
+        if ventanas.empty:
             return []
         
         microciclos = []
         
-        # Procesar cada partido MD como el objetivo del microciclo (preparación hacia ese partido)
+        # Cada partido MD es el objetivo del microciclo (preparación hacia ese partido)
         # El microciclo INCLUYE el MD anterior (que lo inicia) pero NO incluye el MD del título
-        for idx, row in df_md.iterrows():
-            md_timestamp = row['start_time']
-            md_date = datetime.fromtimestamp(md_timestamp)
-            partido_nombre = row['name'] if pd.notna(row['name']) else f"Partido {md_date.strftime('%d/%m/%Y')}"
-            
-            # Encontrar la fecha de inicio del microciclo (INCLUIR el MD anterior)
-            if idx > 0:
-                # Buscar el índice del MD anterior
-                md_prev_idx = df_md.index[df_md.index < idx].max() if len(df_md.index[df_md.index < idx]) > 0 else None
-                
-                if md_prev_idx is not None:
-                    # INCLUIR el MD anterior (ese partido inicia el microciclo)
-                    prev_md_timestamp = df_md.loc[md_prev_idx, 'start_time']
-                    start_timestamp = prev_md_timestamp
-                else:
-                    # Primer microciclo: tomar todas las actividades ANTES del primer MD
-                    df_antes_md = df[df['start_time'] < md_timestamp]
-                    if not df_antes_md.empty:
-                        start_timestamp = df_antes_md['start_time'].min()
-                    else:
-                        start_timestamp = md_timestamp - 604800  # -7 días por defecto
-            else:
-                # Primer MD: buscar actividades previas (sin incluir el MD)
-                df_antes_md = df[df['start_time'] < md_timestamp]
-                if not df_antes_md.empty:
-                    start_timestamp = df_antes_md['start_time'].min()
-                else:
-                    start_timestamp = md_timestamp - 604800  # -7 días por defecto
-            
-            # La fecha de fin es ANTES del MD actual (el microciclo NO incluye el partido)
-            # Buscar la última actividad antes del MD
-            df_antes_este_md = df[df['start_time'] < md_timestamp]
-            if not df_antes_este_md.empty:
-                end_timestamp = df_antes_este_md['start_time'].max()
-                end_date = datetime.fromtimestamp(end_timestamp)
-                # Para queries, usar el día del MD (sin incluir el MD mismo, solo hasta las 23:59 del día anterior)
-                end_date_for_query = datetime.fromtimestamp(md_timestamp - 1)  # 1 segundo antes del MD
-            else:
-                # Si no hay actividades antes, usar el día anterior al MD
-                end_date = datetime.fromtimestamp(md_timestamp - 86400)
-                end_date_for_query = datetime.fromtimestamp(md_timestamp - 1)
-            
-            start_date = datetime.fromtimestamp(start_timestamp)
+        for ventana in ventanas.itertuples(index=False):
+            md_date = datetime.fromtimestamp(ventana.md_ts)
+            partido_nombre = ventana.partido_nombre or f"Partido {md_date.strftime('%d/%m/%Y')}"
+            start_date = datetime.fromtimestamp(ventana.inicio_ts)
+            end_date = datetime.fromtimestamp(ventana.fin_ts)
+            # Para queries, usar 1 segundo antes del MD (el microciclo no incluye el partido)
+            end_date_for_query = datetime.fromtimestamp(ventana.fin_consulta_ts)
             
-            microciclo = {
-                'id': f'mc_{idx}',
+            microciclos.append({
+                'id': f'mc_{ventana.md_posicion}',
                 'label': f"Semana {partido_nombre} ({start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')})",
                 'start_date': start_date.strftime('%Y-%m-%d'),
                 'end_date': end_date_for_query.strftime('%Y-%m-%d %H:%M:%S'),  # Timestamp exacto para excluir el MD
                 'partido_nombre': partido_nombre,
                 'is_current': False
-            }
-            
-            microciclos.append(microciclo)
+            })
         
         # Añadir "Semana actual" (desde el último MD incluido hasta hoy)
-        if not df_md.empty:
-            ultimo_md_timestamp = df_md['start_time'].max()
+        if not ventanas.empty:
+            ultimo_md_timestamp = int(ventanas['md_ts'].max())
             
             # La semana actual INCLUYE el último MD (que la inicia)
             start_timestamp = ultimo_md_timestamp
@@ -7,6 +7,7 @@ import pandas as pd
 import plotly.graph_objects as go
 import re
 from utils.entrenamiento_metricas import detectar_tipo_microciclo
+from utils.db_manager import get_available_parameters
 
 
 def generar_grafico_optimizado_precargado(df_summary, metric, metrica_label, maximos_historicos, umbrales_df, nombre_partido):
@@ -457,3 +458,68 @@ def generar_grafico_optimizado_precargado(df_summary, metric, metrica_label, max
     )
     
     return fig
+
+
+# --------------------------------------
+# RESÚMENES COMPACTOS PARA dcc.Store
+# --------------------------------------
+# Los stores de microciclo guardan solo números (media por día, nº de jugadores,
+# fecha, minutos y valores de referencia). La figura de la métrica seleccionada
+# se genera en servidor bajo demanda con generar_grafico_desde_resumen().
+
+COLUMNAS_RESUMEN = ['activity_tag', 'avg_metric', 'count_athletes', 'fecha', 'field_time']
+
+
+def resumir_datos_por_metrica(datos_por_metrica):
+    """
+    Convierte {metrica: df_resumen} en {metrica: [filas]} serializable y compacto.
+    
+    Cada fila conserva solo las columnas que usa el gráfico (COLUMNAS_RESUMEN);
+    fechas en formato ISO y NaN convertidos a None.
+    """
+    resumen = {}
+    for metrica, df_resumen in (datos_por_metrica or {}).items():
+        if df_resumen is None or df_resumen.empty:
+            continue
+        columnas = [c for c in COLUMNAS_RESUMEN if c in df_resumen.columns]
+        df = df_resumen[columnas].copy()
+        if 'fecha' in df.columns:
+            df['fecha'] = pd.to_datetime(df['fecha'], errors='coerce').dt.strftime('%Y-%m-%d')
+        df = df.astype(object).where(pd.notna(df), None)
+        resumen[metrica] = df.to_dict('records')
+    return resumen
+
+
+def valores_por_dia(cache_data, metrica):
+    """
+    Lista [(dia, valor)] de la métrica en el orden del resumen guardado en el store.
+    """
+    filas = (cache_data or {}).get('resumen', {}).get(metrica) or []
+    return [(f.get('activity_tag'), f.get('avg_metric') or 0) for f in filas]
+
+
+def generar_grafico_desde_resumen(cache_data, metrica):
+    """
+    Genera en servidor la figura de una métrica a partir del resumen compacto del store.
+    
+    Returns:
+        go.Figure o None si la métrica no tiene datos
+    """
+    filas = (cache_data or {}).get('resumen', {}).get(metrica)
+    if not filas:
+        return None
+    
+    parametros_dict = {p['value']: p['label'] for p in get_available_parameters()}
+    
+    # Máximos de la métrica con el tipo de microciclo (necesario para los umbrales)
+    maximos = dict((cache_data.get('maximos_historicos') or {}).get(metrica) or {})
+    maximos.setdefault('tipo_microciclo', cache_data.get('tipo_microciclo', 'estandar'))
+    
+    return generar_grafico_optimizado_precargado(
+        pd.DataFrame(filas),
+        metrica,
+        parametros_dict.get(metrica, metrica),
+        maximos,
+        None,  # umbrales_df no necesario (hardcodeados)
+        cache_data.get('nombre_partido')
+    )
@@ -34,10 +34,12 @@ def generar_tabla_evolutiva(datos_evolutivos):
         {'id': 'ritmo_medio', 'label': 'Ritmo Medio (%)'}
     ]
     
-    # Calcular valores de compensatorio (MD+1/MD+2) para cada microciclo
-    # IMPORTANTE: Usar los mismos jugadores_ids que el resto de la tabla
-    from pages.seguimiento_carga_ultra_optimizado import obtener_compensatorios_tabla
-    compensatorios = obtener_compensatorios_tabla(microciclos, jugadores_ids=jugadores_ids)
+    # Valores de compensatorio (MD+1/MD+2) para cada microciclo: vienen calculados con la
+    # tabla (mismos jugadores_ids); solo se recalculan para datos cacheados sin ellos
+    compensatorios = datos_evolutivos.get('compensatorios')
+    if compensatorios is None:
+        from pages.seguimiento_carga_ultra_optimizado import obtener_compensatorios_tabla
+        compensatorios = obtener_compensatorios_tabla(microciclos, jugadores_ids=jugadores_ids)
     
     # Mapeo de colores
     color_map = {
@@ -0,0 +1,171 @@
+# utils/historico_medico.py
+
+"""
+Histórico médico (medico_mejuto + mapeo_nombre_dni) cargado UNA vez por proceso.
+
+Antes cada vista (estadísticas por jugador, evolución, lista de jugadores) y el semáforo
+médico releían la tabla completa con su JOIN. Aquí se carga una vez y se indexa:
+- por fecha (str(fecha_entrenamiento)) -> evaluaciones del día ordenadas por jugador
+- por jugador -> evolución ordenada por fecha (solo filas con evaluación)
+
+Refresco incremental: como mucho cada HISTORICO_MEDICO_COMPROBACION_SEGUNDOS se consulta
+MAX(fecha_entrenamiento) y COUNT(*). Si hay fechas nuevas se recargan solo las filas
+desde la última fecha conocida (incluida, por si se completó ese día); si aun así el
+número de filas no cuadra (ediciones o borrados antiguos) se recarga todo.
+
+Configuración desde .env:
+- HISTORICO_MEDICO_COMPROBACION_SEGUNDOS (por defecto 60)
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+from utils.consultas import ejecutar_consulta
+
+COLUMNAS = ['fecha_entrenamiento', 'nombre_jugador', 'evaluacion', 'comentarios_evaluacion', 'observaciones']
+
+_SQL_EVALUACIONES = """
+    SELECT
+        mm.fecha_entrenamiento,
+        COALESCE(m.nombre_pedrosa, mm.nombre_jugador) as nombre_jugador,
+        mm.evaluacion,
+        mm.comentarios_evaluacion,
+        mm.observaciones
+    FROM medico_mejuto mm
+    LEFT JOIN mapeo_nombre_dni m ON mm.nombre_jugador COLLATE utf8mb4_unicode_ci = m.nombre_mejuto COLLATE utf8mb4_unicode_ci
+"""
+
+# Snapshot inmutable: se sustituye entero en cada refresco (los lectores no necesitan lock)
+_ALMACEN = None
+_ULTIMA_COMPROBACION = 0.0
+_LOCK = threading.Lock()
+
+
+def _intervalo_comprobacion():
+    try:
+        return int(os.getenv('HISTORICO_MEDICO_COMPROBACION_SEGUNDOS', 60))
+    except (TypeError, ValueError):
+        return 60
+
+
+def _engine():
+    from utils.db_manager import get_soccer_db_connection
+
+    engine = get_soccer_db_connection()
+    if engine is None:
+        raise RuntimeError("No se pudo conectar a la BD soccersystem")
+    return engine
+
+
+def _estado_tabla(engine):
+    df = ejecutar_consulta(
+        "SELECT MAX(fecha_entrenamiento) AS ultima, COUNT(*) AS filas FROM medico_mejuto",
+        engine=engine, nombre='medico_mejuto_estado'
+    )
+    return df.iloc[0]['ultima'], int(df.iloc[0]['filas'])
+
+
+def _cargar_filas(engine, desde=None):
+    if desde is None:
+        return ejecutar_consulta(_SQL_EVALUACIONES, engine=engine, nombre='medico_mejuto_completo')
+    return ejecutar_consulta(
+        _SQL_EVALUACIONES + " WHERE mm.fecha_entrenamiento >= :desde",
+        {'desde': desde}, engine=engine, nombre='medico_mejuto_incremental'
+    )
+
+
+def _construir_almacen(df, ultima, filas):
+    """
+    Índices por fecha y por jugador sobre todas las filas cargadas.
+    """
+    df = df[COLUMNAS].reset_index(drop=True)
+
+    # Evaluaciones del día: todas las filas (también sin evaluación), nulos como cadena vacía
+    por_fecha = {
+        str(fecha): grupo.drop(columns='fecha_entrenamiento')
+                         .sort_values('nombre_jugador', kind='stable')
+                         .fillna('')
+                         .reset_index(drop=True)
+        for fecha, grupo in df.groupby('fecha_entrenamiento', sort=False)
+    }
+
+    historico = df[df['evaluacion'].notna()].sort_values(
+        ['fecha_entrenamiento', 'nombre_jugador'], ascending=[False, True], kind='stable'
+    ).reset_index(drop=True)
+    por_jugador = {
+        nombre: grupo.sort_values('fecha_entrenamiento', kind='stable')
+        for nombre, grupo in historico.groupby('nombre_jugador', sort=False)
+    }
+
+    return {
+        'filas': df,
+        'ultima': ultima,
+        'num_filas': filas,
+        'fechas': sorted(df['fecha_entrenamiento'].dropna().unique().tolist(), reverse=True),
+        'por_fecha': por_fecha,
+        'historico': historico,
+        'por_jugador': por_jugador,
+    }
+
+
+def _refrescar():
+    global _ALMACEN
+
+    engine = _engine()
+    ultima, filas = _estado_tabla(engine)
+    almacen = _ALMACEN
+
+    if almacen is not None and almacen['ultima'] == ultima and almacen['num_filas'] == filas:
+        return
+
+    df = None
+    if almacen is not None and almacen['ultima'] is not None:
+        # Incremental: se sustituyen las filas desde la última fecha conocida
+        nuevas = _cargar_filas(engine, almacen['ultima'])
+        anteriores = almacen['filas']
+        anteriores = anteriores[anteriores['fecha_entrenamiento'] < almacen['ultima']]
+        df = pd.concat([anteriores, nuevas[COLUMNAS]], ignore_index=True)
+        if len(df) != filas:
+            df = None
+
+    if df is None:
+        df = _cargar_filas(engine)
+
+    _ALMACEN = _construir_almacen(df, ultima, filas)
+    print(f"🩺 Histórico médico: {len(df)} evaluaciones, última fecha {ultima}")
+
+
+def get_almacen_medico():
+    """
+    Almacén del histórico médico, refrescado si toca comprobar cambios.
+    Si la comprobación falla se sigue sirviendo el último almacén cargado.
+
+    Returns:
+        dict con 'fechas', 'por_fecha', 'historico' y 'por_jugador' (None si nunca se pudo cargar)
+    """
+    global _ULTIMA_COMPROBACION
+
+    if _ALMACEN is not None and time.time() - _ULTIMA_COMPROBACION < _intervalo_comprobacion():
+        return _ALMACEN
+
+    with _LOCK:
+        if _ALMACEN is None or time.time() - _ULTIMA_COMPROBACION >= _intervalo_comprobacion():
+            try:
+                _refrescar()
+            except Exception as e:
+                print(f"Error refrescando histórico médico: {e}")
+                if _ALMACEN is None:
+                    return None
+            _ULTIMA_COMPROBACION = time.time()
+    return _ALMACEN
+
+
+def invalidar_historico_medico():
+    """
+    Fuerza la comprobación de cambios en el próximo acceso.
+    """
+    global _ULTIMA_COMPROBACION
+    _ULTIMA_COMPROBACION = 0.0
@@ -0,0 +1,180 @@
+# utils/indicadores_laliga.py
+
+"""
+Cubo en memoria de indicadores_rendimiento (BD LaLiga): equipo x métrica -> valor,
+ranking y categoría para los 22 equipos.
+
+La tabla es pequeña y solo cambia una vez por jornada, pero las páginas de competición
+(heatmaps, scatters, rankings compuestos) y el semáforo la consultaban en cada callback.
+Aquí se carga entera UNA vez por proceso y todas esas vistas filtran en memoria.
+
+Versión del cubo: (MAX(last_updated), COUNT(*)) si la tabla tiene last_updated, si no
+solo COUNT(*). Como mucho cada INDICADORES_COMPROBACION_SEGUNDOS se comprueba la versión
+y, si ha cambiado, se recarga la tabla completa.
+
+Los diagramas de dispersión (mapas de estilo/rendimiento) comparten además una matriz
+ancha equipo x metric_id que se construye una vez por cada cubo cargado.
+
+Configuración desde .env:
+- INDICADORES_COMPROBACION_SEGUNDOS (por defecto 60)
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+from utils.consultas import ejecutar_consulta
+from utils.db_engines import get_table_columns, table_exists
+
+TABLA_INDICADORES = 'indicadores_rendimiento'
+COLUMNAS_CUBO = [
+    'team_name', 'metric_id', 'metric_name', 'metric_category',
+    'metric_value', 'metric_unit', 'ranking_position', 'season_id'
+]
+
+# {'datos': DataFrame, 'version': tuple, 'comprobado': float}
+_CUBO = None
+_CUBO_LOCK = threading.Lock()
+
+# {'cubo': DataFrame del que se construyó, 'datos': matriz equipo x metric_id}
+_MATRIZ = None
+
+
+def _intervalo_comprobacion():
+    try:
+        return int(os.getenv('INDICADORES_COMPROBACION_SEGUNDOS', 60))
+    except (TypeError, ValueError):
+        return 60
+
+
+def _version(engine, columnas_tabla):
+    ultima = 'MAX(last_updated)' if 'last_updated' in columnas_tabla else 'NULL'
+    df = ejecutar_consulta(
+        f"SELECT {ultima} AS ultima, COUNT(*) AS filas FROM {TABLA_INDICADORES}",
+        engine=engine, nombre='indicadores_rendimiento_version'
+    )
+    return df.iloc[0]['ultima'], int(df.iloc[0]['filas'])
+
+
+def _cargar(engine, columnas_tabla):
+    columnas = [c for c in COLUMNAS_CUBO if c in columnas_tabla]
+    df = ejecutar_consulta(
+        f"SELECT {', '.join(columnas)} FROM {TABLA_INDICADORES}",
+        engine=engine, nombre='indicadores_rendimiento_cubo'
+    )
+    for columna in COLUMNAS_CUBO:
+        if columna not in df.columns:
+            df[columna] = None
+    return df[COLUMNAS_CUBO]
+
+
+def get_cubo_indicadores():
+    """
+    Cubo completo de indicadores (compartido: NO modificar el DataFrame devuelto).
+    Si la comprobación falla se sigue sirviendo el último cubo cargado.
+
+    Returns:
+        DataFrame con COLUMNAS_CUBO (vacío si nunca se pudo cargar)
+    """
+    global _CUBO
+
+    cubo = _CUBO
+    if cubo is not None and time.time() - cubo['comprobado'] < _intervalo_comprobacion():
+        return cubo['datos']
+
+    with _CUBO_LOCK:
+        cubo = _CUBO
+        if cubo is not None and time.time() - cubo['comprobado'] < _intervalo_comprobacion():
+            return cubo['datos']
+
+        try:
+            from utils.db_manager import get_laliga_db_connection
+
+            engine = get_laliga_db_connection()
+            if engine is None or not table_exists(engine, TABLA_INDICADORES):
+                raise RuntimeError(f"No hay acceso a {TABLA_INDICADORES}")
+
+            columnas_tabla = get_table_columns(engine, TABLA_INDICADORES)
+            version = _version(engine, columnas_tabla)
+            if cubo is None or cubo['version'] != version:
+                datos = _cargar(engine, columnas_tabla)
+                print(f"📦 Cubo indicadores LaLiga: {len(datos)} filas, versión {version}")
+            else:
+                datos = cubo['datos']
+            _CUBO = {'datos': datos, 'version': version, 'comprobado': time.time()}
+        except Exception as e:
+            print(f"Error cargando cubo de indicadores LaLiga: {e}")
+            if cubo is None:
+                return pd.DataFrame(columns=COLUMNAS_CUBO)
+            _CUBO = {**cubo, 'comprobado': time.time()}
+
+    return _CUBO['datos']
+
+
+def get_version_cubo():
+    """
+    Versión del cubo cargado (None si todavía no se ha cargado).
+    """
+    cubo = _CUBO
+    return cubo['version'] if cubo is not None else None
+
+
+def consultar_indicadores(team_name=None, metric_ids=None, metric_names=None):
+    """
+    Filas del cubo filtradas por equipo y/o lista de metric_id / metric_name.
+
+    Returns:
+        DataFrame (copia) con COLUMNAS_CUBO
+    """
+    df = get_cubo_indicadores()
+    mascara = pd.Series(True, index=df.index)
+    if team_name is not None:
+        mascara &= df['team_name'] == team_name
+    if metric_ids is not None:
+        mascara &= df['metric_id'].isin(list(metric_ids))
+    if metric_names is not None:
+        mascara &= df['metric_name'].isin(list(metric_names))
+    return df[mascara].copy()
+
+
+def get_matriz_metricas():
+    """
+    Matriz ancha equipo x metric_id con metric_value, ordenada por equipo y métrica
+    (compartida: NO modificar). Se reconstruye solo cuando se recarga el cubo.
+
+    Returns:
+        DataFrame con índice team_name y una columna por metric_id
+    """
+    global _MATRIZ
+
+    cubo = get_cubo_indicadores()
+    matriz = _MATRIZ
+    if matriz is not None and matriz['cubo'] is cubo:
+        return matriz['datos']
+
+    df = cubo.dropna(subset=['team_name', 'metric_id'])
+    datos = df.drop_duplicates(['team_name', 'metric_id'], keep='last').pivot(
+        index='team_name', columns='metric_id', values='metric_value'
+    )
+    _MATRIZ = {'cubo': cubo, 'datos': datos}
+    return datos
+
+
+def pivotar_metricas(metric_ids):
+    """
+    Una fila por equipo y una columna por metric_id con metric_value (datos de scatter).
+    Selección de columnas sobre la matriz compartida: no consulta la BD.
+
+    Returns:
+        DataFrame (copia) con team_name + una columna por métrica encontrada (vacío si no hay datos)
+    """
+    matriz = get_matriz_metricas()
+    columnas = sorted(m for m in set(metric_ids) if m in matriz.columns)
+    if not columnas:
+        return pd.DataFrame()
+    df = matriz[columnas].dropna(how='all')
+    if df.empty:
+        return pd.DataFrame()
+    return df.reset_index()
@@ -0,0 +1,106 @@
+# utils/microciclos.py
+
+"""
+Segmentación de actividades en microciclos.
+
+Todo se calcula en una sola pasada sobre las actividades ordenadas por start_time
+(searchsorted / shift), sin recorrer las actividades una vez por cada MD. Sirve para
+cualquier rango de fechas, incluidas varias temporadas: cada ventana lleva la
+temporada de su MD (corte el 1 de julio).
+
+- segmentar_microciclos(): una ventana por MD (el microciclo que prepara ese partido)
+- indices_md_cierre(): para cada actividad, el MD que cierra su microciclo
+"""
+
+import numpy as np
+import pandas as pd
+
+SEGUNDOS_DIA = 86400
+MES_INICIO_TEMPORADA = 7
+
+
+def temporada_de_fecha(fecha):
+    """
+    Temporada a la que pertenece una fecha: '2025/2026' para 01/07/2025 - 30/06/2026.
+    """
+    fecha = pd.Timestamp(fecha)
+    anio = fecha.year if fecha.month >= MES_INICIO_TEMPORADA else fecha.year - 1
+    return f"{anio}/{anio + 1}"
+
+
+def indices_md_cierre(start_times, md_times):
+    """
+    Para cada actividad, índice (en md_times) del primer MD con start_time >= al suyo.
+
+    Args:
+        start_times (array): start_time de las actividades
+        md_times (array): start_time de los MDs, ordenado ascendente
+
+    Returns:
+        (idx_md, es_actual): idx_md acotado a [0, len(md_times) - 1] y máscara de
+        actividades posteriores al último MD (semana actual)
+    """
+    md_times = np.asarray(md_times)
+    idx_md = np.searchsorted(md_times, np.asarray(start_times), side='left')
+    es_actual = idx_md >= len(md_times)
+    idx_md = np.minimum(idx_md, max(len(md_times) - 1, 0))
+    return idx_md, es_actual
+
+
+def segmentar_microciclos(actividades, col_tiempo='start_time', col_tag='grupo_dia', col_nombre='name'):
+    """
+    Divide las actividades en microciclos delimitados por los partidos (MD).
+
+    El microciclo de cada MD es la preparación hacia ese partido: INCLUYE el MD
+    anterior (que lo inicia) y NO incluye el propio MD.
+
+    Args:
+        actividades (DataFrame): actividades con tiempo UNIX, tag de día y nombre
+        col_tiempo, col_tag, col_nombre (str): nombres de las columnas
+
+    Returns:
+        DataFrame con una fila por MD (orden cronológico) y columnas:
+        - md_posicion: posición del MD en las actividades ordenadas
+        - md_ts: start_time del MD
+        - inicio_ts: MD anterior; si no hay, primera actividad previa o MD - 7 días
+        - fin_ts: última actividad antes del MD; si no hay, MD - 1 día
+        - fin_consulta_ts: MD - 1 segundo (límite para queries, excluye el MD)
+        - partido_nombre: nombre del MD (None si no tiene)
+        - temporada: temporada del MD ('2025/2026')
+    """
+    columnas = ['md_posicion', 'md_ts', 'inicio_ts', 'fin_ts', 'fin_consulta_ts', 'partido_nombre', 'temporada']
+    if actividades is None or actividades.empty:
+        return pd.DataFrame(columns=columnas)
+
+    df = actividades.sort_values(col_tiempo, kind='stable').reset_index(drop=True)
+    tiempos = df[col_tiempo].to_numpy(dtype='int64')
+    md_posiciones = np.flatnonzero((df[col_tag] == 'MD').to_numpy())
+    if len(md_posiciones) == 0:
+        return pd.DataFrame(columns=columnas)
+
+    md_ts = tiempos[md_posiciones]
+
+    # Actividades estrictamente anteriores a cada MD
+    num_previas = np.searchsorted(tiempos, md_ts, side='left')
+    hay_previas = num_previas > 0
+    ultima_previa = tiempos[np.maximum(num_previas - 1, 0)]
+
+    # MD anterior (shift) o, si no hay, primera actividad previa / MD - 7 días
+    md_anterior = np.concatenate(([-1], md_ts[:-1]))
+    inicio_sin_md = np.where(hay_previas, tiempos[0], md_ts - 7 * SEGUNDOS_DIA)
+    inicio_ts = np.where(md_anterior >= 0, md_anterior, inicio_sin_md)
+
+    fin_ts = np.where(hay_previas, ultima_previa, md_ts - SEGUNDOS_DIA)
+
+    nombres = df[col_nombre].to_numpy()[md_posiciones] if col_nombre in df.columns else [None] * len(md_ts)
+    fechas_md = pd.to_datetime(md_ts, unit='s')
+
+    return pd.DataFrame({
+        'md_posicion': md_posiciones,
+        'md_ts': md_ts,
+        'inicio_ts': inicio_ts,
+        'fin_ts': fin_ts,
+        'fin_consulta_ts': md_ts - 1,
+        'partido_nombre': [n if pd.notna(n) else None for n in nombres],
+        'temporada': [temporada_de_fecha(f) for f in fechas_md]
+    })
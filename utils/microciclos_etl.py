@@ -0,0 +1,430 @@
+# utils/microciclos_etl.py
+
+"""
+Proceso incremental que mantiene la tabla intermedia microciclos_metricas_procesadas.
+
+Cada ejecución:
+1. Lee la marca de agua (último start_time procesado) de microciclos_etl_estado
+2. Carga las actividades nuevas (con un margen hacia atrás para métricas que llegan tarde)
+   y las anteriores necesarias para localizar el MD que abre su microciclo
+3. Asigna activity_tag (DayCode normalizado) y microciclo a cada actividad
+4. Pivota las métricas EAV de activity_athlete_metrics a columnas (1 sola query)
+5. Sustituye en bloque (DELETE + INSERT por lotes en una transacción) solo los
+   microciclos tocados y la semana actual
+6. Avanza la marca de agua
+
+Un microciclo va desde el día siguiente a un MD hasta el MD siguiente (incluido).
+Las actividades posteriores al último MD forman la semana actual ('mc_actual').
+
+Configuración desde .env:
+- MICROCICLOS_ETL_MARGEN_HORAS (por defecto 48)
+- MICROCICLOS_ETL_TZ (por defecto Europe/Madrid)
+"""
+
+import os
+import re
+import time
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from utils.db_manager import (
+    get_db_connection,
+    get_all_athletes,
+    get_participants_for_activities,
+    get_metrics_wide,
+    add_grupo_dia_column
+)
+from utils.db_engines import table_exists, get_table_columns, invalidate_schema_cache
+from utils.result_cache import cache_clear
+from utils.referencias_temporada import invalidar_referencias
+from utils.microciclos import indices_md_cierre
+
+
+def _env_int(key, default):
+    try:
+        return int(os.getenv(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+TABLA_PROCESADA = 'microciclos_metricas_procesadas'
+TABLA_ESTADO = 'microciclos_etl_estado'
+NOMBRE_PROCESO = 'microciclos_metricas_procesadas'
+
+MICROCICLO_ACTUAL_ID = 'mc_actual'
+MICROCICLO_ACTUAL_NOMBRE = 'Semana Actual'
+TAG_SIN_CLASIFICAR = 'Unknown'
+
+# Margen hacia atrás sobre la marca de agua (métricas que se suben después de la sesión)
+MARGEN_SEGUNDOS = _env_int('MICROCICLOS_ETL_MARGEN_HORAS', 48) * 3600
+# Ventana para buscar el MD que abre el microciclo de las actividades nuevas
+VENTANA_SEGUNDOS = 21 * 86400
+VENTANA_MAXIMA_SEGUNDOS = 180 * 86400
+ZONA_HORARIA = os.getenv('MICROCICLOS_ETL_TZ', 'Europe/Madrid')
+TAMANO_LOTE = 1000
+
+# Namespaces de utils.result_cache calculados a partir de la tabla intermedia
+CACHES_DEPENDIENTES = ['microciclo_equipo_resumen', 'microciclos_lista', 'tabla_evolutiva_equipo']
+
+# parameter_name en activity_athlete_metrics -> columna en la tabla intermedia
+METRICAS_EAV = {
+    'field_time': 'field_time',
+    'total_distance': 'total_distance',
+    'distancia_+21_km/h_(m)': 'distancia_21_kmh',
+    'distancia_+24_km/h_(m)': 'distancia_24_kmh',
+    'distancia+28_(km/h)': 'distancia_28_kmh',
+    'gen2_acceleration_band7plus_total_effort_count': 'acc_dec_total',
+    'average_player_load': 'player_load',
+    'max_vel': 'max_vel',
+}
+
+COLUMNAS_MICROCICLO = [
+    'microciclo_id', 'microciclo_nombre', 'fecha_inicio', 'fecha_fin',
+    'partido_nombre', 'fecha_partido', 'is_current_week'
+]
+COLUMNAS_ACTIVIDAD = ['activity_id', 'activity_name', 'activity_date', 'activity_tag']
+COLUMNAS_ATLETA = ['athlete_id', 'athlete_name', 'athlete_position', 'participation_type']
+COLUMNAS_METRICAS = list(METRICAS_EAV.values()) + ['aceleraciones', 'ritmo_medio', 'distance_per_minute']
+
+DDL_TABLA_PROCESADA = f'''
+    CREATE TABLE IF NOT EXISTS {TABLA_PROCESADA} (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        microciclo_id VARCHAR(191) NOT NULL,
+        microciclo_nombre VARCHAR(255),
+        fecha_inicio DATE,
+        fecha_fin DATE,
+        partido_nombre VARCHAR(255),
+        fecha_partido DATE,
+        is_current_week TINYINT(1) NOT NULL DEFAULT 0,
+        activity_id VARCHAR(64) NOT NULL,
+        activity_name VARCHAR(255),
+        activity_date DATE,
+        activity_tag VARCHAR(32),
+        athlete_id VARCHAR(64) NOT NULL,
+        athlete_name VARCHAR(255),
+        athlete_position VARCHAR(64),
+        participation_type VARCHAR(32),
+        field_time DOUBLE,
+        total_distance DOUBLE,
+        distancia_21_kmh DOUBLE,
+        distancia_24_kmh DOUBLE,
+        distancia_28_kmh DOUBLE,
+        acc_dec_total DOUBLE,
+        aceleraciones DOUBLE,
+        player_load DOUBLE,
+        ritmo_medio DOUBLE,
+        distance_per_minute DOUBLE,
+        max_vel DOUBLE,
+        UNIQUE KEY uq_actividad_atleta (activity_id, athlete_id),
+        KEY idx_microciclo (microciclo_id),
+        KEY idx_fecha_tag (activity_date, activity_tag),
+        KEY idx_atleta_tag (athlete_id, activity_tag)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+'''
+
+DDL_TABLA_ESTADO = f'''
+    CREATE TABLE IF NOT EXISTS {TABLA_ESTADO} (
+        proceso VARCHAR(64) PRIMARY KEY,
+        ultimo_start_time BIGINT NOT NULL,
+        actualizado_en DATETIME NOT NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+'''
+
+
+# --------------------------------------
+# ESQUEMA Y MARCA DE AGUA
+# --------------------------------------
+
+def crear_tablas_si_no_existen(engine):
+    """
+    Crea la tabla intermedia y la tabla de estado del proceso si no existen.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(DDL_TABLA_PROCESADA))
+        conn.execute(text(DDL_TABLA_ESTADO))
+    invalidate_schema_cache(engine)
+
+
+def leer_marca_agua(engine):
+    """
+    Devuelve el último start_time procesado (UNIX) o None si nunca se ha ejecutado.
+    """
+    with engine.connect() as conn:
+        valor = conn.execute(
+            text(f"SELECT ultimo_start_time FROM {TABLA_ESTADO} WHERE proceso = :proceso"),
+            {'proceso': NOMBRE_PROCESO}
+        ).scalar()
+    return int(valor) if valor is not None else None
+
+
+def _guardar_marca_agua(conn, start_time):
+    conn.execute(
+        text(f'''
+            INSERT INTO {TABLA_ESTADO} (proceso, ultimo_start_time, actualizado_en)
+            VALUES (:proceso, :start_time, :ahora)
+            ON DUPLICATE KEY UPDATE
+                ultimo_start_time = GREATEST(ultimo_start_time, VALUES(ultimo_start_time)),
+                actualizado_en = VALUES(actualizado_en)
+        '''),
+        {'proceso': NOMBRE_PROCESO, 'start_time': int(start_time), 'ahora': datetime.now()}
+    )
+
+
+# --------------------------------------
+# ACTIVIDADES Y MICROCICLOS
+# --------------------------------------
+
+def _slug(nombre):
+    """'J11 RCD Vs R VALLADOLID' -> 'J11_RCD_Vs_R_VALLADOLID' (sin tildes ni símbolos)"""
+    nombre = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^0-9A-Za-z]+', '_', nombre).strip('_')
+
+
+def _cargar_actividades(engine, desde_ts):
+    """
+    Actividades desde desde_ts con activity_tag y activity_date asignados.
+    """
+    query = '''
+        SELECT id, start_time, name, tag_list_json
+        FROM activities
+        WHERE start_time >= %s
+        ORDER BY start_time ASC
+    '''
+    df = pd.read_sql(query, engine, params=(int(desde_ts),))
+    if df.empty:
+        return df
+
+    df = add_grupo_dia_column(df)
+    df['activity_tag'] = df['grupo_dia'].astype(object).replace('Sin clasificar', TAG_SIN_CLASIFICAR)
+    df['activity_date'] = (
+        pd.to_datetime(df['start_time'], unit='s', utc=True)
+        .dt.tz_convert(ZONA_HORARIA)
+        .dt.date
+    )
+    return df.drop(columns=['tag_list_json', 'grupo_dia'])
+
+
+def asignar_microciclos(actividades):
+    """
+    Asigna a cada actividad (ordenada por start_time) el microciclo que cierra el
+    primer MD con start_time >= al suyo; las posteriores al último MD van a 'mc_actual'.
+
+    Returns:
+        DataFrame de actividades con las columnas de COLUMNAS_MICROCICLO
+    """
+    df = actividades.sort_values('start_time').reset_index(drop=True)
+    mds = df[df['activity_tag'] == 'MD']
+    md_times = mds['start_time'].to_numpy()
+
+    # Índice del MD que cierra el microciclo de cada actividad
+    idx_md, es_actual = indices_md_cierre(df['start_time'].to_numpy(), md_times)
+
+    if len(md_times):
+        md_nombres = mds['name'].fillna('').to_numpy()[idx_md]
+        md_fechas = mds['activity_date'].to_numpy()[idx_md]
+        df['microciclo_id'] = [
+            f"mc_{fecha.strftime('%Y-%m-%d')}_{_slug(nombre)}" for fecha, nombre in zip(md_fechas, md_nombres)
+        ]
+        df['partido_nombre'] = md_nombres
+        df['fecha_partido'] = md_fechas
+    else:
+        df['microciclo_id'] = MICROCICLO_ACTUAL_ID
+        df['partido_nombre'] = None
+        df['fecha_partido'] = None
+
+    df.loc[es_actual, 'microciclo_id'] = MICROCICLO_ACTUAL_ID
+    df.loc[es_actual, 'partido_nombre'] = MICROCICLO_ACTUAL_NOMBRE
+    df.loc[es_actual, 'fecha_partido'] = None
+    df['is_current_week'] = es_actual.astype(int)
+    df['microciclo_nombre'] = np.where(
+        es_actual, MICROCICLO_ACTUAL_NOMBRE, 'Semana ' + df['partido_nombre'].astype(str)
+    )
+
+    limites = df.groupby('microciclo_id')['activity_date'].agg(fecha_inicio='min', fecha_fin='max')
+    return df.join(limites, on='microciclo_id')
+
+
+def _actividades_con_contexto(engine, desde_ts):
+    """
+    Carga las actividades desde desde_ts ampliando la ventana hacia atrás hasta
+    encontrar el MD anterior, para que los microciclos tocados queden completos.
+    """
+    ventana = VENTANA_SEGUNDOS
+    while True:
+        actividades = _cargar_actividades(engine, desde_ts - ventana)
+        if actividades.empty or ventana >= VENTANA_MAXIMA_SEGUNDOS:
+            return actividades
+        md_previos = actividades[(actividades['activity_tag'] == 'MD') & (actividades['start_time'] < desde_ts)]
+        if not md_previos.empty:
+            return actividades
+        ventana *= 2
+
+
+# --------------------------------------
+# MÉTRICAS (EAV -> COLUMNAS)
+# --------------------------------------
+
+def _cargar_metricas_pivotadas(activity_ids):
+    """
+    Una sola query para todas las métricas y actividades; devuelve una fila por
+    (activity_id, athlete_id) con una columna por métrica (nombres de la tabla intermedia).
+    """
+    ancho = get_metrics_wide(activity_ids, list(METRICAS_EAV.keys()), dtype='float64')
+    return ancho.rename(columns=METRICAS_EAV)
+
+
+def construir_filas(actividades):
+    """
+    Construye las filas de la tabla intermedia para las actividades dadas
+    (ya con microciclo asignado).
+    """
+    activity_ids = actividades['id'].tolist()
+    metricas = _cargar_metricas_pivotadas(activity_ids)
+    if metricas.empty:
+        return pd.DataFrame()
+
+    # Columnas derivadas
+    metricas['aceleraciones'] = metricas['acc_dec_total']
+    minutos = metricas['field_time'] / 60.0
+    metricas['distance_per_minute'] = (metricas['total_distance'] / minutos).where(minutos > 0)
+    metricas['ritmo_medio'] = metricas['distance_per_minute']
+
+    participantes = get_participants_for_activities(activity_ids, include_participation_tags=True)
+    filas = metricas.merge(participantes, on=['activity_id', 'athlete_id'], how='left')
+
+    atletas = get_all_athletes()
+    if not atletas.empty:
+        atletas = atletas.rename(columns={'id': 'athlete_id', 'full_name': 'athlete_name',
+                                          'position_name': 'athlete_position'})
+        filas = filas.merge(atletas[['athlete_id', 'athlete_name', 'athlete_position']],
+                            on='athlete_id', how='left')
+    else:
+        filas['athlete_name'] = None
+        filas['athlete_position'] = None
+
+    info_actividades = actividades.rename(columns={'id': 'activity_id', 'name': 'activity_name'})
+    filas = filas.merge(
+        info_actividades[COLUMNAS_ACTIVIDAD + COLUMNAS_MICROCICLO],
+        on='activity_id', how='inner'
+    )
+    return filas[COLUMNAS_MICROCICLO + COLUMNAS_ACTIVIDAD + COLUMNAS_ATLETA + COLUMNAS_METRICAS]
+
+
+# --------------------------------------
+# UPSERT EN BLOQUE
+# --------------------------------------
+
+def _trozos(valores, tamano=TAMANO_LOTE):
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+def reemplazar_microciclos(conn, filas, microciclo_ids, columnas_tabla):
+    """
+    Sustituye en la tabla intermedia los microciclos indicados por las filas nuevas.
+    También borra las filas previas de las mismas actividades (p.ej. actividades
+    que pasan de 'mc_actual' a un microciclo cerrado al llegar el MD).
+    """
+    activity_ids = filas['activity_id'].unique().tolist() if not filas.empty else []
+
+    borrar_mc = text(f"DELETE FROM {TABLA_PROCESADA} WHERE microciclo_id IN :ids").bindparams(
+        bindparam('ids', expanding=True))
+    borrar_act = text(f"DELETE FROM {TABLA_PROCESADA} WHERE activity_id IN :ids").bindparams(
+        bindparam('ids', expanding=True))
+    for lote in _trozos(list(microciclo_ids)):
+        conn.execute(borrar_mc, {'ids': lote})
+    for lote in _trozos(activity_ids):
+        conn.execute(borrar_act, {'ids': lote})
+
+    if filas.empty:
+        return 0
+
+    columnas = [c for c in filas.columns if c in columnas_tabla]
+    insertar = text(
+        f"INSERT INTO {TABLA_PROCESADA} ({', '.join(columnas)}) "
+        f"VALUES ({', '.join(':' + c for c in columnas)})"
+    )
+    registros = filas[columnas].astype(object).where(pd.notna(filas[columnas]), None).to_dict('records')
+    for lote in _trozos(registros):
+        conn.execute(insertar, lote)
+    return len(registros)
+
+
+# --------------------------------------
+# PROCESO PRINCIPAL
+# --------------------------------------
+
+def actualizar_microciclos(desde=None, completo=False):
+    """
+    Ejecuta una pasada incremental (o completa) del proceso.
+
+    Args:
+        desde (str|None): Fecha 'YYYY-MM-DD' desde la que reconstruir; si es None se usa
+                          la marca de agua menos el margen (MICROCICLOS_ETL_MARGEN_HORAS)
+        completo (bool): Si True y no se indica 'desde', reconstruye desde el 1 de julio
+                         de la temporada en curso
+
+    Returns:
+        dict con 'microciclos', 'filas', 'marca_agua' y 'segundos'
+    """
+    inicio = time.perf_counter()
+    engine = get_db_connection()
+    if engine is None:
+        raise RuntimeError("No se pudo conectar a la base de datos principal")
+
+    if not table_exists(engine, TABLA_PROCESADA) or not table_exists(engine, TABLA_ESTADO):
+        crear_tablas_si_no_existen(engine)
+
+    marca_agua = leer_marca_agua(engine)
+    if desde:
+        desde_ts = int(datetime.strptime(desde, '%Y-%m-%d').timestamp())
+    elif completo or marca_agua is None:
+        hoy = datetime.now()
+        anio = hoy.year if hoy.month >= 7 else hoy.year - 1
+        desde_ts = int(datetime(anio, 7, 1).timestamp())
+    else:
+        desde_ts = marca_agua - MARGEN_SEGUNDOS
+
+    print(f"🔄 ETL microciclos desde {datetime.fromtimestamp(desde_ts):%Y-%m-%d %H:%M}")
+
+    actividades = _actividades_con_contexto(engine, desde_ts)
+    if actividades.empty:
+        print("   Sin actividades nuevas")
+        return {'microciclos': [], 'filas': 0, 'marca_agua': marca_agua,
+                'segundos': round(time.perf_counter() - inicio, 2)}
+
+    actividades = asignar_microciclos(actividades)
+
+    # Microciclos tocados por actividades nuevas + semana actual siempre
+    tocados = set(actividades.loc[actividades['start_time'] >= desde_ts, 'microciclo_id'])
+    tocados.add(MICROCICLO_ACTUAL_ID)
+    actividades_tocadas = actividades[actividades['microciclo_id'].isin(tocados)]
+
+    filas = construir_filas(actividades_tocadas)
+    columnas_tabla = set(get_table_columns(engine, TABLA_PROCESADA))
+    nueva_marca = int(actividades['start_time'].max())
+
+    with engine.begin() as conn:
+        num_filas = reemplazar_microciclos(conn, filas, tocados, columnas_tabla)
+        _guardar_marca_agua(conn, nueva_marca)
+
+    # Los payloads cacheados de microciclo dependen de esta tabla
+    for namespace in CACHES_DEPENDIENTES:
+        cache_clear(namespace)
+
+    # Las referencias de temporada por jugador solo cambian cuando entra un MD
+    if (actividades_tocadas['activity_tag'] == 'MD').any():
+        invalidar_referencias()
+
+    segundos = round(time.perf_counter() - inicio, 2)
+    print(f"✅ ETL microciclos: {len(tocados)} microciclos, {num_filas} filas en {segundos}s")
+    return {
+        'microciclos': sorted(tocados),
+        'filas': num_filas,
+        'marca_agua': nueva_marca,
+        'segundos': segundos
+    }
@@ -0,0 +1,148 @@
+# utils/precalentamiento.py
+
+"""
+Precalentamiento de cada worker tras el arranque (hook post_fork de gunicorn.conf.py).
+
+El primer click en "Cargar microciclo" tras un despliegue o un reciclado de workers
+pagaba engines fríos, buffers de MySQL fríos y el cálculo completo. En un hilo en
+segundo plano:
+- Todos los workers abren sus pools (BD principal, LaLiga y soccersystem) y construyen
+  en memoria el modelo del heatmap de competición (22 equipos, utils.indicadores_laliga)
+  y el dataset de contextos de partidos (utils.contextos_laliga)
+- UN solo worker (marca atómica en utils.result_cache) deja en la caché compartida:
+  lista de microciclos, los dos microciclos más recientes (semana actual y la jugada),
+  la referencia del equipo, la tabla evolutiva de la temporada, el snapshot del semáforo
+  y el de Tendencia de Resultados
+- Todos los workers arrancan el refresco periódico del snapshot del semáforo
+
+Configuración desde .env:
+- PRECALENTAMIENTO_ACTIVO (por defecto 1; 0 = desactivado)
+- PRECALENTAMIENTO_MODOS (por defecto 'max'; p.ej. 'max,media')
+"""
+
+import os
+import threading
+import time
+
+from utils.result_cache import cache_add
+
+PRECALENTAMIENTO_NAMESPACE = 'precalentamiento'
+# Mientras dure la marca, los demás workers no repiten los cálculos pesados
+PRECALENTAMIENTO_MARCA_TTL = 600
+NUM_MICROCICLOS = 2
+
+_LANZADO_PID = None
+_LANZADO_LOCK = threading.Lock()
+
+
+def _activo():
+    return os.getenv('PRECALENTAMIENTO_ACTIVO', '1') not in ('0', 'false', 'False')
+
+
+def _modos():
+    modos = [m.strip() for m in os.getenv('PRECALENTAMIENTO_MODOS', 'max').split(',')]
+    return [m for m in modos if m in ('max', 'media')] or ['max']
+
+
+def _paso(nombre, funcion):
+    """
+    Ejecuta un paso del precalentamiento midiendo su tiempo; los errores no cortan el resto.
+    """
+    inicio = time.perf_counter()
+    try:
+        funcion()
+        print(f"🔥 Precalentamiento [{nombre}]: {time.perf_counter() - inicio:.2f}s")
+    except Exception as e:
+        print(f"⚠️ Precalentamiento [{nombre}] falló: {e}")
+
+
+def _abrir_engines():
+    from utils.db_manager import get_db_connection, get_laliga_db_connection
+    from utils.soccersystem_data import get_soccersystem_engine
+
+    get_db_connection()
+    get_laliga_db_connection()
+    get_soccersystem_engine()
+
+
+def _precalentar_heatmap_competicion():
+    from pages.competicion_evolutivo_temporada import get_modelos_heatmap
+
+    get_modelos_heatmap()
+
+
+def _precalentar_microciclos():
+    from pages.entrenamiento_equipo import obtener_lista_microciclos, obtener_payload_microciclo
+
+    # La lista viene ordenada por fecha de inicio descendente: semana actual y la anterior
+    microciclos = obtener_lista_microciclos() or []
+    for mc in microciclos[:NUM_MICROCICLOS]:
+        for modo in _modos():
+            obtener_payload_microciclo(mc['id'], modo, bool(mc.get('is_current')))
+
+
+def _precalentar_tabla_evolutiva():
+    from pages.entrenamiento_equipo import obtener_datos_evolutivos_equipo
+
+    for modo in _modos():
+        obtener_datos_evolutivos_equipo(modo)
+
+
+def _precalentar_semaforo():
+    from utils.semaforo_utils import get_snapshot_semaforo
+
+    get_snapshot_semaforo()
+
+
+def precalentar():
+    """
+    Ejecuta el precalentamiento completo en el hilo actual.
+
+    Returns:
+        True si este worker ha hecho los cálculos pesados, False si solo ha abierto engines
+    """
+    from utils.contextos_laliga import get_dataset_contextos
+    from utils.semaforo_utils import iniciar_refresco_semaforo
+
+    inicio = time.perf_counter()
+    _paso('engines', _abrir_engines)
+    # Memoria de proceso: cada worker construye el suyo
+    _paso('heatmap competición', _precalentar_heatmap_competicion)
+    _paso('contextos partidos', get_dataset_contextos)
+    # Refresco periódico del snapshot del semáforo (cada worker comprueba, uno recalcula)
+    iniciar_refresco_semaforo()
+
+    if not cache_add(PRECALENTAMIENTO_NAMESPACE, 'lote', os.getpid(), ttl=PRECALENTAMIENTO_MARCA_TTL):
+        return False
+
+    from utils.referencias_temporada import get_referencias_equipo
+    from utils.tendencia_resultados import get_snapshot_tendencia
+
+    _paso('referencias equipo', get_referencias_equipo)
+    _paso('microciclos', _precalentar_microciclos)
+    _paso('tabla evolutiva', _precalentar_tabla_evolutiva)
+    _paso('semáforo', _precalentar_semaforo)
+    _paso('tendencia resultados', get_snapshot_tendencia)
+    print(f"✅ Precalentamiento completado en {time.perf_counter() - inicio:.2f}s (pid {os.getpid()})")
+    return True
+
+
+def iniciar_precalentamiento():
+    """
+    Lanza precalentar() en un hilo daemon, una sola vez por proceso.
+
+    Returns:
+        True si se ha lanzado
+    """
+    global _LANZADO_PID
+
+    if not _activo():
+        return False
+
+    with _LANZADO_LOCK:
+        if _LANZADO_PID == os.getpid():
+            return False
+        _LANZADO_PID = os.getpid()
+
+    threading.Thread(target=precalentar, name='precalentamiento', daemon=True).start()
+    return True
@@ -0,0 +1,441 @@
+# utils/referencias_temporada.py
+
+"""
+Valores de referencia de temporada por jugador (máximo / media en partidos).
+
+Para cada jugador y temporada se calcula, en UNA consulta sobre
+microciclos_metricas_procesadas y para TODAS las métricas a la vez:
+- max, media, partido y fecha del máximo, número de partidos +70' y último MD
+- fallback: partido con más minutos (si no tiene ningún partido +70')
+
+El resultado se guarda en la caché compartida (utils.result_cache), así que cambiar de
+jugador es una lectura de caché y no 5-7 consultas. Solo cambia cuando entra un MD nuevo:
+el ETL de microciclos vacía el namespace al actualizar la tabla, y la temporada forma
+parte de la clave.
+
+Para una plantilla completa, get_referencias_jugadores() resuelve todos los jugadores
+que falten en caché con una única consulta (IN de atletas) agrupada por jugador, y
+precargar_referencias_jugadores() lo lanza en segundo plano.
+
+Referencia del EQUIPO (gráfico de barras del microciclo y tabla evolutiva): tabla indexada
+por fecha de MD con max / min / media de los últimos 4 MDs por métrica y el partido del
+máximo, construida con UNA consulta agregada por temporada (get_referencias_equipo) y
+consultada con merge_asof (referencias_equipo_para_fechas).
+
+Configuración desde .env:
+- REFERENCIAS_TEMPORADA_TTL (segundos, por defecto 21600): red de seguridad por si la
+  tabla se actualiza por otra vía distinta del ETL
+"""
+
+import os
+import re
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.consultas import ejecutar_consulta
+from utils.db_engines import get_table_columns
+from utils.db_manager import get_db_connection
+from utils.result_cache import get_or_compute, make_key, cache_get, cache_set, cache_clear
+
+REFERENCIAS_NAMESPACE = 'referencias_temporada_jugador'
+REFERENCIAS_EQUIPO_NAMESPACE = 'referencias_equipo_md'
+TABLA_PROCESADA = 'microciclos_metricas_procesadas'
+
+# Solo una precarga en segundo plano a la vez por proceso
+_PRECARGA_LOCK = threading.Lock()
+
+SEGUNDOS_70_MIN = 4200
+SEGUNDOS_ESTANDAR = 5640  # 94 minutos
+
+# Nombre de métrica (como llega de los callbacks) -> columna de la tabla procesada
+# Para ritmo medio usamos distance_per_minute en partidos (MD)
+COLUMNAS_REFERENCIA = {
+    'total_distance': 'total_distance',
+    'distancia_+21_km/h_(m)': 'distancia_21_kmh',
+    'distancia_+24_km/h_(m)': 'distancia_24_kmh',
+    'distancia+28_(km/h)': 'distancia_28_kmh',
+    'gen2_acceleration_band7plus_total_effort_count': 'acc_dec_total',
+    'average_player_load': 'distance_per_minute'
+}
+
+# Columnas que NO se estandarizan a 94' (ya son por minuto)
+COLUMNAS_SIN_ESTANDARIZAR = {'distance_per_minute'}
+
+
+def _ttl():
+    try:
+        return int(os.getenv('REFERENCIAS_TEMPORADA_TTL', 21600))
+    except (TypeError, ValueError):
+        return 21600
+
+
+def fecha_inicio_temporada():
+    """
+    Inicio de la temporada oficial (excluye pretemporada): 10/08 del año actual.
+    """
+    return f"{datetime.now().year}-08-10"
+
+
+def columna_de_metrica(metric_name):
+    """
+    Columna de microciclos_metricas_procesadas para un nombre de métrica (o None si no es válida).
+    """
+    col_name = COLUMNAS_REFERENCIA.get(metric_name, metric_name)
+    return col_name if col_name in COLUMNAS_REFERENCIA.values() else None
+
+
+def _referencias_desde_partidos(df):
+    """
+    Calcula las referencias de todas las columnas a partir de los MDs de UN jugador.
+
+    Args:
+        df (DataFrame): partidos (activity_date, activity_name, field_time, columnas métricas),
+                        ordenados por activity_date descendente
+
+    Returns:
+        dict {columna: {'max', 'media', 'partido_max', 'fecha_max', 'num_partidos',
+                        'ultimo_md_fecha', 'fallback'}}
+    """
+    df_70 = df[df['field_time'] >= SEGUNDOS_70_MIN]
+    referencias = {}
+
+    # Partido con más minutos (solo se usa si no hay ningún partido +70')
+    fila_max_minutos = df.loc[df['field_time'].idxmax()] if not df.empty else None
+
+    for col_name in COLUMNAS_REFERENCIA.values():
+        if col_name not in df.columns:
+            continue
+
+        fallback = None
+        if fila_max_minutos is not None:
+            valor = fila_max_minutos[col_name]
+            if col_name not in COLUMNAS_SIN_ESTANDARIZAR:
+                valor = valor * (SEGUNDOS_ESTANDAR / fila_max_minutos['field_time'])
+            fallback = {
+                'valor': None if pd.isna(valor) else float(valor),
+                'partido': fila_max_minutos['activity_name'],
+                'fecha': fila_max_minutos['activity_date'],
+                'field_time': float(fila_max_minutos['field_time'])
+            }
+
+        if df_70.empty:
+            referencias[col_name] = {
+                'max': None, 'media': None, 'partido_max': None, 'fecha_max': None,
+                'num_partidos': 0, 'ultimo_md_fecha': None, 'fallback': fallback
+            }
+            continue
+
+        # Estandarizar a 94 minutos solo si la métrica lo requiere
+        if col_name in COLUMNAS_SIN_ESTANDARIZAR:
+            valores = df_70[col_name]
+        else:
+            valores = df_70[col_name] * (SEGUNDOS_ESTANDAR / df_70['field_time'])
+
+        if valores.notna().any():
+            idx_max = valores.idxmax()
+            max_value = float(valores.loc[idx_max])
+            media_value = float(valores.mean())
+            partido_max = df_70.loc[idx_max, 'activity_name']
+            fecha_max = df_70.loc[idx_max, 'activity_date']
+        else:
+            max_value = media_value = partido_max = fecha_max = None
+
+        referencias[col_name] = {
+            'max': max_value,
+            'media': media_value,
+            'partido_max': partido_max,
+            'fecha_max': fecha_max,
+            'num_partidos': len(df_70),
+            'ultimo_md_fecha': df_70['activity_date'].iloc[0],  # El más reciente
+            'fallback': fallback
+        }
+
+    return referencias
+
+
+def _cargar_partidos_jugadores(athlete_ids, inicio_temporada):
+    """
+    Una sola consulta con todos los MDs de la temporada de los jugadores y todas las métricas.
+    """
+    engine = get_db_connection()
+    if engine is None:
+        raise RuntimeError("No se pudo conectar a la base de datos")
+
+    # Solo las columnas de métrica que existen en la tabla (p.ej. distancia_28_kmh es opcional)
+    existentes = set(get_table_columns(engine, TABLA_PROCESADA))
+    columnas = ',\n            '.join(sorted(set(COLUMNAS_REFERENCIA.values()) & existentes))
+    query = f'''
+        SELECT
+            athlete_id,
+            activity_date,
+            activity_name,
+            field_time,
+            {columnas}
+        FROM {TABLA_PROCESADA}
+        WHERE athlete_id IN :athlete_ids
+          AND activity_tag = 'MD'
+          AND field_time > 0
+          AND activity_date >= :fecha_inicio_temporada
+        ORDER BY athlete_id, activity_date DESC
+    '''
+    return ejecutar_consulta(
+        query,
+        {'athlete_ids': list(athlete_ids), 'fecha_inicio_temporada': inicio_temporada},
+        engine=engine, nombre='referencias_temporada.jugadores'
+    )
+
+
+def _calcular_referencias_jugadores(athlete_ids, inicio_temporada):
+    """
+    Referencias de varios jugadores con una consulta, agrupando los partidos por jugador.
+
+    Returns:
+        dict {athlete_id: {columna: referencia}} (vacío para jugadores sin MDs)
+    """
+    df = _cargar_partidos_jugadores(athlete_ids, inicio_temporada)
+    referencias = {athlete_id: {} for athlete_id in athlete_ids}
+    for athlete_id, df_jugador in df.groupby('athlete_id', sort=False):
+        referencias[athlete_id] = _referencias_desde_partidos(df_jugador)
+    return referencias
+
+
+def get_referencias_jugador(athlete_id, inicio_temporada=None):
+    """
+    Referencias de temporada del jugador para todas las métricas (cacheadas).
+
+    Returns:
+        dict {columna: referencia} (ver _referencias_desde_partidos); vacío si no tiene MDs
+    """
+    inicio_temporada = inicio_temporada or fecha_inicio_temporada()
+    entrada = get_or_compute(
+        REFERENCIAS_NAMESPACE,
+        make_key(athlete_id, inicio_temporada),
+        lambda: {
+            'athlete_id': athlete_id,
+            'referencias': _calcular_referencias_jugadores([athlete_id], inicio_temporada)[athlete_id]
+        },
+        ttl=_ttl()
+    )
+    return entrada['referencias'] if entrada else {}
+
+
+def get_referencias_jugadores(athlete_ids, inicio_temporada=None):
+    """
+    Referencias de temporada (max, media y fallback de todas las métricas) de varios jugadores.
+
+    Los jugadores que ya están en caché no se consultan; el resto se resuelve con UNA
+    consulta y se guarda en caché jugador a jugador (mismas claves que get_referencias_jugador).
+
+    Args:
+        athlete_ids (list): IDs de los jugadores
+        inicio_temporada (str): 'YYYY-MM-DD' (None = temporada actual)
+
+    Returns:
+        dict {athlete_id: {columna: referencia}}
+    """
+    inicio_temporada = inicio_temporada or fecha_inicio_temporada()
+    resultado = {}
+    pendientes = []
+    for athlete_id in dict.fromkeys(athlete_ids or []):
+        entrada = cache_get(REFERENCIAS_NAMESPACE, make_key(athlete_id, inicio_temporada))
+        if entrada is not None:
+            resultado[athlete_id] = entrada['referencias']
+        else:
+            pendientes.append(athlete_id)
+
+    if pendientes:
+        calculadas = _calcular_referencias_jugadores(pendientes, inicio_temporada)
+        ttl = _ttl()
+        for athlete_id, referencias in calculadas.items():
+            cache_set(REFERENCIAS_NAMESPACE, make_key(athlete_id, inicio_temporada),
+                      {'athlete_id': athlete_id, 'referencias': referencias}, ttl=ttl)
+            resultado[athlete_id] = referencias
+
+    return resultado
+
+
+def precargar_referencias_jugadores(athlete_ids, inicio_temporada=None):
+    """
+    Lanza get_referencias_jugadores() en un hilo en segundo plano (no bloquea el callback).
+    Si ya hay una precarga en curso en este proceso no se lanza otra.
+
+    Returns:
+        True si se ha lanzado la precarga
+    """
+    athlete_ids = list(athlete_ids or [])
+    if not athlete_ids or not _PRECARGA_LOCK.acquire(blocking=False):
+        return False
+
+    def _precargar():
+        try:
+            get_referencias_jugadores(athlete_ids, inicio_temporada)
+        except Exception as e:
+            print(f"⚠️ Error precargando referencias de temporada: {e}")
+        finally:
+            _PRECARGA_LOCK.release()
+
+    threading.Thread(target=_precargar, name='precarga-referencias', daemon=True).start()
+    return True
+
+
+# ============================================
+# REFERENCIA DEL EQUIPO: ÚLTIMOS 4 MDs
+# ============================================
+
+# Métrica del dashboard -> expresión por jugador (+70', estandarizada a 94' salvo el ritmo)
+METRICAS_EQUIPO = {
+    'total_distance': 'total_distance * (5640.0 / field_time)',
+    'distancia_21_kmh': 'distancia_21_kmh * (5640.0 / field_time)',
+    'distancia_24_kmh': 'distancia_24_kmh * (5640.0 / field_time)',
+    'acc_dec_total': 'acc_dec_total * (5640.0 / field_time)',
+    'ritmo_medio': 'distance_per_minute'
+}
+
+VENTANA_MDS = 4
+
+
+def _cargar_medias_equipo_md(desde):
+    """
+    Media del equipo en cada MD desde 'desde' (jugadores de campo +70' con participación Full).
+    Una fila por fecha de MD, orden ascendente.
+    """
+    medias = ',\n            '.join(f"AVG({expresion}) as {metrica}" for metrica, expresion in METRICAS_EQUIPO.items())
+    query = f'''
+        SELECT
+            activity_date as fecha_md,
+            MAX(activity_name) as activity_name,
+            MAX(microciclo_id) as microciclo_id,
+            {medias}
+        FROM {TABLA_PROCESADA}
+        WHERE activity_tag = 'MD'
+          AND activity_date >= :desde
+          AND athlete_position != 'Goal Keeper'
+          AND field_time >= {SEGUNDOS_70_MIN}
+          AND (participation_type IS NULL OR participation_type NOT IN ('Part', 'Rehab'))
+        GROUP BY activity_date
+        ORDER BY activity_date ASC
+    '''
+    return ejecutar_consulta(query, {'desde': desde}, nombre='referencias_equipo.medias_md')
+
+
+def _nombre_partido(activity_name, microciclo_id):
+    """
+    Nombre del partido: activity_name o, si falta, el sufijo 'X_Vs_Y' del microciclo_id.
+    """
+    if pd.notna(activity_name):
+        return activity_name
+    if pd.notna(microciclo_id):
+        match = re.search(r'_([^_]+_Vs_[^_]+)$', microciclo_id)
+        if match:
+            return match.group(1).replace('_', ' ')
+    return None
+
+
+def construir_referencias_equipo(df_md, inicio_temporada):
+    """
+    Tabla de referencia del equipo indexada por fecha de MD.
+
+    Para cada MD de la temporada (desde inicio_temporada) la ventana son los últimos 4 MDs
+    hasta esa fecha (incluida): max, min y media por métrica y el partido/fecha del máximo.
+    Los MDs anteriores al inicio (pretemporada) solo se usan como su propia referencia
+    (primera jornada sin partidos anteriores).
+
+    Returns:
+        DataFrame con fecha_md, partido, en_temporada, num_partidos y, por métrica:
+        <m>, <m>_max, <m>_min, <m>_media, <m>_fecha_max, <m>_partido_max
+    """
+    df = df_md.copy()
+    df['fecha_md'] = pd.to_datetime(df['fecha_md'])
+    df = df.sort_values('fecha_md').reset_index(drop=True)
+    df['partido'] = [_nombre_partido(n, mc) for n, mc in zip(df['activity_name'], df['microciclo_id'])]
+    df['en_temporada'] = df['fecha_md'] >= pd.Timestamp(inicio_temporada)
+
+    if df.empty:
+        return df.drop(columns=['activity_name', 'microciclo_id'])
+
+    # Inicio de la ventana de cada MD: hasta 3 MDs antes, sin cruzar a pretemporada
+    posicion = df['en_temporada'].cumsum().to_numpy() - 1
+    indices = np.arange(len(df))
+    inicio_ventana = np.where(df['en_temporada'], indices - np.minimum(posicion, VENTANA_MDS - 1), indices)
+    df['num_partidos'] = indices - inicio_ventana + 1
+
+    # Matriz de ventanas (n x 4): posiciones de cada MD de la ventana, NaN fuera de ella
+    posiciones = indices[:, None] + np.arange(-(VENTANA_MDS - 1), 1)[None, :]
+    fuera = posiciones < inicio_ventana[:, None]
+    posiciones = np.clip(posiciones, 0, None)
+
+    fechas = df['fecha_md'].to_numpy()
+    partidos = df['partido'].to_numpy(dtype=object)
+    for metrica in METRICAS_EQUIPO:
+        ventanas = np.where(fuera, np.nan, df[metrica].to_numpy(dtype='float64')[posiciones])
+        vacias = np.isnan(ventanas).all(axis=1)
+        pos_max = posiciones[indices, np.argmax(np.where(np.isnan(ventanas), -np.inf, ventanas), axis=1)]
+
+        with np.errstate(all='ignore'):
+            df[f'{metrica}_max'] = np.where(vacias, np.nan, np.max(np.where(np.isnan(ventanas), -np.inf, ventanas), axis=1))
+            df[f'{metrica}_min'] = np.where(vacias, np.nan, np.min(np.where(np.isnan(ventanas), np.inf, ventanas), axis=1))
+            df[f'{metrica}_media'] = np.where(vacias, np.nan, np.nansum(ventanas, axis=1) / np.maximum((~np.isnan(ventanas)).sum(axis=1), 1))
+        df[f'{metrica}_fecha_max'] = pd.Series(fechas[pos_max]).where(~vacias)
+        df[f'{metrica}_partido_max'] = pd.Series(partidos[pos_max], dtype=object).where(~vacias, None)
+
+    return df.drop(columns=['activity_name', 'microciclo_id'])
+
+
+def get_referencias_equipo(inicio_temporada=None):
+    """
+    Tabla de referencia del equipo (últimos 4 MDs por fecha de MD), cacheada por temporada.
+    Una sola consulta agregada por temporada; se invalida con invalidar_referencias().
+    """
+    inicio_temporada = inicio_temporada or fecha_inicio_temporada()
+    # Incluye la pretemporada del mismo año para el caso de primera jornada
+    desde = f"{pd.Timestamp(inicio_temporada).year}-01-01"
+    entrada = get_or_compute(
+        REFERENCIAS_EQUIPO_NAMESPACE,
+        make_key(inicio_temporada),
+        lambda: {'referencias': construir_referencias_equipo(_cargar_medias_equipo_md(desde), inicio_temporada)},
+        ttl=_ttl()
+    )
+    return entrada['referencias'] if entrada else pd.DataFrame()
+
+
+def referencias_equipo_para_fechas(df_referencias, fechas_md, con_primera_jornada=True):
+    """
+    Fila de referencia para cada fecha de MD: el último MD de temporada <= fecha (merge_asof)
+    y, si no hay ninguno, el propio MD (primera jornada) cuando con_primera_jornada=True.
+
+    Args:
+        df_referencias (DataFrame): tabla de get_referencias_equipo()
+        fechas_md (Series): fechas de MD (NaT/None = sin referencia)
+
+    Returns:
+        DataFrame alineado con fechas_md (mismo índice); filas vacías sin referencia
+    """
+    fechas = pd.to_datetime(pd.Series(fechas_md)).rename('fecha_consulta')
+    validas = fechas.dropna()
+    if validas.empty or df_referencias.empty:
+        return pd.DataFrame(index=fechas.index, columns=df_referencias.columns)
+
+    temporada = df_referencias[df_referencias['en_temporada']]
+    izquierda = validas.sort_values().reset_index()
+    encontradas = pd.merge_asof(
+        izquierda, temporada, left_on='fecha_consulta', right_on='fecha_md', direction='backward'
+    ).set_index('index')
+    encontradas = encontradas[encontradas['fecha_md'].notna()]
+
+    if con_primera_jornada:
+        pendientes = izquierda[~izquierda['index'].isin(encontradas.index)]
+        propias = pendientes.merge(df_referencias, left_on='fecha_consulta', right_on='fecha_md').set_index('index')
+        encontradas = pd.concat([encontradas, propias])
+
+    return encontradas[df_referencias.columns].reindex(fechas.index)
+
+
+def invalidar_referencias():
+    """
+    Descarta todas las referencias cacheadas (p.ej. tras cargar un MD nuevo).
+    """
+    cache_clear(REFERENCIAS_NAMESPACE)
+    cache_clear(REFERENCIAS_EQUIPO_NAMESPACE)
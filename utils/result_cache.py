@@ -0,0 +1,305 @@
+# utils/result_cache.py
+
+"""
+Caché de resultados en servidor compartida por todos los workers de gunicorn.
+
+Se guarda en un fichero SQLite local (un único fichero por servidor), de modo que
+cualquier worker que calcule un resultado lo deja disponible para los demás.
+- Entradas sin caducidad (ttl=None) para datos cerrados (p.ej. microciclos pasados)
+- Entradas con TTL corto para datos vivos (p.ej. semana actual)
+- Expulsión LRU cuando se supera el tamaño máximo o el número máximo de entradas
+  (last_access se refresca como mucho cada LRU_TOQUE_SEGUNDOS, para que las lecturas
+  no escriban siempre en el fichero compartido; las entradas de vida corta, como las
+  marcas de cache_add, no se expulsan por LRU: caducan solas)
+
+Los valores se guardan con pickle, así que el fichero solo puede ser del usuario de la app:
+el directorio por defecto se crea con permisos 0700, el fichero con 0600, y se rechaza
+abrir un fichero (o directorio por defecto) que pertenezca a otro usuario.
+
+Configuración desde .env:
+- RESULT_CACHE_PATH (por defecto $XDG_CACHE_HOME o ~/.cache + /dash_rendimiento/result_cache.sqlite)
+- RESULT_CACHE_MAX_MB (por defecto 256)
+- RESULT_CACHE_MAX_ENTRIES (por defecto 2000)
+"""
+
+import os
+import pickle
+import sqlite3
+import stat
+import threading
+import time
+
+_DEFAULT_DIR = os.path.join(
+    os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'dash_rendimiento'
+)
+_DEFAULT_PATH = os.path.join(_DEFAULT_DIR, 'result_cache.sqlite')
+# Una lectura solo actualiza last_access si es más antiguo que esto
+LRU_TOQUE_SEGUNDOS = 60
+# Entradas con TTL <= esto (marcas, datos vivos) quedan fuera de la expulsión LRU
+LRU_TTL_PROTEGIDO = 600
+
+_LOCAL = threading.local()
+_INIT_LOCK = threading.Lock()
+_INITIALIZED_PATHS = set()
+
+
+def _env_int(key, default):
+    try:
+        return int(os.getenv(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _cache_path():
+    return os.getenv('RESULT_CACHE_PATH', _DEFAULT_PATH)
+
+
+def _max_bytes():
+    return _env_int('RESULT_CACHE_MAX_MB', 256) * 1024 * 1024
+
+
+def _max_entries():
+    return _env_int('RESULT_CACHE_MAX_ENTRIES', 2000)
+
+
+def _comprobar_propietario(path, st):
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        raise PermissionError(f"{path} pertenece a otro usuario (uid {st.st_uid}); no se usa como caché")
+
+
+def _preparar_fichero(path):
+    """
+    Crea el directorio por defecto (0700) y el fichero (0600) si no existen y comprueba
+    que ambos son del usuario actual: nunca se des-serializa un fichero ajeno.
+    """
+    directorio = os.path.dirname(os.path.abspath(path))
+    if directorio == os.path.abspath(_DEFAULT_DIR):
+        os.makedirs(directorio, mode=0o700, exist_ok=True)
+        st = os.stat(directorio)
+        _comprobar_propietario(directorio, st)
+        if stat.S_IMODE(st.st_mode) & 0o077:
+            os.chmod(directorio, 0o700)
+
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+        os.close(fd)
+    except FileExistsError:
+        pass
+
+    st = os.lstat(path)
+    if not stat.S_ISREG(st.st_mode):
+        raise PermissionError(f"{path} no es un fichero regular; no se usa como caché")
+    _comprobar_propietario(path, st)
+    if stat.S_IMODE(st.st_mode) & 0o077:
+        os.chmod(path, 0o600)
+
+
+def _get_conn():
+    """
+    Conexión SQLite por hilo y por proceso (las conexiones no se comparten tras fork).
+    """
+    path = _cache_path()
+    pid = os.getpid()
+    conn = getattr(_LOCAL, 'conn', None)
+    if conn is not None and getattr(_LOCAL, 'pid', None) == pid and getattr(_LOCAL, 'path', None) == path:
+        return conn
+
+    _preparar_fichero(path)
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+
+    with _INIT_LOCK:
+        if (path, pid) not in _INITIALIZED_PATHS:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    namespace TEXT NOT NULL,
+                    cache_key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (namespace, cache_key)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_result_cache_lru ON result_cache(last_access)')
+            _INITIALIZED_PATHS.add((path, pid))
+
+    _LOCAL.conn = conn
+    _LOCAL.pid = pid
+    _LOCAL.path = path
+    return conn
+
+
+def make_key(*parts):
+    """
+    Construye una clave de caché estable a partir de sus componentes.
+    """
+    return '|'.join('' if p is None else str(p) for p in parts)
+
+
+def cache_get(namespace, key):
+    """
+    Devuelve el valor cacheado o None si no existe o ha caducado.
+    """
+    try:
+        conn = _get_conn()
+        now = time.time()
+        row = conn.execute(
+            'SELECT value, expires_at, last_access FROM result_cache WHERE namespace = ? AND cache_key = ?',
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at, last_access = row
+        if expires_at is not None and expires_at <= now:
+            conn.execute('DELETE FROM result_cache WHERE namespace = ? AND cache_key = ?', (namespace, key))
+            return None
+        if now - last_access >= LRU_TOQUE_SEGUNDOS:
+            conn.execute(
+                'UPDATE result_cache SET last_access = ? WHERE namespace = ? AND cache_key = ?',
+                (now, namespace, key)
+            )
+        return pickle.loads(value)
+    except Exception as e:
+        print(f"[CACHE] Error leyendo {namespace}/{key}: {e}")
+        return None
+
+
+def cache_set(namespace, key, value, ttl=None):
+    """
+    Guarda un valor en la caché.
+
+    Args:
+        namespace (str): Grupo de la entrada (p.ej. 'microciclo_equipo')
+        key (str): Clave dentro del grupo
+        value: Objeto serializable con pickle
+        ttl (int|None): Segundos de vida; None = sin caducidad (solo LRU)
+    """
+    try:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > _max_bytes():
+            return
+        conn = _get_conn()
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        conn.execute(
+            '''INSERT OR REPLACE INTO result_cache
+               (namespace, cache_key, value, size_bytes, created_at, expires_at, last_access)
+               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            (namespace, key, sqlite3.Binary(blob), len(blob), now, expires_at, now)
+        )
+        _evict(conn)
+    except Exception as e:
+        print(f"[CACHE] Error guardando {namespace}/{key}: {e}")
+
+
+def cache_add(namespace, key, value, ttl=None):
+    """
+    Guarda el valor solo si la clave no existe (o ha caducado). Operación atómica
+    entre workers: sirve como marca para que una tarea la haga un único proceso.
+
+    Returns:
+        True si se ha guardado, False si ya existía o hubo error
+    """
+    try:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = _get_conn()
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        conn.execute(
+            'DELETE FROM result_cache WHERE namespace = ? AND cache_key = ? AND expires_at IS NOT NULL AND expires_at <= ?',
+            (namespace, key, now)
+        )
+        cursor = conn.execute(
+            '''INSERT OR IGNORE INTO result_cache
+               (namespace, cache_key, value, size_bytes, created_at, expires_at, last_access)
+               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            (namespace, key, sqlite3.Binary(blob), len(blob), now, expires_at, now)
+        )
+        return cursor.rowcount == 1
+    except Exception as e:
+        print(f"[CACHE] Error guardando {namespace}/{key}: {e}")
+        return False
+
+
+def cache_delete(namespace, key):
+    """
+    Elimina una entrada concreta.
+    """
+    try:
+        _get_conn().execute('DELETE FROM result_cache WHERE namespace = ? AND cache_key = ?', (namespace, key))
+    except Exception as e:
+        print(f"[CACHE] Error borrando {namespace}/{key}: {e}")
+
+
+def cache_clear(namespace=None):
+    """
+    Vacía un namespace completo (o toda la caché si namespace es None).
+    """
+    try:
+        conn = _get_conn()
+        if namespace is None:
+            conn.execute('DELETE FROM result_cache')
+        else:
+            conn.execute('DELETE FROM result_cache WHERE namespace = ?', (namespace,))
+    except Exception as e:
+        print(f"[CACHE] Error vaciando {namespace}: {e}")
+
+
+def _evict(conn):
+    """
+    Borra entradas caducadas y, si se superan los límites, las menos usadas (LRU).
+    Las entradas con TTL corto (<= LRU_TTL_PROTEGIDO) no se expulsan: caducan solas.
+    """
+    now = time.time()
+    conn.execute('DELETE FROM result_cache WHERE expires_at IS NOT NULL AND expires_at <= ?', (now,))
+
+    total_bytes, total_entries = conn.execute(
+        'SELECT COALESCE(SUM(size_bytes), 0), COUNT(*) FROM result_cache'
+    ).fetchone()
+    max_bytes = _max_bytes()
+    max_entries = _max_entries()
+    if total_bytes <= max_bytes and total_entries <= max_entries:
+        return
+
+    rows = conn.execute(
+        '''SELECT namespace, cache_key, size_bytes FROM result_cache
+           WHERE expires_at IS NULL OR expires_at - created_at > ?
+           ORDER BY last_access ASC''',
+        (LRU_TTL_PROTEGIDO,)
+    ).fetchall()
+    to_delete = []
+    for namespace, key, size in rows:
+        if total_bytes <= max_bytes and total_entries <= max_entries:
+            break
+        to_delete.append((namespace, key))
+        total_bytes -= size
+        total_entries -= 1
+    conn.executemany('DELETE FROM result_cache WHERE namespace = ? AND cache_key = ?', to_delete)
+
+
+def _cacheable(value):
+    if value is None:
+        return False
+    if hasattr(value, 'empty'):
+        return not value.empty
+    if hasattr(value, '__len__'):
+        return len(value) > 0
+    return True
+
+
+def get_or_compute(namespace, key, compute_fn, ttl=None):
+    """
+    Devuelve el valor cacheado o lo calcula con compute_fn() y lo guarda.
+    Los resultados None o vacíos (colecciones, DataFrames) no se cachean.
+    """
+    value = cache_get(namespace, key)
+    if value is not None:
+        return value
+    value = compute_fn()
+    if _cacheable(value):
+        cache_set(namespace, key, value, ttl=ttl)
+    return value
@@ -0,0 +1,128 @@
+# utils/scatter_equipos.py
+
+"""
+Capas comunes de los diagramas de dispersión de equipos (escudos, hover y destacado).
+
+Lo usan los scatters de Mapas de Estilo-Rendimiento, Evolutivo Estilo y Evolutivo
+Temporada. Los datos salen de la matriz equipo x métrica de utils.indicadores_laliga y
+cada capa es UNA traza para los 22 equipos (antes una traza por equipo y capa).
+
+Las figuras terminadas se guardan en memoria mientras no se recargue el cubo de
+indicadores: volver a pulsar una opción ya vista no reconstruye la figura.
+"""
+
+import numpy as np
+import plotly.graph_objects as go
+
+from utils.indicadores_laliga import get_cubo_indicadores
+
+EQUIPO_DESTACADO = 'RC Deportivo'
+
+# {'cubo': DataFrame del cubo con el que se construyeron, 'figuras': {clave: go.Figure | None}}
+_FIGURAS = {'cubo': None, 'figuras': {}}
+
+
+def figura_cacheada(clave, construir):
+    """
+    Figura ya construida para el cubo de indicadores actual; si no existe se llama a
+    construir() y se guarda (también None = sin datos). Compartida: NO modificar.
+    """
+    global _FIGURAS
+
+    cubo = get_cubo_indicadores()
+    cache = _FIGURAS
+    if cache['cubo'] is not cubo:
+        cache = {'cubo': cubo, 'figuras': {}}
+        _FIGURAS = cache
+
+    if clave not in cache['figuras']:
+        cache['figuras'][clave] = construir()
+    return cache['figuras'][clave]
+
+
+def aplicar_jitter(df, metric_x, metric_y):
+    """
+    Añade x_jitter / y_jitter (0.3% del rango, semilla fija) para separar escudos solapados.
+
+    Returns:
+        (x_range, y_range) de los valores originales
+    """
+    np.random.seed(42)  # Para reproducibilidad
+
+    x_range = df[metric_x].max() - df[metric_x].min()
+    y_range = df[metric_y].max() - df[metric_y].min()
+
+    df['x_jitter'] = df[metric_x] + np.random.uniform(-x_range*0.003, x_range*0.003, len(df))
+    df['y_jitter'] = df[metric_y] + np.random.uniform(-y_range*0.003, y_range*0.003, len(df))
+    return x_range, y_range
+
+
+def capas_equipos(fig, df, label_x, label_y, hover_size, destacado_size, destacado_width, img_size_x, img_size_y):
+    """
+    Añade la capa de hover (puntos invisibles) y el círculo azul del equipo destacado,
+    una traza por capa, y devuelve los escudos para layout.images.
+
+    Args:
+        fig: go.Figure
+        df: DataFrame con team_name, x_jitter, y_jitter
+        hover_size (int): tamaño del punto invisible de hover
+        destacado_size (int) / destacado_width (int): círculo del equipo destacado
+        img_size_x / img_size_y (float): tamaño de los escudos en unidades de datos
+
+    Returns:
+        list de dicts de imagen (uno por equipo)
+    """
+    equipos = df['team_name'].to_numpy()
+    x = df['x_jitter'].to_numpy()
+    y = df['y_jitter'].to_numpy()
+
+    # Puntos invisibles para el hover (mantener interactividad)
+    fig.add_trace(go.Scatter(
+        x=x,
+        y=y,
+        mode='markers',
+        marker=dict(
+            size=hover_size,
+            color='rgba(0,0,0,0)',  # Transparente
+            line=dict(width=0)
+        ),
+        customdata=equipos,
+        hovertemplate='<b>%{customdata}</b><br>' +
+                      f'{label_x}: %{{x:.2f}}<br>' +
+                      f'{label_y}: %{{y:.2f}}<extra></extra>',
+        showlegend=False
+    ))
+
+    # Círculo azul para el equipo destacado
+    destacado = equipos == EQUIPO_DESTACADO
+    if destacado.any():
+        fig.add_trace(go.Scatter(
+            x=x[destacado],
+            y=y[destacado],
+            mode='markers',
+            marker=dict(
+                size=destacado_size,
+                color='rgba(0,0,0,0)',
+                line=dict(width=destacado_width, color='#007bff')
+            ),
+            showlegend=False,
+            hoverinfo='skip'
+        ))
+
+    # Escudos como imágenes (mismo tamaño para todos; el destacado lleva el círculo)
+    return [
+        dict(
+            source=f'/assets/Escudos/{team}.png',
+            xref="x",
+            yref="y",
+            x=x_val,
+            y=y_val,
+            sizex=img_size_x,
+            sizey=img_size_y,
+            xanchor="center",
+            yanchor="middle",
+            sizing="contain",
+            layer="above"
+        )
+        for team, x_val, y_val in zip(equipos, x, y)
+    ]
@@ -2,12 +2,81 @@
 
 """
 Utilidades para calcular estados de semáforo de todas las secciones
+
+Snapshot compartido: las seis secciones y el estado general se calculan UNA vez por
+intervalo (SEMAFORO_REFRESCO_SEGUNDOS) y se guardan versionados en la caché de servidor
+(utils.result_cache). Un hilo por worker comprueba la antigüedad y solo el worker que
+consigue la marca recalcula; los callbacks solo leen el snapshot, así que la carga sobre
+las tres BDs no depende de cuántas sesiones tengan el panel abierto.
+
+Las seis secciones consultan BDs independientes (LaLiga, principal y soccersystem), así que
+get_all_semaforo_status() las calcula en paralelo sobre un pool acotado con timeout por
+sección: una fuente lenta o caída se queda en gris 'SIN DATOS' sin bloquear el panel.
+Un hilo colgado no se puede interrumpir, así que la sección que sigue en curso no se vuelve
+a lanzar hasta que termine (se informa 'SIN DATOS'): una fuente colgada ocupa como mucho
+un hilo del pool. Los timeouts del driver (DB_READ_TIMEOUT, utils.db_engines) acotan
+cuánto puede durar.
+
+Configuración desde .env:
+- SEMAFORO_REFRESCO_SEGUNDOS (por defecto 300)
+- SEMAFORO_TIMEOUT_SECCION (segundos, por defecto 20)
+- SEMAFORO_MAX_HILOS (por defecto 6)
 """
 
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 import pandas as pd
 from datetime import datetime
 from utils.db_manager import get_evaluaciones_medicas, get_estadisticas_por_jugador, get_fechas_entrenamiento_disponibles
 from utils.soccersystem_data import get_team_anthropometry_timeseries
+from utils.result_cache import cache_add, cache_delete, cache_get, cache_set
+
+SEMAFORO_NAMESPACE = 'semaforo_snapshot'
+# Marca para que solo un worker recalcule a la vez (caduca si el worker muere a mitad)
+SEMAFORO_MARCA_TTL = 120
+# Espera máxima de un callback mientras otro worker calcula el primer snapshot
+SEMAFORO_ESPERA_MAXIMA = 30
+
+_REFRESCO_PID = None
+_REFRESCO_LOCK = threading.Lock()
+
+# Pool de hilos por proceso para las secciones (no se hereda tras fork)
+_POOL = None
+_POOL_PID = None
+_POOL_LOCK = threading.Lock()
+
+# {seccion: Future} de la última ejecución lanzada en este proceso
+_EN_CURSO = {}
+_EN_CURSO_PID = None
+_EN_CURSO_LOCK = threading.Lock()
+
+
+def _env_int(key, default):
+    try:
+        return int(os.getenv(key, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _get_pool():
+    global _POOL, _POOL_PID
+    pid = os.getpid()
+    if _POOL is not None and _POOL_PID == pid:
+        return _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_PID != pid:
+            _POOL = ThreadPoolExecutor(
+                max_workers=max(_env_int('SEMAFORO_MAX_HILOS', 6), 1),
+                thread_name_prefix='semaforo'
+            )
+            _POOL_PID = pid
+    return _POOL
+
+
+def _intervalo_refresco():
+    return max(_env_int('SEMAFORO_REFRESCO_SEGUNDOS', 300), 10)
 
 
 def get_medico_status():
@@ -189,30 +258,10 @@ def get_competicion_status():
     - Ranking 17-22: Rojo (CRÍTICO)
     """
     try:
-        from utils.db_manager import get_laliga_db_connection
-        import pandas as pd
+        from utils.indicadores_laliga import consultar_indicadores
         
-        # Obtener el ranking global desde indicadores_rendimiento
-        engine = get_laliga_db_connection()
-        
-        if not engine:
-            return {
-                'color': '#6c757d',
-                'estado': 'SIN DATOS',
-                'detalle': 'No se puede conectar a la base de datos'
-            }
-        
-        query = """
-        SELECT 
-            team_name,
-            ranking_position,
-            metric_value
-        FROM indicadores_rendimiento 
-        WHERE metric_id = 'RankingRendimiento'
-        AND team_name = 'RC Deportivo'
-        """
-        
-        df = pd.read_sql(query, engine)
+        # Ranking global desde el cubo de indicadores_rendimiento en memoria
+        df = consultar_indicadores(team_name='RC Deportivo', metric_ids=['RankingRendimiento'])
         
         if df.empty:
             return {
@@ -255,27 +304,77 @@ def get_competicion_status():
         }
 
 
+# Sección -> función de cálculo (orden de presentación)
+SECCIONES_SEMAFORO = {
+    'competicion': get_competicion_status,
+    'entrenamiento': get_entrenamiento_status,
+    'nutricion': get_nutricion_status,
+    'psicologico': get_psicologico_status,
+    'medico': get_medico_status,
+    'capacidad': get_capacidad_status
+}
+
+
+def _estado_sin_datos(detalle):
+    return {
+        'color': '#6c757d',  # Gris - sin datos
+        'estado': 'SIN DATOS',
+        'detalle': detalle
+    }
+
+
 def get_all_semaforo_status():
     """
     Obtiene el estado de todas las secciones del semáforo
+    Las secciones se calculan en paralelo; la que no termina en SEMAFORO_TIMEOUT_SECCION
+    segundos (o falla) queda como 'SIN DATOS'. La latencia es la de la fuente más lenta.
     Returns: dict con todas las secciones
     """
-    return {
-        'competicion': get_competicion_status(),
-        'entrenamiento': get_entrenamiento_status(),
-        'nutricion': get_nutricion_status(),
-        'psicologico': get_psicologico_status(),
-        'medico': get_medico_status(),
-        'capacidad': get_capacidad_status()
-    }
+    global _EN_CURSO, _EN_CURSO_PID
+    
+    timeout = max(_env_int('SEMAFORO_TIMEOUT_SECCION', 20), 1)
+    pool = _get_pool()
+    
+    futuros = {}
+    with _EN_CURSO_LOCK:
+        if _EN_CURSO_PID != os.getpid():
+            _EN_CURSO, _EN_CURSO_PID = {}, os.getpid()
+        for seccion, funcion in SECCIONES_SEMAFORO.items():
+            previo = _EN_CURSO.get(seccion)
+            if previo is not None and not previo.done():
+                # La ejecución anterior sigue colgada: no ocupar otro hilo con la misma fuente
+                futuros[seccion] = None
+                continue
+            futuros[seccion] = _EN_CURSO[seccion] = pool.submit(funcion)
+    wait([f for f in futuros.values() if f is not None], timeout=timeout)
+    
+    estados = {}
+    for seccion, futuro in futuros.items():
+        if futuro is None:
+            print(f"⚠️ Semáforo [{seccion}]: la consulta anterior sigue en curso")
+            estados[seccion] = _estado_sin_datos('La consulta anterior a la fuente sigue en curso')
+            continue
+        if not futuro.done():
+            # El hilo sigue hasta terminar; queda en _EN_CURSO y no se relanza mientras tanto
+            print(f"⚠️ Semáforo [{seccion}]: sin respuesta en {timeout}s")
+            estados[seccion] = _estado_sin_datos(f'Sin respuesta de la fuente en {timeout}s')
+            continue
+        try:
+            estados[seccion] = futuro.result()
+        except Exception as e:
+            print(f"Error calculando estado {seccion}: {e}")
+            estados[seccion] = _estado_sin_datos(f'Error al calcular estado: {str(e)}')
+    return estados
 
 
-def get_estado_general():
+def get_estado_general(estados=None):
     """
     Calcula un estado general basado en todas las secciones
+    Args: estados ya calculados (get_all_semaforo_status); None = se calculan
     Returns: dict con color y estado general
     """
-    estados = get_all_semaforo_status()
+    if estados is None:
+        estados = get_all_semaforo_status()
     
     # Contar estados por color (prioridad: rojo > amarillo > verde > gris)
     colores = [estado['color'] for estado in estados.values()]
@@ -315,3 +414,97 @@ def get_estado_general():
             'estado': 'EN DESARROLLO',
             'detalle': 'La mayoría de secciones están en desarrollo'
         }
+
+
+# ============================================
+# SNAPSHOT COMPARTIDO
+# ============================================
+
+def refrescar_snapshot_semaforo(forzar=False):
+    """
+    Recalcula todas las secciones y el estado general y guarda un snapshot nuevo.
+    Solo lo hace el worker que consigue la marca; los demás no tocan las BDs.
+
+    Args:
+        forzar (bool): recalcular aunque el snapshot actual no haya caducado
+
+    Returns:
+        snapshot vigente o None si otro worker ya está recalculando
+    """
+    if not cache_add(SEMAFORO_NAMESPACE, 'calculando', os.getpid(), ttl=SEMAFORO_MARCA_TTL):
+        return None
+
+    try:
+        anterior = cache_get(SEMAFORO_NAMESPACE, 'actual')
+        # Otro worker puede haberlo recalculado entre la comprobación y la marca
+        if not forzar and not _snapshot_caducado(anterior):
+            return anterior
+        estados = get_all_semaforo_status()
+        snapshot = {
+            'estados': estados,
+            'estado_general': get_estado_general(estados),
+            'timestamp': datetime.now().isoformat(),
+            'calculado_en': time.time(),
+            'version': (anterior or {}).get('version', 0) + 1
+        }
+        cache_set(SEMAFORO_NAMESPACE, 'actual', snapshot)
+        return snapshot
+    finally:
+        cache_delete(SEMAFORO_NAMESPACE, 'calculando')
+
+
+def _snapshot_caducado(snapshot):
+    return snapshot is None or time.time() - snapshot.get('calculado_en', 0) >= _intervalo_refresco()
+
+
+def get_snapshot_semaforo():
+    """
+    Snapshot actual del semáforo (solo lectura de caché). Si todavía no existe ninguno
+    (arranque sin refresco en segundo plano) se calcula aquí o se espera al worker que
+    lo esté calculando.
+
+    Returns:
+        dict con 'estados', 'estado_general', 'timestamp' y 'version'
+    """
+    # Garantiza el refresco periódico aunque el worker no haya pasado por el precalentamiento
+    iniciar_refresco_semaforo()
+
+    snapshot = cache_get(SEMAFORO_NAMESPACE, 'actual')
+    if snapshot is not None:
+        return snapshot
+
+    limite = time.time() + SEMAFORO_ESPERA_MAXIMA
+    while time.time() < limite:
+        snapshot = refrescar_snapshot_semaforo() or cache_get(SEMAFORO_NAMESPACE, 'actual')
+        if snapshot is not None:
+            return snapshot
+        time.sleep(0.5)
+    raise TimeoutError('No hay snapshot del semáforo disponible')
+
+
+def _bucle_refresco():
+    while True:
+        try:
+            if _snapshot_caducado(cache_get(SEMAFORO_NAMESPACE, 'actual')):
+                refrescar_snapshot_semaforo()
+        except Exception as e:
+            print(f"⚠️ Error refrescando snapshot del semáforo: {e}")
+        time.sleep(min(_intervalo_refresco(), 60))
+
+
+def iniciar_refresco_semaforo():
+    """
+    Lanza el hilo de refresco periódico del snapshot, una sola vez por proceso.
+
+    Returns:
+        True si se ha lanzado
+    """
+    global _REFRESCO_PID
+
+    with _REFRESCO_LOCK:
+        if _REFRESCO_PID == os.getpid():
+            return False
+        _REFRESCO_PID = os.getpid()
+
+    threading.Thread(target=_bucle_refresco, name='refresco-semaforo', daemon=True).start()
+    return True
@@ -1,23 +1,24 @@
 # utils/soccersystem_data.py
+import os
+import threading
+import time
+
 import pandas as pd
-from sqlalchemy import create_engine, inspect
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from config import SOCCER_DATABASE_URL, SOCCER_DB_NAME, DB_HOST, SOCCER_DB_HOST, SOCCER_DB_PORT, SOCCER_DB_USER
+from utils.db_engines import get_engine, get_table_names, table_exists, get_table_columns, find_table_column
+from utils.consultas import ejecutar_consulta
 
 
 def get_soccersystem_engine():
     """
-    Crea un engine SQLAlchemy hacia la BD secundaria 'soccersystem'.
+    Devuelve el engine compartido (con pool) hacia la BD secundaria 'soccersystem'.
     """
     try:
         if not SOCCER_DATABASE_URL:
             return None
-        engine = create_engine(SOCCER_DATABASE_URL)
-        # Test rápido
-        _ = engine.connect()
-        _.close()
-        return engine
+        return get_engine('soccersystem', SOCCER_DATABASE_URL)
     except Exception as e:
         print(f"[ANTROPO][ERROR] No se pudo conectar a soccersystem: {e}")
         return None
@@ -26,6 +27,7 @@ def get_soccersystem_engine():
 def _find_first_column(cols: List[str], candidates: List[str]) -> Optional[str]:
     """
     Devuelve el primer nombre de columna que exista en 'cols' entre los 'candidates'.
+    Para columnas de una tabla usar _find_table_column (resuelto una vez por tabla).
     """
     for c in candidates:
         if c in cols:
@@ -33,6 +35,79 @@ def _find_first_column(cols: List[str], candidates: List[str]) -> Optional[str]:
     return None
 
 
+def _find_table_column(engine, table: str, candidates: List[str]) -> Optional[str]:
+    """
+    Resuelve el alias de columna de 'table' desde la caché de esquema: una vez por
+    (tabla, candidatos), sin consultar la BD.
+    """
+    return find_table_column(engine, table, candidates)
+
+
+# Columnas de antropometria_pedrosa que usa el dashboard: nombre canónico -> alias posibles.
+# El canónico es siempre el primer alias, así que el procesado posterior (que resuelve con
+# _find_first_column) funciona igual sobre las columnas ya renombradas en SQL.
+ALIAS_ANTROPOMETRIA = [
+    ["hoja", "nombre_pedrosa"],
+    ["kg_a_bajar", "kg_bajar", "kg_pendientes"],
+    ["porcentaje_grasa", "pct_grasa", "%grasa", "porc_grasa", "grasa_pct", "grasa_porcentaje"],
+    ["sum_pliegues", "suma_pliegues", "pliegues_suma", "suma_pli", "sum_pli", "sumapliegues"],
+    ["peso_kg", "peso", "peso_actual", "weight"],
+    ["peso_ideal", "peso_id", "weight_ideal", "ideal_weight"],
+    ["fecha", "fecha_medicion", "date", "created_at"],
+    ["id", "pk"],
+    ["tricipital_media", "tricipital", "triceps_media", "triceps"],
+    ["subescapular_media", "subescapular", "subesacapular_media"],
+    ["suprailiaco_media", "suprailiaco", "supra_iliaco_media"],
+    ["abdominal_media", "abdominal", "abd_media"],
+    ["muslo_anterior_media", "muslo_anterior", "muslo_ant_media"],
+    ["pierna_medial_media", "pierna_medial", "pierna_med_media"],
+    ["talla_cm", "talla", "altura_cm", "altura"],
+    ["pbc", "per_brazo_contraido", "perimetro_brazo"],
+    ["pmc", "per_muslo_contraido", "perimetro_muslo"],
+    ["ppc", "per_pierna_contraida", "perimetro_pierna"],
+    ["fecha_nacimiento", "nacimiento", "birth_date"],
+    ["raza", "etnia", "race"],
+]
+FECHAS_ANTROPOMETRIA = ["fecha", "fecha_nacimiento"]
+TEXTO_ANTROPOMETRIA = ["hoja", "raza"]
+
+
+def _resolver_columnas_antropometria(engine) -> List[Tuple[str, str]]:
+    """
+    (columna real, nombre canónico) de las columnas presentes, resuelto desde la caché de esquema.
+    """
+    resueltas = []
+    for alias in ALIAS_ANTROPOMETRIA:
+        real = _find_table_column(engine, "antropometria_pedrosa", alias)
+        if real:
+            resueltas.append((real, alias[0]))
+    return resueltas
+
+
+def _consulta_antropometria(engine, where: str, params: dict) -> pd.DataFrame:
+    """
+    SELECT de antropometria_pedrosa proyectando solo las columnas del dashboard, renombradas
+    a su nombre canónico. Fechas a datetime y medidas a float al leer (sin columnas object).
+    """
+    columnas = _resolver_columnas_antropometria(engine)
+    if not columnas:
+        return pd.DataFrame()
+
+    select = ", ".join(f"`{real}` AS {canonica}" for real, canonica in columnas)
+    df = ejecutar_consulta(
+        f"SELECT {select} FROM antropometria_pedrosa WHERE {where}",
+        params, engine=engine, nombre="antropometria_pedrosa"
+    )
+
+    for _, canonica in columnas:
+        if canonica in FECHAS_ANTROPOMETRIA:
+            df[canonica] = pd.to_datetime(df[canonica], errors="coerce")
+        elif canonica not in TEXTO_ANTROPOMETRIA and df[canonica].dtype == object:
+            # Solo las columnas que el driver no ha devuelto como numéricas (DECIMAL / texto)
+            df[canonica] = pd.to_numeric(df[canonica], errors="coerce")
+    return df
+
+
 def get_team_players(team_id: int = 95) -> pd.DataFrame:
     """
     Obtiene jugadores del equipo dado desde las tablas 'player_team' y 'players'.
@@ -43,17 +118,16 @@ def get_team_players(team_id: int = 95) -> pd.DataFrame:
         print("[ANTROPO] Engine soccersystem es None")
         return pd.DataFrame(columns=["player_id", "full_name", "dni"])  # vacío seguro
 
-    insp = inspect(engine)
-    tables = set(insp.get_table_names())
+    tables = get_table_names(engine)
     if not {"player_team", "players"}.issubset(tables):
         print(f"[ANTROPO] Tablas requeridas faltantes. Disponibles: {tables}")
         return pd.DataFrame(columns=["player_id", "full_name", "dni"])  # tablas faltantes
 
     # 1) player_team -> obtener player_ids del equipo
     try:
-        pt_table_cols = [c['name'] for c in insp.get_columns('player_team')]
-        team_col = _find_first_column(pt_table_cols, ["team_id", "id_team", "team", "equipo_id", "club_id"])  # heurística equipo
-        player_id_col = _find_first_column(pt_table_cols, ["player_id", "player", "id_player", "athlete_id"])  # heurística jugador
+        pt_table_cols = get_table_columns(engine, 'player_team')
+        team_col = _find_table_column(engine, 'player_team', ["team_id", "id_team", "team", "equipo_id", "club_id"])  # heurística equipo
+        player_id_col = _find_table_column(engine, 'player_team', ["player_id", "player", "id_player", "athlete_id"])  # heurística jugador
         if not player_id_col:
             print("[ANTROPO] player_team sin columna de jugador reconocible")
             return pd.DataFrame(columns=["player_id", "full_name", "dni"])  # sin columna jugador
@@ -85,8 +159,8 @@ def get_team_players(team_id: int = 95) -> pd.DataFrame:
 
     # 2) players -> info de nombre y dni
     try:
-        pl_table_cols = [c['name'] for c in insp.get_columns('players')]
-        id_key = _find_first_column(pl_table_cols, ["id", "player_id", "id_player"]) or "id"
+        pl_table_cols = get_table_columns(engine, 'players')
+        id_key = _find_table_column(engine, 'players', ["id", "player_id", "id_player"]) or "id"
         placeholders = ",".join(["%s"] * len(player_ids))
         query = f"SELECT * FROM players WHERE {id_key} IN ({placeholders})"
         players_df = pd.read_sql(query, engine, params=tuple(player_ids))
@@ -97,14 +171,13 @@ def get_team_players(team_id: int = 95) -> pd.DataFrame:
         print("[ANTROPO] Tabla players no devolvió filas para los ids indicados")
         return pd.DataFrame(columns=["player_id", "player_name", "dni"])  # sin filas
 
-    pl_cols = list(players_df.columns)
-    id_col = _find_first_column(pl_cols, ["id", "player_id", "id_player"]) or "id"
+    id_col = _find_table_column(engine, 'players', ["id", "player_id", "id_player"]) or "id"
     # Posibles columnas de nombre
-    fn_col = _find_first_column(pl_cols, ["first_name", "nombre", "given_name"])  # nombre
-    ln_col = _find_first_column(pl_cols, ["last_name", "apellidos", "family_name"])  # apellidos
-    name_col = _find_first_column(pl_cols, ["name", "full_name"])  # nombre completo
-    nick_col = _find_first_column(pl_cols, ["nick", "nickname", "alias", "short_name"])  # nick
-    dni_col = _find_first_column(pl_cols, ["dni", "document", "nif", "doc", "documento"])  # documento
+    fn_col = _find_table_column(engine, 'players', ["first_name", "nombre", "given_name"])  # nombre
+    ln_col = _find_table_column(engine, 'players', ["last_name", "apellidos", "family_name"])  # apellidos
+    name_col = _find_table_column(engine, 'players', ["name", "full_name"])  # nombre completo
+    nick_col = _find_table_column(engine, 'players', ["nick", "nickname", "alias", "short_name"])  # nick
+    dni_col = _find_table_column(engine, 'players', ["dni", "document", "nif", "doc", "documento"])  # documento
 
     out = pd.DataFrame()
     out["player_id"] = players_df[id_col]
@@ -135,43 +208,27 @@ def get_team_players(team_id: int = 95) -> pd.DataFrame:
 
     return out
 
-def get_team_anthropometry_timeseries(category: str = "Primer Equipo") -> pd.DataFrame:
-    """
-    Devuelve una serie temporal por jugador filtrando directamente por categoría en la tabla antropometria_pedrosa.
-    Columnas devueltas:
-      - player_name (usando 'hoja' de la tabla)
-      - fecha
-      - kg_a_bajar, pct_grasa, sum_pliegues, peso
-      - peso_muscular (Lee) - calculado con fórmula
-    """
-    engine = get_soccersystem_engine()
-    if engine is None:
-        return pd.DataFrame(columns=[
-            "player_name", "fecha", "kg_a_bajar", "pct_grasa", "sum_pliegues", "peso", "peso_muscular"
-        ])
 
-    insp = inspect(engine)
-    if "antropometria_pedrosa" not in set(insp.get_table_names()):
-        return pd.DataFrame(columns=[
-            "player_name", "fecha", "kg_a_bajar", "pct_grasa", "sum_pliegues", "peso", "peso_muscular"
-        ])
+COLUMNAS_ANTROPOMETRIA = ["player_name", "fecha", "kg_a_bajar", "pct_grasa", "sum_pliegues", "peso", "peso_muscular"]
+FECHA_ANTROPOMETRIA_CANDIDATAS = ["fecha", "fecha_medicion", "date", "created_at"]
+
+# Almacén por categoría: {categoria: {'datos', 'ultima', 'num_filas', 'comprobado'}}
+_ALMACEN_ANTROPOMETRIA = {}
+_ALMACEN_ANTROPOMETRIA_LOCK = threading.Lock()
 
+
+def _intervalo_comprobacion_antropometria():
     try:
-        # Filtrar directamente por categoría en la tabla antropometrica
-        query = "SELECT * FROM antropometria_pedrosa WHERE categoria = %s"
-        df = pd.read_sql(query, engine, params=(category,))
-    except Exception as e:
-        print(f"[ANTROPO][ERROR] Error al consultar antropometria_pedrosa por categoría: {e}")
-        return pd.DataFrame(columns=[
-            "player_name", "fecha", "kg_a_bajar", "pct_grasa", "sum_pliegues", "peso", "peso_muscular"
-        ])
+        return int(os.getenv("ANTROPOMETRIA_COMPROBACION_SEGUNDOS", 60))
+    except (TypeError, ValueError):
+        return 60
 
-    if df.empty:
-        return pd.DataFrame(columns=[
-            "player_name", "fecha", "kg_a_bajar", "pct_grasa", "sum_pliegues", "peso", "peso_muscular"
-        ])
 
-    # Procesar los datos igual que antes pero sin necesidad de mapping
+def _procesar_antropometria(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Filas crudas de antropometria_pedrosa -> serie temporal con las columnas derivadas
+    (% grasa por 4 pliegues, suma de 6 pliegues y peso muscular de Lee).
+    """
     cols = list(df.columns)
     hoja_col = _find_first_column(cols, ["hoja", "nombre_pedrosa"]) or "hoja"
     kg_col = _find_first_column(cols, ["kg_a_bajar", "kg_bajar", "kg_pendientes"])
@@ -258,7 +315,8 @@ def get_team_anthropometry_timeseries(category: str = "Primer Equipo") -> pd.Dat
             else:
                 return 0.0
         
-        factor_raza = df.get(raza_col).apply(get_factor_raza) if raza_col else 0.0
+        # Una evaluación por valor distinto de raza (no por fila)
+        factor_raza = df[raza_col].map({r: get_factor_raza(r) for r in df[raza_col].dropna().unique()}).fillna(0.0) if raza_col else 0.0
         
         # Fórmula de Lee: ((talla_cm/100) * (0.00744*pbc² + 0.00088*pmc² + 0.00441*ppc²)) + 2.4 - 0.048*edad + factor_raza + 7.8
         out["peso_muscular"] = (
@@ -281,6 +339,106 @@ def get_team_anthropometry_timeseries(category: str = "Primer Equipo") -> pd.Dat
     
     return out
 
+
+
+def _cargar_antropometria_categoria(engine, category: str, desde=None) -> pd.DataFrame:
+    """
+    Mediciones procesadas de una categoría; con 'desde', solo las de fecha >= desde.
+    """
+    fecha_col = _find_table_column(engine, "antropometria_pedrosa", FECHA_ANTROPOMETRIA_CANDIDATAS)
+    where = "categoria = :categoria"
+    params = {"categoria": category}
+    if desde is not None and fecha_col:
+        where += f" AND `{fecha_col}` >= :desde"
+        params["desde"] = desde
+
+    df = _consulta_antropometria(engine, where, params)
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNAS_ANTROPOMETRIA)
+    return _procesar_antropometria(df)
+
+
+def _estado_antropometria_categoria(engine, category: str):
+    """
+    (última fecha, número de filas) de la categoría: comprobación barata de cambios.
+    """
+    fecha_col = _find_table_column(engine, "antropometria_pedrosa", FECHA_ANTROPOMETRIA_CANDIDATAS)
+    ultima = f"MAX(`{fecha_col}`)" if fecha_col else "NULL"
+    df = ejecutar_consulta(
+        f"SELECT {ultima} AS ultima, COUNT(*) AS filas FROM antropometria_pedrosa WHERE categoria = :categoria",
+        {"categoria": category}, engine=engine, nombre="antropometria_pedrosa_estado"
+    )
+    return df.iloc[0]["ultima"], int(df.iloc[0]["filas"])
+
+
+def _refrescar_antropometria(engine, category: str, entrada):
+    """
+    Recarga incremental: solo las mediciones desde la última fecha conocida (incluida);
+    si el número de filas no cuadra (ediciones o borrados antiguos), recarga completa.
+    """
+    ultima, filas = _estado_antropometria_categoria(engine, category)
+    if entrada is not None and entrada["ultima"] == ultima and entrada["num_filas"] == filas:
+        return entrada
+
+    datos = None
+    if entrada is not None and entrada["ultima"] is not None and ultima is not None:
+        nuevas = _cargar_antropometria_categoria(engine, category, desde=entrada["ultima"])
+        anteriores = entrada["datos"][entrada["datos"]["fecha"] < pd.Timestamp(entrada["ultima"])]
+        datos = pd.concat([anteriores, nuevas], ignore_index=True)
+        if len(datos) != filas:
+            datos = None
+
+    if datos is None:
+        datos = _cargar_antropometria_categoria(engine, category)
+
+    print(f"[ANTROPO] {category}: {len(datos)} mediciones, última fecha {ultima}")
+    return {"datos": datos, "ultima": ultima, "num_filas": filas}
+
+
+def get_team_anthropometry_timeseries(category: str = "Primer Equipo") -> pd.DataFrame:
+    """
+    Devuelve una serie temporal por jugador filtrando directamente por categoría en la tabla antropometria_pedrosa.
+    Columnas devueltas:
+      - player_name (usando 'hoja' de la tabla)
+      - fecha
+      - kg_a_bajar, pct_grasa, sum_pliegues, peso
+      - peso_muscular (Lee) - calculado con fórmula
+
+    Se sirve desde un almacén en memoria por categoría con las columnas derivadas ya
+    calculadas: como mucho cada ANTROPOMETRIA_COMPROBACION_SEGUNDOS se comprueba si hay
+    mediciones nuevas y solo se cargan esas. Devuelve una copia (los llamadores la modifican).
+    """
+    entrada = _ALMACEN_ANTROPOMETRIA.get(category)
+    if entrada is not None and time.time() - entrada["comprobado"] < _intervalo_comprobacion_antropometria():
+        return entrada["datos"].copy()
+
+    engine = get_soccersystem_engine()
+    if engine is None or not table_exists(engine, "antropometria_pedrosa"):
+        return entrada["datos"].copy() if entrada is not None else pd.DataFrame(columns=COLUMNAS_ANTROPOMETRIA)
+
+    with _ALMACEN_ANTROPOMETRIA_LOCK:
+        entrada = _ALMACEN_ANTROPOMETRIA.get(category)
+        if entrada is None or time.time() - entrada["comprobado"] >= _intervalo_comprobacion_antropometria():
+            try:
+                entrada = _refrescar_antropometria(engine, category, entrada)
+            except Exception as e:
+                print(f"[ANTROPO][ERROR] Error al consultar antropometria_pedrosa por categoría: {e}")
+                if entrada is None:
+                    return pd.DataFrame(columns=COLUMNAS_ANTROPOMETRIA)
+            entrada = {**entrada, "comprobado": time.time()}
+            _ALMACEN_ANTROPOMETRIA[category] = entrada
+
+    return entrada["datos"].copy()
+
+
+def invalidar_antropometria():
+    """
+    Fuerza la comprobación de mediciones nuevas en el próximo acceso.
+    """
+    with _ALMACEN_ANTROPOMETRIA_LOCK:
+        for entrada in _ALMACEN_ANTROPOMETRIA.values():
+            entrada["comprobado"] = 0.0
+
 # backward alias (typo compatibility)
 get_team_antropometry_timeseries = get_team_anthropometry_timeseries
 
@@ -295,15 +453,13 @@ def get_player_team_for_team(team_id: int = 95) -> pd.DataFrame:
         print("[ANTROPO] Engine soccersystem es None (player_team raw)")
         return pd.DataFrame(columns=["player_id", "team_id"])  # vacío
 
-    insp = inspect(engine)
-    if "player_team" not in set(insp.get_table_names()):
+    if not table_exists(engine, "player_team"):
         print("[ANTROPO] Falta tabla player_team (player_team raw)")
         return pd.DataFrame(columns=["player_id", "team_id"])  # falta tabla
 
     try:
-        pt_cols = [c['name'] for c in insp.get_columns('player_team')]
-        team_col = _find_first_column(pt_cols, ["team_id", "id_team", "team", "equipo_id", "club_id"])  # heurística equipo
-        pid_col = _find_first_column(pt_cols, ["player_id", "player", "id_player", "athlete_id"])  # heurística jugador
+        team_col = _find_table_column(engine, 'player_team', ["team_id", "id_team", "team", "equipo_id", "club_id"])  # heurística equipo
+        pid_col = _find_table_column(engine, 'player_team', ["player_id", "player", "id_player", "athlete_id"])  # heurística jugador
         if not pid_col:
             print("[ANTROPO] player_team sin col de jugador (player_team raw)")
             return pd.DataFrame(columns=["player_id", "team_id"])  # sin columna jugador
@@ -343,9 +499,8 @@ def get_soccer_diagnostics(team_id: int = 95) -> dict:
         return diag
 
     diag["connected"] = True
-    insp = inspect(engine)
     try:
-        tables = insp.get_table_names()
+        tables = sorted(get_table_names(engine))
     except Exception as e:
         diag["tables_error"] = str(e)
         return diag
@@ -354,12 +509,12 @@ def get_soccer_diagnostics(team_id: int = 95) -> dict:
     # player_team
     if "player_team" in tables:
         try:
-            pt_cols = [c['name'] for c in insp.get_columns('player_team')]
+            pt_cols = get_table_columns(engine, 'player_team')
         except Exception as e:
             diag["player_team"] = {"columns_error": str(e)}
         else:
-            team_col = _find_first_column(pt_cols, ["team_id", "id_team", "team", "equipo_id", "club_id"])  # heurística equipo
-            pid_col = _find_first_column(pt_cols, ["player_id", "player", "id_player", "athlete_id"])  # heurística jugador
+            team_col = _find_table_column(engine, 'player_team', ["team_id", "id_team", "team", "equipo_id", "club_id"])  # heurística equipo
+            pid_col = _find_table_column(engine, 'player_team', ["player_id", "player", "id_player", "athlete_id"])  # heurística jugador
             info = {"columns": pt_cols, "team_col": team_col, "player_col": pid_col}
             # counts
             try:
@@ -383,11 +538,11 @@ def get_soccer_diagnostics(team_id: int = 95) -> dict:
     # players
     if "players" in tables:
         try:
-            pl_cols = [c['name'] for c in insp.get_columns('players')]
+            pl_cols = get_table_columns(engine, 'players')
         except Exception as e:
             diag["players"] = {"columns_error": str(e)}
         else:
-            id_key = _find_first_column(pl_cols, ["id", "player_id", "id_player"]) or "id"
+            id_key = _find_table_column(engine, 'players', ["id", "player_id", "id_player"]) or "id"
             info = {"columns": pl_cols, "id_key": id_key}
             try:
                 cnt_total = pd.read_sql("SELECT COUNT(*) AS c FROM players", engine)
@@ -410,8 +565,7 @@ def get_player_pedrosa_mapping() -> pd.DataFrame:
         print("[ANTROPO] Engine soccersystem es None (mapping)")
         return pd.DataFrame(columns=["player_id", "dni", "nombre_pedrosa"])  # vacío
 
-    insp = inspect(engine)
-    if "mapeo_nombre_dni" not in set(insp.get_table_names()):
+    if not table_exists(engine, "mapeo_nombre_dni"):
         print("[ANTROPO] Falta tabla mapeo_nombre_dni")
         return pd.DataFrame(columns=["player_id", "dni", "nombre_pedrosa"])  # falta tabla
 
@@ -425,10 +579,9 @@ def get_player_pedrosa_mapping() -> pd.DataFrame:
         print("[ANTROPO] mapeo_nombre_dni está vacío")
         return pd.DataFrame(columns=["player_id", "dni", "nombre_pedrosa"])  # vacío
 
-    cols = list(map_df.columns)
-    pedrosa_col = _find_first_column(cols, ["nombre_pedrosa", "pedrosa_nombre", "hoja"]) or "nombre_pedrosa"
-    pid_col = _find_first_column(cols, ["player_id", "id_player", "player"])  # id jugador
-    dni_col = _find_first_column(cols, ["dni", "document", "nif", "doc", "documento"])  # documento
+    pedrosa_col = _find_table_column(engine, "mapeo_nombre_dni", ["nombre_pedrosa", "pedrosa_nombre", "hoja"]) or "nombre_pedrosa"
+    pid_col = _find_table_column(engine, "mapeo_nombre_dni", ["player_id", "id_player", "player"])  # id jugador
+    dni_col = _find_table_column(engine, "mapeo_nombre_dni", ["dni", "document", "nif", "doc", "documento"])  # documento
 
     out_cols = {}
     if pid_col:
@@ -459,15 +612,12 @@ def get_antropometria_for_hojas(hojas: List[str]) -> pd.DataFrame:
         print("[ANTROPO] Engine soccersystem es None (antropometría)")
         return pd.DataFrame(columns=["hoja", "kg_a_bajar"])
 
-    insp = inspect(engine)
-    if "antropometria_pedrosa" not in set(insp.get_table_names()):
+    if not table_exists(engine, "antropometria_pedrosa"):
         print("[ANTROPO] Falta tabla antropometria_pedrosa")
         return pd.DataFrame(columns=["hoja", "kg_a_bajar"])
 
     try:
-        placeholders = ",".join(["%s"] * len(hojas))
-        query = f"SELECT * FROM antropometria_pedrosa WHERE hoja IN ({placeholders})"
-        df = pd.read_sql(query, engine, params=tuple(hojas))
+        df = _consulta_antropometria(engine, "hoja IN :hojas", {"hojas": list(hojas)})
     except Exception as e:
         print(f"[ANTROPO][ERROR] Consulta antropometria_pedrosa falló: {e}")
         return pd.DataFrame(columns=["hoja", "kg_a_bajar"])  # fallo consulta
@@ -530,14 +680,11 @@ def get_antropometria_timeseries_for_hojas(hojas: List[str]) -> pd.DataFrame:
     if engine is None:
         return pd.DataFrame(columns=["hoja", "fecha", "kg_a_bajar", "pct_grasa", "sum_pliegues", "peso", "id"]) 
 
-    insp = inspect(engine)
-    if "antropometria_pedrosa" not in set(insp.get_table_names()):
+    if not table_exists(engine, "antropometria_pedrosa"):
         return pd.DataFrame(columns=["hoja", "fecha", "kg_a_bajar", "pct_grasa", "sum_pliegues", "peso", "id"]) 
 
     try:
-        placeholders = ",".join(["%s"] * len(hojas))
-        query = f"SELECT * FROM antropometria_pedrosa WHERE hoja IN ({placeholders})"
-        df = pd.read_sql(query, engine, params=tuple(hojas))
+        df = _consulta_antropometria(engine, "hoja IN :hojas", {"hojas": list(hojas)})
     except Exception:
         return pd.DataFrame(columns=["hoja", "fecha", "kg_a_bajar", "pct_grasa", "sum_pliegues", "peso", "id"]) 
 
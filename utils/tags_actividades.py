@@ -0,0 +1,140 @@
+# utils/tags_actividades.py
+
+"""
+Parseo compartido de los tags JSON de actividades y participaciones.
+
+- tag_list_json (activities): DayCode del día (MD, MD-4, MD+1...) y flag de partido
+- tags_json (activity_athletes): tipo de participación (Full / Part / Rehab)
+
+Cada cadena JSON distinta se parsea UNA sola vez (memoizado con lru_cache) y las
+columnas se construyen sobre los valores únicos de la serie (factorize), devolviendo
+columnas categóricas. En temporadas completas casi todas las actividades comparten
+un puñado de combinaciones de tags, así que el coste pasa de N json.loads a unos pocos.
+
+Para MySQL se ofrece además el filtro de partidos empujado a SQL con JSON_CONTAINS.
+"""
+
+import json
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+DAYCODE_TAG_TYPE_ID = '09bdd0ac-3477-11ef-8148-06e64249fcaf'
+PARTICIPATION_TAG_TYPE_ID = '09fd58ee-3477-11ef-8148-06e64249fcaf'
+SIN_CLASIFICAR = 'Sin clasificar'
+
+# Filtro SQL de partidos (MySQL 5.7+): algún tag con name == 'MD'
+FILTRO_SQL_MD = "JSON_CONTAINS(tag_list_json, '{\"name\": \"MD\"}')"
+
+
+@lru_cache(maxsize=8192)
+def _parse_tags(tags_json_str):
+    """
+    Parsea una cadena JSON de tags a una tupla de (tag_type_id, tag_type_name, name).
+    Devuelve una tupla vacía si la cadena no es JSON válido.
+    """
+    try:
+        tags = json.loads(tags_json_str)
+        return tuple(
+            (tag.get('tag_type_id'), tag.get('tag_type_name'), tag.get('name'))
+            for tag in tags if isinstance(tag, dict)
+        )
+    except Exception:
+        return ()
+
+
+@lru_cache(maxsize=512)
+def normalizar_grupo_dia(valor):
+    """
+    Normaliza la etiqueta de día: 'Game -X' / 'MD -X' -> 'MD-X', 'Game' -> 'MD'.
+    Los formatos no reconocidos se mantienen.
+    """
+    if valor == SIN_CLASIFICAR:
+        return valor
+
+    match = re.search(r'Game\s+-\s*(\d+)', valor)
+    if match:
+        return f'MD-{match.group(1)}'
+
+    match = re.search(r'MD\s+-\s*(\d+)', valor)
+    if match:
+        return f'MD-{match.group(1)}'
+
+    if valor == 'Game':
+        return 'MD'
+
+    return valor
+
+
+def _por_valor_unico(serie, funcion, categorica=True):
+    """
+    Aplica 'funcion' solo a los valores únicos de la serie y devuelve una serie
+    (categórica por defecto) alineada con el índice original. Los nulos se pasan como None.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    resultados = [funcion(v) for v in unicos]
+    valor_nulo = funcion(None)
+    valores = [resultados[c] if c >= 0 else valor_nulo for c in codigos]
+    if categorica:
+        return pd.Series(pd.Categorical(valores), index=serie.index)
+    return pd.Series(valores, index=serie.index)
+
+
+def _daycode(tags_json_str, dias_ref):
+    if not tags_json_str:
+        return SIN_CLASIFICAR
+    for tag_type_id, _, name in _parse_tags(tags_json_str):
+        if tag_type_id == DAYCODE_TAG_TYPE_ID and name and (dias_ref is None or name in dias_ref):
+            return normalizar_grupo_dia(name)
+    return SIN_CLASIFICAR
+
+
+def _es_md(tags_json_str):
+    if not tags_json_str:
+        return False
+    return any(name == 'MD' for _, _, name in _parse_tags(tags_json_str))
+
+
+def _participacion(tags_json_str):
+    if not tags_json_str:
+        return None  # Sin tag = consideramos Full por defecto
+    for tag_type_id, tag_type_name, name in _parse_tags(tags_json_str):
+        if tag_type_name == 'Participation' or tag_type_id == PARTICIPATION_TAG_TYPE_ID:
+            return name  # 'Full', 'Part', 'Rehab'
+    return None
+
+
+def extraer_grupo_dia(serie_tags, dias_ref=None):
+    """
+    Día del microciclo (solo tags DayCode, normalizado a MD / MD-X / MD+X).
+
+    Args:
+        serie_tags (Series): columna tag_list_json
+        dias_ref (set|None): nombres DayCode válidos (None = aceptar cualquiera)
+
+    Returns:
+        Series categórica ('Sin clasificar' si no hay DayCode)
+    """
+    dias = frozenset(dias_ref) if dias_ref is not None else None
+    return _por_valor_unico(serie_tags, lambda v: _daycode(v, dias))
+
+
+def extraer_es_md(serie_tags):
+    """
+    True si la actividad tiene algún tag con name == 'MD'.
+
+    Returns:
+        Series booleana
+    """
+    return _por_valor_unico(serie_tags, _es_md, categorica=False).astype(bool)
+
+
+def extraer_participacion(serie_tags):
+    """
+    Tipo de participación desde tags_json de activity_athletes.
+
+    Returns:
+        Series categórica con 'Full', 'Part', 'Rehab' o NaN (sin tag = Full)
+    """
+    return _por_valor_unico(serie_tags, _participacion)
@@ -0,0 +1,217 @@
+# utils/tendencia_resultados.py
+
+"""
+Snapshot del cuadro de mando de Tendencia de Resultados: KPIs, racha, últimos partidos
+y clasificación (ventana de contexto, tabla completa y sus ordenaciones del modal).
+
+Antes cada visita a la página releía match_context_analysis y las ~50 columnas de
+league_standings, aunque el contenido solo cambia tras un partido. Aquí se calcula UNA
+vez por versión de datos y se guarda en la caché compartida (utils.result_cache), así
+que lo reutilizan todas las sesiones, todos los workers y el filtro del modal.
+
+Versión: MAX(last_updated) y COUNT(*) de match_context_analysis y league_standings
+(consulta barata). Como mucho cada TENDENCIA_COMPROBACION_SEGUNDOS se vuelve a comprobar.
+
+El snapshot es compacto y serializable: tipos nativos de Python y listas de registros
+(sin DataFrames), solo con las columnas de clasificación que pinta la página.
+
+Configuración desde .env:
+- TENDENCIA_COMPROBACION_SEGUNDOS (por defecto 60)
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.consultas import ejecutar_consulta
+from utils.result_cache import get_or_compute, make_key
+
+TENDENCIA_NAMESPACE = 'tendencia_resultados'
+# La clave lleva la versión: las entradas antiguas solo se limpian por caducidad/LRU
+TENDENCIA_TTL = 24 * 3600
+EQUIPO_TENDENCIA = 'RC Deportivo'
+
+COLUMNAS_CLASIFICACION = [
+    'position', 'position_change', 'team_name',
+    'matches_played', 'matches_won', 'matches_drawn', 'matches_lost',
+    'goals_for', 'goals_against', 'goal_difference', 'points',
+    'matches_played_home', 'matches_won_home', 'matches_drawn_home', 'matches_lost_home',
+    'goals_for_home', 'goals_against_home', 'goal_difference_home', 'points_home',
+    'matches_played_away', 'matches_won_away', 'matches_drawn_away', 'matches_lost_away',
+    'goals_for_away', 'goals_against_away', 'goal_difference_away', 'points_away',
+    'last_5_matches', 'last_5_points'
+]
+
+# Ordenaciones del modal de clasificación: filtro -> (columnas, ascendente)
+ORDENES_CLASIFICACION = {
+    'last5': ('last_5_points', False),
+    'home': (['points_home', 'goal_difference_home', 'goals_for_home'], [False, False, False]),
+    'away': (['points_away', 'goal_difference_away', 'goals_for_away'], [False, False, False]),
+}
+
+_SQL_VERSION = """
+    SELECT
+        (SELECT MAX(last_updated) FROM match_context_analysis) AS partidos_ultima,
+        (SELECT COUNT(*) FROM match_context_analysis) AS partidos_filas,
+        (SELECT MAX(last_updated) FROM league_standings) AS clasificacion_ultima,
+        (SELECT COUNT(*) FROM league_standings) AS clasificacion_filas
+"""
+
+# {'version': tuple, 'comprobado': float}
+_VERSION = None
+_VERSION_LOCK = threading.Lock()
+
+
+def _intervalo_comprobacion():
+    try:
+        return int(os.getenv('TENDENCIA_COMPROBACION_SEGUNDOS', 60))
+    except (TypeError, ValueError):
+        return 60
+
+
+def _consultar_version():
+    from utils.db_manager import get_laliga_db_connection
+
+    engine = get_laliga_db_connection()
+    if engine is None:
+        raise RuntimeError("No se pudo conectar a la BD LaLiga")
+    fila = ejecutar_consulta(_SQL_VERSION, engine=engine, nombre='tendencia_resultados_version').iloc[0]
+    return (
+        str(fila['partidos_ultima']), int(fila['partidos_filas']),
+        str(fila['clasificacion_ultima']), int(fila['clasificacion_filas'])
+    )
+
+
+def get_version_tendencia():
+    """
+    Versión de los datos de tendencia (comprobada como mucho cada intervalo).
+    Si la comprobación falla se mantiene la última conocida.
+
+    Returns:
+        tuple o None si nunca se pudo comprobar
+    """
+    global _VERSION
+
+    actual = _VERSION
+    if actual is not None and time.time() - actual['comprobado'] < _intervalo_comprobacion():
+        return actual['version']
+
+    with _VERSION_LOCK:
+        actual = _VERSION
+        if actual is not None and time.time() - actual['comprobado'] < _intervalo_comprobacion():
+            return actual['version']
+        try:
+            version = _consultar_version()
+        except Exception as e:
+            print(f"Error comprobando versión de tendencia de resultados: {e}")
+            if actual is None:
+                return None
+            version = actual['version']
+        _VERSION = {'version': version, 'comprobado': time.time()}
+    return version
+
+
+def _a_nativo(valor):
+    """
+    Convierte escalares numpy (sumas, conteos) a tipos de Python, recorriendo dicts y listas.
+    """
+    if isinstance(valor, dict):
+        return {k: _a_nativo(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_a_nativo(v) for v in valor]
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def _ordenar_clasificacion(df, filtro):
+    """
+    Ordena la clasificación según el filtro del modal y renumera la posición.
+    """
+    if filtro not in ORDENES_CLASIFICACION:
+        return df
+    columnas, ascendente = ORDENES_CLASIFICACION[filtro]
+    df = df.sort_values(columnas, ascending=ascendente).reset_index(drop=True)
+    df['position'] = range(1, len(df) + 1)
+    return df
+
+
+def _compactar_clasificacion(datos):
+    if not datos:
+        return {}
+    full_df = datos['full_standings']
+    return {
+        'team_position': datos['team_position'],
+        'full_standings': full_df.to_dict('records'),
+        'context_standings': datos['context_standings'].to_dict('records'),
+        'ordenes': {
+            filtro: _ordenar_clasificacion(full_df, filtro).to_dict('records')
+            for filtro in ORDENES_CLASIFICACION
+        },
+    }
+
+
+def _construir_snapshot(team_name):
+    from utils.db_manager import get_league_standings, get_results_trend_statistics
+
+    stats = get_results_trend_statistics(team_name=team_name)
+    clasificacion = get_league_standings(team_name=team_name, columnas=COLUMNAS_CLASIFICACION)
+    if not stats and not clasificacion:
+        return {}
+    return {
+        'stats': _a_nativo(stats),
+        'clasificacion': _compactar_clasificacion(clasificacion),
+    }
+
+
+def get_snapshot_tendencia(team_name=EQUIPO_TENDENCIA):
+    """
+    Snapshot de tendencia del equipo para la versión actual de los datos
+    (compartido entre sesiones y workers).
+
+    Returns:
+        dict con 'stats' (estadísticas de get_results_trend_statistics) y 'clasificacion'
+        (registros de la tabla completa, ventana de contexto, posición y ordenaciones);
+        {} si no hay datos
+    """
+    version = get_version_tendencia()
+    if version is None:
+        return _construir_snapshot(team_name)
+    return get_or_compute(
+        TENDENCIA_NAMESPACE, make_key(team_name, *version),
+        lambda: _construir_snapshot(team_name), ttl=TENDENCIA_TTL
+    ) or {}
+
+
+def get_clasificacion_tendencia(snapshot):
+    """
+    Clasificación del snapshot con la forma de get_league_standings (DataFrames).
+
+    Returns:
+        dict con 'full_standings', 'team_position' y 'context_standings' ({} si no hay datos)
+    """
+    clasificacion = (snapshot or {}).get('clasificacion')
+    if not clasificacion:
+        return {}
+    return {
+        'full_standings': pd.DataFrame(clasificacion['full_standings']),
+        'team_position': clasificacion['team_position'],
+        'context_standings': pd.DataFrame(clasificacion['context_standings']),
+    }
+
+
+def get_clasificacion_ordenada(filtro, team_name=EQUIPO_TENDENCIA):
+    """
+    Tabla completa ordenada para el filtro del modal ('general', 'last5', 'home', 'away').
+
+    Returns:
+        DataFrame (vacío si no hay datos)
+    """
+    clasificacion = get_snapshot_tendencia(team_name).get('clasificacion')
+    if not clasificacion:
+        return pd.DataFrame()
+    registros = clasificacion['ordenes'].get(filtro, clasificacion['full_standings'])
+    return pd.DataFrame(registros)